@@ -0,0 +1,60 @@
+"""Páginas de la interfaz TPS, una por módulo del menú lateral.
+
+Cada página es un módulo con una función ``mostrar()``. Se importa la
+primera vez que se elige en el menú, así que sus dependencias (plotly,
+el motor de informes...) no se cargan en el arranque ni afectan a las
+demás páginas. ``TIEMPOS_ARRANQUE`` guarda lo que costó cada paso de
+arranque del proceso y ``TIEMPOS_RENDER`` el último render de cada
+página, para el reporte de la barra lateral; con el perfilador activo
+(ver ``tps_perfilado``) las consultas de cada página se atribuyen a ella.
+"""
+import importlib
+import time
+from contextlib import contextmanager
+
+from tps_perfilado import PERFILADOR
+
+# Etiqueta del menú -> módulo de la página
+MODULOS = {
+    "🏠 Dashboard TPS": 'dashboard',
+    "👁️ Inspecciones Visuales": 'inspecciones',
+    "📡 Lecturas de Sensores": 'sensores',
+    "🧪 Pruebas Fisicoquímicas": 'pruebas',
+    "📦 Compatibilidad Envases": 'envases',
+    "🚨 Alertas Automáticas": 'alertas',
+    "📊 Informes Consolidados": 'informes',
+    "🌍 Trazabilidad Internacional": 'trazabilidad',
+    "📥 Importación Histórica": 'importacion',
+    "⚙️ Rendimiento": 'rendimiento',
+}
+
+# Paso de arranque -> segundos (solo la primera vez en el proceso)
+TIEMPOS_ARRANQUE = {}
+# Etiqueta del menú -> segundos del último render
+TIEMPOS_RENDER = {}
+
+
+@contextmanager
+def medir_arranque(paso):
+    """Registra la duración del bloque en TIEMPOS_ARRANQUE si ``paso`` aún no se midió."""
+    if paso in TIEMPOS_ARRANQUE:
+        yield
+        return
+    inicio = time.perf_counter()
+    yield
+    TIEMPOS_ARRANQUE[paso] = time.perf_counter() - inicio
+
+
+def cargar_pagina(etiqueta):
+    """Módulo de la página; la primera importación queda registrada en TIEMPOS_ARRANQUE."""
+    nombre = MODULOS[etiqueta]
+    with medir_arranque(f"Importar página {nombre}"):
+        return importlib.import_module(f"{__name__}.{nombre}")
+
+
+def mostrar_pagina(etiqueta):
+    pagina = cargar_pagina(etiqueta)
+    inicio = time.perf_counter()
+    with PERFILADOR.seccion(pagina=etiqueta):
+        pagina.mostrar()
+    TIEMPOS_RENDER[etiqueta] = time.perf_counter() - inicio
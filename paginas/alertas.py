@@ -0,0 +1,167 @@
+"""Alertas automáticas: alertas activas, registro manual, historial y configuración."""
+import streamlit as st
+
+from paginas.comun import (INTERVALO_EN_VIVO, actualizar, feed_alertas_activas, guardar_configuracion_umbrales, pestanas,
+                           registrar, resumen_historial, selector_ambito_umbrales, selector_lote, tabla_paginada)
+
+# Tarjetas de alertas activas que se dibujan por refresco
+ALERTAS_VISIBLES = 50
+
+CRITICIDAD_COLOR = {
+    'ALTA': '#ef4444',
+    'MEDIA': '#f59e0b', 
+    'BAJA': '#10b981'
+}
+
+
+# Callback: corre antes del refresco, así el fragmento ya no dibuja la alerta resuelta
+def resolver_alerta(id_alerta, codigo_alerta):
+    actualizar('alertas_automaticas', {'estado_alerta': 'RESUELTA', 'episodio_abierto': 0}, id=id_alerta)
+    st.toast(f"✅ Alerta {codigo_alerta} marcada como resuelta")
+
+
+# Alertas activas desde el feed de la sesión: cada tick relee solo las alertas que cambiaron
+@st.fragment(run_every=INTERVALO_EN_VIVO)
+def alertas_en_vivo():
+    feed, _ = feed_alertas_activas()
+    if not feed.alertas:
+        st.success("✅ No hay alertas activas en el sistema")
+        return
+    
+    if len(feed.alertas) > ALERTAS_VISIBLES:
+        st.caption(f"Mostrando las {ALERTAS_VISIBLES} alertas más recientes de {len(feed.alertas):,} activas")
+    for alerta in feed.recientes(ALERTAS_VISIBLES):
+        st.markdown(f"""
+        <div class="alert-box" style="border-left: 4px solid {CRITICIDAD_COLOR.get(alerta['nivel_criticidad'], '#6b7280')}">
+            <h4>🚨 {alerta['tipo_alerta']} - {alerta['nivel_criticidad']}</h4>
+            <p><strong>Lote:</strong> {alerta['codigo_lote']} ({alerta['nombre_producto']})</p>
+            <p><strong>Mensaje:</strong> {alerta['mensaje_alerta']}</p>
+            <p><strong>Parámetro:</strong> {alerta['parametro_afectado']} - Valor: {alerta['valor_detectado']} (Límite: {alerta['valor_limite']})</p>
+            <p><strong>Fecha:</strong> {alerta['fecha_alerta']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        if alerta['lecturas_afectadas'] is not None:
+            estado_episodio = "en curso" if alerta['episodio_abierto'] else f"hasta {alerta['fecha_fin']}"
+            st.caption(f"⏱️ Episodio {estado_episodio}: {int(alerta['lecturas_afectadas'])} lecturas, "
+                       f"{alerta['duracion_segundos'] / 60:.1f} min")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button(f"✅ Resolver Alerta {alerta['codigo_alerta']}", key=f"resolver_{alerta['id']}",
+                      on_click=resolver_alerta, args=(alerta['id'], alerta['codigo_alerta']))
+        
+        with col2:
+            accion = st.text_input(f"Acción tomada para {alerta['codigo_alerta']}", key=f"accion_{alerta['id']}")
+            if st.button(f"💾 Guardar Acción", key=f"guardar_{alerta['id']}"):
+                if accion:
+                    actualizar('alertas_automaticas', {'accion_tomada': accion}, id=alerta['id'])
+                    st.success("Acción guardada")
+
+
+def mostrar():
+    st.title("🚨 Sistema de Alertas Automáticas TPS")
+    
+    tab1, tab2, tab3 = pestanas(["⚡ Alertas Activas", "📊 Historial", "⚙️ Configuración"])
+    
+    with tab1:
+        st.subheader("⚡ Alertas Activas del Sistema")
+        
+        alertas_en_vivo()
+        
+        # Generar nueva alerta de ejemplo
+        st.markdown("---")
+        st.subheader("🔧 Simular Nueva Alerta")
+        
+        lote_alerta = selector_lote("lote_alerta", 'abiertos')
+        
+        with st.form("form_alerta"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                tipo_alerta = st.selectbox("Tipo de Alerta", 
+                    ["TEMPERATURA", "HUMEDAD", "PH", "PESO", "CALIDAD", "SENSOR"])
+                nivel_criticidad = st.selectbox("Nivel de Criticidad", ["BAJA", "MEDIA", "ALTA"])
+            
+            with col2:
+                mensaje_alerta = st.text_input("Mensaje de Alerta", 
+                    placeholder="Descripción del problema detectado")
+                parametro_afectado = st.text_input("Parámetro Afectado", placeholder="Ej: Temperatura")
+                valor_detectado = st.number_input("Valor Detectado", value=0.0)
+                valor_limite = st.number_input("Valor Límite", value=0.0)
+            
+            if st.form_submit_button("🚨 Generar Alerta"):
+                if lote_alerta and mensaje_alerta:
+                    try:
+                        codigo_alerta = registrar('alertas_automaticas', {
+                            'codigo_lote': lote_alerta, 'tipo_alerta': tipo_alerta, 'nivel_criticidad': nivel_criticidad,
+                            'mensaje_alerta': mensaje_alerta, 'parametro_afectado': parametro_afectado,
+                            'valor_detectado': valor_detectado, 'valor_limite': valor_limite, 'estado_alerta': 'ACTIVA'})
+                        st.success(f"🚨 Alerta generada: {codigo_alerta}")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+    
+    with tab2:
+        st.subheader("📊 Historial de Alertas")
+        
+        filtros, hay_registros = tabla_paginada("historial_alertas", 'alertas')
+        
+        if hay_registros:
+            resumen = resumen_historial('alertas', {
+                'total': "COUNT(*)",
+                'activas': "COUNT(CASE WHEN aa.estado_alerta = 'ACTIVA' THEN 1 END)",
+                'resueltas': "COUNT(CASE WHEN aa.estado_alerta = 'RESUELTA' THEN 1 END)",
+                'criticas': "COUNT(CASE WHEN aa.nivel_criticidad = 'ALTA' THEN 1 END)",
+            }, **filtros)
+            
+            # Métricas de alertas
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("🚨 Total Alertas", resumen['total'])
+            with col2:
+                st.metric("⚡ Activas", resumen['activas'])
+            with col3:
+                st.metric("✅ Resueltas", resumen['resueltas'])
+            with col4:
+                st.metric("🔴 Críticas", resumen['criticas'])
+        else:
+            st.info("🚨 No hay alertas en el historial")
+    
+    with tab3:
+        st.subheader("⚙️ Configuración de Alertas")
+        
+        st.markdown("### 🎛️ Parámetros de Alertas Automáticas")
+        st.caption("Fuera del rango de sensores la alerta es de criticidad MEDIA; fuera de estos límites, ALTA.")
+        
+        ambito, codigo_ambito, umbrales = selector_ambito_umbrales("alertas")
+        sufijo = f"{ambito}_{codigo_ambito}"
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**🌡️ Alertas de Temperatura**")
+            temp_alerta_min = st.number_input("Temperatura Mínima Alerta (°C)", value=float(umbrales['temp_alerta_min']), key=f"temp_alerta_min_{sufijo}")
+            temp_alerta_max = st.number_input("Temperatura Máxima Alerta (°C)", value=float(umbrales['temp_alerta_max']), key=f"temp_alerta_max_{sufijo}")
+            
+            st.markdown("**💧 Alertas de Humedad**")
+            hum_alerta_min = st.number_input("Humedad Mínima Alerta (%)", value=float(umbrales['hum_alerta_min']), key=f"hum_alerta_min_{sufijo}")
+            hum_alerta_max = st.number_input("Humedad Máxima Alerta (%)", value=float(umbrales['hum_alerta_max']), key=f"hum_alerta_max_{sufijo}")
+        
+        with col2:
+            st.markdown("**🧪 Alertas de pH**")
+            ph_alerta_min = st.number_input("pH Mínimo Alerta", value=float(umbrales['ph_alerta_min']), key=f"ph_alerta_min_{sufijo}")
+            ph_alerta_max = st.number_input("pH Máximo Alerta", value=float(umbrales['ph_alerta_max']), key=f"ph_alerta_max_{sufijo}")
+            
+            st.markdown("**⚖️ Alertas de Peso**")
+            peso_variacion_max = st.number_input("Variación Máxima Peso (%)", value=float(umbrales['peso_variacion_max']), key=f"peso_variacion_max_{sufijo}")
+        
+        if st.button("💾 Guardar Configuración de Alertas"):
+            if temp_alerta_min >= temp_alerta_max or hum_alerta_min >= hum_alerta_max or ph_alerta_min >= ph_alerta_max:
+                st.error("❌ Cada mínimo debe ser menor que su máximo")
+            elif guardar_configuracion_umbrales(ambito, codigo_ambito, {
+                'temp_alerta_min': temp_alerta_min, 'temp_alerta_max': temp_alerta_max,
+                'hum_alerta_min': hum_alerta_min, 'hum_alerta_max': hum_alerta_max,
+                'ph_alerta_min': ph_alerta_min, 'ph_alerta_max': ph_alerta_max,
+                'peso_variacion_max': peso_variacion_max,
+            }):
+                st.success("✅ Configuración de alertas actualizada")
@@ -0,0 +1,90 @@
+"""Búsqueda global de la barra lateral y ficha del lote de cada resultado."""
+import re
+
+import pandas as pd
+import streamlit as st
+
+from paginas.comun import recursos
+from tps_busqueda import FUENTES, MAX_RANQUEADOS, MARCA_FIN, MARCA_INICIO, buscar
+from tps_linaje import ETIQUETAS_TIPO, nodo, resumen as resumen_linaje
+
+RESULTADOS_VISIBLES = 10
+
+
+def _escapar(texto):
+    return re.sub(r'([\\`*_\[\]#<>:$~|])', r'\\\1', texto)
+
+
+def resaltar(fragmento):
+    """Markdown del fragmento de ``buscar`` con las coincidencias resaltadas."""
+    partes = re.split(f"{re.escape(MARCA_INICIO)}(.*?){re.escape(MARCA_FIN)}", fragmento)
+    # split alterna texto normal (posiciones pares) y coincidencias (impares)
+    return ''.join(f":orange-background[{_escapar(parte)}]" if i % 2 else _escapar(parte)
+                   for i, parte in enumerate(partes))
+
+
+@st.dialog("📦 Ficha del lote", width="large")
+def ficha_lote(codigo_lote):
+    pool = recursos().pool
+    with pool.conexion() as conn:
+        lote = conn.execute("""
+            SELECT lp.codigo_lote, pa.nombre_producto, lp.campo_origen, lp.fecha_cosecha, lp.cantidad_kg, lp.estado_lote
+            FROM lotes_produccion lp
+            LEFT JOIN productos_agro pa ON pa.codigo_producto = lp.codigo_producto
+            WHERE lp.codigo_lote = ?
+        """, (codigo_lote,)).fetchone()
+    if lote is None:
+        st.warning(f"El lote {codigo_lote} ya no existe")
+        return
+
+    _, producto, campo, cosecha, kg, estado = lote
+    st.markdown(f"### {codigo_lote}")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Producto", producto or "—")
+        st.caption(f"🌾 {campo or 'Campo sin registrar'}")
+    with col2:
+        st.metric("Cosecha", cosecha or "—")
+        st.caption(f"⚖️ {kg or 0:,.1f} kg")
+    with col3:
+        st.metric("Estado", estado or "—")
+
+    with pool.conexion() as conn:
+        origen = nodo(conn, 'lote', codigo_lote)
+        if origen is not None:
+            arriba, abajo = resumen_linaje(conn, origen)
+            st.caption("🔗 " + " · ".join(f"{ETIQUETAS_TIPO[tipo]}: {n:,}" for tipo, n in {**arriba, **abajo}.items()))
+        registros = pd.concat([pd.read_sql_query(f"""
+            SELECT '{fuente.etiqueta}' AS registro, {fuente.columna_codigo} AS codigo, {fuente.columna_fecha} AS fecha,
+                   {', '.join(fuente.columnas_texto)}
+            FROM {tabla} WHERE codigo_lote = ?
+        """, conn, params=(codigo_lote,)).melt(['registro', 'codigo', 'fecha'], var_name='campo', value_name='texto')
+            for tabla, fuente in FUENTES.items()])
+    registros = registros[registros['texto'].fillna('') != ''].sort_values('fecha', ascending=False)
+    if registros.empty:
+        st.info("El lote no tiene observaciones ni documentos registrados")
+    else:
+        st.dataframe(registros, use_container_width=True, hide_index=True)
+
+
+def barra_busqueda():
+    """Buscador de texto libre en la barra lateral; cada resultado abre la ficha de su lote."""
+    texto = st.sidebar.text_input("🔎 Buscar en registros", placeholder="defecto, acción, documento...",
+                                  key="busqueda_global")
+    if not texto:
+        return
+    with recursos().pool.conexion() as conn:
+        resultado = buscar(conn, texto, RESULTADOS_VISIBLES)
+    if resultado.por_relevancia:
+        st.sidebar.caption(f"{resultado.total:,} coincidencias en {resultado.milisegundos:.1f} ms, por relevancia")
+    else:
+        st.sidebar.caption(f"Más de {MAX_RANQUEADOS:,} coincidencias en {resultado.milisegundos:.1f} ms; "
+                           "se muestran las últimas registradas")
+    if not resultado.resultados:
+        st.sidebar.info("🔍 Sin coincidencias")
+    for r in resultado.resultados:
+        with st.sidebar.container(border=True):
+            st.markdown(f"{FUENTES[r.tabla].etiqueta} **{r.codigo}** · {(r.fecha or '')[:10]}")
+            st.markdown(resaltar(r.fragmento))
+            if st.button(f"📦 {r.codigo_lote}", key=f"busqueda_{r.tabla}_{r.codigo}", use_container_width=True):
+                ficha_lote(r.codigo_lote)
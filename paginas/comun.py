@@ -0,0 +1,277 @@
+"""Recursos y componentes compartidos por las páginas del TPS.
+
+``recursos()`` abre el pool, aplica las migraciones, siembra los datos
+de ejemplo y arranca el escritor único (``tps_escritor``) una sola vez
+por proceso; las páginas lo llaman al renderizarse en lugar de depender
+de variables globales del script, y registran sus altas a través del
+escritor en lugar de abrir transacciones propias.
+
+Las páginas importan este módulo antes de dibujar nada, así que arriba
+solo van dependencias livianas. pandas, NumPy y los módulos que los
+arrastran (alertas, ingesta, escritor, rollups...) se importan dentro de
+las funciones que los usan y se pagan al primer uso, no en el arranque.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import TYPE_CHECKING, NamedTuple
+
+import streamlit as st
+
+from paginas import medir_arranque
+from tps_cache import CacheDatasets
+from tps_catalogo import CatalogoLotes
+from tps_db import PoolConexiones
+from tps_feed import FeedAlertasActivas, FeedLecturas
+from tps_kpis import ServicioKPI
+from tps_migraciones import aplicar_migraciones
+from tps_paginacion import VISTAS, contar, leer_pagina, resumir
+from tps_perfilado import PERFILADOR
+from tps_semilla import sembrar_datos_danper
+
+if TYPE_CHECKING:
+    from tps_escritor import EscritorSerializado
+    from tps_repositorio import RepositorioSQLite
+
+
+# Segundos entre refrescos de los fragmentos en vivo
+INTERVALO_EN_VIVO = 5
+
+# Texto de un canal que la lectura no trae (se guarda como NULL)
+SIN_DATO = "sin dato"
+
+
+class Recursos(NamedTuple):
+    pool: PoolConexiones
+    servicio_kpi: ServicioKPI
+    cache_datasets: CacheDatasets
+    escritor: 'EscritorSerializado'
+    repositorio: 'RepositorioSQLite'
+    catalogo_lotes: CatalogoLotes
+
+
+# Inicializar base de datos TPS: esquema, datos de ejemplo y servicios, una vez por proceso
+@st.cache_resource
+def recursos():
+    from tps_escritor import EscritorSerializado
+    from tps_repositorio import RepositorioSQLite
+
+    with medir_arranque("Inicialización de la base"):
+        pool = PoolConexiones(perfilador=PERFILADOR)
+        aplicar_migraciones(pool)
+        with pool.transaccion() as conn:
+            sembrar_datos_danper(conn)
+    cache_datasets = CacheDatasets(pool)
+    # Índice de linaje, rollups, resumen y cartas avanzan en el mantenimiento del escritor, con la cola
+    # vacía y en tandas cortas: ni los formularios los esperan ni las páginas escriben al consultarlos
+    escritor = EscritorSerializado(pool, mantenimiento=(_mantener_linaje, _mantener_derivados, _mantener_cartas))
+    return Recursos(pool, ServicioKPI(pool), cache_datasets, escritor, RepositorioSQLite(pool),
+                    CatalogoLotes(cache_datasets))
+
+
+# Funciones de mantenimiento del escritor. Rollups y cartas traen NumPy y pandas: se importan en la primera
+# tanda, en el hilo escritor, y no al arrancar la app
+def _mantener_linaje(conn):
+    from tps_linaje import mantener_linaje
+    return mantener_linaje(conn)
+
+def _mantener_derivados(conn):
+    from tps_series import mantener_derivados
+    return mantener_derivados(conn)
+
+def _mantener_cartas(conn):
+    from tps_spc import mantener_cartas
+    return mantener_cartas(conn)
+
+# Lotes y umbrales para tps_ingesta, compartidos entre sesiones: se recargan solo si cambian los lotes o
+# los umbrales guardados, y fuera del escritor, para no releerlos en cada lectura registrada
+def contexto_ingesta():
+    from tps_alertas import cargar_umbrales
+    from tps_ingesta import cargar_contexto
+
+    app = recursos()
+    with app.pool.conexion() as conn:
+        umbrales = cargar_umbrales(conn)
+    clave = ('contexto_ingesta', repr(sorted(umbrales.items())))
+    return app.cache_datasets.obtener(clave, ('lotes_produccion',), cargar_contexto)
+
+# Altas y cambios de los formularios: SQL en tps_repositorio, ejecutado por el escritor único
+def registrar(tabla, datos):
+    app = recursos()
+    return app.escritor.ejecutar(app.repositorio.registrar, tabla, datos)
+
+def actualizar(tabla, valores, **donde):
+    app = recursos()
+    return app.escritor.ejecutar(app.repositorio.actualizar, tabla, valores, **donde)
+
+# Selector de lote de una lista de tps_catalogo: devuelve el código elegido o None si la lista está vacía.
+# Fuera de los st.form, para que la búsqueda se aplique al escribir. Con más lotes que el límite del
+# catálogo muestra los más recientes y un campo de búsqueda que filtra en SQL.
+def selector_lote(clave, lista, etiqueta="Lote"):
+    catalogo = recursos().catalogo_lotes
+    opciones = catalogo.opciones(lista)
+    if not opciones.completa:
+        texto = st.text_input(f"🔎 Buscar {etiqueta.lower()}", key=f"{clave}_buscar",
+                              placeholder="Código de lote o producto")
+        opciones = catalogo.buscar(lista, texto)
+        st.caption(f"{len(opciones.codigos)} de {catalogo.total(lista):,} lotes"
+                   + ("" if opciones.completa else "; escriba para acotar la búsqueda"))
+    if not opciones.codigos:
+        return None
+    return st.selectbox(etiqueta, opciones.codigos, format_func=opciones.etiquetas.get, key=clave)
+
+AMBITOS_UMBRALES = {
+    'GLOBAL': "Global",
+    'PRODUCTO': "Por producto",
+    'LOTE': "Por lote",
+}
+
+# Selector de ámbito para las pantallas de umbrales: devuelve (ambito, codigo, valores efectivos)
+def selector_ambito_umbrales(clave):
+    import pandas as pd
+    from tps_alertas import cargar_umbrales, umbrales_efectivos
+
+    ambito = st.radio("Ámbito de los umbrales", list(AMBITOS_UMBRALES), format_func=AMBITOS_UMBRALES.get,
+                      horizontal=True, key=f"ambito_{clave}")
+    codigo = ''
+    with recursos().pool.conexion() as conn:
+        umbrales = cargar_umbrales(conn)
+        if ambito == 'PRODUCTO':
+            productos = pd.read_sql_query("SELECT codigo_producto, nombre_producto FROM productos_agro ORDER BY codigo_producto", conn)
+            if not productos.empty:
+                nombres = dict(zip(productos['codigo_producto'], productos['nombre_producto']))
+                codigo = st.selectbox("Producto", list(nombres), format_func=lambda x: f"{x} - {nombres[x]}",
+                                      key=f"producto_{clave}")
+    if ambito == 'LOTE':
+        codigo = selector_lote(f"lote_{clave}", 'todos') or ''
+    if ambito == 'LOTE' and codigo:
+        with recursos().pool.conexion() as conn:
+            producto, = conn.execute("SELECT codigo_producto FROM lotes_produccion WHERE codigo_lote = ?",
+                                     (codigo,)).fetchone()
+        efectivos = umbrales_efectivos(umbrales, codigo, producto)
+    elif ambito == 'PRODUCTO':
+        efectivos = umbrales_efectivos(umbrales, codigo_producto=codigo)
+    else:
+        efectivos = umbrales_efectivos(umbrales)
+    if ambito != 'GLOBAL':
+        st.caption("Los valores mostrados son los vigentes (lote > producto > global); al guardar se fijan para este ámbito.")
+    return ambito, codigo, efectivos
+
+def guardar_configuracion_umbrales(ambito, codigo, valores):
+    if ambito != 'GLOBAL' and not codigo:
+        st.error("❌ Seleccione un producto o lote")
+        return False
+    from tps_alertas import guardar_umbrales
+    try:
+        recursos().escritor.ejecutar(guardar_umbrales, ambito, codigo, valores)
+        return True
+    except Exception as e:
+        st.error(f"❌ Error: {e}")
+        return False
+
+# Pestañas de st.tabs que atribuyen al perfilador las consultas de su bloque
+def pestanas(etiquetas):
+    return [_pestana(contenedor, etiqueta) for contenedor, etiqueta in zip(st.tabs(etiquetas), etiquetas)]
+
+@contextmanager
+def _pestana(contenedor, etiqueta):
+    with contenedor, PERFILADOR.seccion(etiqueta):
+        yield contenedor
+
+# Historial paginado en el servidor: filtros en SQL y solo la página visible en memoria.
+# Devuelve (filtros aplicados, hay_registros) para calcular las métricas con los mismos filtros.
+def tabla_paginada(clave, nombre_vista):
+    import pandas as pd
+
+    vista = VISTAS[nombre_vista]
+    columnas_filtro = st.columns(len(vista.filtros) + 2)
+    filtros = {}
+    for col, (columna, (etiqueta, opciones)) in zip(columnas_filtro, vista.filtros.items()):
+        with col:
+            valor = st.selectbox(f"Filtrar por {etiqueta}", ["Todos"] + opciones, key=f"{clave}_{columna}")
+            filtros[columna] = None if valor == "Todos" else valor
+    with columnas_filtro[-2]:
+        codigo_lote = st.text_input("Código de Lote", key=f"{clave}_lote").strip() or None
+    with columnas_filtro[-1]:
+        rango = st.date_input("Rango de Fechas", value=[], key=f"{clave}_rango")
+    desde = hasta = None
+    if len(rango) == 2:
+        desde, hasta = rango[0].isoformat(), (rango[1] + timedelta(days=1)).isoformat()
+    aplicados = dict(filtros=filtros, codigo_lote=codigo_lote, desde=desde, hasta=hasta)
+
+    # Al cambiar los filtros se vuelve a la primera página
+    estado = st.session_state.setdefault(f"{clave}_pagina", {'firma': None, 'despues_de': None, 'antes_de': None})
+    firma = repr(sorted(aplicados.items()))
+    if estado['firma'] != firma:
+        estado.update(firma=firma, despues_de=None, antes_de=None)
+
+    with recursos().pool.conexion() as conn:
+        pagina = leer_pagina(conn, vista, despues_de=estado['despues_de'], antes_de=estado['antes_de'], **aplicados)
+        total, exacto = contar(conn, vista, **aplicados)
+        if not pagina.filas and (estado['despues_de'] or estado['antes_de']):
+            estado.update(despues_de=None, antes_de=None)
+            pagina = leer_pagina(conn, vista, **aplicados)
+    if not pagina.filas:
+        return aplicados, False
+
+    st.caption(f"Mostrando {len(pagina.filas)} registros de {total:,}" if exacto
+               else f"Mostrando {len(pagina.filas)} registros de más de {total:,}")
+    st.dataframe(pd.DataFrame(pagina.filas, columns=pagina.columnas), use_container_width=True, height=400)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("⏮️ Primera", key=f"{clave}_primera", disabled=not pagina.hay_anterior):
+            estado.update(despues_de=None, antes_de=None)
+            st.rerun()
+    with col2:
+        if st.button("⬅️ Anterior", key=f"{clave}_anterior", disabled=not pagina.hay_anterior):
+            estado.update(despues_de=None, antes_de=pagina.primera)
+            st.rerun()
+    with col3:
+        if st.button("Siguiente ➡️", key=f"{clave}_siguiente", disabled=not pagina.hay_siguiente):
+            estado.update(despues_de=pagina.ultima, antes_de=None)
+            st.rerun()
+    return aplicados, True
+
+# Tablas de las que dependen las consultas de cada módulo (tabla principal + lote y producto)
+def tablas_modulo(tabla):
+    return (tabla, 'lotes_produccion', 'productos_agro')
+
+# Consulta de solo lectura compartida por todas las pestañas y reruns hasta que cambie alguna de sus tablas.
+# El DataFrame devuelto es compartido: no modificarlo en el lugar.
+def consulta_cacheada(nombre, tablas, sql, params=()):
+    import pandas as pd
+
+    return recursos().cache_datasets.obtener((nombre, tuple(params)), tablas,
+                                  lambda conn: pd.read_sql_query(sql, conn, params=tuple(params)))
+
+# Métricas de un historial (agregados SQL sobre los filtros de tabla_paginada), cacheadas por generación
+def resumen_historial(nombre_vista, expresiones, **filtros):
+    vista = VISTAS[nombre_vista]
+    clave = ('resumen', nombre_vista, repr(sorted(expresiones.items())), repr(sorted(filtros.items())))
+    return recursos().cache_datasets.obtener(clave, (vista.tabla,), lambda conn: resumir(conn, vista, expresiones, **filtros))
+
+# Suscripción de la sesión al feed de cambios: cada fragmento en vivo conserva su feed entre
+# refrescos y solo trae lo nuevo (ver tps_feed). Devuelve (feed, hubo cambios).
+def feed_sesion(clave, fabrica):
+    feed = st.session_state.get(clave)
+    if feed is None:
+        feed = st.session_state[clave] = fabrica()
+    with recursos().pool.conexion() as conn:
+        cambios = feed.actualizar(conn)
+    return feed, bool(cambios)
+
+def feed_lecturas():
+    return feed_sesion('feed_lecturas', FeedLecturas)
+
+def feed_alertas_activas():
+    return feed_sesion('feed_alertas_activas', FeedAlertasActivas)
+
+# Valor de un canal de la lectura con su unidad, o "sin dato" si vino vacío
+def formato_canal(valor, unidad=""):
+    return SIN_DATO if valor is None else f"{valor}{unidad}"
+
+# Estado de un canal frente a su rango; None si la lectura no trae el canal
+def estado_canal(valor, minimo, maximo):
+    if valor is None:
+        return None
+    return "Normal" if minimo <= valor <= maximo else "Alerta"
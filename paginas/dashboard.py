@@ -0,0 +1,115 @@
+"""Dashboard TPS: KPIs en tiempo real y resumen de actividad."""
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import INTERVALO_EN_VIVO, consulta_cacheada, feed_lecturas, formato_canal, recursos, tablas_modulo
+
+
+# Snapshot de KPIs (una sola consulta, cacheada hasta la próxima escritura); se refresca solo este fragmento
+@st.fragment(run_every=INTERVALO_EN_VIVO)
+def kpis_en_vivo():
+    kpi = recursos().servicio_kpi.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("🔄 Lotes en Proceso", kpi.lotes_en_proceso)
+    
+    with col2:
+        st.metric("👁️ Inspecciones Hoy", kpi.inspecciones_hoy)
+    
+    with col3:
+        alertas_valor = kpi.alertas_activas
+        st.metric("🚨 Alertas Activas", alertas_valor, delta="Crítico" if alertas_valor > 0 else "Normal")
+    
+    with col4:
+        st.metric("✅ Lotes Aprobados Hoy", kpi.aprobados_hoy)
+
+
+# Última lectura registrada, desde el feed de la sesión: cada tick solo lee las filas nuevas
+@st.fragment(run_every=INTERVALO_EN_VIVO)
+def lecturas_en_vivo():
+    feed, _ = feed_lecturas()
+    lectura_actual = feed.ultima()
+    if lectura_actual is None:
+        st.info("📡 Aún no hay lecturas de sensores registradas")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="sensor-reading">
+            <h3>🌡️ Temperatura</h3>
+            <h2>{formato_canal(lectura_actual['sensor_temperatura'], '°C')}</h2>
+            <p>Rango óptimo: 2-8°C</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="sensor-reading">
+            <h3>⚖️ Peso Promedio</h3>
+            <h2>{formato_canal(lectura_actual['sensor_peso'], ' kg')}</h2>
+            <p>Estándar exportación</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="sensor-reading">
+            <h3>💧 Humedad</h3>
+            <h2>{formato_canal(lectura_actual['sensor_humedad'], '%')}</h2>
+            <p>Rango óptimo: 85-95%</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.caption(f"Lote {lectura_actual['codigo_lote']} · {lectura_actual['timestamp_lectura']} · "
+               f"{len(feed.filas)} lecturas recientes en memoria")
+
+
+def mostrar():
+    st.title("🏠 Dashboard TPS - Control de Calidad en Tiempo Real")
+    
+    # Métricas TPS en tiempo real
+    kpis_en_vivo()
+    
+    # Lecturas de sensores en tiempo real
+    st.markdown("---")
+    st.subheader("📡 Lecturas de Sensores en Tiempo Real")
+    lecturas_en_vivo()
+    
+    # Gráficos del TPS
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("📊 Resultados de Calidad por Producto")
+        # Decisión del último informe de cada lote, desde el resumen por lote
+        calidad_producto = consulta_cacheada('calidad_producto', tablas_modulo('informes_calidad'), """
+            SELECT pa.nombre_producto, 
+                   COUNT(CASE WHEN lr.decision_final = 'APROBADO' THEN 1 END) as aprobados,
+                   COUNT(CASE WHEN lr.decision_final = 'RECHAZADO' THEN 1 END) as rechazados
+            FROM lote_resumen lr
+            JOIN productos_agro pa ON lr.codigo_producto = pa.codigo_producto
+            WHERE lr.decision_final IS NOT NULL
+            GROUP BY pa.nombre_producto
+        """)
+        
+        if not calidad_producto.empty:
+            fig = px.bar(calidad_producto, x='nombre_producto', y=['aprobados', 'rechazados'],
+                        title='Resultados de Calidad por Producto',
+                        color_discrete_map={'aprobados': '#10b981', 'rechazados': '#ef4444'})
+            st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        st.subheader("⏱️ Tiempo de Procesamiento TPS")
+        tiempo_procesamiento = consulta_cacheada('tiempo_procesamiento', ('inspecciones_visuales',), """
+            SELECT inspector, AVG(tiempo_procesamiento) as tiempo_promedio
+            FROM inspecciones_visuales
+            GROUP BY inspector
+        """)
+        
+        if not tiempo_procesamiento.empty:
+            fig2 = px.bar(tiempo_procesamiento, x='inspector', y='tiempo_promedio',
+                         title='Tiempo Promedio de Inspección (minutos)')
+            st.plotly_chart(fig2, use_container_width=True)
@@ -0,0 +1,135 @@
+"""Compatibilidad de envases: registro, historial paginado y análisis."""
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import (consulta_cacheada, pestanas, registrar, resumen_historial, selector_lote, tabla_paginada,
+                           tablas_modulo)
+
+
+def mostrar():
+    st.title("📦 Compatibilidad de Envases - TPS")
+    
+    tab1, tab2, tab3 = pestanas(["🧪 Nueva Prueba", "📋 Historial", "📊 Análisis"])
+    
+    with tab1:
+        st.subheader("🧪 Evaluar Compatibilidad de Envases")
+        
+        lote_seleccionado = selector_lote("lote_envase", 'abiertos', "Lote para Evaluación")
+        
+        with st.form("form_envase"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                tipo_envase = st.selectbox("Tipo de Envase", 
+                    ["Caja de cartón", "Bandeja PET", "Clamshell", "Bolsa plástica", "Caja de madera", "Envase al vacío"])
+                material_envase = st.selectbox("Material del Envase", 
+                    ["Cartón corrugado", "PET reciclado", "PET transparente", "Plástico PP", "Madera", "Vidrio"])
+                capacidad_envase = st.text_input("Capacidad del Envase", placeholder="Ej: 5 kg, 500 g")
+            
+            with col2:
+                prueba_hermeticidad = st.checkbox("Prueba de Hermeticidad Aprobada")
+                prueba_resistencia = st.checkbox("Prueba de Resistencia Aprobada")
+                compatibilidad_producto = st.checkbox("Compatibilidad con Producto Verificada")
+                observaciones = st.text_area("Observaciones", 
+                    placeholder="Detalles sobre la compatibilidad...")
+            
+            submitted = st.form_submit_button("📦 Registrar Evaluación", use_container_width=True)
+            
+            if submitted:
+                if lote_seleccionado and tipo_envase:
+                    # Determinar resultado basado en pruebas
+                    resultado_envase = "APROBADO" if prueba_hermeticidad and prueba_resistencia and compatibilidad_producto else "RECHAZADO"
+                    
+                    try:
+                        codigo_compatibilidad = registrar('compatibilidad_envases', {
+                            'codigo_lote': lote_seleccionado, 'tipo_envase': tipo_envase, 'material_envase': material_envase,
+                            'capacidad_envase': capacidad_envase, 'prueba_hermeticidad': prueba_hermeticidad,
+                            'prueba_resistencia': prueba_resistencia, 'compatibilidad_producto': compatibilidad_producto,
+                            'resultado_envase': resultado_envase, 'observaciones_envase': observaciones})
+                        st.success(f"✅ Evaluación registrada: {codigo_compatibilidad}")
+                        
+                        # Mostrar resultado
+                        if resultado_envase == "APROBADO":
+                            st.markdown('<div class="status-aprobado">✅ ENVASE APROBADO</div>', unsafe_allow_html=True)
+                        else:
+                            st.markdown('<div class="status-rechazado">❌ ENVASE RECHAZADO</div>', unsafe_allow_html=True)
+                            
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+                else:
+                    st.error("❌ Complete los campos obligatorios")
+    
+    with tab2:
+        st.subheader("📋 Historial de Evaluaciones")
+        
+        filtros, hay_registros = tabla_paginada("historial_envases", 'envases')
+        
+        if hay_registros:
+            resumen = resumen_historial('envases', {
+                'total': "COUNT(*)",
+                'aprobados': "COUNT(CASE WHEN ce.resultado_envase = 'APROBADO' THEN 1 END)",
+                'materiales': "COUNT(DISTINCT ce.material_envase)",
+            }, **filtros)
+            
+            # Métricas
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📦 Total Evaluaciones", resumen['total'])
+            with col2:
+                st.metric("✅ Envases Aprobados", resumen['aprobados'])
+            with col3:
+                st.metric("🔄 Materiales Diferentes", resumen['materiales'])
+        else:
+            st.info("📦 No hay evaluaciones de envases registradas")
+    
+    with tab3:
+        st.subheader("📊 Análisis de Compatibilidad")
+        
+        # Agregados calculados en SQL sobre el join completo
+        tablas = tablas_modulo('compatibilidad_envases')
+        resultado_dist = consulta_cacheada('envases_resultados', tablas, """
+            SELECT ce.resultado_envase AS resultado, COUNT(*) AS cantidad
+            FROM compatibilidad_envases ce
+            JOIN lotes_produccion lp ON ce.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY ce.resultado_envase
+            ORDER BY cantidad DESC
+        """)
+        material_dist = consulta_cacheada('envases_materiales', tablas, """
+            SELECT ce.material_envase AS material, COUNT(*) AS cantidad
+            FROM compatibilidad_envases ce
+            JOIN lotes_produccion lp ON ce.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY ce.material_envase
+            ORDER BY cantidad DESC
+        """)
+        compatibilidad_producto = consulta_cacheada('envases_compatibilidad', tablas, """
+            SELECT pa.nombre_producto AS producto, AVG(ce.resultado_envase = 'APROBADO') * 100 AS porcentaje_aprobado
+            FROM compatibilidad_envases ce
+            JOIN lotes_produccion lp ON ce.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY pa.nombre_producto
+        """)
+        
+        if not resultado_dist.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Distribución de resultados
+                fig = px.pie(resultado_dist, values='cantidad', names='resultado',
+                           title='Distribución de Resultados de Envases',
+                           color_discrete_map={'APROBADO': '#10b981', 'RECHAZADO': '#ef4444'})
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                # Materiales más utilizados
+                fig2 = px.bar(material_dist, x='material', y='cantidad',
+                            title='Materiales de Envases más Utilizados',
+                            color='material')
+                st.plotly_chart(fig2, use_container_width=True)
+            
+            # Compatibilidad por producto
+            fig3 = px.bar(compatibilidad_producto, x='producto', y='porcentaje_aprobado',
+                        title='Porcentaje de Aprobación por Producto (%)',
+                        labels={'porcentaje_aprobado': '% Aprobación', 'producto': 'Producto'})
+            st.plotly_chart(fig3, use_container_width=True)
@@ -0,0 +1,152 @@
+"""Importación histórica: carga por bloques de CSV/Excel con progreso y rechazos descargables."""
+import io
+import os
+
+import pandas as pd
+import streamlit as st
+
+from paginas.comun import pestanas, recursos
+from tps_importacion import (ESQUEMAS, clave_importacion, contar_filas, estado_importacion, faltantes, formato_de,
+                             importar, leer_bloques, mapear_columnas)
+
+ETIQUETAS_TABLAS = {
+    'inspecciones_visuales': "👁️ Inspecciones visuales",
+    'lecturas_sensores': "📡 Lecturas de sensores",
+    'pruebas_fisicoquimicas': "🧪 Pruebas fisicoquímicas",
+    'compatibilidad_envases': "📦 Compatibilidad de envases",
+    'alertas_automaticas': "🚨 Alertas",
+    'informes_calidad': "📊 Informes de calidad",
+    'trazabilidad_internacional': "🌍 Trazabilidad internacional",
+    'lotes_produccion': "🏷️ Lotes de producción",
+    'productos_agro': "🌱 Productos",
+}
+SIN_COLUMNA = "— (sin columna)"
+FILAS_VISTA_PREVIA = 20
+
+
+def _mapeo(tabla, encabezados):
+    """Selectores columna de la tabla -> encabezado, con lo deducido por nombre como valor inicial."""
+    deducido = mapear_columnas(tabla, encabezados)
+    opciones = [SIN_COLUMNA] + list(encabezados)
+    mapeo = {}
+    columnas = st.columns(3)
+    for i, columna in enumerate(ESQUEMAS[tabla].columnas):
+        with columnas[i % 3]:
+            elegido = st.selectbox(f"{columna.nombre}{' *' if columna.obligatoria else ''}", opciones,
+                                   index=opciones.index(deducido.get(columna.nombre, SIN_COLUMNA)),
+                                   key=f"mapeo_{tabla}_{columna.nombre}")
+        if elegido != SIN_COLUMNA:
+            mapeo[columna.nombre] = elegido
+    return mapeo
+
+
+def _importar(tabla, archivo, formato, separador, mapeo, clave, reanudar):
+    barra = st.progress(0.0, text="Contando filas…")
+    total = contar_filas(archivo, formato)
+    rechazos = io.StringIO()
+
+    def progreso(parcial):
+        hechas = parcial.filas_omitidas + parcial.filas_leidas
+        barra.progress(min(hechas / total, 1.0) if total else 1.0,
+                       text=f"{hechas:,} de ~{total:,} filas · {parcial.filas_por_segundo:,.0f} filas/s")
+
+    resultado = importar(recursos().pool, tabla, leer_bloques(archivo, formato, separador=separador), clave,
+                         archivo.name, mapeo, reanudar=reanudar, rechazos=rechazos, escritor=recursos().escritor,
+                         progreso=progreso)
+    barra.progress(1.0, text=f"✅ {resultado.filas_omitidas + resultado.filas_leidas:,} filas")
+    return resultado, rechazos.getvalue()
+
+
+def _resultado(resultado, rechazos, nombre):
+    if resultado.filas_omitidas and not resultado.filas_leidas:
+        st.info(f"ℹ️ El archivo ya estaba importado ({resultado.filas_omitidas:,} filas); "
+                f"elija «Desde cero» para repetirlo")
+        return
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📄 Filas leídas", f"{resultado.filas_leidas:,}",
+                  help=f"{resultado.filas_omitidas:,} ya importadas antes" if resultado.filas_omitidas else None)
+    with col2:
+        st.metric("✅ Insertadas", f"{resultado.filas_insertadas:,}")
+    with col3:
+        st.metric("❌ Rechazadas", f"{resultado.filas_rechazadas:,}")
+    with col4:
+        st.metric("⚡ Filas/s", f"{resultado.filas_por_segundo:,.0f}", help=f"{resultado.segundos:.1f} s")
+    if resultado.rechazos_por_motivo:
+        st.dataframe(pd.DataFrame(sorted(resultado.rechazos_por_motivo.items(), key=lambda m: -m[1]),
+                                  columns=["Motivo", "Filas"]), use_container_width=True, hide_index=True)
+        st.download_button("📥 Descargar filas rechazadas (CSV)", data=rechazos,
+                           file_name=f"{os.path.splitext(nombre)[0]}.rechazos.csv", mime="text/csv")
+
+
+def mostrar():
+    pool = recursos().pool
+
+    st.title("📥 Importación Histórica de Registros")
+
+    tab1, tab2 = pestanas(["📥 Importar Archivo", "🗂️ Importaciones"])
+
+    with tab1:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            tabla = st.selectbox("Tabla de destino", list(ETIQUETAS_TABLAS), format_func=ETIQUETAS_TABLAS.get)
+        with col2:
+            separador = st.selectbox("Separador (CSV)", [",", ";", "\t"],
+                                     format_func=lambda s: {"\t": "Tabulador"}.get(s, s))
+        archivo = st.file_uploader("Archivo CSV o Excel (.xlsx)", type=['csv', 'txt', 'xlsx'],
+                                   help="Excel requiere openpyxl en el servidor")
+
+        if archivo is None:
+            referencia = ESQUEMAS[tabla].referencia
+            st.info(f"📄 Suba un archivo con una fila de encabezados. Columnas obligatorias: "
+                    f"{', '.join(c.nombre for c in ESQUEMAS[tabla].columnas if c.obligatoria)}"
+                    + (f"; «{referencia[0]}» debe existir en {referencia[1]}" if referencia else ""))
+        else:
+            formato = formato_de(archivo.name)
+            try:
+                vista_previa = next(leer_bloques(archivo, formato, FILAS_VISTA_PREVIA, separador), None)
+            except Exception as e:
+                st.error(f"❌ No se pudo leer el archivo: {e}")
+                vista_previa = None
+            archivo.seek(0)
+
+            if vista_previa is not None:
+                st.dataframe(vista_previa, use_container_width=True, hide_index=True)
+                st.markdown("#### 🔗 Columnas")
+                mapeo = _mapeo(tabla, list(vista_previa.columns))
+                sin_mapear = faltantes(tabla, mapeo)
+
+                clave = clave_importacion(tabla, archivo)
+                with pool.conexion() as conn:
+                    previo = estado_importacion(conn, clave)
+                reanudar = True
+                if previo is not None:
+                    estado = ("completa" if previo.completada
+                              else f"interrumpida en la fila {previo.filas_procesadas:,}")
+                    st.warning(f"⚠️ Este archivo ya tiene una importación {estado} "
+                               f"({previo.filas_insertadas:,} filas insertadas)")
+                    reanudar = st.radio("Al importar", ["Reanudar", "Desde cero"], horizontal=True) == "Reanudar"
+
+                if sin_mapear:
+                    st.error(f"❌ Asigne las columnas obligatorias: {', '.join(sin_mapear)}")
+                elif st.button("📥 Importar", type="primary", use_container_width=True):
+                    try:
+                        resultado, rechazos = _importar(tabla, archivo, formato, separador, mapeo, clave, reanudar)
+                        _resultado(resultado, rechazos, archivo.name)
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+
+    with tab2:
+        st.subheader("🗂️ Importaciones Registradas")
+        with pool.conexion() as conn:
+            importaciones = pd.read_sql_query("""
+                SELECT tabla, archivo, filas_procesadas, filas_insertadas, filas_rechazadas,
+                       CASE WHEN completada THEN 'Completa' ELSE 'Interrumpida' END AS estado, actualizada
+                FROM importaciones
+                ORDER BY actualizada DESC
+                LIMIT 200
+            """, conn)
+        if importaciones.empty:
+            st.info("📥 Aún no se ha importado ningún archivo")
+        else:
+            st.dataframe(importaciones, use_container_width=True, hide_index=True)
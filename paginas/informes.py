@@ -0,0 +1,222 @@
+"""Informes consolidados: generación individual y por lotes, historial y análisis."""
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import (consulta_cacheada, pestanas, recursos, resumen_historial, selector_lote, tabla_paginada,
+                           tablas_modulo)
+from tps_informes import (DESTINOS_COMERCIALES, TABLAS_RESULTADOS, decidir, generar_informes_pendientes, leer_resultados,
+                          registrar_informes)
+
+
+# Decisiones del cierre masivo, compartidas entre reruns y sesiones: se recalculan cuando cambian las tablas
+# del resumen por lote o avanza su marca de lecturas. El DataFrame es compartido: no modificarlo en el lugar.
+def decisiones_pendientes():
+    app = recursos()
+    with app.pool.conexion() as conn:
+        marca = conn.execute("SELECT ultimo_id FROM rollup_estado WHERE clave = 'lote_resumen'").fetchone()[0]
+    return app.cache_datasets.obtener(('informes_decisiones_pendientes', marca), TABLAS_RESULTADOS,
+                                      lambda conn: decidir(leer_resultados(conn)))
+
+
+def mostrar():
+    pool = recursos().pool
+
+    st.title("📊 Informes Consolidados de Calidad")
+    
+    tab1, tab2, tab3 = pestanas(["📋 Generar Informe", "📊 Informes Existentes", "📈 Análisis Ejecutivo"])
+    
+    with tab1:
+        st.subheader("📋 Generar Informe Consolidado")
+        
+        lote_informe = selector_lote("lote_informe", 'pendientes_informe', "Lote para Informe")
+        
+        with st.form("form_informe"):
+            if lote_informe:
+                responsable_aprobacion = st.text_input("Responsable de Aprobación", 
+                    placeholder="Ing. Nombre Apellido")
+                
+                # Obtener resultados automáticamente (último resultado de cada fuente)
+                with pool.conexion() as conn:
+                    resultados_lote = leer_resultados(conn, [lote_informe])
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.write(f"**Inspección Visual:** {resultados_lote['resultado_inspeccion_visual'].iloc[0]}")
+                    st.write(f"**Estado Sensores:** {resultados_lote['resultado_sensores'].iloc[0]}")
+                    st.write(f"**Resultado Fisicoquímico:** {resultados_lote['resultado_fisicoquimico'].iloc[0]}")
+                
+                with col2:
+                    opciones_envases = ["APROBADO", "RECHAZADO", "PENDIENTE"]
+                    resultado_envases = st.selectbox("Resultado Envases", opciones_envases,
+                        index=opciones_envases.index(resultados_lote['resultado_envases'].iloc[0]))
+                    certificaciones = st.multiselect("Certificaciones Obtenidas", 
+                        ["Global GAP", "HACCP", "Organic", "Fair Trade", "BRC", "SQF"])
+                    destino_comercial = st.selectbox("Destino Comercial", DESTINOS_COMERCIALES)
+                
+                # Calcular decisión final automática
+                decision = decidir(resultados_lote.assign(resultado_envases=resultado_envases))
+                decision_final = decision['decision_final'].iloc[0]
+                porcentaje_calidad = decision['porcentaje_calidad_total'].iloc[0]
+                
+                st.write(f"**Decisión Final Automática:** {decision_final}")
+                st.write(f"**Porcentaje de Calidad:** {porcentaje_calidad}%")
+                
+                submitted = st.form_submit_button("📊 Generar Informe Consolidado", use_container_width=True)
+                
+                if submitted:
+                    if responsable_aprobacion:
+                        try:
+                            # Informe y estado del lote en la misma transacción
+                            codigos = recursos().escritor.ejecutar(registrar_informes, decision, responsable_aprobacion,
+                                                                   destino_comercial, ', '.join(certificaciones))
+                            if not codigos:
+                                raise ValueError(f"El lote {lote_informe} ya tiene un informe consolidado")
+                            
+                            st.success(f"✅ Informe consolidado generado: {codigos[0]}")
+                            
+                            # Mostrar resultado final
+                            if decision_final == "APROBADO":
+                                st.markdown('<div class="status-aprobado">✅ LOTE APROBADO PARA COMERCIALIZACIÓN</div>', unsafe_allow_html=True)
+                            elif decision_final == "RECHAZADO":
+                                st.markdown('<div class="status-rechazado">❌ LOTE RECHAZADO</div>', unsafe_allow_html=True)
+                            else:
+                                st.markdown('<div class="status-pendiente">⏳ LOTE EN REVISIÓN</div>', unsafe_allow_html=True)
+                                
+                        except Exception as e:
+                            st.error(f"❌ Error: {e}")
+                    else:
+                        st.error("❌ Ingrese el responsable de aprobación")
+            else:
+                st.info("📋 No hay lotes disponibles para generar informes")
+        
+        # Cierre masivo: todos los lotes EN_PROCESO sin informe en una sola transacción
+        st.markdown("---")
+        st.subheader("⚡ Generación por Lotes")
+        
+        decisiones = decisiones_pendientes()
+        
+        if not decisiones.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("✅ Aprobados", int((decisiones['decision_final'] == 'APROBADO').sum()))
+            with col2:
+                st.metric("❌ Rechazados", int((decisiones['decision_final'] == 'RECHAZADO').sum()))
+            with col3:
+                st.metric("⏳ Pendientes", int((decisiones['decision_final'] == 'PENDIENTE').sum()))
+            
+            with st.expander(f"📋 Decisiones calculadas ({len(decisiones)} lotes)"):
+                st.dataframe(decisiones[['codigo_lote', 'nombre_producto', 'resultado_inspeccion_visual', 'resultado_sensores',
+                                         'resultado_fisicoquimico', 'resultado_envases', 'decision_final', 'porcentaje_calidad_total']],
+                             use_container_width=True, height=300)
+            
+            with st.form("form_informes_lote"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    responsable_lote = st.text_input("Responsable de Aprobación", placeholder="Ing. Nombre Apellido", key="responsable_lote")
+                    destino_lote = st.selectbox("Destino Comercial", DESTINOS_COMERCIALES, key="destino_lote")
+                with col2:
+                    incluir_pendientes = st.checkbox("Incluir lotes PENDIENTE (pasan a EN_REVISION)")
+                
+                if st.form_submit_button("⚡ Generar Informes Pendientes", use_container_width=True):
+                    if responsable_lote:
+                        try:
+                            # En el hilo escritor la transacción de generar_informes_pendientes se une a la del grupo
+                            resultado = recursos().escritor.ejecutar(
+                                lambda conn: generar_informes_pendientes(pool, responsable_lote, destino_lote, incluir_pendientes))
+                            st.success(f"✅ {resultado.generados} informes generados de {resultado.evaluados} lotes evaluados")
+                        except Exception as e:
+                            st.error(f"❌ Error: {e}")
+                    else:
+                        st.error("❌ Ingrese el responsable de aprobación")
+        else:
+            st.info("📋 No hay lotes EN_PROCESO pendientes de informe")
+    
+    with tab2:
+        st.subheader("📊 Informes Existentes")
+        
+        filtros, hay_registros = tabla_paginada("historial_informes", 'informes')
+        
+        if hay_registros:
+            resumen = resumen_historial('informes', {
+                'total': "COUNT(*)",
+                'aprobados': "COUNT(CASE WHEN ic.decision_final = 'APROBADO' THEN 1 END)",
+                'calidad_promedio': "AVG(ic.porcentaje_calidad_total)",
+                'exportacion': "COUNT(CASE WHEN instr(ic.destino_comercial, 'Exportación') > 0 THEN 1 END)",
+            }, **filtros)
+            
+            # Métricas de informes
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📊 Total Informes", resumen['total'])
+            with col2:
+                st.metric("✅ Lotes Aprobados", resumen['aprobados'])
+            with col3:
+                st.metric("📈 Calidad Promedio", f"{resumen['calidad_promedio'] or 0:.1f}%")
+            with col4:
+                st.metric("🌍 Para Exportación", resumen['exportacion'])
+        else:
+            st.info("📊 No hay informes consolidados generados")
+    
+    with tab3:
+        st.subheader("📈 Análisis Ejecutivo")
+        
+        # Agregados calculados en SQL sobre el join completo
+        tablas = tablas_modulo('informes_calidad')
+        decision_dist = consulta_cacheada('informes_decisiones', tablas, """
+            SELECT ic.decision_final AS decision, COUNT(*) AS cantidad
+            FROM informes_calidad ic
+            JOIN lotes_produccion lp ON ic.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY ic.decision_final
+            ORDER BY cantidad DESC
+        """)
+        calidad_campo = consulta_cacheada('informes_calidad_campo', tablas, """
+            SELECT lp.campo_origen, AVG(ic.porcentaje_calidad_total) AS porcentaje_calidad_total
+            FROM informes_calidad ic
+            JOIN lotes_produccion lp ON ic.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY lp.campo_origen
+        """)
+        destino_dist = consulta_cacheada('informes_destinos', tablas, """
+            SELECT ic.destino_comercial AS destino, COUNT(*) AS cantidad
+            FROM informes_calidad ic
+            JOIN lotes_produccion lp ON ic.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY ic.destino_comercial
+            ORDER BY cantidad DESC
+        """)
+        tendencia_calidad = consulta_cacheada('informes_tendencia', tablas, """
+            SELECT strftime('%Y-%m', ic.fecha_informe) AS mes, AVG(ic.porcentaje_calidad_total) AS porcentaje_calidad_total
+            FROM informes_calidad ic
+            JOIN lotes_produccion lp ON ic.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY mes
+            ORDER BY mes
+        """)
+        
+        if not decision_dist.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Decisiones finales
+                fig = px.pie(decision_dist, values='cantidad', names='decision',
+                           title='Distribución de Decisiones Finales',
+                           color_discrete_map={'APROBADO': '#10b981', 'RECHAZADO': '#ef4444', 'PENDIENTE': '#f59e0b'})
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # Calidad por campo
+                fig3 = px.bar(calidad_campo, x='campo_origen', y='porcentaje_calidad_total',
+                            title='Calidad Promedio por Campo de Origen')
+                st.plotly_chart(fig3, use_container_width=True)
+            
+            with col2:
+                # Destinos comerciales
+                fig2 = px.bar(destino_dist, x='destino', y='cantidad',
+                            title='Distribución por Destino Comercial')
+                st.plotly_chart(fig2, use_container_width=True)
+                
+                # Tendencia de calidad
+                fig4 = px.line(tendencia_calidad, x='mes', y='porcentaje_calidad_total',
+                             title='Tendencia de Calidad Mensual', markers=True)
+                st.plotly_chart(fig4, use_container_width=True)
@@ -0,0 +1,132 @@
+"""Inspecciones visuales: registro, historial paginado y análisis."""
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import (consulta_cacheada, pestanas, registrar, resumen_historial, selector_lote, tabla_paginada,
+                           tablas_modulo)
+
+
+def mostrar():
+    st.title("👁️ Inspecciones Visuales - TPS en Tiempo Real")
+    
+    tab1, tab2, tab3 = pestanas(["📝 Nueva Inspección", "📋 Historial", "📊 Análisis"])
+    
+    with tab1:
+        st.subheader("📝 Registrar Inspección Visual")
+        
+        lote_seleccionado = selector_lote("lote_inspeccion", 'abiertos', "Lote a Inspeccionar")
+        
+        with st.form("form_inspeccion"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                inspector = st.text_input("Inspector", placeholder="Nombre del inspector")
+                color_evaluacion = st.selectbox("Evaluación de Color", 
+                    ["Excelente", "Bueno", "Regular", "Deficiente"])
+                forma_evaluacion = st.selectbox("Evaluación de Forma", 
+                    ["Uniforme", "Ligeramente irregular", "Irregular", "Deforme"])
+            
+            with col2:
+                tamano_evaluacion = st.text_input("Evaluación de Tamaño", placeholder="Ej: 18-22 cm")
+                defectos_visuales = st.text_area("Defectos Visuales Detectados", 
+                    placeholder="Describir defectos encontrados...")
+                porcentaje_conformidad = st.slider("Porcentaje de Conformidad", 0.0, 100.0, 95.0, 0.1)
+                observaciones = st.text_area("Observaciones", 
+                    placeholder="Comentarios adicionales...")
+            
+            # Simulación de tiempo de procesamiento
+            tiempo_procesamiento = st.number_input("Tiempo de Procesamiento (minutos)", 
+                min_value=0.1, value=2.5, step=0.1)
+            
+            submitted = st.form_submit_button("👁️ Registrar Inspección", use_container_width=True)
+            
+            if submitted:
+                if lote_seleccionado and inspector:
+                    resultado_visual = "APROBADO" if porcentaje_conformidad >= 90 else "RECHAZADO" if porcentaje_conformidad < 70 else "OBSERVADO"
+                    
+                    try:
+                        codigo_inspeccion = registrar('inspecciones_visuales', {
+                            'codigo_lote': lote_seleccionado, 'inspector': inspector, 'color_evaluacion': color_evaluacion,
+                            'forma_evaluacion': forma_evaluacion, 'tamano_evaluacion': tamano_evaluacion,
+                            'defectos_visuales': defectos_visuales, 'porcentaje_conformidad': porcentaje_conformidad,
+                            'resultado_visual': resultado_visual, 'observaciones': observaciones,
+                            'tiempo_procesamiento': tiempo_procesamiento})
+                        st.success(f"✅ Inspección registrada: {codigo_inspeccion}")
+                        st.balloons()
+                        
+                        # Mostrar resultado
+                        if resultado_visual == "APROBADO":
+                            st.markdown(f'<div class="status-aprobado">✅ LOTE APROBADO - {porcentaje_conformidad}% conformidad</div>', unsafe_allow_html=True)
+                        elif resultado_visual == "RECHAZADO":
+                            st.markdown(f'<div class="status-rechazado">❌ LOTE RECHAZADO - {porcentaje_conformidad}% conformidad</div>', unsafe_allow_html=True)
+                        else:
+                            st.markdown(f'<div class="status-pendiente">⚠️ LOTE EN OBSERVACIÓN - {porcentaje_conformidad}% conformidad</div>', unsafe_allow_html=True)
+                            
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+                else:
+                    st.error("❌ Complete los campos obligatorios")
+    
+    with tab2:
+        st.subheader("📋 Historial de Inspecciones")
+        
+        filtros, hay_registros = tabla_paginada("historial_inspecciones", 'inspecciones')
+        
+        if hay_registros:
+            resumen = resumen_historial('inspecciones', {
+                'total': "COUNT(*)",
+                'aprobadas': "COUNT(CASE WHEN iv.resultado_visual = 'APROBADO' THEN 1 END)",
+                'tiempo_promedio': "AVG(iv.tiempo_procesamiento)",
+                'conformidad_promedio': "AVG(iv.porcentaje_conformidad)",
+            }, **filtros)
+            
+            # Métricas
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📋 Total Inspecciones", resumen['total'])
+            with col2:
+                st.metric("✅ Aprobadas", resumen['aprobadas'])
+            with col3:
+                st.metric("⏱️ Tiempo Promedio", f"{resumen['tiempo_promedio'] or 0:.1f} min")
+            with col4:
+                st.metric("📊 Conformidad Promedio", f"{resumen['conformidad_promedio'] or 0:.1f}%")
+        else:
+            st.info("👁️ No hay inspecciones registradas")
+    
+    with tab3:
+        st.subheader("📊 Análisis de Inspecciones Visuales")
+        
+        # Agregados calculados en SQL sobre el join completo
+        tablas = tablas_modulo('inspecciones_visuales')
+        resultado_dist = consulta_cacheada('inspecciones_resultados', tablas, """
+            SELECT iv.resultado_visual AS resultado, COUNT(*) AS cantidad
+            FROM inspecciones_visuales iv
+            JOIN lotes_produccion lp ON iv.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY iv.resultado_visual
+            ORDER BY cantidad DESC
+        """)
+        # Media de todas las inspecciones a partir de las sumas acumuladas por lote
+        conformidad_producto = consulta_cacheada('inspecciones_conformidad', tablas, """
+            SELECT pa.nombre_producto, SUM(lr.conformidad_suma) / SUM(lr.conformidad_n) AS porcentaje_conformidad
+            FROM lote_resumen lr
+            JOIN productos_agro pa ON lr.codigo_producto = pa.codigo_producto
+            WHERE lr.conformidad_n > 0
+            GROUP BY pa.nombre_producto
+        """)
+        
+        if not resultado_dist.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Distribución de resultados
+                fig = px.pie(resultado_dist, values='cantidad', names='resultado',
+                           title='Distribución de Resultados de Inspección',
+                           color_discrete_map={'APROBADO': '#10b981', 'RECHAZADO': '#ef4444', 'OBSERVADO': '#f59e0b'})
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                # Conformidad por producto
+                fig2 = px.bar(conformidad_producto, x='nombre_producto', y='porcentaje_conformidad',
+                            title='Conformidad Promedio por Producto (%)')
+                st.plotly_chart(fig2, use_container_width=True)
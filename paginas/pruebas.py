@@ -0,0 +1,142 @@
+"""Pruebas fisicoquímicas: registro, historial paginado y análisis."""
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import (consulta_cacheada, pestanas, recursos, resumen_historial, selector_lote, tabla_paginada,
+                           tablas_modulo)
+from paginas.spc import cartas_control
+from tps_spc import FUENTES as FUENTES_SPC, actualizar_spc
+
+
+def mostrar():
+    st.title("🧪 Pruebas Fisicoquímicas - Laboratorio TPS")
+    
+    tab1, tab2, tab3 = pestanas(["🔬 Nueva Prueba", "📋 Resultados", "📊 Análisis"])
+    
+    with tab1:
+        st.subheader("🔬 Registrar Prueba Fisicoquímica")
+        
+        lote_seleccionado = selector_lote("lote_prueba", 'abiertos', "Lote para Análisis")
+        
+        with st.form("form_prueba"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                laboratorista = st.text_input("Laboratorista", placeholder="Dr./Dra. Nombre")
+                acidez_titulable = st.number_input("Acidez Titulable (%)", min_value=0.0, value=0.15, step=0.01)
+                solidos_solubles = st.number_input("Sólidos Solubles (°Brix)", min_value=0.0, value=12.0, step=0.1)
+            
+            with col2:
+                firmeza = st.number_input("Firmeza (g/mm)", min_value=0.0, value=180.0, step=0.1)
+                contenido_humedad = st.number_input("Contenido de Humedad (%)", min_value=0.0, value=85.0, step=0.1)
+                residuos_pesticidas = st.selectbox("Residuos de Pesticidas", 
+                    ["No detectados", "Dentro de límites", "Excede límites"])
+                microbiologia_resultado = st.selectbox("Resultado Microbiológico", 
+                    ["Negativo", "Positivo", "En proceso"])
+                certificacion_organica = st.checkbox("Certificación Orgánica")
+            
+            submitted = st.form_submit_button("🧪 Registrar Prueba", use_container_width=True)
+            
+            if submitted:
+                if lote_seleccionado and laboratorista:
+                    # Determinar resultado basado en parámetros
+                    resultado_fisicoquimico = "APROBADO"
+                    if residuos_pesticidas == "Excede límites" or microbiologia_resultado == "Positivo":
+                        resultado_fisicoquimico = "RECHAZADO"
+                    elif microbiologia_resultado == "En proceso":
+                        resultado_fisicoquimico = "PENDIENTE"
+                    
+                    # La prueba y su paso por las cartas de control en la misma transacción
+                    def registrar_prueba(conn):
+                        codigo_prueba = recursos().repositorio.registrar(conn, 'pruebas_fisicoquimicas', {
+                            'codigo_lote': lote_seleccionado, 'laboratorista': laboratorista,
+                            'acidez_titulable': acidez_titulable, 'solidos_solubles': solidos_solubles, 'firmeza': firmeza,
+                            'contenido_humedad': contenido_humedad, 'residuos_pesticidas': residuos_pesticidas,
+                            'microbiologia_resultado': microbiologia_resultado,
+                            'resultado_fisicoquimico': resultado_fisicoquimico, 'certificacion_organica': certificacion_organica})
+                        return codigo_prueba, actualizar_spc(conn, 'pruebas_fisicoquimicas')
+
+                    try:
+                        codigo_prueba, spc = recursos().escritor.ejecutar(registrar_prueba)
+                        st.success(f"✅ Prueba registrada: {codigo_prueba}")
+                        if spc.alertas:
+                            st.warning(f"🚨 La prueba generó {spc.alertas} alerta(s) de control estadístico")
+                        
+                        # Mostrar resultado
+                        if resultado_fisicoquimico == "APROBADO":
+                            st.markdown('<div class="status-aprobado">✅ PRUEBA APROBADA</div>', unsafe_allow_html=True)
+                        elif resultado_fisicoquimico == "RECHAZADO":
+                            st.markdown('<div class="status-rechazado">❌ PRUEBA RECHAZADA</div>', unsafe_allow_html=True)
+                        else:
+                            st.markdown('<div class="status-pendiente">⏳ PRUEBA PENDIENTE</div>', unsafe_allow_html=True)
+                            
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+                else:
+                    st.error("❌ Complete los campos obligatorios")
+    
+    with tab2:
+        st.subheader("📋 Resultados de Laboratorio")
+        
+        filtros, hay_registros = tabla_paginada("historial_pruebas", 'pruebas')
+        
+        if hay_registros:
+            resumen = resumen_historial('pruebas', {
+                'total': "COUNT(*)",
+                'aprobadas': "COUNT(CASE WHEN pf.resultado_fisicoquimico = 'APROBADO' THEN 1 END)",
+                'organicas': "COUNT(CASE WHEN pf.certificacion_organica = 1 THEN 1 END)",
+                'brix_promedio': "AVG(pf.solidos_solubles)",
+            }, **filtros)
+            
+            # Métricas de laboratorio
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("🧪 Total Pruebas", resumen['total'])
+            with col2:
+                st.metric("✅ Aprobadas", resumen['aprobadas'])
+            with col3:
+                st.metric("🌱 Certificación Orgánica", resumen['organicas'])
+            with col4:
+                st.metric("📊 Brix Promedio", f"{resumen['brix_promedio'] or 0:.1f}°")
+        else:
+            st.info("🧪 No hay pruebas fisicoquímicas registradas")
+    
+    with tab3:
+        st.subheader("📊 Análisis de Laboratorio")
+        
+        # Agregados calculados en SQL sobre el join completo
+        tablas = tablas_modulo('pruebas_fisicoquimicas')
+        resultado_dist = consulta_cacheada('pruebas_resultados', tablas, """
+            SELECT pf.resultado_fisicoquimico AS resultado, COUNT(*) AS cantidad
+            FROM pruebas_fisicoquimicas pf
+            JOIN lotes_produccion lp ON pf.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY pf.resultado_fisicoquimico
+            ORDER BY cantidad DESC
+        """)
+        brix_producto = consulta_cacheada('pruebas_brix', tablas, """
+            SELECT pa.nombre_producto, AVG(pf.solidos_solubles) AS solidos_solubles
+            FROM pruebas_fisicoquimicas pf
+            JOIN lotes_produccion lp ON pf.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY pa.nombre_producto
+        """)
+        
+        if not resultado_dist.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Distribución de resultados
+                fig = px.pie(resultado_dist, values='cantidad', names='resultado',
+                           title='Distribución de Resultados Fisicoquímicos',
+                           color_discrete_map={'APROBADO': '#10b981', 'RECHAZADO': '#ef4444', 'PENDIENTE': '#f59e0b'})
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                # Análisis de Brix por producto
+                fig2 = px.bar(brix_producto, x='nombre_producto', y='solidos_solubles',
+                            title='Grados Brix Promedio por Producto')
+                st.plotly_chart(fig2, use_container_width=True)
+        
+        st.markdown("### 📉 Control Estadístico de Proceso")
+        cartas_control(FUENTES_SPC['pruebas_fisicoquimicas'].canales, 'pruebas')
@@ -0,0 +1,123 @@
+"""Rendimiento: perfilado de consultas por página, pestaña y punto de llamada."""
+import json
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import pestanas, recursos
+from tps_perfilado import PERFILADOR, agregar_consultas
+
+COLUMNAS_CONSULTAS = {
+    'seccion': "Pestaña",
+    'origen': "Origen",
+    'ejecuciones': "Ejecuciones",
+    'ms': "Total (ms)",
+    'max_ms': "Máx. (ms)",
+    'filas': "Filas",
+    'recorre': "Recorre entera",
+    'sql': "SQL",
+}
+
+
+def _tabla_consultas(consultas):
+    df = pd.DataFrame(consultas)
+    df['ms'] = (df['segundos'] * 1000).round(2)
+    df['max_ms'] = (df['max_segundos'] * 1000).round(2)
+    df['recorre'] = df['escaneos'].map(", ".join)
+    return df
+
+
+def _escaneos_completos(df):
+    escaneos = df[df['recorre'] != ''].drop_duplicates('sql')
+    if escaneos.empty:
+        st.success("✅ Ninguna consulta recorre una tabla entera")
+        return
+    st.markdown(f"#### ⚠️ {len(escaneos)} consulta(s) con recorrido completo de tabla")
+    for _, consulta in escaneos.iterrows():
+        with st.expander(f"{consulta['recorre']} · {consulta['ms']:,.1f} ms · {consulta['origen']}"):
+            st.code(consulta['sql'], language='sql')
+            st.code(consulta['plan'] or "", language='text')
+
+
+def _escritor(escritor):
+    m = escritor.metricas()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("✍️ Escrituras", f"{m['intenciones']:,}", help=f"{m['fallidas']:,} con error")
+    with col2:
+        st.metric("📦 Transacciones", f"{m['grupos']:,}", help=f"{m['grupo_medio']} escrituras de media, "
+                                                              f"máximo {m['grupo_maximo']}")
+    with col3:
+        st.metric("⏳ Espera en cola", f"{m['espera_cola_media_ms']:,.1f} ms",
+                  help=f"Máxima {m['espera_cola_max_ms']:,.1f} ms; {m['en_cola']} en cola ahora")
+    with col4:
+        st.metric("🔁 Reintentos por bloqueo", f"{m['reintentos']:,}",
+                  help=f"{m['grupos_fallidos']} transacciones fallidas tras agotar los reintentos")
+
+
+def mostrar():
+    pool = recursos().pool
+
+    st.title("⚙️ Rendimiento - Perfilado de Consultas")
+
+    activo = st.toggle("Perfilar consultas", value=PERFILADOR.activo,
+                       help="Mide tiempo, filas y plan de cada consulta de las páginas que se visiten")
+    if activo != PERFILADOR.activo:
+        PERFILADOR.activo = activo
+        st.rerun()
+    ruta_log = f" y se añaden a `{PERFILADOR.ruta_log}`" if PERFILADOR.ruta_log else ""
+    st.caption(f"Las ejecuciones perfiladas se guardan en memoria (últimas {PERFILADOR.historial.maxlen}){ruta_log}. "
+               f"Conexiones perfiladas: {'sí' if pool.perfilador is PERFILADOR else 'no'}.")
+
+    with st.expander("✍️ Escritor único (altas de los formularios)"):
+        _escritor(recursos().escritor)
+
+    ejecuciones = list(PERFILADOR.historial)
+    if not ejecuciones:
+        st.info("⏱️ Active el perfilado y recorra los módulos: cada ejecución de una página aparecerá aquí")
+        return
+
+    tab1, tab2 = pestanas(["🧾 Por ejecución", "📚 Acumulado"])
+
+    with tab1:
+        indice = st.selectbox("Ejecución", list(range(len(ejecuciones)))[::-1],
+                              format_func=lambda i: f"{ejecuciones[i].inicio[11:]} · {ejecuciones[i].pagina or 'Inicio'} · "
+                                                    f"{ejecuciones[i].segundos * 1000:,.0f} ms")
+        ejecucion = ejecuciones[indice]
+        if not ejecucion.consultas:
+            st.info("La ejecución no hizo consultas")
+        else:
+            df = _tabla_consultas(ejecucion.consultas)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("⏱️ Ejecución", f"{ejecucion.segundos * 1000:,.0f} ms")
+            with col2:
+                st.metric("🗄️ En SQL", f"{df['ms'].sum():,.0f} ms")
+            with col3:
+                st.metric("🔁 Sentencias", f"{df['ejecuciones'].sum():,}")
+            with col4:
+                st.metric("⚠️ Recorridos completos", int((df['recorre'] != '').sum()))
+
+            por_seccion = (df.assign(seccion=df['pagina'].where(df['pagina'] != '', "Inicio") + " / " +
+                                     df['seccion'].where(df['seccion'] != '', "—"))
+                           .groupby('seccion', as_index=False)[['ms', 'ejecuciones', 'filas']].sum()
+                           .sort_values('ms', ascending=False))
+            fig = px.bar(por_seccion, x='ms', y='seccion', orientation='h', hover_data=['ejecuciones', 'filas'],
+                         title='Tiempo en SQL por página y pestaña (ms)')
+            fig.update_layout(yaxis_title=None, yaxis={'categoryorder': 'total ascending'})
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.dataframe(df[list(COLUMNAS_CONSULTAS)].rename(columns=COLUMNAS_CONSULTAS),
+                         use_container_width=True, hide_index=True, height=400)
+            _escaneos_completos(df)
+
+    with tab2:
+        st.caption(f"{len(ejecuciones)} ejecuciones en memoria, sumadas por punto de llamada")
+        df = _tabla_consultas(agregar_consultas(ejecuciones))
+        st.dataframe(df[['pagina'] + list(COLUMNAS_CONSULTAS)].rename(columns=dict(COLUMNAS_CONSULTAS, pagina="Página")),
+                     use_container_width=True, hide_index=True, height=400)
+        _escaneos_completos(df)
+        st.download_button("📥 Descargar ejecuciones (JSON)",
+                           data="\n".join(json.dumps(e._asdict(), ensure_ascii=False) for e in ejecuciones),
+                           file_name="tps_perfilado.jsonl", mime="application/json")
@@ -0,0 +1,228 @@
+"""Lecturas de sensores IoT: monitoreo, histórico con rollups y configuración de umbrales."""
+import datetime
+from datetime import timedelta
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import (INTERVALO_EN_VIVO, contexto_ingesta, estado_canal, feed_lecturas, formato_canal,
+                           guardar_configuracion_umbrales, pestanas, recursos, selector_ambito_umbrales, selector_lote)
+from paginas.spc import cartas_control
+from tps_alertas import cargar_umbrales, umbrales_efectivos
+from tps_codigos import siguiente_codigo
+from tps_feed import COLUMNAS_LECTURA
+from tps_ingesta import ingestar_lecturas
+from tps_semilla import simular_lectura_sensores
+from tps_series import serie_historica, tablas_lecturas
+from tps_spc import FUENTES as FUENTES_SPC
+
+
+# Ventanas y resoluciones del histórico de sensores
+VENTANAS_HISTORICO = {
+    "Últimas 24 horas": timedelta(days=1),
+    "Últimos 7 días": timedelta(days=7),
+    "Últimos 30 días": timedelta(days=30),
+    "Último año": timedelta(days=365),
+}
+
+RESOLUCIONES_HISTORICO = {
+    'auto': "Automática",
+    'cruda': "Lecturas crudas (LTTB)",
+    'minuto': "Por minuto",
+    'hora': "Por hora",
+    'dia': "Por día",
+}
+
+
+@st.fragment(run_every=INTERVALO_EN_VIVO)
+def monitoreo_en_vivo():
+    feed, _ = feed_lecturas()
+    ultima = feed.ultima()
+    if ultima is None:
+        st.info("📡 Aún no hay lecturas de sensores registradas")
+        return
+    with recursos().pool.conexion() as conn:
+        umbrales_globales = umbrales_efectivos(cargar_umbrales(conn))
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown("### 🌡️ Sensor de Temperatura")
+        temp_status = estado_canal(ultima['sensor_temperatura'], umbrales_globales['temp_min'], umbrales_globales['temp_max'])
+        st.metric("Temperatura Actual", formato_canal(ultima['sensor_temperatura'], "°C"), 
+                 delta=temp_status and f"Estado: {temp_status}")
+        
+        st.markdown("### ⚖️ Sensor de Peso")
+        st.metric("Peso Promedio", formato_canal(ultima['sensor_peso'], " kg"))
+    
+    with col2:
+        st.markdown("### 💧 Sensor de Humedad")
+        hum_status = estado_canal(ultima['sensor_humedad'], umbrales_globales['hum_min'], umbrales_globales['hum_max'])
+        st.metric("Humedad Relativa", formato_canal(ultima['sensor_humedad'], "%"), 
+                 delta=hum_status and f"Estado: {hum_status}")
+        
+        st.markdown("### 🧪 Sensor de pH")
+        ph_status = estado_canal(ultima['sensor_ph'], umbrales_globales['ph_min'], umbrales_globales['ph_max'])
+        st.metric("Nivel de pH", formato_canal(ultima['sensor_ph']), 
+                 delta=ph_status and f"Estado: {ph_status}")
+    
+    with col3:
+        st.markdown("### 🍯 Sensor de Brix")
+        st.metric("Grados Brix", formato_canal(ultima['sensor_brix'], "°"))
+        st.caption(f"Lote {ultima['codigo_lote']} · {ultima['timestamp_lectura']}")
+    
+    # Últimas lecturas del feed, la más reciente primero
+    recientes = pd.DataFrame(reversed(feed.filas), columns=COLUMNAS_LECTURA).head(20)
+    st.dataframe(recientes, use_container_width=True, height=250, hide_index=True)
+
+
+def mostrar():
+    pool = recursos().pool
+
+    st.title("📡 Lecturas de Sensores IoT - TPS en Tiempo Real")
+    
+    tab1, tab2, tab3, tab4 = pestanas(["📊 Monitoreo Actual", "📈 Histórico", "📉 Control Estadístico", "⚙️ Configuración"])
+    
+    with tab1:
+        st.subheader("📊 Monitoreo de Sensores en Tiempo Real")
+        
+        # Lecturas actuales: fragmento que se refresca solo con las filas nuevas del feed
+        monitoreo_en_vivo()
+        
+        # Registrar nueva lectura simulada
+        lote_sensor = selector_lote("lote_sensor", 'abiertos', "Lote para Registro")
+        with st.form("form_sensor"):
+            if lote_sensor:
+                if st.form_submit_button("📡 Registrar Lectura"):
+                    def registrar_lectura(conn, contexto):
+                        codigo_lectura = siguiente_codigo(conn, 'lecturas_sensores')
+                        return codigo_lectura, ingestar_lecturas(pool, [dict(simular_lectura_sensores(), codigo_lectura=codigo_lectura, codigo_lote=lote_sensor)],
+                                                                 contexto=contexto)
+
+                    try:
+                        codigo_lectura, resultado = recursos().escritor.ejecutar(registrar_lectura, contexto_ingesta())
+                        if resultado.filas_insertadas:
+                            st.success(f"✅ Lectura registrada: {codigo_lectura}")
+                            if resultado.alertas_generadas:
+                                st.warning(f"🚨 La lectura generó {resultado.alertas_generadas} alerta(s) automática(s)")
+                        else:
+                            st.error(f"❌ Lectura rechazada: {', '.join(resultado.rechazos_por_motivo)}")
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+
+    with tab2:
+        st.subheader("📈 Histórico de Sensores")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            ventana = st.selectbox("Ventana de Tiempo", list(VENTANAS_HISTORICO.keys()))
+        
+        with col2:
+            with pool.conexion() as conn:
+                lotes_con_lecturas = [fila[0] for fila in conn.execute("SELECT DISTINCT codigo_lote FROM lecturas_rollup WHERE resolucion = 'dia'")]
+            lote_historico = st.selectbox("Lote", ["Todos"] + lotes_con_lecturas)
+        
+        with col3:
+            resolucion_historico = st.selectbox("Resolución", list(RESOLUCIONES_HISTORICO.keys()),
+                format_func=lambda x: RESOLUCIONES_HISTORICO[x])
+        
+        hasta = datetime.datetime.now(datetime.timezone.utc)
+        desde = hasta - VENTANAS_HISTORICO[ventana]
+        rango = (desde.strftime('%Y-%m-%d %H:%M:%S'), hasta.strftime('%Y-%m-%d %H:%M:%S'))
+        codigo_lote_historico = None if lote_historico == "Todos" else lote_historico
+        if resolucion_historico == 'cruda':
+            with pool.conexion() as conn:
+                archivadas = tablas_lecturas(conn, *rango)[:-1]
+            if archivadas:
+                st.caption(f"🗄️ La ventana incluye {len(archivadas)} mes(es) de lecturas archivadas")
+        
+        col1, col2 = st.columns(2)
+        
+        for columna, canal, titulo, minimo, maximo in [
+            (col1, 'sensor_temperatura', 'Tendencia de Temperatura (°C)', 2.0, 8.0),
+            (col2, 'sensor_humedad', 'Tendencia de Humedad (%)', 85.0, 95.0),
+        ]:
+            with columna:
+                with pool.conexion() as conn:
+                    resolucion_usada, serie = serie_historica(conn, canal, *rango, codigo_lote=codigo_lote_historico,
+                                                              resolucion=resolucion_historico)
+                
+                if serie:
+                    serie_df = pd.DataFrame(serie, columns=['instante', 'valor', 'minimo', 'maximo'])
+                    serie_df['instante'] = pd.to_datetime(serie_df['instante'])
+                    fig = px.line(serie_df, x='instante', y='valor',
+                                title=f"{titulo} - {len(serie_df)} puntos ({RESOLUCIONES_HISTORICO[resolucion_usada]})")
+                    if resolucion_usada != 'cruda':
+                        # Banda mín-máx de cada periodo del rollup
+                        fig.add_scatter(x=serie_df['instante'], y=serie_df['maximo'], mode='lines',
+                                        line=dict(width=0), showlegend=False, hoverinfo='skip')
+                        fig.add_scatter(x=serie_df['instante'], y=serie_df['minimo'], mode='lines',
+                                        line=dict(width=0), fill='tonexty', name='Mín-Máx', hoverinfo='skip')
+                    fig.add_hline(y=minimo, line_dash="dash", line_color="blue", annotation_text="Mín")
+                    fig.add_hline(y=maximo, line_dash="dash", line_color="red", annotation_text="Máx")
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("📡 No hay lecturas en la ventana seleccionada")
+        
+        st.markdown("### 📋 Últimas Lecturas")
+        with pool.conexion() as conn:
+            sensores_df = pd.read_sql_query("""
+                SELECT ls.*, pa.nombre_producto
+                FROM lecturas_sensores ls
+                JOIN lotes_produccion lp ON ls.codigo_lote = lp.codigo_lote
+                JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+                ORDER BY ls.timestamp_lectura DESC
+                LIMIT 200
+            """, conn)
+        
+        if not sensores_df.empty:
+            st.dataframe(sensores_df, use_container_width=True, height=400)
+        else:
+            st.info("📡 No hay lecturas de sensores registradas")
+    
+    with tab3:
+        st.subheader("📉 Control Estadístico de Proceso")
+        st.caption("Cartas por producto con subgrupos de lecturas consecutivas; los límites se actualizan con cada lectura")
+        cartas_control(FUENTES_SPC['lecturas_sensores'].canales, 'sensores')
+    
+    with tab4:
+        st.subheader("⚙️ Configuración de Sensores")
+        
+        st.markdown("### 🎛️ Parámetros de Sensores")
+        
+        ambito, codigo_ambito, umbrales = selector_ambito_umbrales("sensores")
+        sufijo = f"{ambito}_{codigo_ambito}"
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**🌡️ Sensor de Temperatura**")
+            temp_min = st.number_input("Temperatura Mínima (°C)", value=float(umbrales['temp_min']), key=f"temp_min_{sufijo}")
+            temp_max = st.number_input("Temperatura Máxima (°C)", value=float(umbrales['temp_max']), key=f"temp_max_{sufijo}")
+            
+            st.markdown("**💧 Sensor de Humedad**")
+            hum_min = st.number_input("Humedad Mínima (%)", value=float(umbrales['hum_min']), key=f"hum_min_{sufijo}")
+            hum_max = st.number_input("Humedad Máxima (%)", value=float(umbrales['hum_max']), key=f"hum_max_{sufijo}")
+        
+        with col2:
+            st.markdown("**🧪 Sensor de pH**")
+            ph_min = st.number_input("pH Mínimo", value=float(umbrales['ph_min']), key=f"ph_min_{sufijo}")
+            ph_max = st.number_input("pH Máximo", value=float(umbrales['ph_max']), key=f"ph_max_{sufijo}")
+            
+            st.markdown("**⚖️ Sensor de Peso**")
+            peso_nominal = st.number_input("Peso Nominal (kg)", min_value=0.0, value=umbrales['peso_nominal'],
+                                           placeholder="Sin evaluar", key=f"peso_nominal_{sufijo}")
+            peso_tolerancia = st.number_input("Tolerancia de Peso (%)", value=float(umbrales['peso_tolerancia']), key=f"peso_tolerancia_{sufijo}")
+        
+        if st.button("💾 Guardar Configuración"):
+            if temp_min >= temp_max or hum_min >= hum_max or ph_min >= ph_max:
+                st.error("❌ Cada mínimo debe ser menor que su máximo")
+            elif guardar_configuracion_umbrales(ambito, codigo_ambito, {
+                'temp_min': temp_min, 'temp_max': temp_max,
+                'hum_min': hum_min, 'hum_max': hum_max,
+                'ph_min': ph_min, 'ph_max': ph_max,
+                'peso_nominal': peso_nominal, 'peso_tolerancia': peso_tolerancia,
+            }):
+                st.success("✅ Configuración de sensores actualizada")
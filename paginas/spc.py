@@ -0,0 +1,104 @@
+"""Cartas de control X̄/R, EWMA y CUSUM de las pestañas de sensores y laboratorio."""
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import recursos
+from tps_spc import CANALES, H_CUSUM, MIN_SUBGRUPOS, REGLAS_WE, TAMANO_SUBGRUPO, carta
+
+SUBGRUPOS_VISIBLES = 200
+
+
+def _carta_con_limites(subgrupos, columna, titulo, lineas, senales=None):
+    fig = px.line(subgrupos, x='numero', y=columna, markers=True, title=titulo,
+                  hover_data=['fecha', 'codigo_lote'])
+    for valor, etiqueta, color in lineas:
+        fig.add_hline(y=valor, line_dash="solid" if etiqueta == "LC" else "dash", line_color=color,
+                      annotation_text=etiqueta)
+    if senales is not None and not senales.empty:
+        fig.add_scatter(x=senales['numero'], y=senales[columna], mode='markers', name='Regla incumplida',
+                        marker=dict(color='red', size=10, symbol='x'), text=senales['reglas'])
+    fig.update_layout(xaxis_title="Subgrupo", yaxis_title=None, showlegend=False)
+    return fig
+
+
+def cartas_control(canales, clave):
+    """Selector de producto y canal con sus cuatro cartas; ``canales`` son claves de tps_spc.CANALES."""
+    pool = recursos().pool
+    with pool.conexion() as conn:
+        productos = pd.read_sql_query(f"""
+            SELECT DISTINCT c.codigo_producto, COALESCE(pa.nombre_producto, c.codigo_producto) AS nombre_producto
+            FROM spc_canales c
+            LEFT JOIN productos_agro pa ON pa.codigo_producto = c.codigo_producto
+            WHERE c.subgrupos > 0 AND c.canal IN ({', '.join('?' * len(canales))})
+            ORDER BY nombre_producto
+        """, conn, params=tuple(canales))
+    if productos.empty:
+        st.info(f"📉 Aún no hay subgrupos completos de {TAMANO_SUBGRUPO} mediciones para las cartas de control")
+        return
+
+    nombres = dict(zip(productos['codigo_producto'], productos['nombre_producto']))
+    col1, col2 = st.columns(2)
+    with col1:
+        producto = st.selectbox("Producto", list(nombres), format_func=nombres.get, key=f"spc_producto_{clave}")
+    with col2:
+        canal = st.selectbox("Variable", list(canales), format_func=lambda c: CANALES[c][0], key=f"spc_canal_{clave}")
+
+    with pool.conexion() as conn:
+        limites, subgrupos = carta(conn, producto, canal, SUBGRUPOS_VISIBLES)
+    if limites is None or subgrupos.empty:
+        st.info("📉 Sin subgrupos completos para este producto y variable")
+        return
+
+    etiqueta, unidad = CANALES[canal]
+    unidad = f" ({unidad})" if unidad else ""
+    senales = subgrupos[subgrupos['reglas'].notna()]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("X̄̄", f"{limites.centro:.3f}")
+    with col2:
+        st.metric("R̄", f"{limites.rango_medio:.3f}")
+    with col3:
+        st.metric("σ de la media", f"{limites.sigma_media:.3f}")
+    with col4:
+        st.metric("Subgrupos con reglas incumplidas", len(senales))
+    if subgrupos['numero'].iloc[-1] < MIN_SUBGRUPOS:
+        st.caption(f"⏳ Las reglas de Western Electric se evalúan a partir de {MIN_SUBGRUPOS} subgrupos")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(_carta_con_limites(
+            subgrupos, 'media', f"X̄ - {etiqueta}{unidad}",
+            [(limites.centro, "LC", "green"), (limites.lsc, "LSC", "red"), (limites.lic, "LIC", "red")],
+            senales), use_container_width=True)
+    with col2:
+        st.plotly_chart(_carta_con_limites(
+            subgrupos, 'rango', f"R - {etiqueta}{unidad}",
+            [(limites.rango_medio, "LC", "green"), (limites.rango_lsc, "LSC", "red"), (limites.rango_lic, "LIC", "red")]),
+            use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(_carta_con_limites(
+            subgrupos, 'ewma', f"EWMA - {etiqueta}{unidad}",
+            [(limites.media, "LC", "green"), (limites.ewma_lsc, "LSC", "red"), (limites.ewma_lic, "LIC", "red")]),
+            use_container_width=True)
+    with col2:
+        cusum = subgrupos.assign(cusum_neg=-subgrupos['cusum_neg'])
+        fig = px.line(cusum, x='numero', y=['cusum_pos', 'cusum_neg'], title=f"CUSUM - {etiqueta} (σ)",
+                      labels={'value': "C", 'variable': ""})
+        fig.add_hline(y=H_CUSUM, line_dash="dash", line_color="red", annotation_text="H")
+        fig.add_hline(y=-H_CUSUM, line_dash="dash", line_color="red", annotation_text="-H")
+        fig.update_layout(xaxis_title="Subgrupo")
+        st.plotly_chart(fig, use_container_width=True)
+
+    if not senales.empty:
+        st.markdown("#### 🚨 Reglas de Western Electric incumplidas")
+        st.dataframe(pd.DataFrame({
+            'Subgrupo': senales['numero'],
+            'Fecha': senales['fecha'],
+            'Lote': senales['codigo_lote'],
+            'Media': senales['media'].round(3),
+            'Reglas': senales['reglas'].map(
+                lambda reglas: "; ".join(f"{r}: {REGLAS_WE[int(r)][1]}" for r in reglas.split(','))),
+        }).iloc[::-1], use_container_width=True, hide_index=True)
@@ -0,0 +1,187 @@
+"""Trazabilidad internacional: registro de envíos, historial y análisis."""
+from datetime import date, timedelta
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from paginas.comun import (consulta_cacheada, pestanas, recursos, resumen_historial, selector_lote, tabla_paginada,
+                           tablas_modulo)
+from tps_linaje import ETIQUETAS_TIPO, TIPOS, buscar, relacionados, resumen as resumen_linaje
+
+# Tipo buscado por defecto en cada dirección del linaje
+TIPO_LINAJE_POR_DEFECTO = {'arriba': 'campo', 'abajo': 'contenedor'}
+
+
+def mostrar():
+    pool = recursos().pool
+
+    st.title("🌍 Trazabilidad Internacional - Exportaciones")
+    
+    tab1, tab2, tab3, tab4 = pestanas(["🚢 Nuevo Envío", "📦 Seguimiento", "📊 Reportes", "🔗 Linaje"])
+    
+    with tab1:
+        st.subheader("🚢 Registrar Envío Internacional")
+        
+        lote_envio = selector_lote("lote_envio", 'aprobados', "Lote Aprobado")
+        
+        with st.form("form_trazabilidad"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                pais_destino = st.selectbox("País de Destino", 
+                    ["Estados Unidos", "Países Bajos", "Reino Unido", "Alemania", "Francia", "Canadá", "Japón"])
+                cliente_internacional = st.text_input("Cliente Internacional", 
+                    placeholder="Nombre del importador")
+                certificacion_requerida = st.multiselect("Certificaciones Requeridas", 
+                    ["Global GAP", "HACCP", "Organic", "Fair Trade", "BRC", "SQF", "FDA"])
+            
+            with col2:
+                numero_contenedor = st.text_input("Número de Contenedor", 
+                    placeholder="ABCD1234567")
+                fecha_embarque = st.date_input("Fecha de Embarque", value=date.today() + timedelta(days=7))
+                puerto_destino = st.text_input("Puerto de Destino", 
+                    placeholder="Puerto de destino")
+                documentos_exportacion = st.text_area("Documentos de Exportación", 
+                    placeholder="Lista de documentos requeridos...")
+                estado_envio = st.selectbox("Estado del Envío", 
+                    ["PREPARACION", "EMBARCADO", "EN_TRANSITO", "LLEGADA", "ENTREGADO"])
+            
+            submitted = st.form_submit_button("🌍 Registrar Trazabilidad", use_container_width=True)
+            
+            if submitted:
+                if lote_envio and cliente_internacional:
+                    # El envío y el estado del lote en la misma transacción
+                    def registrar_envio(conn):
+                        repositorio = recursos().repositorio
+                        codigo_trazabilidad = repositorio.registrar(conn, 'trazabilidad_internacional', {
+                            'codigo_lote': lote_envio, 'pais_destino': pais_destino,
+                            'cliente_internacional': cliente_internacional,
+                            'certificacion_requerida': ', '.join(certificacion_requerida),
+                            'numero_contenedor': numero_contenedor, 'fecha_embarque': fecha_embarque,
+                            'puerto_destino': puerto_destino, 'documentos_exportacion': documentos_exportacion,
+                            'estado_envio': estado_envio})
+                        repositorio.actualizar(conn, 'lotes_produccion', {'estado_lote': 'EXPORTADO'}, codigo_lote=lote_envio)
+                        return codigo_trazabilidad
+
+                    try:
+                        codigo_trazabilidad = recursos().escritor.ejecutar(registrar_envio)
+                        
+                        st.success(f"✅ Trazabilidad registrada: {codigo_trazabilidad}")
+                        st.balloons()
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
+                else:
+                    st.error("❌ Complete los campos obligatorios")
+    
+    with tab2:
+        st.subheader("📦 Seguimiento de Envíos")
+        
+        # Filtro por estado, fecha y lote aplicados en SQL
+        filtros, hay_registros = tabla_paginada("seguimiento_envios", 'trazabilidad')
+        
+        if hay_registros:
+            resumen = resumen_historial('trazabilidad', {
+                'total': "COUNT(*)",
+                'en_transito': "COUNT(CASE WHEN ti.estado_envio = 'EN_TRANSITO' THEN 1 END)",
+                'entregados': "COUNT(CASE WHEN ti.estado_envio = 'ENTREGADO' THEN 1 END)",
+                'paises': "COUNT(DISTINCT ti.pais_destino)",
+            }, **filtros)
+            
+            # Métricas de exportación
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("🚢 Total Envíos", resumen['total'])
+            with col2:
+                st.metric("🌊 En Tránsito", resumen['en_transito'])
+            with col3:
+                st.metric("✅ Entregados", resumen['entregados'])
+            with col4:
+                st.metric("🌍 Países Destino", resumen['paises'])
+        else:
+            st.info("🌍 No hay envíos internacionales registrados")
+    
+    with tab3:
+        st.subheader("📊 Reportes de Exportación")
+        
+        # Agregados calculados en SQL sobre el join completo
+        tablas = tablas_modulo('trazabilidad_internacional')
+        pais_dist = consulta_cacheada('trazabilidad_paises', tablas, """
+            SELECT ti.pais_destino AS pais, COUNT(*) AS cantidad
+            FROM trazabilidad_internacional ti
+            JOIN lotes_produccion lp ON ti.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY ti.pais_destino
+            ORDER BY cantidad DESC
+        """)
+        estado_dist = consulta_cacheada('trazabilidad_estados', tablas, """
+            SELECT ti.estado_envio AS estado, COUNT(*) AS cantidad
+            FROM trazabilidad_internacional ti
+            JOIN lotes_produccion lp ON ti.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY ti.estado_envio
+            ORDER BY cantidad DESC
+        """)
+        volumen_producto = consulta_cacheada('trazabilidad_volumen', tablas, """
+            SELECT pa.nombre_producto, SUM(lp.cantidad_kg) AS cantidad_kg
+            FROM trazabilidad_internacional ti
+            JOIN lotes_produccion lp ON ti.codigo_lote = lp.codigo_lote
+            JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+            GROUP BY pa.nombre_producto
+        """)
+        
+        if not pais_dist.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Exportaciones por país
+                fig = px.bar(pais_dist, x='pais', y='cantidad',
+                           title='Exportaciones por País de Destino')
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                # Estados de envío
+                fig2 = px.pie(estado_dist, values='cantidad', names='estado',
+                            title='Distribución por Estado de Envío')
+                st.plotly_chart(fig2, use_container_width=True)
+            
+            # Volumen exportado por producto
+            fig3 = px.bar(volumen_producto, x='nombre_producto', y='cantidad_kg',
+                        title='Volumen Exportado por Producto (kg)')
+            st.plotly_chart(fig3, use_container_width=True)
+    
+    with tab4:
+        st.subheader("🔗 Linaje de Lotes")
+        st.caption("Busque por el inicio del código: campo, cosecha (campo|AAAA-MM-DD), producto, lote, informe, "
+                   "envío, contenedor, inspección, prueba, envase o alerta.")
+        
+        texto = st.text_input("Código", placeholder="Campo Norte, LT-..., DNPU...", key="linaje_texto")
+        if texto:
+            with pool.conexion() as conn:
+                nodos = buscar(conn, texto)
+            
+            if nodos:
+                origen = st.selectbox("Nodo", nodos, format_func=lambda n: f"{ETIQUETAS_TIPO[n.tipo]} {n.codigo}",
+                                      key="linaje_nodo")
+                with pool.conexion() as conn:
+                    conteos = dict(zip(('arriba', 'abajo'), resumen_linaje(conn, origen)))
+                
+                col1, col2 = st.columns(2)
+                for columna, direccion, titulo in ((col1, 'arriba', "⬆️ Aguas arriba"), (col2, 'abajo', "⬇️ Aguas abajo")):
+                    with columna:
+                        st.markdown(f"### {titulo}")
+                        st.caption(" · ".join(f"{ETIQUETAS_TIPO[tipo]}: {n:,}" for tipo, n in conteos[direccion].items())
+                                   or "Sin lotes ni envíos relacionados")
+                        tipo = st.selectbox("Tipo", list(TIPOS), format_func=ETIQUETAS_TIPO.get,
+                                            index=list(TIPOS).index(TIPO_LINAJE_POR_DEFECTO[direccion]),
+                                            key=f"linaje_tipo_{direccion}")
+                        with pool.conexion() as conn:
+                            resultado = relacionados(conn, origen, direccion, tipo)
+                        mostrados = f", primeros {len(resultado.filas)}" if len(resultado.filas) < resultado.total else ""
+                        st.caption(f"{resultado.total:,} resultados en {resultado.milisegundos:.1f} ms{mostrados}")
+                        if resultado.filas:
+                            st.dataframe(pd.DataFrame([(relacionado.codigo, profundidad) for relacionado, profundidad in resultado.filas],
+                                                      columns=['Código', 'Profundidad']),
+                                         use_container_width=True, height=300, hide_index=True)
+            else:
+                st.info("🔍 Ningún código empieza así")
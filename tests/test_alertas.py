@@ -0,0 +1,85 @@
+"""Histéresis de los episodios de alerta entre bloques de ingesta.
+
+Cada llamada a ``ingestar_lecturas`` es un bloque: el episodio abierto de
+un bloque continúa o se cierra en el siguiente según ``lecturas_en_rango``.
+"""
+import datetime
+import itertools
+
+import pytest
+
+from tps_alertas import CIERRE_LECTURAS
+from tps_db import PoolConexiones
+from tps_ingesta import ingestar_lecturas
+from tps_migraciones import aplicar_migraciones
+
+LOTE = 'LT-PRUEBA-ALERTAS'
+INICIO = datetime.datetime(2024, 12, 1, 10, 0, 0)
+EN_RANGO, FUERA = 5.0, 9.5
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PoolConexiones(str(tmp_path / 'alertas.db'))
+    aplicar_migraciones(pool)
+    with pool.transaccion() as conn:
+        conn.execute("INSERT INTO lotes_produccion (codigo_lote, estado_lote) VALUES (?, 'EN_PROCESO')", (LOTE,))
+    yield pool
+    pool.cerrar()
+
+
+@pytest.fixture
+def ingestar(pool):
+    """Ingesta un bloque de temperaturas, una cada 15 s; None es una lectura sin ese canal."""
+    segundos = itertools.count(step=15)
+
+    def bloque(*temperaturas):
+        registros = []
+        for temperatura in temperaturas:
+            registro = {'codigo_lote': LOTE, 'humedad': 90.0,
+                        'timestamp_lectura': (INICIO + datetime.timedelta(seconds=next(segundos))).isoformat(' ')}
+            if temperatura is not None:
+                registro['temperatura'] = temperatura
+            registros.append(registro)
+        resultado = ingestar_lecturas(pool, registros)
+        assert resultado.filas_insertadas == len(temperaturas)
+        return resultado
+    return bloque
+
+
+def episodios(pool):
+    with pool.conexion() as conn:
+        return conn.execute("""
+            SELECT lecturas_afectadas, episodio_abierto, lecturas_en_rango
+            FROM alertas_automaticas WHERE codigo_lote = ? AND tipo_alerta = 'TEMPERATURA' ORDER BY id
+        """, (LOTE,)).fetchall()
+
+
+def test_episodio_se_extiende_entre_bloques(pool, ingestar):
+    assert ingestar(EN_RANGO, FUERA, FUERA + 0.1).alertas_generadas == 1
+    assert episodios(pool) == [(2, 1, 0)]
+
+    assert ingestar(FUERA + 0.2, EN_RANGO).alertas_generadas == 0
+    assert episodios(pool) == [(3, 1, 1)]
+
+
+def test_episodio_se_cierra_tras_lecturas_en_rango(pool, ingestar):
+    ingestar(FUERA)
+    ingestar(*[EN_RANGO] * (CIERRE_LECTURAS - 1))
+    assert episodios(pool) == [(1, 1, CIERRE_LECTURAS - 1)]
+
+    ingestar(EN_RANGO)
+    assert [abierto for _, abierto, _ in episodios(pool)] == [0]
+
+    # Cerrado el episodio, la siguiente excursión abre otro
+    assert ingestar(FUERA).alertas_generadas == 1
+    assert [abierto for _, abierto, _ in episodios(pool)] == [0, 1]
+
+
+def test_lecturas_sin_el_canal_no_cierran_el_episodio(pool, ingestar):
+    ingestar(FUERA)
+    ingestar(*[None] * (CIERRE_LECTURAS + 5))
+    assert episodios(pool) == [(1, 1, 0)]
+
+    assert ingestar(FUERA).alertas_generadas == 0
+    assert episodios(pool) == [(2, 1, 0)]
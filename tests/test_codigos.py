@@ -0,0 +1,58 @@
+"""Secuencias de códigos: cambio de día UTC y avance con códigos emitidos en otra parte."""
+import datetime
+import re
+
+import pytest
+
+import tps_codigos
+from tps_codigos import avanzar_secuencia, patron_codigo, reservar_codigos
+from tps_db import PoolConexiones
+from tps_migraciones import aplicar_migraciones
+
+TABLA = 'lecturas_sensores'
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PoolConexiones(str(tmp_path / 'codigos.db'))
+    aplicar_migraciones(pool)
+    yield pool
+    pool.cerrar()
+
+
+def reservar(pool, cantidad):
+    with pool.transaccion() as conn:
+        return reservar_codigos(conn, TABLA, cantidad)
+
+
+def numeros(codigos):
+    return [int(re.match(patron_codigo(TABLA), codigo).group(1)) for codigo in codigos]
+
+
+def test_cambio_de_dia_cambia_la_fecha_y_no_reinicia_la_secuencia(pool, monkeypatch):
+    monkeypatch.setattr(tps_codigos, '_hoy_utc', lambda: datetime.date(2024, 12, 31))
+    antes = reservar(pool, 2)
+    monkeypatch.setattr(tps_codigos, '_hoy_utc', lambda: datetime.date(2025, 1, 1))
+    despues = reservar(pool, 2)
+
+    assert antes == ['SEN-20241231-000000000001', 'SEN-20241231-000000000002']
+    assert despues == ['SEN-20250101-000000000003', 'SEN-20250101-000000000004']
+    # El orden de emisión es también el orden de texto del índice UNIQUE
+    assert sorted(antes + despues) == antes + despues
+
+
+def test_avanzar_secuencia_nunca_retrocede(pool):
+    reservar(pool, 1)
+    with pool.transaccion() as conn:
+        avanzar_secuencia(conn, TABLA, 1000)
+        avanzar_secuencia(conn, TABLA, 10)
+    assert numeros(reservar(pool, 2)) == [1001, 1002]
+
+
+def test_avanzar_una_tabla_sin_reservas_crea_su_secuencia(pool):
+    with pool.transaccion() as conn:
+        avanzar_secuencia(conn, 'informes_calidad', 42)
+        codigo, = reservar_codigos(conn, 'informes_calidad')
+    assert re.match(patron_codigo('informes_calidad'), codigo).group(1) == '000000000043'
+    # El patrón de una tabla no reconoce los códigos de otra
+    assert re.match(patron_codigo(TABLA), codigo) is None
@@ -0,0 +1,125 @@
+"""Escritor único: reintento ante candados y mantenimiento fuera de los grupos de formularios."""
+import sqlite3
+import threading
+
+import pytest
+
+from tps_db import PoolConexiones
+from tps_escritor import EscritorSerializado
+from tps_migraciones import aplicar_migraciones
+
+LOTE = 'LT-PRUEBA-ESCRITOR'
+ESPERA = 10.0
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PoolConexiones(str(tmp_path / 'escritor.db'))
+    aplicar_migraciones(pool)
+    yield pool
+    pool.cerrar()
+
+
+def registrar_lote(conn, codigo):
+    conn.execute("INSERT INTO lotes_produccion (codigo_lote, estado_lote) VALUES (?, 'NUEVO')", (codigo,))
+    return codigo
+
+
+def lotes(pool):
+    with pool.conexion() as conn:
+        return [fila[0] for fila in conn.execute("SELECT codigo_lote FROM lotes_produccion ORDER BY id")]
+
+
+def test_candado_reintenta_el_grupo_entero(pool):
+    intentos = []
+
+    def choca_una_vez(conn):
+        registrar_lote(conn, LOTE)
+        intentos.append(1)
+        if len(intentos) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return len(intentos)
+
+    escritor = EscritorSerializado(pool, espera_base=0.001)
+    try:
+        assert escritor.ejecutar(choca_una_vez) == 2
+        assert escritor.metricas()['reintentos'] == 1
+    finally:
+        escritor.cerrar()
+    # El INSERT del intento deshecho no quedó
+    assert lotes(pool) == [LOTE]
+
+
+def test_mantenimiento_no_retrasa_ni_se_adelanta_a_los_formularios(pool):
+    orden = []
+    en_curso, soltar = threading.Event(), threading.Event()
+
+    def lento(conn):
+        orden.append('lento')
+        en_curso.set()
+        assert soltar.wait(ESPERA)
+        return 0
+
+    def rapido(conn):
+        orden.append('rapido')
+        return 0
+
+    escritor = EscritorSerializado(pool, mantenimiento=(lento, rapido), intervalo_mantenimiento=ESPERA)
+    try:
+        # El resultado llega antes de que empiece el mantenimiento, que queda bloqueado
+        assert escritor.ejecutar(registrar_lote, 'LT-1') == 'LT-1'
+        assert en_curso.wait(ESPERA)
+        futuro = escritor.enviar(registrar_lote, 'LT-2')
+        soltar.set()
+        assert futuro.result(ESPERA) == 'LT-2'
+        escritor.ejecutar(registrar_lote, 'LT-3')
+    finally:
+        escritor.cerrar()
+    # La intención encolada pasó antes que la segunda función de mantenimiento de esa vuelta
+    assert orden[:2] == ['lento', 'lento']
+    assert lotes(pool) == ['LT-1', 'LT-2', 'LT-3']
+
+
+def test_mantenimiento_en_transaccion_propia_y_por_tandas(pool):
+    pendientes = [3]
+    transacciones = []
+    terminado = threading.Event()
+
+    def por_tandas(conn):
+        # Ve confirmado lo del formulario: no comparte su transacción
+        transacciones.append(conn.execute("SELECT COUNT(*) FROM lotes_produccion").fetchone()[0])
+        if not pendientes[0]:
+            terminado.set()
+            return 0
+        pendientes[0] -= 1
+        return 1
+
+    def falla(conn):
+        raise ValueError("mantenimiento roto")
+
+    escritor = EscritorSerializado(pool, mantenimiento=(falla, por_tandas), intervalo_mantenimiento=ESPERA)
+    try:
+        escritor.ejecutar(registrar_lote, LOTE)
+        assert terminado.wait(ESPERA)
+        metricas = escritor.metricas()
+    finally:
+        escritor.cerrar()
+    # Una tanda por vuelta mientras avanza, y la función que falla no arrastra al formulario
+    assert transacciones == [1, 1, 1, 1]
+    assert metricas['mantenimiento_fallido'] == 4 and metricas['fallidas'] == 0
+    assert lotes(pool) == [LOTE]
+
+
+def test_mantenimiento_periodico_con_la_cola_quieta(pool):
+    vueltas = threading.Semaphore(0)
+
+    def contar(conn):
+        vueltas.release()
+        return 0
+
+    escritor = EscritorSerializado(pool, mantenimiento=(contar,), intervalo_mantenimiento=0.01)
+    try:
+        for _ in range(3):
+            assert vueltas.acquire(timeout=ESPERA)
+    finally:
+        escritor.cerrar()
@@ -0,0 +1,83 @@
+"""Lotes parcialmente inválidos en el escritor del gateway.
+
+Una lectura que no se puede escribir no debe arrastrar al resto de su
+lote: se rechaza con su motivo y las demás llegan a la base.
+"""
+import asyncio
+
+import pytest
+
+from tps_db import PoolConexiones
+from tps_gateway import Gateway
+from tps_migraciones import aplicar_migraciones
+
+LOTE = 'LT-PRUEBA-GATEWAY'
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PoolConexiones(str(tmp_path / 'gateway.db'))
+    aplicar_migraciones(pool)
+    with pool.transaccion() as conn:
+        conn.execute("INSERT INTO lotes_produccion (codigo_lote, estado_lote) VALUES (?, 'EN_PROCESO')", (LOTE,))
+    yield pool
+    pool.cerrar()
+
+
+def lectura(segundo, codigo=None, temperatura=5.0):
+    registro = {'codigo_lote': LOTE, 'temperatura': temperatura, 'timestamp_lectura': f'2024-12-01 10:00:{segundo:02d}'}
+    if codigo is not None:
+        registro['codigo_lectura'] = codigo
+    return registro
+
+
+def enviar(pool, registros):
+    """Pasa ``registros`` por el gateway en un solo lote; devuelve los motivos de cada uno y las métricas."""
+    async def correr():
+        gateway = Gateway(pool, tamano_lote=len(registros) + 1, intervalo_flush=60.0, evaluar_alertas=False)
+        motivos = {}
+        for indice, registro in enumerate(registros):
+            await gateway.recibir(registro, 'prueba', aviso=lambda m, indice=indice: motivos.__setitem__(indice, list(m)))
+        await gateway.cola.put(None)
+        await gateway.escritor()
+        return [motivos[i] for i in range(len(registros))], gateway.metricas()['escritura']
+    return asyncio.run(correr())
+
+
+def codigos_guardados(pool):
+    with pool.conexion() as conn:
+        return [fila[0] for fila in conn.execute("SELECT codigo_lectura FROM lecturas_sensores ORDER BY timestamp_lectura")]
+
+
+def test_codigo_repetido_en_el_lote_solo_rechaza_la_repeticion(pool):
+    motivos, escritura = enviar(pool, [lectura(0, 'L-1'), lectura(1, 'L-2'), lectura(2, 'L-1'), lectura(3)])
+
+    assert motivos == [[], [], ['codigo_duplicado'], []]
+    assert escritura['filas_insertadas'] == 3 and escritura['errores'] == 0
+    assert codigos_guardados(pool)[:2] == ['L-1', 'L-2']
+
+
+def test_codigo_ya_guardado_se_rechaza_sin_perder_el_lote(pool):
+    enviar(pool, [lectura(0, 'L-1')])
+    motivos, escritura = enviar(pool, [lectura(1), lectura(2, 'L-1'), lectura(3, 'L-3')])
+
+    assert motivos == [[], ['codigo_duplicado'], []]
+    assert escritura['filas_insertadas'] == 2
+    assert len(codigos_guardados(pool)) == 3
+
+
+def test_error_no_reintentable_descarta_solo_las_lecturas_culpables(pool):
+    # Un fallo que la validación no ve: el lote se parte hasta aislar la lectura
+    with pool.transaccion() as conn:
+        conn.execute("""
+            CREATE TRIGGER rechazar_prueba BEFORE INSERT ON lecturas_sensores
+            WHEN NEW.sensor_temperatura = 7.7 BEGIN SELECT RAISE(ABORT, 'lectura rechazada por la prueba'); END
+        """)
+    registros = [lectura(segundo, temperatura=7.7 if segundo in (2, 5) else 5.0) for segundo in range(8)]
+    motivos, escritura = enviar(pool, registros)
+
+    assert [i for i, m in enumerate(motivos) if m] == [2, 5]
+    assert motivos[2] == ['error_escritura']
+    assert escritura['filas_insertadas'] == 6 and escritura['errores'] == 2
+    with pool.conexion() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM lecturas_sensores WHERE sensor_temperatura = 5.0").fetchone()[0] == 6
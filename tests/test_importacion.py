@@ -0,0 +1,119 @@
+"""Importación por bloques: reanudación tras un corte y archivo de rechazos."""
+import csv
+import io
+
+import pytest
+
+from tps_db import PoolConexiones
+from tps_importacion import estado_importacion, importar, leer_csv
+from tps_migraciones import aplicar_migraciones
+
+TABLA = 'inspecciones_visuales'
+LOTE = 'LT-PRUEBA-IMPORTACION'
+CLAVE = f'{TABLA}:prueba'
+ENCABEZADO = ['inspeccion', 'lote', 'resultado', 'conformidad']
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PoolConexiones(str(tmp_path / 'importacion.db'))
+    aplicar_migraciones(pool)
+    with pool.transaccion() as conn:
+        conn.execute("INSERT INTO lotes_produccion (codigo_lote, estado_lote) VALUES (?, 'EN_PROCESO')", (LOTE,))
+    yield pool
+    pool.cerrar()
+
+
+def archivo_csv(tmp_path, filas):
+    ruta = tmp_path / 'inspecciones.csv'
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(ENCABEZADO)
+        escritor.writerows(filas)
+    return ruta
+
+
+def cortado(bloques, cantidad):
+    """Entrega ``cantidad`` bloques y luego falla como una lectura interrumpida."""
+    for bloque in bloques:
+        if not cantidad:
+            raise OSError("lectura interrumpida")
+        cantidad -= 1
+        yield bloque
+
+
+def inspecciones(pool):
+    with pool.conexion() as conn:
+        return conn.execute("SELECT codigo_inspeccion, porcentaje_conformidad FROM inspecciones_visuales "
+                            "ORDER BY id").fetchall()
+
+
+def leer_rechazos(rechazos):
+    return list(csv.DictReader(io.StringIO(rechazos.getvalue())))
+
+
+def test_reanudar_salta_los_bloques_confirmados(pool, tmp_path):
+    filas = [['', LOTE, 'APROBADO', str(90 + i)] for i in range(7)]
+    filas[1][3] = '150'
+    filas[5][1] = ''
+    ruta = archivo_csv(tmp_path, filas)
+    rechazos = io.StringIO()
+
+    with pytest.raises(OSError):
+        importar(pool, TABLA, cortado(leer_csv(ruta, tamano_bloque=3), 1), CLAVE, rechazos=rechazos)
+    with pool.conexion() as conn:
+        assert estado_importacion(conn, CLAVE) == (3, 2, 1, False)
+
+    resultado = importar(pool, TABLA, leer_csv(ruta, tamano_bloque=3), CLAVE, rechazos=rechazos)
+
+    assert resultado.filas_omitidas == 3 and resultado.filas_leidas == 4
+    assert resultado.filas_insertadas == 3 and resultado.filas_rechazadas == 1 and resultado.completada
+    # Cada fila válida una sola vez, con código propio
+    guardadas = inspecciones(pool)
+    assert [conformidad for _, conformidad in guardadas] == [90.0, 92.0, 93.0, 94.0, 96.0]
+    assert len({codigo for codigo, _ in guardadas}) == 5
+    with pool.conexion() as conn:
+        assert estado_importacion(conn, CLAVE) == (7, 5, 2, True)
+    # El archivo de rechazos sigue el de la carga cortada sin repetir el encabezado
+    assert rechazos.getvalue().count('fila,') == 1
+    assert [(r['fila'], r['motivos']) for r in leer_rechazos(rechazos)] == [
+        ('2', 'porcentaje_conformidad_fuera_de_rango'), ('6', 'codigo_lote_vacio')]
+
+    # Completada, otra carga con la misma clave no vuelve a insertar
+    assert importar(pool, TABLA, leer_csv(ruta, tamano_bloque=3), CLAVE).filas_leidas == 0
+    assert len(inspecciones(pool)) == 5
+
+
+def test_rechazos_con_numero_de_fila_y_motivos(pool, tmp_path):
+    with pool.transaccion() as conn:
+        conn.execute("INSERT INTO inspecciones_visuales (codigo_inspeccion, codigo_lote, resultado_visual) "
+                     "VALUES ('INS-GUARDADA', ?, 'APROBADO')", (LOTE,))
+    ruta = archivo_csv(tmp_path, [
+        ['INS-A', LOTE, 'APROBADO', '95'],
+        ['INS-B', 'LT-NO-EXISTE', 'APROBADO', '95'],
+        ['INS-C', LOTE, 'quizas', 'abc'],
+        ['INS-A', LOTE, 'RECHAZADO', '40'],
+        ['INS-GUARDADA', LOTE, 'APROBADO', '95'],
+        ['INS-D', LOTE, 'observado', '80,5'],
+        ['INS-E', LOTE, 'APROBADO', '99'],
+        ['INS-E', LOTE, 'APROBADO', '99'],
+    ])
+    rechazos = io.StringIO()
+
+    resultado = importar(pool, TABLA, leer_csv(ruta, tamano_bloque=2), CLAVE, rechazos=rechazos)
+
+    assert resultado.filas_insertadas == 3 and resultado.filas_rechazadas == 5
+    assert resultado.rechazos_por_motivo == {
+        'codigo_lote_inexistente': 1, 'resultado_visual_no_permitido': 1, 'porcentaje_conformidad_invalido': 1,
+        'codigo_repetido_en_archivo': 1, 'codigo_existente': 2}
+    assert inspecciones(pool) == [('INS-GUARDADA', None), ('INS-A', 95.0), ('INS-D', 80.5), ('INS-E', 99.0)]
+    # Una repetición dentro del bloque se ve al validar; la de un bloque anterior ya está en la base
+    filas = leer_rechazos(rechazos)
+    assert list(filas[0]) == ['fila'] + ENCABEZADO + ['motivos']
+    assert [(f['fila'], f['inspeccion'], f['motivos']) for f in filas] == [
+        ('2', 'INS-B', 'codigo_lote_inexistente'),
+        ('3', 'INS-C', 'porcentaje_conformidad_invalido;resultado_visual_no_permitido'),
+        ('4', 'INS-A', 'codigo_existente'),
+        ('5', 'INS-GUARDADA', 'codigo_existente'),
+        ('8', 'INS-E', 'codigo_repetido_en_archivo'),
+    ]
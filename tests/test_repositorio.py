@@ -0,0 +1,67 @@
+"""Paridad del repositorio de escrituras: los mismos escenarios en SQLite y PostgreSQL.
+
+PostgreSQL solo se prueba si ``TPS_POSTGRES_DSN`` apunta a una base
+desechable; cada corrida trabaja en un esquema propio que se borra al final.
+"""
+import os
+import uuid
+
+import pytest
+
+from tps_db import PoolConexiones
+from tps_repositorio import Repositorio, RepositorioPostgres, RepositorioSQLite, escenarios, verificar_paridad
+
+LECTURAS = 5000
+DSN_POSTGRES = os.environ.get('TPS_POSTGRES_DSN')
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    repositorio = RepositorioSQLite(PoolConexiones(str(tmp_path / 'paridad.db')))
+    repositorio.crear_esquema()
+    yield repositorio
+    repositorio.cerrar()
+
+
+@pytest.fixture
+def postgres():
+    if not DSN_POSTGRES:
+        pytest.skip("TPS_POSTGRES_DSN no definido")
+    psycopg = pytest.importorskip('psycopg')
+    esquema = f"tps_paridad_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(DSN_POSTGRES, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {esquema}")
+    repositorio = None
+    try:
+        repositorio = RepositorioPostgres(DSN_POSTGRES, esquema=esquema)
+        repositorio.crear_esquema()
+        yield repositorio
+    finally:
+        if repositorio is not None:
+            repositorio.cerrar()
+        with psycopg.connect(DSN_POSTGRES, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {esquema} CASCADE")
+
+
+def test_escenarios_sqlite(sqlite):
+    resultados = escenarios(sqlite, LECTURAS)
+
+    assert resultados['codigos'] == ['PROD', 'LT', '0001', '0001']
+    assert resultados['altas'] == ['INS', 'LAB', 'ENV', 'ALT', 'TRZ']
+    assert resultados['cambios'] == [1, 1, 0]
+    assert resultados['secuencias'] == ['0043', '1001']
+    assert resultados['lecturas_insertadas'] == LECTURAS
+    assert resultados['lecturas_leidas'] == [LECTURAS // 1000, LECTURAS]
+    assert resultados['registros'] == ['APROBADO', 96.5, 1, 0, 'RESUELTA', 'EXPORTADO', '2024-12-15']
+    assert resultados['conteos_del_dia'] == [1, 0]
+
+
+def test_paridad_postgres(sqlite, postgres):
+    _, diferencias = verificar_paridad({'sqlite': sqlite, 'postgres': postgres}, LECTURAS)
+
+    assert diferencias == []
+
+
+def test_repositorio_base_es_abstracto():
+    with pytest.raises(TypeError):
+        Repositorio()
@@ -0,0 +1,368 @@
+"""Motor de alertas automáticas a partir de umbrales persistidos.
+
+Los umbrales se guardan en ``umbrales_alerta`` por ámbito (GLOBAL,
+PRODUCTO o LOTE; el más específico gana). Cada bloque de lecturas se
+evalúa con máscaras NumPy y las excursiones de un mismo lote y canal se
+agrupan en un solo episodio: una alerta con duración y número de
+lecturas afectadas, que se extiende si la excursión continúa en el
+bloque siguiente.
+
+Un episodio no se cierra en la primera lectura que vuelve a rango: una
+excursión sostenida que ronda el límite (8,1; 7,9; 8,2 °C) sigue siendo
+la misma. Se cierra tras ``CIERRE_LECTURAS`` lecturas seguidas en rango
+o si pasan más de ``CIERRE_SEGUNDOS`` hasta la siguiente lectura fuera
+de rango; mientras tanto ``lecturas_en_rango`` guarda cuántas lleva en
+rango, para continuar en el bloque siguiente. Las lecturas sin el canal
+no cuentan ni dentro ni fuera de rango.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from tps_codigos import reservar_codigos
+
+# Parámetros configurables y sus valores por defecto (los de las pantallas de configuración).
+# peso_nominal vacío desactiva la evaluación de peso.
+PARAMETROS_UMBRAL = {
+    'temp_min': 2.0,
+    'temp_max': 8.0,
+    'hum_min': 85.0,
+    'hum_max': 95.0,
+    'ph_min': 6.0,
+    'ph_max': 7.5,
+    'peso_nominal': None,
+    'peso_tolerancia': 5.0,
+    'temp_alerta_min': 1.0,
+    'temp_alerta_max': 9.0,
+    'hum_alerta_min': 80.0,
+    'hum_alerta_max': 98.0,
+    'ph_alerta_min': 5.5,
+    'ph_alerta_max': 8.0,
+    'peso_variacion_max': 10.0,
+}
+
+AMBITOS = ('GLOBAL', 'PRODUCTO', 'LOTE')
+
+# Histéresis de los episodios: lecturas seguidas en rango, o segundos sin salir de rango, que lo cierran
+CIERRE_LECTURAS = 10
+CIERRE_SEGUNDOS = 600
+
+# canal -> (tipo_alerta, parametro_afectado, (mín, máx) del rango óptimo, (mín, máx) de alerta crítica)
+REGLAS = {
+    'sensor_temperatura': ('TEMPERATURA', 'Temperatura', ('temp_min', 'temp_max'), ('temp_alerta_min', 'temp_alerta_max')),
+    'sensor_humedad': ('HUMEDAD', 'Humedad', ('hum_min', 'hum_max'), ('hum_alerta_min', 'hum_alerta_max')),
+    'sensor_ph': ('PH', 'pH', ('ph_min', 'ph_max'), ('ph_alerta_min', 'ph_alerta_max')),
+    'sensor_peso': ('PESO', 'Peso', None, None),
+}
+
+SQL_INSERTAR_ALERTA = '''
+    INSERT INTO alertas_automaticas (codigo_alerta, codigo_lote, tipo_alerta, nivel_criticidad, mensaje_alerta, parametro_afectado, valor_detectado, valor_limite, fecha_alerta, estado_alerta, fecha_fin, duracion_segundos, lecturas_afectadas, episodio_abierto, lecturas_en_rango)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'ACTIVA', ?, ?, ?, ?, ?)
+'''
+
+
+class Episodio(NamedTuple):
+    codigo_lote: str
+    canal: str
+    inicio: np.datetime64
+    fin: np.datetime64
+    lecturas: int
+    critico: bool
+    valor: float
+    limite: float
+    # Sigue abierto al final del bloque (dentro de la histéresis) y lecturas en rango desde su fin
+    abierto: bool
+    en_rango: int
+    # Primer episodio del lote y canal en el bloque: puede continuar uno abierto de un bloque anterior
+    primero: bool
+
+
+class Inicio(NamedTuple):
+    """Cómo empieza un lote y canal en el bloque, para continuar o cerrar su episodio abierto."""
+    en_rango: int               # lecturas en rango antes de la primera fuera (todas si no hay)
+    instante: np.datetime64     # la primera fuera de rango, o la última lectura si no hay
+    fuera: bool
+
+
+class Evaluacion(NamedTuple):
+    alerta_generada: np.ndarray
+    episodios: list
+    # canal -> {codigo_lote: Inicio} de los lotes con lecturas del canal en el bloque
+    inicios: dict
+
+
+def _num(valor):
+    return np.nan if valor is None else float(valor)
+
+
+def _texto_fecha(instante):
+    return str(np.datetime64(instante, 's')).replace('T', ' ')
+
+
+def _instante(texto):
+    return np.datetime64(texto.replace(' ', 'T')[:19], 's')
+
+
+def cargar_umbrales(conn):
+    """{(ambito, codigo): {parametro: valor}} con todo lo guardado en umbrales_alerta."""
+    umbrales = {}
+    for ambito, codigo, parametro, valor in conn.execute("SELECT ambito, codigo, parametro, valor FROM umbrales_alerta"):
+        umbrales.setdefault((ambito, codigo), {})[parametro] = valor
+    return umbrales
+
+
+def guardar_umbrales(conn, ambito, codigo, valores):
+    if ambito not in AMBITOS:
+        raise ValueError(f"Ámbito no válido: {ambito}")
+    desconocidos = set(valores) - set(PARAMETROS_UMBRAL)
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+    conn.executemany('''
+        INSERT INTO umbrales_alerta (ambito, codigo, parametro, valor, fecha_actualizacion)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (ambito, codigo, parametro) DO UPDATE SET valor = excluded.valor, fecha_actualizacion = CURRENT_TIMESTAMP
+    ''', [(ambito, codigo if ambito != 'GLOBAL' else '', parametro, valor) for parametro, valor in valores.items()])
+
+
+def umbrales_efectivos(umbrales, codigo_lote=None, codigo_producto=None):
+    """Valores por defecto, sobrescritos por GLOBAL, PRODUCTO y LOTE en ese orden."""
+    efectivos = dict(PARAMETROS_UMBRAL)
+    efectivos.update(umbrales.get(('GLOBAL', ''), {}))
+    if codigo_producto:
+        efectivos.update(umbrales.get(('PRODUCTO', codigo_producto), {}))
+    if codigo_lote:
+        efectivos.update(umbrales.get(('LOTE', codigo_lote), {}))
+    return efectivos
+
+
+def limites_canal(efectivos, canal):
+    """(mín, máx, mín crítico, máx crítico) para un canal; NaN desactiva el límite."""
+    _, _, rango, rango_alerta = REGLAS[canal]
+    if canal == 'sensor_peso':
+        nominal = _num(efectivos['peso_nominal'])
+        tolerancia = _num(efectivos['peso_tolerancia']) / 100.0
+        variacion = _num(efectivos['peso_variacion_max']) / 100.0
+        return (nominal * (1 - tolerancia), nominal * (1 + tolerancia),
+                nominal * (1 - variacion), nominal * (1 + variacion))
+    return (_num(efectivos[rango[0]]), _num(efectivos[rango[1]]),
+            _num(efectivos[rango_alerta[0]]), _num(efectivos[rango_alerta[1]]))
+
+
+def _segundos(desde, hasta):
+    return (np.asarray(hasta, dtype='datetime64[s]') - np.asarray(desde, dtype='datetime64[s]')).astype(np.int64)
+
+
+class MotorAlertas:
+    def __init__(self, umbrales, producto_por_lote, cierre_lecturas=CIERRE_LECTURAS, cierre_segundos=CIERRE_SEGUNDOS):
+        self.umbrales = umbrales
+        self.producto_por_lote = producto_por_lote
+        self.cierre_lecturas = cierre_lecturas
+        self.cierre_segundos = cierre_segundos
+        self._limites = {}
+
+    @classmethod
+    def cargar(cls, conn, producto_por_lote=None):
+        if producto_por_lote is None:
+            producto_por_lote = dict(conn.execute("SELECT codigo_lote, codigo_producto FROM lotes_produccion"))
+        return cls(cargar_umbrales(conn), producto_por_lote)
+
+    def _limites_lotes(self, lotes_unicos, canal):
+        filas = []
+        for lote in lotes_unicos.tolist():
+            clave = (lote, canal)
+            if clave not in self._limites:
+                efectivos = umbrales_efectivos(self.umbrales, lote, self.producto_por_lote.get(lote))
+                self._limites[clave] = limites_canal(efectivos, canal)
+            filas.append(self._limites[clave])
+        return np.array(filas, dtype=float).reshape(-1, 4)
+
+    def evaluar(self, lotes, instantes, valores):
+        """Evalúa un bloque de lecturas sin tocar la base de datos.
+
+        ``lotes`` es un arreglo de códigos, ``instantes`` un arreglo
+        datetime64 y ``valores`` un dict canal -> arreglo float (NaN si la
+        lectura no trae el canal).
+        """
+        n = len(lotes)
+        alerta = np.zeros(n, dtype=bool)
+        episodios = []
+        inicios_lote = {}
+        if n == 0:
+            return Evaluacion(alerta, episodios, inicios_lote)
+
+        lotes_unicos, lote_idx = np.unique(lotes, return_inverse=True)
+        # Orden por lote y tiempo: las lecturas de cada lote quedan contiguas
+        orden = np.lexsort((instantes, lote_idx))
+
+        for canal in REGLAS:
+            if canal not in valores:
+                continue
+            v_todas = np.asarray(valores[canal], dtype=float)[orden]
+            presentes = np.flatnonzero(np.isfinite(v_todas))
+            if not len(presentes):
+                continue
+            # Solo las lecturas con el canal, en orden de lote y tiempo
+            filas = orden[presentes]
+            v = v_todas[presentes]
+            lote_c = lote_idx[filas]
+            instantes_c = np.asarray(instantes[filas], dtype='datetime64[s]')
+            limites = self._limites_lotes(lotes_unicos, canal)[lote_c]
+            with np.errstate(invalid='ignore'):
+                fuera = (v < limites[:, 0]) | (v > limites[:, 1])
+                critico = (v < limites[:, 2]) | (v > limites[:, 3])
+            primera_de_lote = np.r_[True, lote_c[1:] != lote_c[:-1]]
+            indice_primera = np.flatnonzero(primera_de_lote)
+            # Para cada lectura, la posición de la última lectura de su lote
+            ultima = np.r_[indice_primera[1:], len(v)][np.cumsum(primera_de_lote) - 1] - 1
+
+            posiciones = np.flatnonzero(fuera)
+            alerta[filas[posiciones]] = True
+            codigos_lote = lotes_unicos[lote_c[indice_primera]].tolist()
+            # Lecturas en rango antes de la primera fuera de cada lote
+            primera_fuera = np.full(len(indice_primera), -1)
+            if len(posiciones):
+                grupo_lote = np.cumsum(primera_de_lote)[posiciones] - 1
+                primeras = np.r_[True, grupo_lote[1:] != grupo_lote[:-1]]
+                primera_fuera[grupo_lote[primeras]] = posiciones[primeras]
+            hay_fuera = primera_fuera >= 0
+            referencia = np.where(hay_fuera, primera_fuera, ultima[indice_primera])
+            inicios_lote[canal] = {
+                codigo: Inicio(int(en_rango), instante, bool(afuera))
+                for codigo, en_rango, instante, afuera in zip(
+                    codigos_lote, np.where(hay_fuera, primera_fuera - indice_primera, referencia - indice_primera + 1),
+                    instantes_c[referencia], hay_fuera)
+            }
+            if not len(posiciones):
+                continue
+
+            # Una lectura fuera de rango abre episodio si es la primera del lote o si desde la anterior
+            # fuera de rango pasaron CIERRE_LECTURAS en rango o más de CIERRE_SEGUNDOS
+            mismo_lote = np.r_[False, lote_c[posiciones[1:]] == lote_c[posiciones[:-1]]]
+            en_rango_entre = np.r_[0, np.diff(posiciones) - 1]
+            pausa = np.r_[0, _segundos(instantes_c[posiciones[:-1]], instantes_c[posiciones[1:]])]
+            nuevo = ~mismo_lote | (en_rango_entre >= self.cierre_lecturas) | (pausa > self.cierre_segundos)
+            cortes = np.flatnonzero(nuevo)
+            inicios = posiciones[cortes]
+            fines = posiciones[np.r_[cortes[1:], len(posiciones)] - 1]
+            lecturas = np.diff(np.r_[cortes, len(posiciones)])
+            episodio_de = np.cumsum(nuevo) - 1
+
+            es_critico = np.logical_or.reduceat(critico[posiciones], cortes)
+            desviacion = np.fmax(limites[:, 0] - v, v - limites[:, 1])[posiciones]
+            orden_pico = np.lexsort((-desviacion, episodio_de))
+            pico = posiciones[orden_pico[np.r_[True, episodio_de[orden_pico][1:] != episodio_de[orden_pico][:-1]]]]
+            valor_pico = v[pico]
+            limite_pico = np.where(valor_pico > limites[pico, 1], limites[pico, 1], limites[pico, 0])
+
+            # Solo el último episodio de cada lote puede seguir abierto: el que no cumplió aún la histéresis
+            ultimo_del_lote = np.r_[~mismo_lote[cortes[1:]], True]
+            en_rango_final = ultima[fines] - fines
+            abierto = (ultimo_del_lote & (en_rango_final < self.cierre_lecturas)
+                       & (_segundos(instantes_c[fines], instantes_c[ultima[fines]]) <= self.cierre_segundos))
+            primero = ~mismo_lote[cortes]
+
+            codigos = lotes_unicos[lote_c[inicios]].tolist()
+            for k in range(len(inicios)):
+                episodios.append(Episodio(
+                    codigo_lote=codigos[k],
+                    canal=canal,
+                    inicio=instantes_c[inicios[k]],
+                    fin=instantes_c[fines[k]],
+                    lecturas=int(lecturas[k]),
+                    critico=bool(es_critico[k]),
+                    valor=float(valor_pico[k]),
+                    limite=float(limite_pico[k]),
+                    abierto=bool(abierto[k]),
+                    en_rango=int(en_rango_final[k]),
+                    primero=bool(primero[k]),
+                ))
+        return Evaluacion(alerta, episodios, inicios_lote)
+
+    def registrar(self, conn, evaluacion):
+        """Escribe los episodios en alertas_automaticas; devuelve cuántas alertas nuevas se crearon.
+
+        Un episodio abierto de un bloque anterior continúa con el primer
+        episodio del bloque en su lote y canal si no se cumplió la
+        histéresis entre ambos; si el bloque solo trae lecturas en rango,
+        suma esas lecturas y se cierra al cumplirla.
+        """
+        lotes_bloque = set()
+        for por_lote in evaluacion.inicios.values():
+            lotes_bloque.update(por_lote)
+        tipos = {REGLAS[canal][0]: canal for canal in REGLAS}
+        abiertos = {}
+        for fila in conn.execute('''
+            SELECT id, codigo_lote, tipo_alerta, fecha_alerta, nivel_criticidad, valor_detectado, valor_limite,
+                   lecturas_afectadas, COALESCE(fecha_fin, fecha_alerta), lecturas_en_rango
+            FROM alertas_automaticas WHERE episodio_abierto = 1
+        '''):
+            if fila[1] in lotes_bloque and fila[2] in tipos:
+                abiertos[(fila[1], tipos[fila[2]])] = fila
+
+        continuan = set()
+        cerrar, en_rango = [], []
+        for clave, abierto in abiertos.items():
+            inicio = evaluacion.inicios.get(clave[1], {}).get(clave[0])
+            if inicio is None:
+                # El bloque no trae el canal para ese lote: nada cambia
+                continue
+            lecturas = (abierto[9] or 0) + inicio.en_rango
+            vigente = (lecturas < self.cierre_lecturas
+                       and _segundos(_instante(abierto[8]), inicio.instante) <= self.cierre_segundos)
+            if vigente and inicio.fuera:
+                continuan.add(clave)
+            elif vigente:
+                en_rango.append((lecturas, abierto[0]))
+            else:
+                cerrar.append((abierto[0],))
+
+        nuevas = []
+        for episodio in evaluacion.episodios:
+            clave = (episodio.codigo_lote, episodio.canal)
+            if episodio.primero and clave in continuan:
+                self._extender(conn, abiertos[clave], episodio)
+                continue
+            nuevas.append(self._fila_alerta(episodio))
+
+        if cerrar:
+            conn.executemany("UPDATE alertas_automaticas SET episodio_abierto = 0 WHERE id = ?", cerrar)
+        if en_rango:
+            conn.executemany("UPDATE alertas_automaticas SET lecturas_en_rango = ? WHERE id = ?", en_rango)
+        if nuevas:
+            codigos = reservar_codigos(conn, 'alertas_automaticas', len(nuevas))
+            conn.executemany(SQL_INSERTAR_ALERTA, [(codigo,) + fila for codigo, fila in zip(codigos, nuevas)])
+        return len(nuevas)
+
+    @staticmethod
+    def _extender(conn, abierto, episodio):
+        id_alerta, _, _, fecha_alerta, nivel, valor, limite, lecturas = abierto[:8]
+        if abs(episodio.valor - episodio.limite) > abs((valor or 0) - (limite or 0)):
+            valor, limite = episodio.valor, episodio.limite
+        conn.execute('''
+            UPDATE alertas_automaticas
+            SET nivel_criticidad = ?, valor_detectado = ?, valor_limite = ?, fecha_fin = ?,
+                duracion_segundos = ?, lecturas_afectadas = ?, episodio_abierto = ?, lecturas_en_rango = ?
+            WHERE id = ?
+        ''', ('ALTA' if episodio.critico else nivel, valor, limite, _texto_fecha(episodio.fin),
+              float(_segundos(_instante(fecha_alerta), episodio.fin)),
+              (lecturas or 0) + episodio.lecturas, int(episodio.abierto), episodio.en_rango, id_alerta))
+
+    @staticmethod
+    def _fila_alerta(episodio):
+        tipo_alerta, parametro, _, _ = REGLAS[episodio.canal]
+        sentido = "por encima" if episodio.valor > episodio.limite else "por debajo"
+        return (
+            episodio.codigo_lote,
+            tipo_alerta,
+            'ALTA' if episodio.critico else 'MEDIA',
+            f"{parametro} {sentido} del rango configurado ({episodio.lecturas} lecturas)",
+            parametro,
+            round(episodio.valor, 3),
+            round(episodio.limite, 3),
+            _texto_fecha(episodio.inicio),
+            _texto_fecha(episodio.fin),
+            float(_segundos(episodio.inicio, episodio.fin)),
+            episodio.lecturas,
+            int(episodio.abierto),
+            episodio.en_rango,
+        )
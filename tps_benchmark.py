@@ -0,0 +1,310 @@
+"""Benchmark sin interfaz de las consultas y escrituras de cada módulo TPS.
+
+Cronometra las mismas funciones que usa la app (snapshot de KPIs,
+páginas de historial, conteos y resúmenes, series de sensores, motor de
+informes, linaje, búsqueda de texto), sus rutas de escritura (ingesta de lecturas, informes por
+lotes, registro de una inspección) y el arranque de la app (importación
+en frío de cada página, migraciones y siembra) sobre una base existente,
+normalmente poblada con ``tps_generador``. Las escrituras se ejecutan
+dentro de una transacción que se revierte al final de cada repetición,
+así que la base no cambia.
+
+El resultado es un JSON con la versión del código, el entorno y, por
+caso, los tiempos mínimo, mediana, p95 y máximo en milisegundos; con
+``--comparar`` se contrasta contra un JSON anterior.
+
+Uso desde línea de comandos::
+
+    python tps_benchmark.py --db bench.db --salida bench-actual.json
+    python tps_benchmark.py --db bench.db --comparar bench-anterior.json --solo historial
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from tps_busqueda import buscar
+from tps_cache import TABLAS_VERSIONADAS, CacheDatasets
+from tps_db import DB_PATH, PoolConexiones
+from tps_informes import decidir, generar_informes_pendientes, leer_resultados
+from tps_ingesta import CAMPOS_SENSOR, ingestar_lecturas
+from tps_kpis import leer_snapshot
+from tps_linaje import nodo, relacionados
+from tps_migraciones import aplicar_migraciones
+from paginas import MODULOS
+from tps_paginacion import TAMANO_PAGINA, VISTAS, contar, leer_pagina, resumir
+from tps_semilla import sembrar_datos_danper
+from tps_series import actualizar_rollups, serie_historica
+from tps_spc import actualizar_spc
+
+REPETICIONES = 5
+# Búsquedas de texto libre sobre el vocabulario de tps_generador: frecuentes, poco frecuentes y por prefijo
+BUSQUEDAS = {
+    'termino_frecuente': "certificado",
+    'dos_terminos': "daño frío",
+    'poco_frecuente': "sensor defectuoso",
+    'prefijo': "fitosan",
+}
+# Páginas que se saltan para medir una página profunda del historial
+PAGINAS_PROFUNDAS = 200
+LECTURAS_INGESTA = 5000
+
+
+class _Revertir(Exception):
+    """Fuerza el ROLLBACK de la transacción de un caso de escritura."""
+
+
+def _version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _texto(instante):
+    return str(instante).replace('T', ' ')
+
+
+def _medir(funcion, repeticiones):
+    """Estadísticas en ms de ``repeticiones`` llamadas; ``funcion`` devuelve el número de filas."""
+    tiempos = []
+    filas = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+    tiempos = np.array(tiempos)
+    return {
+        'min_ms': round(float(tiempos.min()), 3),
+        'mediana_ms': round(float(np.median(tiempos)), 3),
+        'p95_ms': round(float(np.percentile(tiempos, 95)), 3),
+        'max_ms': round(float(tiempos.max()), 3),
+        'repeticiones': repeticiones,
+        'filas': filas,
+    }
+
+
+def _revertido(pool, escribir):
+    """Ejecuta ``escribir(conn)`` en una transacción que siempre se revierte."""
+    def caso():
+        resultado = None
+        try:
+            with pool.transaccion() as conn:
+                resultado = escribir(conn)
+                raise _Revertir
+        except _Revertir:
+            pass
+        return resultado
+    return caso
+
+
+def casos_lectura(pool, conn):
+    """{nombre: función} con las consultas de lectura de cada módulo."""
+    casos = {'dashboard.snapshot_kpis': lambda: len(leer_snapshot(conn))}
+
+    for nombre, vista in VISTAS.items():
+        prefijo = f"historial.{nombre}"
+        casos[f"{prefijo}.primera_pagina"] = lambda vista=vista: len(leer_pagina(conn, vista).filas)
+        # Clave de la página N, obtenida una vez con OFFSET fuera del cronómetro
+        a, fecha = vista.alias, vista.columna_fecha
+        clave = conn.execute(f"""
+            SELECT {a}.{fecha}, {a}.id FROM {vista.tabla} {a}
+            WHERE {a}.{fecha} IS NOT NULL
+            ORDER BY {a}.{fecha} DESC, {a}.id DESC LIMIT 1 OFFSET ?
+        """, (PAGINAS_PROFUNDAS * TAMANO_PAGINA,)).fetchone()
+        if clave is not None:
+            casos[f"{prefijo}.pagina_profunda"] = \
+                lambda vista=vista, clave=clave: len(leer_pagina(conn, vista, despues_de=clave).filas)
+        columna, (_, opciones) = next(iter(vista.filtros.items()))
+        filtro = {columna: opciones[0]}
+        casos[f"{prefijo}.pagina_filtrada"] = \
+            lambda vista=vista, filtro=filtro: len(leer_pagina(conn, vista, filtros=filtro).filas)
+        casos[f"{prefijo}.contar"] = lambda vista=vista: contar(conn, vista)[0]
+        casos[f"{prefijo}.contar_filtrado"] = lambda vista=vista, filtro=filtro: contar(conn, vista, filtros=filtro)[0]
+        casos[f"{prefijo}.resumir"] = lambda vista=vista: len(resumir(conn, vista, {'total': 'COUNT(*)'}))
+        casos[f"{prefijo}.distribucion"] = lambda vista=vista, columna=columna: len(conn.execute(
+            f"SELECT {columna}, COUNT(*) FROM {vista.tabla} GROUP BY {columna}").fetchall())
+
+    hasta = conn.execute("SELECT MAX(timestamp_lectura) FROM lecturas_sensores").fetchone()[0]
+    if hasta is not None:
+        fin = np.datetime64(hasta[:19].replace(' ', 'T'), 's') + np.timedelta64(1, 's')
+        lote = conn.execute("SELECT codigo_lote FROM lecturas_sensores ORDER BY id DESC LIMIT 1").fetchone()[0]
+        for etiqueta, dias in (('24h', 1), ('30d', 30), ('1a', 365)):
+            desde = _texto(fin - np.timedelta64(dias, 'D'))
+            casos[f"sensores.serie_{etiqueta}"] = lambda desde=desde: len(
+                serie_historica(conn, 'sensor_temperatura', desde, _texto(fin))[1])
+        casos['sensores.serie_cruda_lote_7d'] = lambda: len(serie_historica(
+            conn, 'sensor_temperatura', _texto(fin - np.timedelta64(7, 'D')), _texto(fin), lote, resolucion='cruda')[1])
+
+    casos['informes.leer_y_decidir'] = lambda: len(decidir(leer_resultados(conn)))
+
+    envio = conn.execute("""
+        SELECT l.campo_origen, l.campo_origen || '|' || l.fecha_cosecha, t.numero_contenedor
+        FROM trazabilidad_internacional t JOIN lotes_produccion l ON l.codigo_lote = t.codigo_lote
+        WHERE t.numero_contenedor <> '' AND l.campo_origen <> '' AND l.fecha_cosecha IS NOT NULL
+        ORDER BY t.id DESC LIMIT 1
+    """).fetchone()
+    if envio is not None:
+        campo, cosecha, contenedor = (nodo(conn, tipo, codigo) for tipo, codigo in
+                                      zip(('campo', 'cosecha', 'contenedor'), envio))
+        casos['trazabilidad.linaje_campo_contenedores'] = lambda: relacionados(conn, campo, 'abajo', 'contenedor').total
+        casos['trazabilidad.linaje_cosecha_contenedores'] = lambda: relacionados(conn, cosecha, 'abajo', 'contenedor').total
+        casos['trazabilidad.linaje_contenedor_lotes'] = lambda: relacionados(conn, contenedor, 'arriba', 'lote').total
+        casos['trazabilidad.linaje_contenedor_inspecciones'] = \
+            lambda: relacionados(conn, contenedor, 'arriba', 'inspeccion').total
+
+    if conn.execute("SELECT 1 FROM busqueda_texto LIMIT 1").fetchone():
+        for nombre, texto in BUSQUEDAS.items():
+            casos[f"busqueda.{nombre}"] = lambda texto=texto: len(buscar(conn, texto).resultados)
+
+    cache = CacheDatasets(pool)
+    cache.obtener('benchmark', TABLAS_VERSIONADAS, lambda c: None)
+    casos['cache.acierto'] = lambda: cache.obtener('benchmark', TABLAS_VERSIONADAS, lambda c: None) or 0
+    return casos
+
+
+def casos_escritura(pool, conn):
+    """{nombre: función} con las rutas de escritura, cada una revertida al terminar."""
+    lotes = [fila[0] for fila in conn.execute(
+        "SELECT codigo_lote FROM lotes_produccion WHERE estado_lote IN ('NUEVO', 'EN_PROCESO') LIMIT 100")]
+    if not lotes:
+        return {}
+    rng = np.random.default_rng(0)
+    ahora = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0, tzinfo=None)
+    registros = [
+        dict({'codigo_lote': lotes[i % len(lotes)],
+              'timestamp_lectura': (ahora + datetime.timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S')},
+             **{alias: round(float(v), 2) for alias, v in zip(CAMPOS_SENSOR.values(), rng.uniform([1.5, 15, 84, 6, 8], [8.5, 25, 96, 7.5, 15]))})
+        for i in range(LECTURAS_INGESTA)
+    ]
+
+    def inspeccion(conn):
+        conn.execute('''
+            INSERT INTO inspecciones_visuales (codigo_inspeccion, codigo_lote, inspector, color_evaluacion, forma_evaluacion, tamano_evaluacion, defectos_visuales, porcentaje_conformidad, resultado_visual, observaciones, tiempo_procesamiento)
+            VALUES ('INS-BENCHMARK', ?, 'Benchmark', 'Bueno', 'Uniforme', '', 'golpe leve', 95.0, 'APROBADO', 'Muestra representativa del lote', 2.5)
+        ''', (lotes[0],))
+        return 1
+
+    def prueba(conn):
+        conn.execute('''
+            INSERT INTO pruebas_fisicoquimicas (codigo_prueba, codigo_lote, laboratorista, acidez_titulable, solidos_solubles, firmeza, contenido_humedad, residuos_pesticidas, microbiologia_resultado, resultado_fisicoquimico, certificacion_organica)
+            VALUES ('LAB-BENCHMARK', ?, 'Benchmark', 0.15, 12.0, 180.0, 85.0, 'No detectados', 'Negativo', 'APROBADO', 0)
+        ''', (lotes[0],))
+        return actualizar_spc(conn, 'pruebas_fisicoquimicas').puntos
+
+    return {
+        f"escritura.ingesta_{LECTURAS_INGESTA}_lecturas": _revertido(
+            pool, lambda conn: ingestar_lecturas(pool, registros).filas_insertadas),
+        # La ingesta más lo que deja para después: rollups, resumen y cartas de esas lecturas
+        f"escritura.ingesta_con_derivados_{LECTURAS_INGESTA}_lecturas": _revertido(
+            pool, lambda conn: ingestar_lecturas(pool, registros).filas_insertadas and actualizar_rollups(conn)),
+        'escritura.informes_por_lotes': _revertido(
+            pool, lambda conn: generar_informes_pendientes(pool, 'Benchmark').generados),
+        'escritura.inspeccion': _revertido(pool, inspeccion),
+        'escritura.prueba_con_spc': _revertido(pool, prueba),
+    }
+
+
+def _importar_en_frio(modulo):
+    """Importa ``modulo`` en un intérprete nuevo (el tiempo incluye el arranque de Python)."""
+    def caso():
+        subprocess.run([sys.executable, '-c', f"import {modulo}"], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+    return caso
+
+
+def casos_arranque(pool):
+    """{nombre: función} con el costo de arranque de la app: importaciones en frío e inicialización."""
+    casos = {'arranque.importar_comun': _importar_en_frio('paginas.comun')}
+    for modulo in MODULOS.values():
+        casos[f"arranque.importar_pagina_{modulo}"] = _importar_en_frio(f"paginas.{modulo}")
+    sembrar = _revertido(pool, sembrar_datos_danper)
+
+    def inicializar():
+        aplicar_migraciones(pool)
+        sembrar()
+    casos['arranque.inicializar_base'] = inicializar
+    return casos
+
+
+def ejecutar(pool, repeticiones=REPETICIONES, solo=None, escrituras=True, arranque=True):
+    """Corre los casos (los que contienen ``solo``, si se indica) y devuelve el dict del informe JSON."""
+    with pool.conexion() as conn:
+        casos = casos_lectura(pool, conn)
+        if escrituras:
+            casos.update(casos_escritura(pool, conn))
+        if arranque:
+            casos.update(casos_arranque(pool))
+        totales = {tabla: conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+                   for tabla in TABLAS_VERSIONADAS + ('lecturas_sensores',)}
+        resultados = {nombre: _medir(funcion, repeticiones)
+                      for nombre, funcion in casos.items() if solo is None or solo in nombre}
+    return {
+        'version': _version(),
+        'fecha': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        'entorno': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                    'plataforma': platform.platform()},
+        'base': {'ruta': pool.ruta, 'filas': totales},
+        'casos': resultados,
+    }
+
+
+def comparar(actual, anterior):
+    """Líneas (caso, mediana anterior, mediana actual, razón) de los casos presentes en ambos."""
+    filas = []
+    for nombre, medida in actual['casos'].items():
+        previa = anterior['casos'].get(nombre)
+        if previa is None:
+            continue
+        razon = medida['mediana_ms'] / previa['mediana_ms'] if previa['mediana_ms'] else float('inf')
+        filas.append((nombre, previa['mediana_ms'], medida['mediana_ms'], razon))
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de consultas y escrituras del TPS")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--solo', help="Ejecutar solo los casos cuyo nombre contenga este texto")
+    parser.add_argument('--sin-escrituras', action='store_true', help="Omitir los casos de escritura")
+    parser.add_argument('--sin-arranque', action='store_true',
+                        help="Omitir los casos de arranque (importaciones en frío de cada página)")
+    parser.add_argument('--salida', help="Archivo donde guardar el JSON de resultados")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para comparar medianas")
+    args = parser.parse_args(argv)
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        informe = ejecutar(pool, args.repeticiones, args.solo, not args.sin_escrituras, not args.sin_arranque)
+    finally:
+        pool.cerrar()
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Versión {informe['version']} | SQLite {informe['entorno']['sqlite']} | "
+          f"{informe['base']['filas']['lotes_produccion']:,} lotes")
+    for nombre, medida in informe['casos'].items():
+        print(f"  {nombre:<48} {medida['mediana_ms']:>10.2f} ms  (p95 {medida['p95_ms']:.2f})")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        print(f"\nComparación con {anterior.get('version')} ({anterior.get('fecha')}):")
+        for nombre, previa, actual, razon in comparar(informe, anterior):
+            marca = " ▲" if razon > 1.2 else " ▼" if razon < 0.8 else ""
+            print(f"  {nombre:<48} {previa:>10.2f} -> {actual:>10.2f} ms  x{razon:.2f}{marca}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Búsqueda de texto libre (FTS5) en observaciones, defectos, alertas y documentos.
+
+``busqueda_texto`` (migración 14) es un índice FTS5 con una fila por
+registro de origen que tenga algún texto libre. El rowid codifica el
+origen (``id * 8 + código de la fuente``), así que los triggers de cada
+tabla borran o reemplazan su fila sin buscarla, y los resultados se
+completan con una lectura por clave primaria.
+
+Las consultas se ordenan por relevancia (bm25) mientras coincidan como
+mucho ``MAX_RANQUEADOS`` registros; con términos más frecuentes se
+devuelven los últimos registrados, que FTS5 recorre sin puntuar toda la
+lista de coincidencias.
+
+Uso desde línea de comandos::
+
+    python tps_busqueda.py "daño mecánico"
+    python tps_busqueda.py "fitosan" --limite 5
+"""
+import argparse
+import re
+import sys
+import time
+from typing import NamedTuple
+
+from tps_db import DB_PATH, PoolConexiones
+
+
+class Fuente(NamedTuple):
+    clave: int              # código de la fuente en el rowid (1-7)
+    etiqueta: str
+    columna_codigo: str
+    columna_fecha: str
+    columnas_texto: tuple
+
+
+FUENTES = {
+    'inspecciones_visuales': Fuente(1, "👁️ Inspección", 'codigo_inspeccion', 'fecha_inspeccion',
+                                    ('defectos_visuales', 'observaciones')),
+    'compatibilidad_envases': Fuente(2, "📦 Envase", 'codigo_compatibilidad', 'fecha_evaluacion',
+                                     ('observaciones_envase',)),
+    'alertas_automaticas': Fuente(3, "🚨 Alerta", 'codigo_alerta', 'fecha_alerta',
+                                  ('mensaje_alerta', 'accion_tomada')),
+    'trazabilidad_internacional': Fuente(4, "🚢 Envío", 'codigo_trazabilidad', 'fecha_embarque',
+                                         ('documentos_exportacion',)),
+}
+TABLA_POR_CLAVE = {fuente.clave: tabla for tabla, fuente in FUENTES.items()}
+
+SEPARADOR = ' · '
+MAX_RANQUEADOS = 20000
+MARCA_INICIO, MARCA_FIN = '[[', ']]'
+
+
+class Resultado(NamedTuple):
+    tabla: str
+    codigo: str
+    codigo_lote: str
+    fecha: str
+    fragmento: str          # texto con las coincidencias entre MARCA_INICIO y MARCA_FIN
+
+
+class ResultadoBusqueda(NamedTuple):
+    total: int              # coincidencias, acotado a MAX_RANQUEADOS + 1
+    por_relevancia: bool
+    resultados: list
+    milisegundos: float
+
+
+def expresion_texto(fuente, fila='NEW'):
+    """Expresión SQL con el texto indexado de ``fila`` (NEW en los triggers, un alias en la carga inicial)."""
+    unidas = f" || '{SEPARADOR}' || ".join(f"COALESCE({fila}.{columna}, '')" for columna in fuente.columnas_texto)
+    # Sin separadores sobrantes cuando alguna columna está vacía
+    return f"trim({unidas}, '{SEPARADOR}')" if len(fuente.columnas_texto) > 1 else unidas
+
+
+def condicion_texto(fuente, fila='NEW'):
+    return " OR ".join(f"COALESCE({fila}.{columna}, '') <> ''" for columna in fuente.columnas_texto)
+
+
+def sentencias_indice(tabla):
+    """Triggers que mantienen busqueda_texto al día con ``tabla``."""
+    fuente = FUENTES[tabla]
+    insertar = f"""
+        INSERT INTO busqueda_texto (rowid, texto)
+        SELECT NEW.id * 8 + {fuente.clave}, {expresion_texto(fuente)}
+        WHERE {condicion_texto(fuente)};"""
+    borrar = f"DELETE FROM busqueda_texto WHERE rowid = OLD.id * 8 + {fuente.clave};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_busqueda_{tabla}_ins AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_busqueda_{tabla}_upd AFTER UPDATE OF {', '.join(fuente.columnas_texto)} "
+        f"ON {tabla} BEGIN {borrar} {insertar} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_busqueda_{tabla}_del AFTER DELETE ON {tabla} BEGIN {borrar} END",
+    ]
+
+
+def indexar_existentes(conn, tabla):
+    """Carga en busqueda_texto las filas que ya tenía ``tabla``."""
+    fuente = FUENTES[tabla]
+    conn.execute(f"""
+        INSERT OR REPLACE INTO busqueda_texto (rowid, texto)
+        SELECT t.id * 8 + {fuente.clave}, {expresion_texto(fuente, 't')} FROM {tabla} t
+        WHERE {condicion_texto(fuente, 't')}
+    """)
+
+
+def consulta_fts(texto):
+    """Expresión MATCH para lo que escribió el usuario: todos los términos, el último como prefijo.
+
+    Devuelve None si no hay términos buscables.
+    """
+    terminos = re.findall(r'\w+', texto)
+    if not terminos:
+        return None
+    frases = [f'"{termino}"' for termino in terminos]
+    frases[-1] += '*'
+    return ' '.join(frases)
+
+
+def buscar(conn, texto, limite=20):
+    """Registros que contienen todos los términos de ``texto``; devuelve un ResultadoBusqueda."""
+    inicio = time.perf_counter()
+    expresion = consulta_fts(texto)
+    if expresion is None:
+        return ResultadoBusqueda(0, True, [], 0.0)
+    total = conn.execute("SELECT COUNT(*) FROM (SELECT rowid FROM busqueda_texto WHERE busqueda_texto MATCH ? LIMIT ?)",
+                         (expresion, MAX_RANQUEADOS + 1)).fetchone()[0]
+    por_relevancia = total <= MAX_RANQUEADOS
+    filas = conn.execute(f"""
+        SELECT rowid, snippet(busqueda_texto, 0, ?, ?, '…', 16)
+        FROM busqueda_texto
+        WHERE busqueda_texto MATCH ?
+        ORDER BY {'rank' if por_relevancia else 'rowid DESC'}
+        LIMIT ?
+    """, (MARCA_INICIO, MARCA_FIN, expresion, limite)).fetchall()
+
+    resultados = []
+    for rowid, fragmento in filas:
+        tabla = TABLA_POR_CLAVE[rowid % 8]
+        fuente = FUENTES[tabla]
+        origen = conn.execute(f"SELECT {fuente.columna_codigo}, codigo_lote, {fuente.columna_fecha} FROM {tabla} WHERE id = ?",
+                              (rowid // 8,)).fetchone()
+        if origen is not None:
+            resultados.append(Resultado(tabla, *origen, fragmento))
+    return ResultadoBusqueda(total, por_relevancia, resultados, (time.perf_counter() - inicio) * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Búsqueda de texto libre en los registros TPS")
+    parser.add_argument('texto')
+    parser.add_argument('--limite', type=int, default=20)
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    pool = PoolConexiones(args.db)
+    try:
+        with pool.conexion() as conn:
+            resultado = buscar(conn, args.texto, args.limite)
+    finally:
+        pool.cerrar()
+
+    orden = "por relevancia" if resultado.por_relevancia else "los más recientes"
+    total = f"{resultado.total:,}" if resultado.por_relevancia else f"más de {MAX_RANQUEADOS:,}"
+    print(f"{total} coincidencias en {resultado.milisegundos:.1f} ms ({orden}):")
+    for r in resultado.resultados:
+        print(f"  - {FUENTES[r.tabla].etiqueta} {r.codigo} · lote {r.codigo_lote} · {r.fecha}: {r.fragmento}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Caché de datasets por módulo, invalidada por generación de tabla.
+
+``generaciones_tablas`` guarda un contador por tabla que los triggers de
+la migración 9 incrementan en cada INSERT/UPDATE/DELETE (en
+lecturas_sensores lo hace ``tps_ingesta.insertar_filas`` una vez por
+bloque). Cada entrada de la caché recuerda las generaciones de las
+tablas de las que depende y se recarga solo cuando alguna cambió, de
+modo que todas las pestañas de un módulo comparten una única carga y
+cualquier escritura —desde la app, la CLI de ingesta u otro proceso—
+la invalida sin llamadas explícitas.
+"""
+import threading
+from collections import OrderedDict
+
+# Tablas con contador de generación mantenido por triggers
+TABLAS_VERSIONADAS = (
+    'productos_agro',
+    'lotes_produccion',
+    'inspecciones_visuales',
+    'pruebas_fisicoquimicas',
+    'compatibilidad_envases',
+    'alertas_automaticas',
+    'informes_calidad',
+    'trazabilidad_internacional',
+)
+
+
+def leer_generaciones(conn, tablas):
+    """Tupla de generaciones en el orden de ``tablas`` (0 si la tabla no tiene contador)."""
+    marcadores = ", ".join("?" for _ in tablas)
+    actuales = dict(conn.execute(
+        f"SELECT tabla, generacion FROM generaciones_tablas WHERE tabla IN ({marcadores})", tuple(tablas)))
+    return tuple(actuales.get(tabla, 0) for tabla in tablas)
+
+
+class CacheDatasets:
+    def __init__(self, pool, max_entradas=128):
+        self.pool = pool
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'aciertos': 0, 'cargas': 0}
+
+    def obtener(self, clave, tablas, cargar):
+        """Valor cacheado para ``clave``, o ``cargar(conn)`` si alguna de ``tablas`` cambió.
+
+        El valor se comparte entre reruns y sesiones: quien lo use no debe
+        modificarlo en el lugar.
+        """
+        tablas = tuple(tablas)
+        with self.pool.conexion() as conn:
+            generaciones = leer_generaciones(conn, tablas)
+            with self._lock:
+                entrada = self._entradas.get(clave)
+                if entrada is not None and entrada[0] == generaciones:
+                    self._entradas.move_to_end(clave)
+                    self._stats['aciertos'] += 1
+                    return entrada[1]
+            # Las generaciones se leen antes de cargar: una escritura concurrente
+            # deja la entrada desfasada y fuerza la recarga en la siguiente lectura
+            valor = cargar(conn)
+        with self._lock:
+            self._entradas[clave] = (generaciones, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            self._stats['cargas'] += 1
+        return valor
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats, entradas=len(self._entradas))
@@ -0,0 +1,142 @@
+"""Catálogo de lotes para los selectores de los formularios.
+
+Cada formulario elige un lote de una ``ListaLotes`` (abiertos, pendientes
+de informe, aprobados para exportar...). ``CatalogoLotes.opciones``
+devuelve los ``LIMITE_OPCIONES`` lotes de la lista registrados más
+recientemente (por ``lotes_produccion.id``, no por código: los códigos
+de generadores e importaciones no siguen el orden de alta) con sus
+etiquetas en un diccionario, de modo que el ``format_func`` del
+selectbox es una búsqueda O(1) y no un filtro del DataFrame por opción.
+Las opciones y el total de cada lista se guardan en la caché por
+generación (``tps_cache``): se recargan solo cuando cambia alguna de sus
+tablas, por ejemplo al pasar un lote a otro estado.
+
+Cuando la lista tiene más lotes que el límite, ``buscar`` filtra por
+código de lote o nombre de producto en SQL con LIMIT, para el selector
+con búsqueda de las páginas; sus resultados no se cachean porque cambian
+con cada tecla. Los nombres de producto (pocos) se comparan en Python sin
+acentos ni mayúsculas: "arandano" encuentra "Arándanos Frescos".
+"""
+import unicodedata
+from typing import NamedTuple
+
+LIMITE_OPCIONES = 200
+
+
+class ListaLotes(NamedTuple):
+    # lotes_produccion (índice por estado) o lote_resumen (decisión e informe del lote)
+    tabla: str
+    condicion: str
+    # Tablas cuyo cambio invalida la lista (ver tps_cache)
+    tablas: tuple
+
+
+_TABLAS_LOTE = ('lotes_produccion', 'productos_agro')
+
+LISTAS = {
+    # Lotes que aún reciben inspecciones, lecturas, pruebas, evaluaciones y alertas
+    'abiertos': ListaLotes('lotes_produccion', "l.estado_lote IN ('NUEVO', 'EN_PROCESO')", _TABLAS_LOTE),
+    # En proceso y sin informe consolidado (índice parcial de la migración 15)
+    'pendientes_informe': ListaLotes('lote_resumen', "l.estado_lote = 'EN_PROCESO' AND l.codigo_informe IS NULL",
+                                     _TABLAS_LOTE + ('informes_calidad',)),
+    # Aprobados por su informe y aún no exportados
+    'aprobados': ListaLotes('lote_resumen', "l.estado_lote = 'APROBADO' AND l.decision_final = 'APROBADO'",
+                            _TABLAS_LOTE + ('informes_calidad',)),
+    'todos': ListaLotes('lotes_produccion', "1 = 1", _TABLAS_LOTE),
+}
+
+
+class OpcionesLotes(NamedTuple):
+    codigos: list
+    # codigo_lote -> "codigo - producto" para format_func
+    etiquetas: dict
+    # False si el límite dejó lotes de la lista fuera
+    completa: bool
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def normalizar(texto):
+    """Texto sin acentos y en minúsculas, para comparar nombres."""
+    return unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode().lower()
+
+
+def cargar_opciones(conn, lista, texto='', productos=(), limite=LIMITE_OPCIONES):
+    """Lotes de ``LISTAS[lista]``, los últimos registrados primero.
+
+    Con ``texto`` solo los que lo contienen en el código o son de uno de
+    ``productos`` (códigos de producto cuyo nombre coincide).
+    """
+    config = LISTAS[lista]
+    condiciones = [config.condicion]
+    params = []
+    if texto:
+        condicion = "l.codigo_lote LIKE ? ESCAPE '\\'"
+        params.append(f"%{_escapar_like(texto)}%")
+        if productos:
+            condicion += f" OR l.codigo_producto IN ({', '.join('?' * len(productos))})"
+            params += list(productos)
+        condiciones.append(f"({condicion})")
+    if config.tabla == 'lotes_produccion':
+        alta, orden = '', 'l.id'
+    else:
+        # lote_resumen no guarda el orden de alta: se toma de lotes_produccion
+        alta, orden = "JOIN lotes_produccion lp ON lp.codigo_lote = l.codigo_lote", 'lp.id'
+    filas = conn.execute(f"""
+        SELECT l.codigo_lote, pa.nombre_producto
+        FROM {config.tabla} l
+        {alta}
+        JOIN productos_agro pa ON pa.codigo_producto = l.codigo_producto
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY {orden} DESC
+        LIMIT ?
+    """, params + [limite + 1]).fetchall()
+    completa = len(filas) <= limite
+    filas = filas[:limite]
+    return OpcionesLotes(
+        [fila[0] for fila in filas],
+        {codigo: f"{codigo} - {nombre}" for codigo, nombre in filas},
+        completa,
+    )
+
+
+def contar_lotes(conn, lista):
+    config = LISTAS[lista]
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM {config.tabla} l
+        JOIN productos_agro pa ON pa.codigo_producto = l.codigo_producto
+        WHERE {config.condicion}
+    """).fetchone()[0]
+
+
+class CatalogoLotes:
+    def __init__(self, cache, limite=LIMITE_OPCIONES):
+        self.cache = cache
+        self.limite = limite
+
+    def opciones(self, lista):
+        """OpcionesLotes de ``lista`` sin filtrar; compartidas entre sesiones hasta que cambien sus tablas."""
+        return self.cache.obtener(('catalogo_lotes', lista, self.limite), LISTAS[lista].tablas,
+                                  lambda conn: cargar_opciones(conn, lista, limite=self.limite))
+
+    def total(self, lista):
+        return self.cache.obtener(('catalogo_lotes_total', lista), LISTAS[lista].tablas,
+                                  lambda conn: contar_lotes(conn, lista))
+
+    def nombres_productos(self):
+        """{codigo_producto: nombre normalizado}."""
+        return self.cache.obtener(('catalogo_productos',), ('productos_agro',), lambda conn: {
+            codigo: normalizar(nombre) for codigo, nombre in conn.execute(
+                "SELECT codigo_producto, nombre_producto FROM productos_agro")})
+
+    def buscar(self, lista, texto):
+        """OpcionesLotes de ``lista`` cuyo código o producto contiene ``texto``; sin texto, las de ``opciones``."""
+        texto = texto.strip()
+        if not texto:
+            return self.opciones(lista)
+        buscado = normalizar(texto)
+        productos = [codigo for codigo, nombre in self.nombres_productos().items() if buscado in nombre]
+        with self.cache.pool.conexion() as conn:
+            return cargar_opciones(conn, lista, texto, productos, self.limite)
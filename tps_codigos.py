@@ -0,0 +1,134 @@
+"""Códigos de negocio únicos y ordenados en el tiempo (migración 17).
+
+Cada tabla con código propio tiene un prefijo y una secuencia en
+``secuencias_codigos``. ``reservar_codigos`` avanza la secuencia con un
+solo UPSERT ... RETURNING dentro de la transacción de quien escribe, así
+que un lote de N filas cuesta una sentencia y no N, y si la transacción
+se deshace la reserva se deshace con ella. SQLite serializa a los
+escritores, de modo que dos procesos nunca reciben el mismo bloque.
+
+El formato es ``PREFIJO-AAAAMMDD-NNNNNNNNNNNN``: la fecha de emisión en
+UTC, como los timestamps que se guardan con las filas, y el número de
+secuencia con ancho fijo. Como la secuencia nunca retrocede,
+los códigos crecen en el mismo orden en que se emiten y el índice UNIQUE
+de cada tabla recibe siempre inserciones al final del B-tree. Los doce
+dígitos no coinciden con ningún formato anterior (seis u ocho
+hexadecimales, o la fecha con hora), así que conviven con los códigos ya
+guardados sin posibilidad de choque.
+
+Uso desde línea de comandos::
+
+    python tps_codigos.py
+    python tps_codigos.py --reservar lecturas_sensores --cantidad 3
+"""
+import argparse
+import datetime
+import sys
+
+from tps_db import DB_PATH, PoolConexiones
+
+# Tabla -> prefijo de sus códigos
+PREFIJOS = {
+    'productos_agro': 'PROD',
+    'lotes_produccion': 'LT',
+    'inspecciones_visuales': 'INS',
+    'lecturas_sensores': 'SEN',
+    'pruebas_fisicoquimicas': 'LAB',
+    'compatibilidad_envases': 'ENV',
+    'alertas_automaticas': 'ALT',
+    'informes_calidad': 'INF',
+    'trazabilidad_internacional': 'TRZ',
+}
+DIGITOS_SECUENCIA = 12
+
+# Columna calificada en el SET: misma sentencia en SQLite y PostgreSQL (ver tps_repositorio)
+SQL_RESERVAR = '''
+    INSERT INTO secuencias_codigos (tabla, ultimo) VALUES (?, ?)
+    ON CONFLICT (tabla) DO UPDATE SET ultimo = secuencias_codigos.ultimo + excluded.ultimo
+    RETURNING ultimo
+'''
+# Para códigos emitidos en otra parte (importaciones): la secuencia nunca retrocede
+SQL_AVANZAR = '''
+    INSERT INTO secuencias_codigos (tabla, ultimo) VALUES (?, ?)
+    ON CONFLICT (tabla) DO UPDATE SET ultimo = MAX(secuencias_codigos.ultimo, excluded.ultimo)
+'''
+# MAX() con dos argumentos es propio de SQLite; PostgreSQL tiene GREATEST()
+SQL_AVANZAR_POSTGRES = SQL_AVANZAR.replace('MAX(', 'GREATEST(')
+
+
+def _hoy_utc():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def formatear_codigo(prefijo, numero, fecha=None):
+    fecha = fecha or _hoy_utc()
+    return f"{prefijo}-{fecha:%Y%m%d}-{numero:0{DIGITOS_SECUENCIA}d}"
+
+
+def reservar_codigos(conn, tabla, cantidad=1):
+    """Reserva ``cantidad`` números consecutivos de ``tabla`` y devuelve sus códigos en orden.
+
+    Debe llamarse dentro de la transacción que inserta las filas.
+    """
+    if cantidad <= 0:
+        return []
+    ultimo, = conn.execute(SQL_RESERVAR, (tabla, cantidad)).fetchone()
+    return codigos_del_bloque(tabla, ultimo, cantidad)
+
+
+def codigos_del_bloque(tabla, ultimo, cantidad):
+    """Códigos de los ``cantidad`` números que terminan en ``ultimo``."""
+    prefijo = PREFIJOS[tabla]
+    fecha = _hoy_utc()
+    return [formatear_codigo(prefijo, numero, fecha) for numero in range(ultimo - cantidad + 1, ultimo + 1)]
+
+
+def patron_codigo(tabla):
+    """Expresión regular de los códigos de ``tabla``; su grupo es el número de secuencia."""
+    return rf"^{PREFIJOS[tabla]}-\d{{8}}-(\d{{{DIGITOS_SECUENCIA}}})$"
+
+
+def avanzar_secuencia(conn, tabla, numero):
+    """Lleva la secuencia de ``tabla`` al menos hasta ``numero``.
+
+    Quien inserta códigos con este formato que no salieron de
+    ``reservar_codigos`` (una exportación de otra base TPS) lo llama con
+    el mayor número cargado para que las reservas siguientes no choquen.
+    """
+    conn.execute(SQL_AVANZAR, (tabla, int(numero)))
+
+
+def siguiente_codigo(conn, tabla):
+    """Un único código de ``tabla``; para formularios que registran una fila."""
+    return reservar_codigos(conn, tabla)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Secuencias de códigos de negocio del TPS")
+    parser.add_argument('--reservar', choices=sorted(PREFIJOS), default=None,
+                        help="Reservar códigos de esta tabla y mostrarlos")
+    parser.add_argument('--cantidad', type=int, default=1)
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    # Importación local: tps_migraciones importa módulos que usan este
+    from tps_migraciones import aplicar_migraciones
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        if args.reservar:
+            with pool.transaccion() as conn:
+                for codigo in reservar_codigos(conn, args.reservar, args.cantidad):
+                    print(codigo)
+        with pool.conexion() as conn:
+            ultimos = dict(conn.execute("SELECT tabla, ultimo FROM secuencias_codigos"))
+        for tabla, prefijo in PREFIJOS.items():
+            print(f"{tabla:<28} {prefijo:<5} último {ultimos.get(tabla, 0):,}")
+    finally:
+        pool.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
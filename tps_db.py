@@ -0,0 +1,140 @@
+"""Capa de acceso a datos del TPS Danper.
+
+Pool acotado de conexiones SQLite con afinidad por hilo: cada hilo de
+script de Streamlit reutiliza su conexión mientras la tenga tomada y la
+devuelve al pool al salir del bloque ``with``. Las conexiones se
+configuran una sola vez con PRAGMAS al abrirse. Con un ``perfilador``
+(ver ``tps_perfilado``) las conexiones miden sus consultas mientras esté
+activo.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from tps_perfilado import ConexionPerfilada
+
+DB_PATH = 'danper_tps_calidad.db'
+
+# PRAGMAS aplicados a cada conexión nueva (son por conexión en SQLite).
+# journal_mode = WAL es persistente y lo fija la migración 2.
+PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",   # seguro en WAL, evita un fsync por COMMIT
+    "PRAGMA cache_size = -32000",    # ~32 MB de caché de páginas
+    "PRAGMA mmap_size = 268435456",  # 256 MB mapeados en memoria
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class PoolConexiones:
+    def __init__(self, ruta=DB_PATH, max_conexiones=8, timeout=30.0, perfilador=None):
+        self.ruta = ruta
+        self.perfilador = perfilador
+        self.max_conexiones = max_conexiones
+        self.timeout = timeout
+        self._ociosas = []
+        self._total = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {'abiertas': 0, 'reutilizadas': 0, 'esperas': 0, 'transacciones': 0, 'rollbacks': 0}
+        # Se incrementa con cada COMMIT hecho a través del pool; las cachés lo usan para invalidarse
+        self.generacion = 0
+
+    def _abrir(self):
+        if self.perfilador is None:
+            conn = sqlite3.connect(self.ruta, check_same_thread=False, timeout=self.timeout)
+        else:
+            conn = sqlite3.connect(self.ruta, check_same_thread=False, timeout=self.timeout, factory=ConexionPerfilada)
+            conn.perfilador = self.perfilador
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _tomar(self):
+        with self._cond:
+            while True:
+                if self._ociosas:
+                    self._stats['reutilizadas'] += 1
+                    return self._ociosas.pop()
+                if self._total < self.max_conexiones:
+                    self._total += 1
+                    self._stats['abiertas'] += 1
+                    break
+                self._stats['esperas'] += 1
+                if not self._cond.wait(self.timeout):
+                    raise sqlite3.OperationalError("Pool de conexiones agotado")
+        try:
+            return self._abrir()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    def _devolver(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._ociosas.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def conexion(self):
+        """Conexión del hilo actual; los bloques anidados comparten la misma."""
+        actual = getattr(self._local, 'conn', None)
+        if actual is not None:
+            self._local.profundidad += 1
+            try:
+                yield actual
+            finally:
+                self._local.profundidad -= 1
+            return
+
+        conn = self._tomar()
+        self._local.conn = conn
+        self._local.profundidad = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.profundidad = 0
+            self._devolver(conn)
+
+    @contextmanager
+    def transaccion(self):
+        """Bloque de escritura: COMMIT al salir, ROLLBACK ante cualquier excepción.
+
+        Las transacciones anidadas se integran en la transacción externa.
+        """
+        with self.conexion() as conn:
+            if getattr(self._local, 'en_transaccion', False):
+                yield conn
+                return
+            self._local.en_transaccion = True
+            try:
+                yield conn
+                conn.commit()
+                with self._cond:
+                    self._stats['transacciones'] += 1
+                    self.generacion += 1
+            except BaseException:
+                conn.rollback()
+                self._stats['rollbacks'] += 1
+                raise
+            finally:
+                self._local.en_transaccion = False
+
+    def estadisticas(self):
+        with self._cond:
+            return dict(self._stats,
+                        total=self._total,
+                        ociosas=len(self._ociosas),
+                        en_uso=self._total - len(self._ociosas),
+                        max_conexiones=self.max_conexiones)
+
+    def cerrar(self):
+        with self._cond:
+            for conn in self._ociosas:
+                conn.close()
+            self._total -= len(self._ociosas)
+            self._ociosas = []
@@ -0,0 +1,363 @@
+"""Escritor único: serializa las escrituras de las sesiones de Streamlit.
+
+Cada sesión es un hilo con su propia conexión del pool; cuando varias
+escriben a la vez, sus transacciones diferidas empiezan leyendo y al
+pasar a escribir SQLite puede negarles el candado ("database is locked")
+sin esperar el ``busy_timeout``. Aquí las sesiones no escriben: envían
+una intención (una función ``fn(conn, ...)``) a la cola de
+``EscritorSerializado`` y esperan su resultado.
+
+Un hilo escritor vacía la cola en grupos de hasta ``TAMANO_GRUPO``
+intenciones: abre ``BEGIN IMMEDIATE`` (toma el candado de escritura antes
+de leer nada), ejecuta cada intención dentro de su propio SAVEPOINT y
+confirma el grupo con un solo COMMIT. Una intención que falla se deshace
+sola y su error vuelve a quien la envió sin afectar al resto del grupo.
+Si el candado lo tiene otro proceso (el gateway IoT, una carga por línea
+de comandos, otro servidor de Streamlit) el grupo entero se reintenta con
+espera exponencial y jitter; los resultados solo se entregan tras el
+COMMIT.
+
+Las intenciones pueden usar ``pool.transaccion()`` internamente: en el
+hilo escritor se integran en la transacción del grupo. Las funciones de
+``mantenimiento`` (índices y agregados derivados, como el de linaje)
+no alargan esa transacción: corren después de entregar los resultados,
+solo con la cola vacía, una tanda acotada por transacción propia, y
+vuelven a correr mientras avancen y nadie espere. Con la cola quieta
+corren también cada ``intervalo_mantenimiento`` segundos, para recoger
+lo que escriben otros procesos. Cada una devuelve cuánto avanzó (0 = al
+día); si falla se deshace sola y se reintenta en la próxima vuelta.
+
+Con el perfilador activo cada intención lleva la página, la sección y la
+ejecución de quien la envió: lo que ejecuta en el hilo escritor se suma
+a esa ejecución, y el BEGIN y el COMMIT del grupo a la de cada sesión que
+esperó por ellos.
+
+Uso desde línea de comandos::
+
+    python tps_escritor.py
+    python tps_escritor.py --sesiones 40 --por-sesion 25 --directo
+"""
+import argparse
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from tps_codigos import siguiente_codigo
+from tps_db import DB_PATH, PoolConexiones
+from tps_perfilado import PERFILADOR
+
+TAMANO_GRUPO = 64
+REINTENTOS = 8
+ESPERA_BASE = 0.02
+ESPERA_MAXIMA = 1.0
+# Segundos que una sesión espera el resultado de su intención
+TIMEOUT_RESULTADO = 60.0
+# Segundos de cola quieta entre vueltas de mantenimiento
+INTERVALO_MANTENIMIENTO = 5.0
+# Contexto de perfilado de las sentencias del grupo (BEGIN, COMMIT); ver Perfilador.en_contexto
+_CONTEXTO_GRUPO = (None, '', '')
+
+
+def bloqueo(error):
+    """True si ``error`` es un candado de SQLite ocupado (reintentable)."""
+    mensaje = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in mensaje or 'busy' in mensaje)
+
+
+class _Intencion:
+    __slots__ = ('nombre', 'fn', 'args', 'kwargs', 'futuro', 'encolada', 'perfil', 'mediciones')
+
+    def __init__(self, nombre, fn, args, kwargs):
+        self.nombre = nombre
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.futuro = Future()
+        self.encolada = time.perf_counter()
+        # Ejecución perfilada de la sesión que la envía (None sin perfilado) y lo medido en el hilo escritor
+        self.perfil = PERFILADOR.contexto()
+        self.mediciones = {}
+
+
+class EscritorSerializado:
+    def __init__(self, pool, tamano_grupo=TAMANO_GRUPO, reintentos=REINTENTOS, espera_base=ESPERA_BASE,
+                 espera_maxima=ESPERA_MAXIMA, mantenimiento=(), intervalo_mantenimiento=INTERVALO_MANTENIMIENTO):
+        self.pool = pool
+        self.mantenimiento = tuple(mantenimiento)
+        self.intervalo_mantenimiento = intervalo_mantenimiento
+        self.tamano_grupo = tamano_grupo
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.cola = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._stats = {'intenciones': 0, 'fallidas': 0, 'grupos': 0, 'grupo_maximo': 0, 'reintentos': 0,
+                       'grupos_fallidos': 0, 'mantenimientos': 0, 'mantenimiento_fallido': 0,
+                       'mantenimiento_s': 0.0, 'espera_cola_s': 0.0, 'espera_cola_max_s': 0.0, 'transaccion_s': 0.0}
+        self._hilo = threading.Thread(target=self._bucle, name='tps-escritor', daemon=True)
+        self._hilo.start()
+
+    # --- Sesiones ---
+
+    def enviar(self, fn, *args, nombre=None, **kwargs):
+        """Encola ``fn(conn, *args, **kwargs)`` y devuelve su Future."""
+        if self._hilo is None:
+            raise RuntimeError("El escritor está cerrado")
+        intencion = _Intencion(nombre or getattr(fn, '__name__', 'intencion'), fn, args, kwargs)
+        self.cola.put(intencion)
+        return intencion.futuro
+
+    def ejecutar(self, fn, *args, nombre=None, timeout=TIMEOUT_RESULTADO, **kwargs):
+        """Como ``enviar`` pero espera el COMMIT y devuelve el resultado (o relanza su error)."""
+        if threading.current_thread() is self._hilo:
+            # Una intención que envía otra: ya está dentro de la transacción del grupo
+            with self.pool.conexion() as conn:
+                return fn(conn, *args, **kwargs)
+        return self.enviar(fn, *args, nombre=nombre, **kwargs).result(timeout)
+
+    # --- Hilo escritor ---
+
+    def _bucle(self):
+        # Tras cada grupo, y cada intervalo con la cola quieta, queda mantenimiento por hacer
+        pendiente = False
+        while True:
+            try:
+                if pendiente:
+                    intencion = self.cola.get_nowait()
+                else:
+                    intencion = self.cola.get(timeout=self.intervalo_mantenimiento if self.mantenimiento else None)
+            except queue.Empty:
+                # Nadie espera: una tanda de cada función, y otra vuelta mientras alguna avance
+                pendiente = self._mantener()
+                continue
+            if intencion is None:
+                return
+            grupo = [intencion]
+            fin = False
+            while len(grupo) < self.tamano_grupo:
+                try:
+                    intencion = self.cola.get_nowait()
+                except queue.Empty:
+                    break
+                if intencion is None:
+                    fin = True
+                    break
+                grupo.append(intencion)
+            self._procesar(grupo)
+            if fin:
+                return
+            pendiente = bool(self.mantenimiento)
+
+    def _procesar(self, grupo):
+        inicio = time.perf_counter()
+        comunes = {}
+        for intento in range(self.reintentos + 1):
+            try:
+                resultados = self._transaccion(grupo, comunes)
+                break
+            except Exception as e:
+                if bloqueo(e) and intento < self.reintentos:
+                    with self._lock:
+                        self._stats['reintentos'] += 1
+                    time.sleep(min(self.espera_maxima, self.espera_base * 2 ** intento) * random.uniform(0.5, 1.5))
+                    continue
+                with self._lock:
+                    self._stats['grupos_fallidos'] += 1
+                resultados = [(None, e)] * len(grupo)
+                break
+
+        fin = time.perf_counter()
+        with self._lock:
+            s = self._stats
+            s['grupos'] += 1
+            s['grupo_maximo'] = max(s['grupo_maximo'], len(grupo))
+            s['transaccion_s'] += fin - inicio
+            for intencion, (_, error) in zip(grupo, resultados):
+                espera = inicio - intencion.encolada
+                s['intenciones'] += 1
+                s['fallidas'] += error is not None
+                s['espera_cola_s'] += espera
+                s['espera_cola_max_s'] = max(s['espera_cola_max_s'], espera)
+        # Antes de entregar el resultado: quien espera en ejecutar() aún no terminó su ejecución
+        for intencion in grupo:
+            if intencion.perfil is not None:
+                PERFILADOR.fusionar(intencion.perfil, intencion.mediciones)
+                PERFILADOR.fusionar(intencion.perfil, comunes, reatribuir=True)
+        for intencion, (resultado, error) in zip(grupo, resultados):
+            if error is None:
+                intencion.futuro.set_result(resultado)
+            else:
+                intencion.futuro.set_exception(error)
+
+    def _transaccion(self, grupo, comunes):
+        """Ejecuta el grupo en una transacción; devuelve (resultado, error) por intención.
+
+        Con perfilado, lo de cada intención se mide en sus ``mediciones`` y
+        lo del grupo en ``comunes``.
+        """
+        resultados = []
+        perfilado = any(intencion.perfil is not None for intencion in grupo)
+        with PERFILADOR.en_contexto(_CONTEXTO_GRUPO if perfilado else None, comunes), \
+                self.pool.transaccion() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for intencion in grupo:
+                with PERFILADOR.en_contexto(intencion.perfil, intencion.mediciones):
+                    conn.execute("SAVEPOINT intencion")
+                    try:
+                        resultados.append((intencion.fn(conn, *intencion.args, **intencion.kwargs), None))
+                    except Exception as e:
+                        if bloqueo(e):
+                            # Deshace el grupo entero para reintentarlo
+                            raise
+                        conn.execute("ROLLBACK TO intencion")
+                        resultados.append((None, e))
+                    conn.execute("RELEASE intencion")
+        return resultados
+
+    def _mantener(self):
+        """Una tanda de cada función de mantenimiento, cada una en su transacción; True si alguna avanzó."""
+        avanzo = False
+        for fn in self.mantenimiento:
+            if not self.cola.empty():
+                # Llegó una intención: primero ella, el mantenimiento sigue después
+                return True
+            inicio = time.perf_counter()
+            try:
+                with self.pool.transaccion() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    avanzo |= bool(fn(conn))
+            except Exception:
+                # Candado ajeno u otro error: la tanda se deshizo y se reintenta en la próxima vuelta
+                with self._lock:
+                    self._stats['mantenimiento_fallido'] += 1
+                continue
+            finally:
+                with self._lock:
+                    self._stats['mantenimiento_s'] += time.perf_counter() - inicio
+            with self._lock:
+                self._stats['mantenimientos'] += 1
+        return avanzo
+
+    # --- Estado ---
+
+    def metricas(self):
+        with self._lock:
+            s = dict(self._stats)
+        return dict(
+            s,
+            en_cola=self.cola.qsize(),
+            espera_cola_media_ms=round(s['espera_cola_s'] / s['intenciones'] * 1000.0, 2) if s['intenciones'] else 0.0,
+            espera_cola_max_ms=round(s['espera_cola_max_s'] * 1000.0, 2),
+            grupo_medio=round(s['intenciones'] / s['grupos'], 2) if s['grupos'] else 0.0,
+            transaccion_media_ms=round(s['transaccion_s'] / s['grupos'] * 1000.0, 2) if s['grupos'] else 0.0,
+        )
+
+    def cerrar(self):
+        """Procesa lo ya encolado y detiene el hilo escritor."""
+        if self._hilo is None:
+            return
+        self.cola.put(None)
+        self._hilo.join()
+        self._hilo = None
+
+
+def _registrar_inspeccion(conn, lote, inspector):
+    # Lee antes de escribir, como los formularios que validan el lote
+    conn.execute("SELECT estado_lote FROM lotes_produccion WHERE codigo_lote = ?", (lote,)).fetchone()
+    codigo = siguiente_codigo(conn, 'inspecciones_visuales')
+    conn.execute('''
+        INSERT INTO inspecciones_visuales (codigo_inspeccion, codigo_lote, inspector, porcentaje_conformidad, resultado_visual)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (codigo, lote, inspector, 95.0, 'APROBADO'))
+    return codigo
+
+
+def simular_sesiones(pool, sesiones, por_sesion, escritor=None):
+    """Hilos que registran inspecciones a la vez; devuelve (latencias en s, errores).
+
+    Sin ``escritor`` cada hilo escribe en su propia transacción, como las
+    páginas antes de la cola.
+    """
+    with pool.conexion() as conn:
+        lotes = [fila[0] for fila in conn.execute("SELECT codigo_lote FROM lotes_produccion LIMIT 100")]
+    if not lotes:
+        raise ValueError("No hay lotes para simular inspecciones")
+    latencias, errores = [], []
+    barrera = threading.Barrier(sesiones)
+
+    def sesion(numero):
+        barrera.wait()
+        for i in range(por_sesion):
+            lote = lotes[(numero + i) % len(lotes)]
+            inicio = time.perf_counter()
+            try:
+                if escritor is None:
+                    with pool.transaccion() as conn:
+                        _registrar_inspeccion(conn, lote, f"Sesión {numero}")
+                else:
+                    escritor.ejecutar(_registrar_inspeccion, lote, f"Sesión {numero}")
+                latencias.append(time.perf_counter() - inicio)
+            except Exception as e:
+                errores.append(f"{type(e).__name__}: {e}")
+
+    hilos = [threading.Thread(target=sesion, args=(n,)) for n in range(sesiones)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias, errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escritor único del TPS: prueba de carga con sesiones concurrentes")
+    parser.add_argument('--sesiones', type=int, default=20, help="Hilos que escriben a la vez")
+    parser.add_argument('--por-sesion', type=int, default=20, help="Inspecciones registradas por cada hilo")
+    parser.add_argument('--directo', action='store_true',
+                        help="Escribir cada hilo en su propia transacción, sin la cola (para comparar)")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    # Importación local: tps_migraciones importa módulos que usan tps_codigos
+    from tps_migraciones import aplicar_migraciones
+
+    pool = PoolConexiones(args.db, max_conexiones=args.sesiones + 1)
+    escritor = None
+    try:
+        aplicar_migraciones(pool)
+        escritor = None if args.directo else EscritorSerializado(pool)
+        inicio = time.perf_counter()
+        latencias, errores = simular_sesiones(pool, args.sesiones, args.por_sesion, escritor)
+        segundos = time.perf_counter() - inicio
+    except ValueError as e:
+        # Base sin lotes: no hay a qué asociar las inspecciones
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        if escritor is not None:
+            escritor.cerrar()
+        pool.cerrar()
+
+    modo = "directo" if args.directo else "escritor único"
+    print(f"{modo}: {len(latencias):,} escrituras en {segundos:.2f}s ({len(latencias) / segundos:,.0f}/s), "
+          f"{len(errores)} errores")
+    if latencias:
+        # Importación local: solo el reporte de la prueba de carga usa NumPy
+        import numpy as np
+        ms = np.array(latencias) * 1000.0
+        print(f"  latencia p50 {np.percentile(ms, 50):.1f} ms | p95 {np.percentile(ms, 95):.1f} ms | "
+              f"p99 {np.percentile(ms, 99):.1f} ms | máx {ms.max():.1f} ms")
+    if escritor is not None:
+        m = escritor.metricas()
+        print(f"  grupos {m['grupos']:,} (medio {m['grupo_medio']}, máx {m['grupo_maximo']}) | "
+              f"reintentos {m['reintentos']} | transacción media {m['transaccion_media_ms']} ms")
+    for error in sorted(set(errores))[:5]:
+        print(f"  ❌ {error}")
+    return 0 if not errores else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
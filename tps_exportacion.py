@@ -0,0 +1,243 @@
+"""Exportación columnar (Parquet) de los históricos de calidad.
+
+Lee cada tabla por bloques de ``FILAS_POR_BLOQUE`` filas con un cursor
+ordenado por id y escribe un dataset Parquet particionado al estilo
+Hive por producto y mes::
+
+    destino/lecturas_sensores/codigo_producto=PROD-001/mes=2025-03/parte-000000000001.parquet
+
+Las columnas conservan los tipos declarados en SQLite (las fechas van
+como texto, tal como se guardan). La memoria queda acotada por
+``FILAS_EN_MEMORIA``: al superarla se vuelcan como grupos de filas los
+búferes de todas las particiones abiertas.
+
+El manifiesto ``_exportacion.json`` del destino guarda el último id
+exportado por tabla; en modo incremental (el predeterminado) solo se
+exportan las filas añadidas desde la corrida anterior, en archivos
+nuevos. Cada corrida escribe primero en un directorio temporal y mueve
+los archivos a su sitio al terminar la tabla, así que un fallo no deja
+partes a medias.
+
+Uso desde línea de comandos::
+
+    python tps_exportacion.py --destino exportacion/
+    python tps_exportacion.py --destino exportacion/ --tablas lecturas_sensores --completa
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from typing import NamedTuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tps_db import DB_PATH, PoolConexiones
+from tps_migraciones import aplicar_migraciones
+from tps_series import tablas_lecturas
+
+# Tabla exportable -> columna de fecha que define la partición mensual
+TABLAS_EXPORTABLES = {
+    'inspecciones_visuales': 'fecha_inspeccion',
+    'lecturas_sensores': 'timestamp_lectura',
+    'pruebas_fisicoquimicas': 'fecha_prueba',
+    'informes_calidad': 'fecha_informe',
+}
+
+FILAS_POR_BLOQUE = 50000
+FILAS_EN_MEMORIA = 250000
+MANIFIESTO = '_exportacion.json'
+
+# Tipo declarado en SQLite -> tipo Arrow (lo no listado se exporta como texto)
+TIPOS_ARROW = {
+    'INTEGER': pa.int64(),
+    'BOOLEAN': pa.int64(),
+    'REAL': pa.float64(),
+}
+
+
+class ResultadoExportacion(NamedTuple):
+    filas_por_tabla: dict
+    archivos: list
+    segundos: float
+
+
+def esquema_arrow(conn, tabla):
+    """Esquema Arrow de ``tabla`` a partir de sus tipos declarados."""
+    return pa.schema([(nombre, TIPOS_ARROW.get(tipo.upper(), pa.string()))
+                      for _, nombre, tipo, *_ in conn.execute(f"PRAGMA table_info({tabla})")])
+
+
+def _valor_particion(valor, vacio):
+    return re.sub(r'[^\w.-]', '_', valor) if valor else vacio
+
+
+def leer_manifiesto(destino):
+    ruta = os.path.join(destino, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {'tablas': {}}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _guardar_manifiesto(destino, manifiesto):
+    ruta = os.path.join(destino, MANIFIESTO)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(ruta + '.tmp', ruta)
+
+
+class _EscritorParticionado:
+    """Un ParquetWriter por partición, con búferes de filas que se vuelcan como grupos."""
+
+    def __init__(self, raiz, esquema, nombre_archivo, filas_en_memoria):
+        self.raiz = raiz
+        self.esquema = esquema
+        self.nombre_archivo = nombre_archivo
+        self.filas_en_memoria = filas_en_memoria
+        self.bufferes = {}
+        self.escritores = {}
+        self.en_memoria = 0
+
+    def agregar(self, particion, fila):
+        self.bufferes.setdefault(particion, []).append(fila)
+        self.en_memoria += 1
+
+    def volcar_si_lleno(self):
+        if self.en_memoria >= self.filas_en_memoria:
+            self.volcar()
+
+    def volcar(self):
+        for particion, filas in self.bufferes.items():
+            escritor = self.escritores.get(particion)
+            if escritor is None:
+                directorio = os.path.join(self.raiz, *particion)
+                os.makedirs(directorio, exist_ok=True)
+                escritor = self.escritores[particion] = pq.ParquetWriter(
+                    os.path.join(directorio, self.nombre_archivo), self.esquema, compression='zstd')
+            columnas = zip(*filas)
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self.esquema)],
+                schema=self.esquema))
+        self.bufferes.clear()
+        self.en_memoria = 0
+
+    def cerrar(self):
+        for escritor in self.escritores.values():
+            escritor.close()
+        return [os.path.relpath(os.path.join(self.raiz, *particion, self.nombre_archivo), self.raiz)
+                for particion in self.escritores]
+
+
+def exportar_tabla(conn, tabla, destino, desde_id=0, completa=False,
+                   filas_por_bloque=FILAS_POR_BLOQUE, filas_en_memoria=FILAS_EN_MEMORIA):
+    """Exporta las filas de ``tabla`` con id > ``desde_id``; devuelve (filas, último id, archivos).
+
+    Con ``completa`` se reemplaza lo exportado antes para la tabla.
+    """
+    columna_fecha = TABLAS_EXPORTABLES[tabla]
+    # Las lecturas incluyen los meses archivados (ver tps_retencion)
+    origenes = tablas_lecturas(conn) if tabla == 'lecturas_sensores' else [tabla]
+    hasta_id = max(conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {origen}").fetchone()[0] for origen in origenes)
+    if hasta_id <= desde_id and not completa:
+        return 0, desde_id, []
+
+    esquema = esquema_arrow(conn, tabla)
+    temporal = os.path.join(destino, f".tmp-{tabla}")
+    shutil.rmtree(temporal, ignore_errors=True)
+    escritor = _EscritorParticionado(temporal, esquema, f"parte-{desde_id + 1:012d}.parquet", filas_en_memoria)
+    columnas = ', '.join(f't."{campo.name}"' for campo in esquema)
+    filas = 0
+    try:
+        for origen in origenes:
+            cursor = conn.execute(f"""
+                SELECT {columnas}, lp.codigo_producto, strftime('%Y-%m', t.{columna_fecha})
+                FROM {origen} t
+                LEFT JOIN lotes_produccion lp ON lp.codigo_lote = t.codigo_lote
+                WHERE t.id > ? AND t.id <= ?
+                ORDER BY t.id
+            """, (desde_id, hasta_id))
+            try:
+                while True:
+                    bloque = cursor.fetchmany(filas_por_bloque)
+                    if not bloque:
+                        break
+                    for *fila, producto, mes in bloque:
+                        escritor.agregar((f"codigo_producto={_valor_particion(producto, 'sin_producto')}",
+                                          f"mes={_valor_particion(mes, 'sin_fecha')}"), fila)
+                    filas += len(bloque)
+                    escritor.volcar_si_lleno()
+            finally:
+                cursor.close()
+        escritor.volcar()
+    finally:
+        archivos = escritor.cerrar()
+
+    # Publicar: mover las partes del temporal a su partición definitiva
+    raiz = os.path.join(destino, tabla)
+    if completa:
+        shutil.rmtree(raiz, ignore_errors=True)
+    for archivo in archivos:
+        ruta = os.path.join(raiz, archivo)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        os.replace(os.path.join(temporal, archivo), ruta)
+    shutil.rmtree(temporal, ignore_errors=True)
+    return filas, hasta_id, [os.path.join(tabla, archivo) for archivo in archivos]
+
+
+def exportar(pool, destino, tablas=tuple(TABLAS_EXPORTABLES), completa=False,
+             filas_por_bloque=FILAS_POR_BLOQUE, filas_en_memoria=FILAS_EN_MEMORIA):
+    """Exporta ``tablas`` a ``destino``, incremental salvo con ``completa``, y actualiza el manifiesto."""
+    inicio = time.perf_counter()
+    os.makedirs(destino, exist_ok=True)
+    manifiesto = leer_manifiesto(destino)
+    filas_por_tabla = {}
+    archivos = []
+    for tabla in tablas:
+        if tabla not in TABLAS_EXPORTABLES:
+            raise ValueError(f"Tabla no exportable: {tabla}")
+        estado = manifiesto['tablas'].get(tabla, {})
+        desde_id = 0 if completa else estado.get('ultimo_id', 0)
+        with pool.conexion() as conn:
+            filas, ultimo_id, nuevos = exportar_tabla(conn, tabla, destino, desde_id, completa,
+                                                      filas_por_bloque, filas_en_memoria)
+        filas_por_tabla[tabla] = filas
+        archivos.extend(nuevos)
+        if nuevos or completa:
+            manifiesto['tablas'][tabla] = {
+                'ultimo_id': ultimo_id,
+                'filas': filas + (0 if completa else estado.get('filas', 0)),
+                'fecha': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            _guardar_manifiesto(destino, manifiesto)
+    return ResultadoExportacion(filas_por_tabla, archivos, time.perf_counter() - inicio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportación Parquet particionada de los históricos TPS")
+    parser.add_argument('--destino', required=True, help="Directorio del dataset exportado")
+    parser.add_argument('--tablas', nargs='+', choices=list(TABLAS_EXPORTABLES), default=list(TABLAS_EXPORTABLES))
+    parser.add_argument('--completa', action='store_true', help="Reexportar todo en lugar de solo las filas nuevas")
+    parser.add_argument('--filas-por-bloque', type=int, default=FILAS_POR_BLOQUE)
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        resultado = exportar(pool, args.destino, args.tablas, args.completa, args.filas_por_bloque)
+    finally:
+        pool.cerrar()
+
+    print(f"Exportado en {resultado.segundos:.1f}s a {args.destino} ({len(resultado.archivos)} archivos):")
+    for tabla, total in resultado.filas_por_tabla.items():
+        print(f"  - {tabla}: {total:,} filas nuevas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
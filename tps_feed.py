@@ -0,0 +1,115 @@
+"""Feed de cambios para el monitoreo en vivo.
+
+Cada suscriptor (una sesión de la app) recuerda hasta dónde leyó y en
+cada tick hace primero una lectura por clave primaria de
+``generaciones_tablas``: si la tabla no cambió, el tick termina ahí.
+
+* Lecturas de sensores: solo se insertan, así que basta con traer las
+  filas con ``id`` mayor al último visto.
+* Alertas: además cambian de estado (se resuelven, se extienden los
+  episodios). Los triggers de la migración 11 anotan cada alta,
+  modificación o baja en ``registro_cambios`` y el suscriptor relee solo
+  las alertas anotadas después de su último cambio visto.
+
+``registro_cambios`` se poda sola y conserva los últimos
+``CAMBIOS_CONSERVADOS`` cambios; un suscriptor que quedó más atrás
+recarga su vista completa.
+"""
+from collections import deque
+
+from tps_cache import leer_generaciones
+
+CAMBIOS_CONSERVADOS = 10000
+# Tablas cuyos cambios se anotan en registro_cambios
+TABLAS_CON_REGISTRO = ('alertas_automaticas',)
+
+COLUMNAS_LECTURA = ('id', 'codigo_lote', 'timestamp_lectura', 'sensor_temperatura', 'sensor_peso',
+                    'sensor_humedad', 'sensor_ph', 'sensor_brix', 'alerta_generada')
+
+CONSULTA_ALERTAS = """
+    SELECT aa.*, pa.nombre_producto, lp.cantidad_kg
+    FROM alertas_automaticas aa
+    JOIN lotes_produccion lp ON aa.codigo_lote = lp.codigo_lote
+    JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+    WHERE {filtro}
+"""
+
+
+class FeedLecturas:
+    """Las ``capacidad`` lecturas más recientes, mantenidas con lecturas incrementales por id."""
+
+    def __init__(self, capacidad=200):
+        self.filas = deque(maxlen=capacidad)
+        self.ultimo_id = None
+        self._generacion = None
+
+    def actualizar(self, conn):
+        """Trae las lecturas nuevas; devuelve cuántas llegaron desde el último tick."""
+        generacion = leer_generaciones(conn, ('lecturas_sensores',))
+        if generacion == self._generacion:
+            return 0
+        columnas = ', '.join(COLUMNAS_LECTURA)
+        if self.ultimo_id is None:
+            nuevas = conn.execute(f"SELECT {columnas} FROM lecturas_sensores ORDER BY id DESC LIMIT ?",
+                                  (self.filas.maxlen,)).fetchall()
+        else:
+            nuevas = conn.execute(f"SELECT {columnas} FROM lecturas_sensores WHERE id > ? ORDER BY id DESC LIMIT ?",
+                                  (self.ultimo_id, self.filas.maxlen)).fetchall()
+        nuevas.reverse()
+        self.filas.extend(nuevas)
+        if nuevas:
+            self.ultimo_id = nuevas[-1][0]
+        elif self.ultimo_id is None:
+            self.ultimo_id = 0
+        self._generacion = generacion
+        return len(nuevas)
+
+    def ultima(self):
+        """Dict columna -> valor de la lectura más reciente, o None."""
+        return dict(zip(COLUMNAS_LECTURA, self.filas[-1])) if self.filas else None
+
+
+class FeedAlertasActivas:
+    """Alertas ACTIVA por id, actualizadas desde registro_cambios."""
+
+    def __init__(self):
+        self.alertas = {}
+        self.columnas = []
+        self.ultimo_cambio = None
+        self._generacion = None
+
+    def _leer(self, conn, filtro, params=()):
+        cursor = conn.execute(CONSULTA_ALERTAS.format(filtro=filtro), params)
+        self.columnas = [d[0] for d in cursor.description]
+        return cursor.fetchall()
+
+    def actualizar(self, conn):
+        """Aplica los cambios pendientes; devuelve True si la vista cambió."""
+        generacion = leer_generaciones(conn, ('alertas_automaticas',))
+        if generacion == self._generacion:
+            return False
+        minimo, maximo = conn.execute("SELECT MIN(id), MAX(id) FROM registro_cambios").fetchone()
+        if self.ultimo_cambio is None or (minimo is not None and self.ultimo_cambio < minimo - 1):
+            # Primera lectura, o la poda alcanzó al suscriptor: vista completa
+            self.alertas = {fila[0]: fila for fila in self._leer(conn, "aa.estado_alerta = 'ACTIVA'")}
+        else:
+            ids = [fila[0] for fila in conn.execute(
+                "SELECT DISTINCT fila_id FROM registro_cambios WHERE id > ? AND id <= ? AND tabla = 'alertas_automaticas'",
+                (self.ultimo_cambio, maximo or 0))]
+            if ids:
+                actuales = {fila[0]: fila for fila in self._leer(
+                    conn, f"aa.id IN ({', '.join('?' for _ in ids)}) AND aa.estado_alerta = 'ACTIVA'", ids)}
+                for id_alerta in ids:
+                    if id_alerta in actuales:
+                        self.alertas[id_alerta] = actuales[id_alerta]
+                    else:
+                        self.alertas.pop(id_alerta, None)
+        self.ultimo_cambio = maximo or 0
+        self._generacion = generacion
+        return True
+
+    def recientes(self, limite=None):
+        """Alertas activas como dicts, la más reciente primero."""
+        filas = sorted(self.alertas.values(), key=lambda fila: (fila[self.columnas.index('fecha_alerta')] or '', fila[0]),
+                       reverse=True)
+        return [dict(zip(self.columnas, fila)) for fila in filas[:limite]]
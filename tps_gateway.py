@@ -0,0 +1,557 @@
+"""Gateway IoT asíncrono que alimenta ``lecturas_sensores``.
+
+Acepta lecturas de muchos dispositivos a la vez por dos vías locales:
+
+* TCP, protocolo de líneas: un objeto JSON por línea (mismo formato que
+  el NDJSON de ``tps_ingesta``), con ``dispositivo`` opcional; sin él se
+  usa la dirección del par. Cada línea rechazada se contesta con
+  ``ERR <número de línea> <motivo[,motivo...]>`` cuando se escribe su lote.
+* HTTP: ``POST /lecturas`` con un objeto, un arreglo JSON o NDJSON; la
+  respuesta llega tras el COMMIT con las insertadas y los motivos de cada
+  rechazada. ``GET /metricas`` devuelve las métricas en JSON y
+  ``GET /salud`` un 200.
+
+Los canales que no llegan se guardan NULL; una lectura solo con
+``codigo_lote`` y ``temperatura`` es válida.
+
+Las lecturas pasan por una cola acotada. Con la cola llena el lector TCP
+deja de leer (el control de flujo de TCP frena al dispositivo) y HTTP
+espera hasta ``ESPERA_HTTP`` segundos antes de responder 503. Un único
+escritor vacía la cola en lotes de hasta ``TAMANO_LOTE`` lecturas o cada
+``INTERVALO_FLUSH`` segundos y los ingesta con ``tps_ingesta`` en un
+hilo, una transacción por lote, con validación y alertas incluidas. Si
+otro proceso tiene el candado el lote se reintenta con espera
+exponencial; si falla por otra causa se parte en mitades hasta aislar
+las lecturas culpables, y solo esas se rechazan (``error_escritura``). Los
+rollups, el resumen por lote y las cartas de control los pone al día el
+mismo escritor cada ``INTERVALO_DERIVADOS`` segundos, entre lotes.
+
+Las métricas incluyen profundidad de la cola, esperas por
+contrapresión, rendimiento del escritor y, por dispositivo, lecturas
+recibidas y retraso (desde el timestamp del dispositivo y desde la
+recepción hasta el COMMIT).
+
+Uso desde línea de comandos::
+
+    python tps_gateway.py
+    python tps_gateway.py --simular 50 --intervalo 0.2
+    echo '{"codigo_lote": "LT-ESP-20241201", "temperatura": 4.2}' | nc localhost 7070
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import signal
+import sys
+import time
+
+from tps_cache import leer_generaciones
+from tps_db import DB_PATH, PoolConexiones
+from tps_escritor import ESPERA_BASE, ESPERA_MAXIMA, REINTENTOS, bloqueo
+from tps_ingesta import MAX_EJEMPLOS_RECHAZO, ResultadoIngesta, cargar_contexto, ingestar_lecturas
+from tps_migraciones import aplicar_migraciones
+from tps_semilla import simular_lectura_sensores
+from tps_series import poner_al_dia
+
+HOST = '127.0.0.1'
+PUERTO_TCP = 7070
+PUERTO_HTTP = 7071
+TAMANO_COLA = 50000
+TAMANO_LOTE = 2000
+INTERVALO_FLUSH = 0.5
+# Segundos entre puestas al día de rollups, resumen y cartas de control
+INTERVALO_DERIVADOS = 5.0
+ESPERA_HTTP = 2.0
+# Los umbrales no tienen contador de generación: se releen al menos con esta frecuencia
+TTL_CONTEXTO = 30.0
+MAX_CUERPO_HTTP = 10 * 1024 * 1024
+
+ESTADOS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+
+def _ahora_texto():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _epoch(texto):
+    """Segundos UTC de un timestamp 'YYYY-MM-DD HH:MM:SS' (None si no se entiende)."""
+    try:
+        instante = datetime.datetime.fromisoformat(str(texto))
+    except ValueError:
+        return None
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=datetime.timezone.utc)
+    return instante.timestamp()
+
+
+class _Respuesta:
+    """Resultado por lectura de un POST /lecturas; completo cuando el escritor resolvió todas."""
+
+    def __init__(self):
+        self.rechazos = []
+        self.resueltas = 0
+        self.esperadas = None
+        self.lista = asyncio.Event()
+
+    def aviso(self, indice):
+        def avisar(motivos):
+            if motivos:
+                self.rechazos.append({'indice': indice, 'motivos': list(motivos)})
+            self.resueltas += 1
+            if self.esperadas is not None and self.resueltas >= self.esperadas:
+                self.lista.set()
+        return avisar
+
+    async def esperar(self, esperadas):
+        self.esperadas = esperadas
+        if self.resueltas < esperadas:
+            await self.lista.wait()
+        return sorted(self.rechazos, key=lambda rechazo: rechazo['indice'])
+
+
+class Gateway:
+    def __init__(self, pool, tamano_cola=TAMANO_COLA, tamano_lote=TAMANO_LOTE, intervalo_flush=INTERVALO_FLUSH,
+                 evaluar_alertas=True, intervalo_derivados=INTERVALO_DERIVADOS):
+        self.pool = pool
+        self.tamano_lote = tamano_lote
+        self.intervalo_flush = intervalo_flush
+        self.intervalo_derivados = intervalo_derivados
+        self._proximos_derivados = time.monotonic() + intervalo_derivados
+        self.evaluar_alertas = evaluar_alertas
+        self.cola = asyncio.Queue(maxsize=tamano_cola)
+        self.inicio = time.time()
+        self._contexto = None
+        self._contexto_clave = None
+        self._contexto_instante = 0.0
+        self._cola = {'maxima': 0, 'esperas_contrapresion': 0, 'rechazos_http': 0}
+        self._escritura = {'lotes': 0, 'filas_insertadas': 0, 'filas_rechazadas': 0, 'alertas_generadas': 0,
+                           'segundos': 0.0, 'ultimo_lote_ms': 0.0, 'errores': 0, 'ultimo_error': None,
+                           'derivados_lecturas': 0, 'derivados_s': 0.0}
+        self._dispositivos = {}
+        self._conexiones = set()
+
+    # --- Recepción ---
+
+    def _dispositivo(self, nombre):
+        return self._dispositivos.setdefault(nombre, {
+            'recibidas': 0, 'escritas': 0, 'rechazadas': 0, 'ultimo_rechazo': None, 'ultima_recepcion': None,
+            'lag_ms': None, 'lag_max_ms': 0.0, 'en_cola_ms': None,
+        })
+
+    async def recibir(self, registro, dispositivo, espera=None, aviso=None):
+        """Encola una lectura; espera mientras la cola esté llena.
+
+        Con ``espera`` (segundos) devuelve False si la cola sigue llena al
+        vencer el plazo. ``aviso`` se llama tras escribir el lote con los
+        motivos de rechazo de la lectura (vacío si se insertó).
+        """
+        registro.setdefault('timestamp_lectura', _ahora_texto())
+        elemento = (registro, dispositivo, time.time(), _epoch(registro['timestamp_lectura']), aviso)
+        if self.cola.full():
+            self._cola['esperas_contrapresion'] += 1
+        try:
+            await asyncio.wait_for(self.cola.put(elemento), espera)
+        except asyncio.TimeoutError:
+            return False
+        self._cola['maxima'] = max(self._cola['maxima'], self.cola.qsize())
+        metricas = self._dispositivo(dispositivo)
+        metricas['recibidas'] += 1
+        metricas['ultima_recepcion'] = _ahora_texto()
+        return True
+
+    async def atender_tcp(self, reader, writer):
+        par = writer.get_extra_info('peername')
+        origen = f"{par[0]}:{par[1]}" if par else 'tcp'
+        self._conexiones.add(asyncio.current_task())
+
+        def aviso(numero):
+            def avisar(motivos):
+                if motivos and not writer.is_closing():
+                    writer.write(f"ERR {numero} {','.join(motivos)}\n".encode())
+            return avisar
+
+        numero = 0
+        try:
+            async for linea in reader:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                numero += 1
+                try:
+                    registro = json.loads(linea)
+                    if not isinstance(registro, dict):
+                        raise ValueError("se esperaba un objeto JSON")
+                except ValueError as e:
+                    writer.write(f"ERR {numero} json_invalido: {e}\n".encode())
+                    continue
+                await self.recibir(registro, str(registro.pop('dispositivo', None) or origen), aviso=aviso(numero))
+        except (ConnectionError, ValueError):
+            # ValueError: línea mayor al límite del StreamReader
+            pass
+        except asyncio.CancelledError:
+            # Cierre del gateway: las lecturas aún no encoladas se descartan
+            pass
+        finally:
+            self._conexiones.discard(asyncio.current_task())
+            writer.close()
+
+    async def atender_http(self, reader, writer):
+        self._conexiones.add(asyncio.current_task())
+        try:
+            estado, cuerpo = await self._responder_http(reader, writer.get_extra_info('peername'))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            estado, cuerpo = 400, {'error': 'solicitud no válida'}
+        except asyncio.CancelledError:
+            estado, cuerpo = 503, {'error': "gateway detenido"}
+        finally:
+            self._conexiones.discard(asyncio.current_task())
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode()
+        cabeceras = [f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}", "Content-Type: application/json; charset=utf-8",
+                     f"Content-Length: {len(datos)}", "Connection: close"]
+        if estado == 503:
+            cabeceras.append("Retry-After: 1")
+        try:
+            writer.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode() + datos)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _responder_http(self, reader, par):
+        metodo, ruta, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+        cabeceras = {}
+        while True:
+            linea = (await reader.readline()).decode('latin-1').strip()
+            if not linea:
+                break
+            nombre, _, valor = linea.partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        if metodo == 'GET' and ruta == '/metricas':
+            return 200, self.metricas()
+        if metodo == 'GET' and ruta == '/salud':
+            return 200, {'estado': 'ok'}
+        if metodo != 'POST' or ruta != '/lecturas':
+            return 404, {'error': f"{metodo} {ruta} no existe"}
+
+        largo = int(cabeceras.get('content-length', 0))
+        if largo > MAX_CUERPO_HTTP:
+            return 413, {'error': f"cuerpo mayor a {MAX_CUERPO_HTTP} bytes"}
+        texto = (await reader.readexactly(largo)).decode('utf-8')
+        try:
+            datos = json.loads(texto)
+            registros = datos if isinstance(datos, list) else [datos]
+        except ValueError:
+            registros = [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+        if not all(isinstance(r, dict) for r in registros):
+            return 400, {'error': "se esperaban objetos JSON"}
+
+        origen = cabeceras.get('x-dispositivo') or (f"{par[0]}:{par[1]}" if par else 'http')
+        respuesta = _Respuesta()
+        aceptadas = 0
+        for indice, registro in enumerate(registros):
+            if not await self.recibir(registro, str(registro.pop('dispositivo', None) or origen), ESPERA_HTTP,
+                                      respuesta.aviso(indice)):
+                self._cola['rechazos_http'] += 1
+                return 503, {'error': "cola llena, reintente", 'aceptadas': aceptadas}
+            aceptadas += 1
+        # Se responde tras el COMMIT, con el motivo de cada lectura rechazada ('indice' en el envío, desde 0)
+        rechazadas = await respuesta.esperar(aceptadas)
+        return 200, {'aceptadas': aceptadas, 'insertadas': aceptadas - len(rechazadas), 'rechazadas': rechazadas}
+
+    # --- Escritura ---
+
+    def _contexto_vigente(self):
+        """Contexto de ingesta reutilizado mientras no cambien los lotes ni venza el TTL."""
+        with self.pool.conexion() as conn:
+            clave = leer_generaciones(conn, ('lotes_produccion',))
+            if (self._contexto is None or clave != self._contexto_clave
+                    or time.monotonic() - self._contexto_instante > TTL_CONTEXTO):
+                self._contexto = cargar_contexto(conn, self.evaluar_alertas)
+                self._contexto_clave = clave
+                self._contexto_instante = time.monotonic()
+        return self._contexto
+
+    def _escribir(self, lote):
+        return ingestar_lecturas(self.pool, [elemento[0] for elemento in lote], tamano_bloque=len(lote),
+                                 evaluar_alertas=self.evaluar_alertas, contexto=self._contexto_vigente(),
+                                 detallar_rechazos=True)
+
+    def _escribir_con_reintentos(self, lote):
+        """``_escribir`` reintentando con espera exponencial y jitter mientras el candado esté ocupado."""
+        for intento in range(REINTENTOS):
+            try:
+                return self._escribir(lote)
+            except Exception as e:
+                if not bloqueo(e) or intento == REINTENTOS - 1:
+                    raise
+                time.sleep(min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento) * random.uniform(0.5, 1.5))
+
+    def _escribir_aislando(self, lote):
+        """Escribe el lote; si falla sin ser un candado, lo parte en mitades hasta aislar las lecturas culpables.
+
+        Devuelve ``(resultado, errores)``: las posiciones de ``resultado.rechazos``
+        son relativas a ``lote`` e incluyen las lecturas descartadas, con
+        motivo ``error_escritura``; ``errores`` lista los errores que las
+        descartaron. Con el candado agotado se descarta el lote entero.
+        """
+        try:
+            return self._escribir_con_reintentos(lote), []
+        except Exception as e:
+            # El contexto se relee: la transacción fallida pudo dejarlo a medias
+            self._contexto = None
+            if len(lote) == 1 or bloqueo(e):
+                # Un candado que no se libera no depende de las lecturas: partir no serviría
+                return ResultadoIngesta(len(lote), 0, len(lote), 0.0, {'error_escritura': len(lote)},
+                                        [elemento[0] for elemento in lote][:MAX_EJEMPLOS_RECHAZO],
+                                        rechazos=[(i, ['error_escritura']) for i in range(len(lote))]), [e]
+        mitad = len(lote) // 2
+        primera, errores_primera = self._escribir_aislando(lote[:mitad])
+        segunda, errores_segunda = self._escribir_aislando(lote[mitad:])
+        motivos = dict(primera.rechazos_por_motivo)
+        for motivo, total in segunda.rechazos_por_motivo.items():
+            motivos[motivo] = motivos.get(motivo, 0) + total
+        return ResultadoIngesta(
+            filas_leidas=primera.filas_leidas + segunda.filas_leidas,
+            filas_insertadas=primera.filas_insertadas + segunda.filas_insertadas,
+            filas_rechazadas=primera.filas_rechazadas + segunda.filas_rechazadas,
+            segundos=primera.segundos + segunda.segundos,
+            rechazos_por_motivo=motivos,
+            ejemplos_rechazo=primera.ejemplos_rechazo + segunda.ejemplos_rechazo,
+            alertas_generadas=primera.alertas_generadas + segunda.alertas_generadas,
+            rechazos=primera.rechazos + [(mitad + posicion, m) for posicion, m in segunda.rechazos],
+        ), errores_primera + errores_segunda
+
+    async def escritor(self):
+        """Único escritor: vacía la cola en lotes hasta encontrar el marcador de fin (None).
+
+        Entre lotes, y también con la cola vacía, pone al día los derivados
+        cada ``intervalo_derivados`` segundos; al terminar, una última vez.
+        """
+        fin = False
+        while not fin:
+            try:
+                elemento = await asyncio.wait_for(self.cola.get(), max(0.0, self._proximos_derivados - time.monotonic()))
+            except asyncio.TimeoutError:
+                await self._poner_al_dia()
+                continue
+            if elemento is None:
+                self.cola.task_done()
+                break
+            lote = [elemento]
+            limite = time.monotonic() + self.intervalo_flush
+            while len(lote) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    elemento = await asyncio.wait_for(self.cola.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                if elemento is None:
+                    self.cola.task_done()
+                    fin = True
+                    break
+                lote.append(elemento)
+            await self._volcar(lote)
+            if time.monotonic() >= self._proximos_derivados:
+                await self._poner_al_dia()
+        await self._poner_al_dia()
+
+    async def _poner_al_dia(self):
+        """Rollups, resumen y cartas de lo ya escrito, en el hilo del escritor y sin lotes en vuelo."""
+        inicio = time.perf_counter()
+        try:
+            lecturas = await asyncio.to_thread(poner_al_dia, self.pool)
+        except Exception as e:
+            # Las marcas no avanzaron: se reintenta en la próxima vuelta
+            self._escritura['errores'] += 1
+            self._escritura['ultimo_error'] = f"{type(e).__name__}: {e}"
+            print(f"❌ Error al poner al día rollups y resumen: {e}", file=sys.stderr)
+            lecturas = 0
+        self._escritura['derivados_lecturas'] += lecturas
+        self._escritura['derivados_s'] += time.perf_counter() - inicio
+        self._proximos_derivados = time.monotonic() + self.intervalo_derivados
+
+    async def _volcar(self, lote):
+        inicio = time.perf_counter()
+        try:
+            # Reintentos y partición ocurren aquí, antes del próximo lote: no se reordena nada
+            resultado, errores = await asyncio.to_thread(self._escribir_aislando, lote)
+        finally:
+            for _ in lote:
+                self.cola.task_done()
+        if errores:
+            self._escritura['errores'] += len(errores)
+            self._escritura['ultimo_error'] = f"{type(errores[-1]).__name__}: {errores[-1]}"
+            descartadas = resultado.rechazos_por_motivo['error_escritura']
+            print(f"❌ {descartadas} de {len(lote)} lecturas descartadas al escribir: {errores[-1]}", file=sys.stderr)
+        segundos = time.perf_counter() - inicio
+        escritura = self._escritura
+        escritura['lotes'] += 1
+        escritura['filas_insertadas'] += resultado.filas_insertadas
+        escritura['filas_rechazadas'] += resultado.filas_rechazadas
+        escritura['alertas_generadas'] += resultado.alertas_generadas
+        escritura['segundos'] += segundos
+        escritura['ultimo_lote_ms'] = round(segundos * 1000.0, 1)
+
+        confirmado = time.time()
+        rechazos = dict(resultado.rechazos)
+        for posicion, (_, dispositivo, recibido, instante, aviso) in enumerate(lote):
+            metricas = self._dispositivo(dispositivo)
+            motivos = rechazos.get(posicion, ())
+            if aviso is not None:
+                aviso(motivos)
+            if motivos:
+                metricas['rechazadas'] += 1
+                metricas['ultimo_rechazo'] = ','.join(motivos)
+                continue
+            metricas['escritas'] += 1
+            metricas['en_cola_ms'] = round((confirmado - recibido) * 1000.0, 1)
+            if instante is not None:
+                lag = round((confirmado - instante) * 1000.0, 1)
+                metricas['lag_ms'] = lag
+                metricas['lag_max_ms'] = max(metricas['lag_max_ms'], lag)
+
+    async def cerrar_conexiones(self):
+        """Cancela las conexiones abiertas (las que esperan lugar en la cola incluidas)."""
+        for tarea in list(self._conexiones):
+            tarea.cancel()
+        await asyncio.gather(*self._conexiones, return_exceptions=True)
+
+    def metricas(self):
+        e = self._escritura
+        return {
+            'activo_desde': datetime.datetime.fromtimestamp(self.inicio, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            'cola': dict(self._cola, profundidad=self.cola.qsize(), capacidad=self.cola.maxsize),
+            'escritura': dict(e, segundos=round(e['segundos'], 3), derivados_s=round(e['derivados_s'], 3),
+                              filas_por_segundo=round(e['filas_insertadas'] / e['segundos'], 1) if e['segundos'] else 0.0),
+            'dispositivos': self._dispositivos,
+        }
+
+
+async def simular_dispositivos(host, puerto, cantidad, intervalo, lotes, duracion=None):
+    """Dispositivos simulados que envían lecturas por TCP cada ``intervalo`` segundos."""
+    async def dispositivo(numero):
+        _, writer = await asyncio.open_connection(host, puerto)
+        nombre = f"SIM-{numero:03d}"
+        lote = random.choice(lotes)
+        fin = None if duracion is None else time.monotonic() + duracion
+        try:
+            while fin is None or time.monotonic() < fin:
+                lectura = dict(simular_lectura_sensores(), dispositivo=nombre, codigo_lote=lote,
+                               timestamp_lectura=_ahora_texto())
+                writer.write((json.dumps(lectura) + "\n").encode())
+                # drain() bloquea cuando el gateway deja de leer: así se nota la contrapresión
+                await writer.drain()
+                await asyncio.sleep(intervalo * random.uniform(0.5, 1.5))
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(dispositivo(i + 1) for i in range(cantidad)))
+
+
+async def servir(pool, host=HOST, puerto_tcp=PUERTO_TCP, puerto_http=PUERTO_HTTP, simulados=0, intervalo=1.0,
+                 reporte=10.0, duracion=None, **opciones):
+    """Levanta los servidores TCP y HTTP y el escritor hasta recibir SIGINT/SIGTERM (o vencer ``duracion``)."""
+    gateway = Gateway(pool, **opciones)
+    servidor_tcp = await asyncio.start_server(gateway.atender_tcp, host, puerto_tcp)
+    servidor_http = await asyncio.start_server(gateway.atender_http, host, puerto_http)
+    escritor = asyncio.create_task(gateway.escritor())
+    print(f"📡 Gateway TPS: TCP {host}:{puerto_tcp} | HTTP {host}:{puerto_http} (GET /metricas)", flush=True)
+
+    detener = asyncio.Event()
+    bucle = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            bucle.add_signal_handler(senal, detener.set)
+        except NotImplementedError:
+            pass
+
+    tareas = []
+    if simulados:
+        with pool.conexion() as conn:
+            lotes = [fila[0] for fila in conn.execute(
+                "SELECT codigo_lote FROM lotes_produccion WHERE estado_lote IN ('NUEVO', 'EN_PROCESO')")]
+        if lotes:
+            tareas.append(asyncio.create_task(
+                simular_dispositivos(host, puerto_tcp, simulados, intervalo, lotes, duracion)))
+        else:
+            print("⚠️ No hay lotes NUEVO/EN_PROCESO para los dispositivos simulados", file=sys.stderr)
+
+    async def reportar():
+        while True:
+            await asyncio.sleep(reporte)
+            m = gateway.metricas()
+            lags = [d['lag_ms'] for d in m['dispositivos'].values() if d['lag_ms'] is not None]
+            print(f"  cola {m['cola']['profundidad']}/{m['cola']['capacidad']} | "
+                  f"insertadas {m['escritura']['filas_insertadas']:,} | "
+                  f"{m['escritura']['filas_por_segundo']:,.0f} filas/s | dispositivos {len(m['dispositivos'])} | "
+                  f"lag máx {max(lags, default=0):,.0f} ms", flush=True)
+    if reporte:
+        tareas.append(asyncio.create_task(reportar()))
+
+    try:
+        if duracion is None:
+            await detener.wait()
+        else:
+            await asyncio.wait_for(detener.wait(), duracion)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for servidor in (servidor_tcp, servidor_http):
+            servidor.close()
+            await servidor.wait_closed()
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        await gateway.cerrar_conexiones()
+        # El marcador de fin va detrás de lo ya encolado: el escritor lo vuelca antes de terminar
+        await gateway.cola.put(None)
+        await escritor
+    return gateway.metricas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gateway IoT asíncrono del TPS")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--puerto-tcp', type=int, default=PUERTO_TCP)
+    parser.add_argument('--puerto-http', type=int, default=PUERTO_HTTP)
+    parser.add_argument('--tamano-cola', type=int, default=TAMANO_COLA)
+    parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+    parser.add_argument('--intervalo-flush', type=float, default=INTERVALO_FLUSH)
+    parser.add_argument('--intervalo-derivados', type=float, default=INTERVALO_DERIVADOS,
+                        help="Segundos entre puestas al día de rollups, resumen y cartas de control")
+    parser.add_argument('--sin-alertas', action='store_true', help="No evaluar los umbrales de alerta")
+    parser.add_argument('--simular', type=int, default=0, metavar='N',
+                        help="Lanzar N dispositivos simulados contra el puerto TCP")
+    parser.add_argument('--intervalo', type=float, default=1.0,
+                        help="Segundos medios entre lecturas de cada dispositivo simulado")
+    parser.add_argument('--duracion', type=float, help="Detener el gateway tras estos segundos")
+    parser.add_argument('--reporte', type=float, default=10.0, help="Segundos entre líneas de métricas (0 = sin reporte)")
+    args = parser.parse_args(argv)
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        metricas = asyncio.run(servir(
+            pool, args.host, args.puerto_tcp, args.puerto_http, args.simular, args.intervalo, args.reporte,
+            args.duracion, tamano_cola=args.tamano_cola, tamano_lote=args.tamano_lote,
+            intervalo_flush=args.intervalo_flush, evaluar_alertas=not args.sin_alertas,
+            intervalo_derivados=args.intervalo_derivados,
+        ))
+    finally:
+        pool.cerrar()
+
+    e = metricas['escritura']
+    print(f"Insertadas: {e['filas_insertadas']:,} | Rechazadas: {e['filas_rechazadas']:,} | "
+          f"Alertas nuevas: {e['alertas_generadas']:,} | Lotes escritos: {e['lotes']:,} | Errores: {e['errores']}")
+    return 0 if e['errores'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,433 @@
+"""Generador reproducible de datos sintéticos para el esquema TPS.
+
+Puebla la base con lotes, lecturas de sensores, inspecciones, pruebas de
+laboratorio, evaluaciones de envases, alertas, informes y envíos a
+escala de 10k, 100k o 1M lotes. Con la misma semilla y los mismos
+parámetros el contenido generado es idéntico, de modo que los
+resultados de ``tps_benchmark`` son comparables entre versiones.
+
+Las lecturas siguen las distribuciones de ``simular_lectura_sensores``
+(uniformes en el rango óptimo) con una fracción de excursiones; pasan
+por ``tps_ingesta.insertar_filas``, así que contadores y rollups quedan
+al día. Los registros se escriben por tramos de lotes, cada tramo en su
+propia transacción.
+
+Uso desde línea de comandos::
+
+    python tps_generador.py --escala 10k
+    python tps_generador.py --lotes 2000 --lecturas-por-lote 20 --semilla 7 --db prueba.db
+"""
+import argparse
+import datetime
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from tps_alertas import PARAMETROS_UMBRAL, limites_canal
+from tps_db import DB_PATH, PoolConexiones
+from tps_ingesta import insertar_filas
+from tps_linaje import actualizar_linaje
+from tps_migraciones import aplicar_migraciones
+from tps_spc import actualizar_spc
+
+LOTES_POR_TRAMO = 10000
+
+
+class ParametrosGeneracion(NamedTuple):
+    lotes: int = 10000
+    # Lecturas fijas por lote; el resto son tasas medias (Poisson) por lote
+    lecturas_por_lote: int = 50
+    inspecciones_por_lote: float = 1.2
+    pruebas_por_lote: float = 1.0
+    envases_por_lote: float = 0.8
+    alertas_por_lote: float = 0.1
+    envios_por_lote: float = 1.0
+    # Fracción de lecturas con algún canal fuera del rango óptimo
+    prob_excursion: float = 0.02
+    semilla: int = 42
+    fecha_inicio: str = '2025-01-01'
+    dias: int = 365
+    # Distingue los códigos de corridas distintas sobre la misma base
+    prefijo: str = 'GEN'
+
+
+# Tamaños de referencia para comparar rendimiento entre versiones
+ESCALAS = {
+    '10k': ParametrosGeneracion(lotes=10000, lecturas_por_lote=50),
+    '100k': ParametrosGeneracion(lotes=100000, lecturas_por_lote=20),
+    '1M': ParametrosGeneracion(lotes=1000000, lecturas_por_lote=5),
+}
+
+
+class ResultadoGeneracion(NamedTuple):
+    filas_por_tabla: dict
+    segundos: float
+
+
+# Mismo catálogo que los datos de ejemplo de la app
+PRODUCTOS = [
+    ('PROD-ESP-001', 'Espárragos Verdes', 'UC-157', 'Hortalizas', 'Campo Norte Virú', '2024-A', 'Activo'),
+    ('PROD-PAL-002', 'Paltas Hass', 'Hass Premium', 'Frutas', 'Campo Sur Chincha', '2024-A', 'Activo'),
+    ('PROD-ARA-003', 'Arándanos Frescos', 'Biloxi', 'Berries', 'Campo Este Trujillo', '2024-A', 'Activo'),
+    ('PROD-UVA-004', 'Uvas Red Globe', 'Red Globe Premium', 'Frutas', 'Campo Oeste Ica', '2024-A', 'Activo'),
+    ('PROD-MAN-005', 'Mangos Kent', 'Kent Export', 'Frutas', 'Campo Central Piura', '2024-A', 'Activo'),
+]
+
+RESPONSABLES = ['Carlos Mendoza', 'Ana García', 'Luis Rodríguez', 'María López', 'José Fernández']
+INSPECTORES = ['Juan Pérez', 'Carmen Torres', 'Miguel Santos', 'Rosa Díaz']
+LABORATORISTAS = ['Dra. María Santos', 'Dr. Carlos Ruiz', 'Dra. Laura Vega']
+
+# estado_lote -> probabilidad; los lotes cerrados reciben un informe coherente con su estado
+MEZCLA_ESTADOS = {
+    'NUEVO': 0.10,
+    'EN_PROCESO': 0.30,
+    'APROBADO': 0.35,
+    'RECHAZADO': 0.10,
+    'EXPORTADO': 0.15,
+}
+DECISION_POR_ESTADO = {'APROBADO': 'APROBADO', 'EXPORTADO': 'APROBADO', 'RECHAZADO': 'RECHAZADO'}
+
+# canal -> (mín, máx) de simular_lectura_sensores
+DISTRIBUCIONES = {
+    'sensor_temperatura': (2.0, 8.0),
+    'sensor_peso': (15.0, 25.0),
+    'sensor_humedad': (85.0, 95.0),
+    'sensor_ph': (6.0, 7.5),
+    'sensor_brix': (8.0, 15.0),
+}
+DECIMALES = {'sensor_temperatura': 1, 'sensor_peso': 2, 'sensor_humedad': 1, 'sensor_ph': 2, 'sensor_brix': 1}
+
+COLORES = ["Excelente", "Bueno", "Regular", "Deficiente"]
+FORMAS = ["Uniforme", "Ligeramente irregular", "Irregular", "Deforme"]
+RESIDUOS = ["No detectados", "Dentro de límites", "Excede límites"]
+MICROBIOLOGIA = ["Negativo", "Positivo", "En proceso"]
+TIPOS_ENVASE = ["Caja de cartón", "Bandeja PET", "Clamshell", "Bolsa plástica", "Caja de madera", "Envase al vacío"]
+MATERIALES_ENVASE = ["Cartón corrugado", "PET reciclado", "PET transparente", "Plástico PP", "Madera", "Vidrio"]
+TIPOS_ALERTA = ["TEMPERATURA", "HUMEDAD", "PH", "PESO", "CALIDAD", "SENSOR"]
+NIVELES_CRITICIDAD = ["BAJA", "MEDIA", "ALTA"]
+PAISES_DESTINO = ["Estados Unidos", "Países Bajos", "Reino Unido", "Alemania", "Francia", "Canadá", "Japón"]
+ESTADOS_ENVIO = ["PREPARACION", "EMBARCADO", "EN_TRANSITO", "LLEGADA", "ENTREGADO"]
+
+# Vocabulario del texto libre (defectos, observaciones, acciones, documentos)
+DEFECTOS = [
+    "golpe leve", "magulladura", "manchas superficiales", "russeting", "deformación", "daño por trips",
+    "daño mecánico", "herida cicatrizada", "pudrición apical", "pudrición peduncular", "quemadura de sol",
+    "deshidratación", "sobremaduración", "coloración irregular", "calibre fuera de rango", "pedúnculo desprendido",
+    "rajadura", "daño por frío", "presencia de hongos", "lenticelosis", "cicatriz de roce", "ablandamiento",
+]
+OBSERVACIONES = [
+    "Muestra representativa del lote", "Reinspeccionar tras la selección", "Se separaron las unidades dañadas",
+    "El cliente solicita registro fotográfico", "Temperatura de pulpa elevada al ingreso",
+    "Se recomienda enfriamiento inmediato", "Humedad superficial en parte de las jabas",
+    "Embalaje húmedo en la zona inferior del pallet", "Calibre heterogéneo entre jabas",
+    "Lote ingresado fuera del horario de recepción", "Fruta con restos de tierra", "Etiquetado incompleto en jabas",
+    "Se tomó contramuestra para laboratorio", "Cosecha con lluvia el día anterior", "Supervisor de campo presente",
+    "Sin observaciones relevantes", "Desviación comunicada al productor", "Transporte sin cadena de frío",
+]
+OBSERVACIONES_ENVASE = [
+    "Sellado correcto", "Cierre deficiente en algunas unidades", "Deformación de la caja al apilar",
+    "Condensación interna", "Etiqueta despegada", "Ventilación insuficiente", "Material con olor residual",
+    "Resistencia a la compresión dentro de especificación", "Perforaciones fuera de medida",
+]
+ACCIONES = [
+    "Se reajustó el termostato de la cámara", "Se reubicó el lote en otra cámara", "Se notificó al jefe de planta",
+    "Se repitió la selección manual", "Se descartaron las unidades afectadas", "Se recalibró el sensor",
+    "Se reemplazó el sensor defectuoso", "Se retuvo el lote hasta nueva inspección", "Se ajustó la ventilación",
+    "Se coordinó con mantenimiento",
+]
+DOCUMENTOS = [
+    "Certificado fitosanitario", "Packing list", "Bill of lading", "Certificado de origen", "Factura comercial",
+    "Certificado Global GAP", "Protocolo de tratamiento en frío", "Declaración aduanera de exportación",
+    "Certificado orgánico", "Informe de inspección SENASA", "Póliza de seguro de carga",
+]
+
+SEGUNDOS_DIA = 86400
+
+
+def _textos(instantes):
+    """'YYYY-MM-DD HH:MM:SS' para un arreglo datetime64."""
+    return np.char.replace(np.datetime_as_string(instantes, unit='s'), 'T', ' ').tolist()
+
+
+def _elegir(rng, opciones, n, p=None):
+    return np.asarray(opciones, dtype=object)[rng.choice(len(opciones), size=n, p=p)].tolist()
+
+
+def _texto_libre(rng, opciones, n, maximo, prob_vacio, separador):
+    """Hasta ``maximo`` frases distintas de ``opciones`` por registro (vacío con ``prob_vacio``)."""
+    cuantas = np.where(rng.random(n) < prob_vacio, 0, rng.integers(1, maximo + 1, n))
+    elegidas = rng.integers(0, len(opciones), (n, maximo))
+    return [separador.join(dict.fromkeys(opciones[j] for j in fila[:k]))
+            for fila, k in zip(elegidas.tolist(), cuantas.tolist())]
+
+
+def _repartir(rng, n_lotes, tasa, elegibles=None):
+    """Índices de lote (repetidos) para registros con ``tasa`` media por lote."""
+    conteos = rng.poisson(tasa, n_lotes)
+    if elegibles is not None:
+        conteos[~elegibles] = 0
+    return np.repeat(np.arange(n_lotes), conteos)
+
+
+def _despues_de(rng, base, indices, dias_max):
+    return base[indices] + rng.integers(0, int(dias_max * SEGUNDOS_DIA), len(indices)).astype('timedelta64[s]')
+
+
+def _generar_tramo(conn, rng, params, inicio, n, contadores, rng_textos):
+    p = params.prefijo
+    lotes = [f"LT-{p}-{inicio + i:07d}" for i in range(n)]
+    productos = _elegir(rng, [prod[0] for prod in PRODUCTOS], n)
+    origen = {prod[0]: prod[4] for prod in PRODUCTOS}
+    estados = np.asarray(list(MEZCLA_ESTADOS), dtype=object)[
+        rng.choice(len(MEZCLA_ESTADOS), size=n, p=list(MEZCLA_ESTADOS.values()))]
+    cosecha = np.datetime64(params.fecha_inicio, 's') + \
+        rng.integers(0, params.dias, n).astype('timedelta64[D]').astype('timedelta64[s]')
+    conn.executemany('''
+        INSERT INTO lotes_produccion (codigo_lote, codigo_producto, fecha_cosecha, cantidad_kg, campo_origen, responsable_campo, estado_lote, fecha_creacion)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        lotes, productos, [t[:10] for t in _textos(cosecha)],
+        np.round(rng.uniform(500.0, 3000.0, n), 1).tolist(),
+        [origen[prod] for prod in productos],
+        _elegir(rng, RESPONSABLES, n), estados.tolist(), _textos(cosecha),
+    )))
+    contadores['lotes_produccion'] += n
+
+    # Lecturas: una serie por lote repartida en los 3 días posteriores a la cosecha
+    k = params.lecturas_por_lote
+    if k:
+        idx = np.repeat(np.arange(n), k)
+        instantes = np.sort(_despues_de(rng, cosecha, idx, 3).reshape(n, k), axis=1).ravel()
+        m = n * k
+        excursion = rng.random(m) < params.prob_excursion
+        alerta = np.zeros(m, dtype=bool)
+        valores = {}
+        for canal, (minimo, maximo) in DISTRIBUCIONES.items():
+            v = rng.uniform(minimo, maximo, m)
+            # Las excursiones caen hasta un 40% del ancho del rango fuera de él
+            ancho = maximo - minimo
+            v[excursion] = rng.uniform(minimo - 0.4 * ancho, maximo + 0.4 * ancho, int(excursion.sum()))
+            v = np.round(v, DECIMALES[canal])
+            valores[canal] = v
+            if canal in ('sensor_temperatura', 'sensor_humedad', 'sensor_ph'):
+                lim_min, lim_max, _, _ = limites_canal(PARAMETROS_UMBRAL, canal)
+                alerta |= (v < lim_min) | (v > lim_max)
+        base = contadores['lecturas_sensores']
+        insertar_filas(conn, list(zip(
+            [f"SEN-{p}-{base + i:09d}" for i in range(m)],
+            np.asarray(lotes, dtype=object)[idx].tolist(),
+            _textos(instantes),
+            valores['sensor_temperatura'].tolist(),
+            valores['sensor_peso'].tolist(),
+            valores['sensor_humedad'].tolist(),
+            valores['sensor_ph'].tolist(),
+            valores['sensor_brix'].tolist(),
+            ['OPERATIVO'] * m,
+            alerta.astype(int).tolist(),
+        )))
+        contadores['lecturas_sensores'] += m
+
+    lotes = np.asarray(lotes, dtype=object)
+    abiertos = estados == 'NUEVO'
+
+    # Inspecciones visuales: NUEVO aún no se inspecciona
+    idx = _repartir(rng, n, params.inspecciones_por_lote, ~abiertos)
+    conformidad = np.round(np.clip(100.0 - rng.exponential(6.0, len(idx)), 0.0, 100.0), 1)
+    resultado = np.where(conformidad >= 90, 'APROBADO', np.where(conformidad < 70, 'RECHAZADO', 'OBSERVADO'))
+    base = contadores['inspecciones_visuales']
+    conn.executemany('''
+        INSERT INTO inspecciones_visuales (codigo_inspeccion, codigo_lote, fecha_inspeccion, inspector, color_evaluacion, forma_evaluacion, tamano_evaluacion, defectos_visuales, porcentaje_conformidad, resultado_visual, observaciones, tiempo_procesamiento)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        [f"INS-{p}-{base + i:08d}" for i in range(len(idx))],
+        lotes[idx].tolist(), _textos(_despues_de(rng, cosecha, idx, 2)),
+        _elegir(rng, INSPECTORES, len(idx)), _elegir(rng, COLORES, len(idx), [0.4, 0.4, 0.15, 0.05]),
+        _elegir(rng, FORMAS, len(idx), [0.5, 0.3, 0.15, 0.05]), [''] * len(idx),
+        _texto_libre(rng_textos, DEFECTOS, len(idx), 3, 0.4, ', '),
+        conformidad.tolist(), resultado.tolist(), _texto_libre(rng_textos, OBSERVACIONES, len(idx), 2, 0.5, '. '),
+        np.round(rng.uniform(1.0, 5.0, len(idx)), 1).tolist(),
+    )))
+    contadores['inspecciones_visuales'] += len(idx)
+
+    idx = _repartir(rng, n, params.pruebas_por_lote, ~abiertos)
+    base = contadores['pruebas_fisicoquimicas']
+    conn.executemany('''
+        INSERT INTO pruebas_fisicoquimicas (codigo_prueba, codigo_lote, fecha_prueba, laboratorista, acidez_titulable, solidos_solubles, firmeza, contenido_humedad, residuos_pesticidas, microbiologia_resultado, resultado_fisicoquimico, certificacion_organica)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        [f"LAB-{p}-{base + i:08d}" for i in range(len(idx))],
+        lotes[idx].tolist(), _textos(_despues_de(rng, cosecha, idx, 3)),
+        _elegir(rng, LABORATORISTAS, len(idx)),
+        np.round(rng.uniform(0.05, 0.30, len(idx)), 2).tolist(),
+        np.round(rng.uniform(8.0, 15.0, len(idx)), 1).tolist(),
+        np.round(rng.uniform(120.0, 220.0, len(idx)), 1).tolist(),
+        np.round(rng.uniform(75.0, 92.0, len(idx)), 1).tolist(),
+        _elegir(rng, RESIDUOS, len(idx), [0.7, 0.27, 0.03]), _elegir(rng, MICROBIOLOGIA, len(idx), [0.92, 0.03, 0.05]),
+        _elegir(rng, ['APROBADO', 'RECHAZADO', 'PENDIENTE'], len(idx), [0.85, 0.10, 0.05]),
+        (rng.random(len(idx)) < 0.3).astype(int).tolist(),
+    )))
+    contadores['pruebas_fisicoquimicas'] += len(idx)
+
+    idx = _repartir(rng, n, params.envases_por_lote, ~abiertos)
+    pruebas = rng.random((len(idx), 3)) < 0.95
+    base = contadores['compatibilidad_envases']
+    conn.executemany('''
+        INSERT INTO compatibilidad_envases (codigo_compatibilidad, codigo_lote, fecha_evaluacion, tipo_envase, material_envase, capacidad_envase, prueba_hermeticidad, prueba_resistencia, compatibilidad_producto, resultado_envase, observaciones_envase)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        [f"ENV-{p}-{base + i:08d}" for i in range(len(idx))],
+        lotes[idx].tolist(), _textos(_despues_de(rng, cosecha, idx, 3)),
+        _elegir(rng, TIPOS_ENVASE, len(idx)), _elegir(rng, MATERIALES_ENVASE, len(idx)),
+        _elegir(rng, ['500 g', '2 kg', '5 kg', '10 kg'], len(idx)),
+        *(pruebas[:, j].astype(int).tolist() for j in range(3)),
+        np.where(pruebas.all(axis=1), 'APROBADO', 'RECHAZADO').tolist(),
+        _texto_libre(rng_textos, OBSERVACIONES_ENVASE, len(idx), 2, 0.6, '. '),
+    )))
+    contadores['compatibilidad_envases'] += len(idx)
+
+    # Alertas registradas a mano (las de sensores las genera tps_alertas en la ingesta)
+    idx = _repartir(rng, n, params.alertas_por_lote)
+    base = contadores['alertas_automaticas']
+    tipos = _elegir(rng, TIPOS_ALERTA, len(idx))
+    estados_alerta = _elegir(rng, ['ACTIVA', 'RESUELTA'], len(idx), [0.2, 0.8])
+    acciones = _texto_libre(rng_textos, ACCIONES, len(idx), 2, 0.0, '. ')
+    conn.executemany('''
+        INSERT INTO alertas_automaticas (codigo_alerta, codigo_lote, tipo_alerta, nivel_criticidad, mensaje_alerta, parametro_afectado, valor_detectado, valor_limite, fecha_alerta, estado_alerta, accion_tomada)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        [f"ALT-{p}-{base + i:08d}" for i in range(len(idx))],
+        lotes[idx].tolist(), tipos, _elegir(rng, NIVELES_CRITICIDAD, len(idx), [0.5, 0.35, 0.15]),
+        [f"Alerta de {t.lower()} generada" for t in tipos], [t.capitalize() for t in tipos],
+        np.round(rng.uniform(0.0, 100.0, len(idx)), 1).tolist(), np.round(rng.uniform(0.0, 100.0, len(idx)), 1).tolist(),
+        _textos(_despues_de(rng, cosecha, idx, 3)),
+        estados_alerta, [a if e == 'RESUELTA' else '' for e, a in zip(estados_alerta, acciones)],
+    )))
+    contadores['alertas_automaticas'] += len(idx)
+
+    # Un informe por lote cerrado, con la decisión que explica su estado
+    cerrados = np.flatnonzero(np.isin(estados, list(DECISION_POR_ESTADO)))
+    decisiones = [DECISION_POR_ESTADO[e] for e in estados[cerrados].tolist()]
+    fechas = _textos(_despues_de(rng, cosecha, cerrados, 4))
+    base = contadores['informes_calidad']
+    conn.executemany('''
+        INSERT INTO informes_calidad (codigo_informe, codigo_lote, fecha_informe, resultado_inspeccion_visual, resultado_sensores, resultado_fisicoquimico, resultado_envases, decision_final, porcentaje_calidad_total, certificaciones_obtenidas, destino_comercial, responsable_aprobacion, fecha_aprobacion)
+        VALUES (?, ?, ?, ?, 'NORMAL', ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        [f"INF-{p}-{base + i:08d}" for i in range(len(cerrados))],
+        lotes[cerrados].tolist(), fechas, decisiones, decisiones, decisiones, decisiones,
+        np.round(np.where(np.array(decisiones) == 'APROBADO', rng.uniform(85, 100, len(cerrados)),
+                          rng.uniform(40, 75, len(cerrados))), 1).tolist(),
+        _elegir(rng, ['Global GAP, HACCP', 'Organic, Fair Trade', 'BRC'], len(cerrados)),
+        _elegir(rng, ["Exportación USA", "Exportación Europa", "Exportación Asia", "Mercado Nacional"], len(cerrados)),
+        ['Ing. Roberto Silva'] * len(cerrados), fechas,
+    )))
+    contadores['informes_calidad'] += len(cerrados)
+
+    # Envíos de los lotes exportados (al menos uno cada uno)
+    exportados = estados == 'EXPORTADO'
+    conteos = np.where(exportados, np.maximum(rng.poisson(params.envios_por_lote, n), 1), 0)
+    idx = np.repeat(np.arange(n), conteos)
+    base = contadores['trazabilidad_internacional']
+    conn.executemany('''
+        INSERT INTO trazabilidad_internacional (codigo_trazabilidad, codigo_lote, pais_destino, cliente_internacional, certificacion_requerida, numero_contenedor, fecha_embarque, puerto_destino, documentos_exportacion, estado_envio)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', list(zip(
+        [f"TRZ-{p}-{base + i:08d}" for i in range(len(idx))],
+        lotes[idx].tolist(), _elegir(rng, PAISES_DESTINO, len(idx)),
+        [f"Importador {j:03d}" for j in rng.integers(0, 200, len(idx)).tolist()],
+        _elegir(rng, ['Global GAP', 'HACCP', 'Organic', 'BRC'], len(idx)),
+        [f"DNPU{j:07d}" for j in rng.integers(0, 10**7, len(idx)).tolist()],
+        [t[:10] for t in _textos(_despues_de(rng, cosecha, idx, 10))],
+        [''] * len(idx), _texto_libre(rng_textos, DOCUMENTOS, len(idx), 4, 0.1, ', '),
+        _elegir(rng, ESTADOS_ENVIO, len(idx)),
+    )))
+    contadores['trazabilidad_internacional'] += len(idx)
+
+
+def generar(pool, params=ParametrosGeneracion(), lotes_por_tramo=LOTES_POR_TRAMO, progreso=None):
+    """Puebla la base según ``params``; devuelve un ResultadoGeneracion.
+
+    Cada tramo de ``lotes_por_tramo`` lotes usa su propio generador
+    derivado de la semilla (y otro, hijo de ese, para el texto libre): la
+    misma semilla, parámetros y tamaño de tramo reproducen exactamente los
+    mismos datos.
+    ``progreso(lotes_generados)`` se llama tras cada tramo.
+    """
+    inicio_reloj = time.perf_counter()
+    with pool.conexion() as conn:
+        existe = conn.execute("SELECT 1 FROM lotes_produccion WHERE codigo_lote = ?",
+                              (f"LT-{params.prefijo}-{0:07d}",)).fetchone()
+    if existe:
+        raise ValueError(f"La base ya contiene datos generados con el prefijo {params.prefijo}")
+
+    contadores = dict.fromkeys([
+        'lotes_produccion', 'lecturas_sensores', 'inspecciones_visuales', 'pruebas_fisicoquimicas',
+        'compatibilidad_envases', 'alertas_automaticas', 'informes_calidad', 'trazabilidad_internacional',
+    ], 0)
+    hoy = datetime.date.today()
+    with pool.transaccion() as conn:
+        conn.executemany('''
+            INSERT OR IGNORE INTO productos_agro (codigo_producto, nombre_producto, variedad, categoria, origen_campo, temporada, estado, fecha_registro)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [producto + (hoy,) for producto in PRODUCTOS])
+
+    semillas = np.random.SeedSequence(params.semilla).spawn((params.lotes + lotes_por_tramo - 1) // lotes_por_tramo)
+    for tramo, semilla in enumerate(semillas):
+        inicio = tramo * lotes_por_tramo
+        n = min(lotes_por_tramo, params.lotes - inicio)
+        with pool.transaccion() as conn:
+            _generar_tramo(conn, np.random.default_rng(semilla), params, inicio, n, contadores,
+                           np.random.default_rng(semilla.spawn(1)[0]))
+            # El índice de linaje se extiende con cada tramo, igual que los rollups
+            while actualizar_linaje(conn):
+                pass
+            # Las lecturas ya entraron en las cartas de control con los rollups; faltan las pruebas
+            actualizar_spc(conn, 'pruebas_fisicoquimicas')
+        if progreso is not None:
+            progreso(inicio + n)
+
+    with pool.transaccion() as conn:
+        conn.execute("ANALYZE")
+    return ResultadoGeneracion(contadores, time.perf_counter() - inicio_reloj)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador reproducible de datos sintéticos TPS")
+    parser.add_argument('--escala', choices=list(ESCALAS), default='10k', help="Tamaño de referencia")
+    parser.add_argument('--lotes', type=int, help="Número de lotes (sustituye al de la escala)")
+    parser.add_argument('--lecturas-por-lote', type=int)
+    parser.add_argument('--inspecciones-por-lote', type=float)
+    parser.add_argument('--pruebas-por-lote', type=float)
+    parser.add_argument('--envases-por-lote', type=float)
+    parser.add_argument('--alertas-por-lote', type=float)
+    parser.add_argument('--envios-por-lote', type=float)
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--prefijo', help="Prefijo de los códigos generados (por defecto GEN)")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    params = ESCALAS[args.escala]._replace(**{
+        campo: valor for campo, valor in vars(args).items()
+        if campo in ParametrosGeneracion._fields and valor is not None
+    })
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        resultado = generar(pool, params, progreso=lambda hechos: print(f"  {hechos:,}/{params.lotes:,} lotes", flush=True))
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        pool.cerrar()
+
+    print(f"Generado en {resultado.segundos:.1f}s (semilla {params.semilla}):")
+    for tabla, total in resultado.filas_por_tabla.items():
+        print(f"  - {tabla}: {total:,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
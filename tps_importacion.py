@@ -0,0 +1,697 @@
+"""Importación por bloques de registros históricos de calidad desde CSV o Excel.
+
+Hay un importador por tabla del TPS (``ESQUEMAS``). El archivo se lee por
+bloques de ``TAMANO_BLOQUE`` filas sin cargarlo entero. Sus encabezados se
+asocian con las columnas de la tabla por nombre, sin acentos ni
+mayúsculas, o con un mapeo explícito (``mapear_columnas``). Cada bloque se
+valida con operaciones vectorizadas de pandas: tipos, valores permitidos,
+rangos, códigos repetidos y que el ``codigo_lote`` (el ``codigo_producto``
+en los lotes) exista. Las filas rechazadas van a un archivo aparte con su
+número de fila y sus motivos; las válidas se insertan con ``executemany``,
+un bloque por transacción, y las que no traen código reciben uno de
+``tps_codigos``.
+
+El avance se guarda en ``importaciones`` (migración 18) en la misma
+transacción que cada bloque, con la huella del archivo como clave: una
+carga interrumpida se reanuda desde el último bloque confirmado sin
+duplicar filas. Las lecturas pasan por ``tps_ingesta.insertar_filas``
+(contadores y rollups) y las lecturas y pruebas avanzan sus cartas de
+control sin generar alertas, porque son datos históricos. Cada bloque de
+lotes, informes, envíos o evidencias extiende el índice de linaje en su
+transacción, como el generador, para que la primera consulta de
+trazabilidad no indexe toda la importación. El resto (KPIs, resumen por
+lote, búsqueda, feed) lo mantienen los triggers.
+
+Leer Excel requiere openpyxl (dependencia opcional: ``pip install
+openpyxl``), que recorre la hoja en modo de solo lectura.
+
+Uso desde línea de comandos::
+
+    python tps_importacion.py inspecciones_visuales historico_inspecciones.csv
+    python tps_importacion.py pruebas_fisicoquimicas laboratorio_2023.xlsx --hoja Resultados
+    python tps_importacion.py lecturas_sensores lecturas.csv --separador ";" --reanudar
+    python tps_importacion.py alertas_automaticas alertas.csv --mapa Nivel=nivel_criticidad
+"""
+import argparse
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from tps_codigos import avanzar_secuencia, patron_codigo, reservar_codigos
+from tps_db import DB_PATH, PoolConexiones
+from tps_ingesta import RANGOS_VALIDOS, insertar_filas
+from tps_linaje import TABLAS_INDEXADAS, actualizar_linaje
+from tps_repositorio import COLUMNAS_CODIGO
+from tps_series import actualizar_rollups
+from tps_spc import FUENTES as FUENTES_SPC, actualizar_spc
+
+TAMANO_BLOQUE = 5000
+# La huella de un archivo: su tamaño y el SHA-1 de su primer MiB
+BYTES_HUELLA = 1 << 20
+
+# Valor por defecto de las columnas de fecha que en SQLite son CURRENT_TIMESTAMP
+AHORA = 'CURRENT_TIMESTAMP'
+
+VERDADEROS = {'1', '1.0', 'true', 'verdadero', 'si', 'sí', 's', 'x', 'yes', 'y'}
+FALSOS = {'0', '0.0', 'false', 'falso', 'no', 'n'}
+# Formatos de fecha aceptados además de ISO 8601, en orden de prueba
+FORMATOS_FECHA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y')
+
+
+class Columna(NamedTuple):
+    nombre: str
+    # 'texto', 'real', 'entero', 'booleano', 'fecha' (AAAA-MM-DD) o 'instante' (AAAA-MM-DD HH:MM:SS, UTC)
+    tipo: str = 'texto'
+    obligatoria: bool = False
+    # Otros encabezados aceptados, ya normalizados
+    alias: tuple = ()
+    # Valores permitidos (en mayúsculas); vacío si es libre
+    valores: tuple = ()
+    # (mínimo, máximo) de las columnas numéricas; None en un extremo lo deja abierto
+    rango: tuple = None
+    por_defecto: object = None
+
+
+class Esquema(NamedTuple):
+    columnas: tuple
+    # (columna, tabla, columna referida) que debe existir, o None
+    referencia: tuple = None
+
+
+_LOTE = Columna('codigo_lote', obligatoria=True, alias=('lote',))
+_REF_LOTE = ('codigo_lote', 'lotes_produccion', 'codigo_lote')
+_PORCENTAJE = (0.0, 100.0)
+_RESULTADOS = ('APROBADO', 'RECHAZADO', 'PENDIENTE')
+# Los del formulario y el filtro del historial de trazabilidad (tps_paginacion)
+_ESTADOS_ENVIO = ('PREPARACION', 'EMBARCADO', 'EN_TRANSITO', 'LLEGADA', 'ENTREGADO')
+
+# Tabla -> columnas importables; la primera es el código de negocio y, en
+# lecturas_sensores, el orden es el de tps_ingesta.SQL_INSERTAR_LECTURA
+ESQUEMAS = {
+    'productos_agro': Esquema((
+        Columna('codigo_producto', alias=('producto',)),
+        Columna('nombre_producto', obligatoria=True, alias=('nombre',)),
+        Columna('variedad'),
+        Columna('categoria'),
+        Columna('origen_campo'),
+        Columna('temporada'),
+        Columna('estado', por_defecto='ACTIVO'),
+        Columna('fecha_registro', 'fecha'),
+    )),
+    'lotes_produccion': Esquema((
+        Columna('codigo_lote', alias=('lote',)),
+        Columna('codigo_producto', obligatoria=True, alias=('producto',)),
+        Columna('fecha_cosecha', 'fecha'),
+        Columna('cantidad_kg', 'real', rango=(0.0, None), alias=('kg', 'cantidad')),
+        Columna('campo_origen'),
+        Columna('responsable_campo'),
+        Columna('estado_lote', valores=('NUEVO', 'EN_PROCESO', 'APROBADO', 'RECHAZADO', 'EXPORTADO'),
+                por_defecto='NUEVO', alias=('estado',)),
+        Columna('fecha_creacion', 'instante', por_defecto=AHORA),
+    ), ('codigo_producto', 'productos_agro', 'codigo_producto')),
+    'inspecciones_visuales': Esquema((
+        Columna('codigo_inspeccion', alias=('inspeccion',)),
+        _LOTE,
+        Columna('fecha_inspeccion', 'instante', por_defecto=AHORA, alias=('fecha',)),
+        Columna('inspector'),
+        Columna('color_evaluacion', alias=('color',)),
+        Columna('forma_evaluacion', alias=('forma',)),
+        Columna('tamano_evaluacion', alias=('tamano',)),
+        Columna('defectos_visuales', alias=('defectos',)),
+        Columna('porcentaje_conformidad', 'real', rango=_PORCENTAJE, alias=('conformidad',)),
+        Columna('resultado_visual', obligatoria=True, valores=('APROBADO', 'RECHAZADO', 'OBSERVADO'),
+                alias=('resultado',)),
+        Columna('observaciones'),
+        Columna('tiempo_procesamiento', 'real', rango=(0.0, None)),
+    ), _REF_LOTE),
+    'lecturas_sensores': Esquema((
+        Columna('codigo_lectura', alias=('lectura',)),
+        _LOTE,
+        Columna('timestamp_lectura', 'instante', por_defecto=AHORA, alias=('timestamp', 'fecha')),
+        *(Columna(canal, 'real', obligatoria=True, rango=rango, alias=(canal.removeprefix('sensor_'),))
+          for canal, rango in RANGOS_VALIDOS.items()),
+        Columna('estado_sensores', por_defecto='OPERATIVO', alias=('estado',)),
+        Columna('alerta_generada', 'booleano', por_defecto=0, alias=('alerta',)),
+    ), _REF_LOTE),
+    'pruebas_fisicoquimicas': Esquema((
+        Columna('codigo_prueba', alias=('prueba',)),
+        _LOTE,
+        Columna('fecha_prueba', 'instante', por_defecto=AHORA, alias=('fecha',)),
+        Columna('laboratorista'),
+        Columna('acidez_titulable', 'real', rango=(0.0, None), alias=('acidez',)),
+        Columna('solidos_solubles', 'real', rango=(0.0, None), alias=('brix',)),
+        Columna('firmeza', 'real', rango=(0.0, None)),
+        Columna('contenido_humedad', 'real', rango=_PORCENTAJE, alias=('humedad',)),
+        Columna('residuos_pesticidas', alias=('residuos',)),
+        Columna('microbiologia_resultado', alias=('microbiologia',)),
+        Columna('resultado_fisicoquimico', obligatoria=True, valores=_RESULTADOS, alias=('resultado',)),
+        Columna('certificacion_organica', 'booleano', por_defecto=0, alias=('organica',)),
+    ), _REF_LOTE),
+    'compatibilidad_envases': Esquema((
+        Columna('codigo_compatibilidad', alias=('compatibilidad',)),
+        _LOTE,
+        Columna('fecha_evaluacion', 'instante', por_defecto=AHORA, alias=('fecha',)),
+        Columna('tipo_envase'),
+        Columna('material_envase'),
+        Columna('capacidad_envase'),
+        Columna('prueba_hermeticidad', 'booleano', alias=('hermeticidad',)),
+        Columna('prueba_resistencia', 'booleano', alias=('resistencia',)),
+        Columna('compatibilidad_producto', 'booleano'),
+        Columna('resultado_envase', obligatoria=True, valores=_RESULTADOS, alias=('resultado',)),
+        Columna('observaciones_envase', alias=('observaciones',)),
+    ), _REF_LOTE),
+    'alertas_automaticas': Esquema((
+        Columna('codigo_alerta', alias=('alerta',)),
+        _LOTE,
+        Columna('tipo_alerta', obligatoria=True, alias=('tipo',)),
+        Columna('nivel_criticidad', obligatoria=True, valores=('BAJA', 'MEDIA', 'ALTA'), alias=('criticidad', 'nivel')),
+        Columna('mensaje_alerta', alias=('mensaje',)),
+        Columna('parametro_afectado', alias=('parametro',)),
+        Columna('valor_detectado', 'real'),
+        Columna('valor_limite', 'real'),
+        Columna('fecha_alerta', 'instante', por_defecto=AHORA, alias=('fecha',)),
+        Columna('estado_alerta', valores=('ACTIVA', 'RESUELTA'), por_defecto='RESUELTA', alias=('estado',)),
+        Columna('accion_tomada'),
+        Columna('fecha_fin', 'instante'),
+        Columna('duracion_segundos', 'real', rango=(0.0, None)),
+        Columna('lecturas_afectadas', 'entero', rango=(0, None)),
+    ), _REF_LOTE),
+    'informes_calidad': Esquema((
+        Columna('codigo_informe', alias=('informe',)),
+        _LOTE,
+        Columna('fecha_informe', 'instante', por_defecto=AHORA, alias=('fecha',)),
+        Columna('resultado_inspeccion_visual'),
+        Columna('resultado_sensores'),
+        Columna('resultado_fisicoquimico'),
+        Columna('resultado_envases'),
+        Columna('decision_final', obligatoria=True, valores=_RESULTADOS, alias=('decision',)),
+        Columna('porcentaje_calidad_total', 'real', rango=_PORCENTAJE, alias=('calidad',)),
+        Columna('certificaciones_obtenidas', alias=('certificaciones',)),
+        Columna('destino_comercial', alias=('destino',)),
+        Columna('responsable_aprobacion', alias=('responsable',)),
+        Columna('fecha_aprobacion', 'instante'),
+    ), _REF_LOTE),
+    'trazabilidad_internacional': Esquema((
+        Columna('codigo_trazabilidad', alias=('trazabilidad',)),
+        _LOTE,
+        Columna('pais_destino', obligatoria=True, alias=('pais',)),
+        Columna('cliente_internacional', alias=('cliente',)),
+        Columna('certificacion_requerida', alias=('certificacion',)),
+        Columna('numero_contenedor', alias=('contenedor',)),
+        # Obligatoria: el historial paginado por keyset ordena por esta fecha y omite las NULL
+        Columna('fecha_embarque', 'fecha', obligatoria=True, alias=('embarque',)),
+        Columna('puerto_destino', alias=('puerto',)),
+        Columna('documentos_exportacion', alias=('documentos',)),
+        Columna('estado_envio', valores=_ESTADOS_ENVIO, por_defecto='PREPARACION', alias=('estado',)),
+    ), _REF_LOTE),
+}
+
+SQL_AVANCE = '''
+    INSERT INTO importaciones (clave, tabla, archivo, filas_procesadas, filas_insertadas, filas_rechazadas, completada, actualizada)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (clave) DO UPDATE SET
+        archivo = excluded.archivo,
+        filas_procesadas = excluded.filas_procesadas,
+        filas_insertadas = excluded.filas_insertadas,
+        filas_rechazadas = excluded.filas_rechazadas,
+        completada = excluded.completada,
+        actualizada = CURRENT_TIMESTAMP
+'''
+
+
+class Avance(NamedTuple):
+    filas_procesadas: int
+    filas_insertadas: int
+    filas_rechazadas: int
+    completada: bool
+
+
+class ResultadoImportacion(NamedTuple):
+    tabla: str
+    filas_leidas: int
+    filas_insertadas: int
+    filas_rechazadas: int
+    segundos: float
+    rechazos_por_motivo: dict
+    # Filas saltadas al reanudar: ya procesadas en una carga anterior
+    filas_omitidas: int = 0
+    completada: bool = False
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas_leidas / self.segundos if self.segundos > 0 else 0.0
+
+
+# --- Lectura ---
+
+def formato_de(nombre):
+    return 'excel' if str(nombre).lower().endswith(('.xlsx', '.xlsm')) else 'csv'
+
+
+def leer_csv(archivo, tamano_bloque=TAMANO_BLOQUE, separador=','):
+    """DataFrames de ``tamano_bloque`` filas con todas las columnas como texto."""
+    # Sin inferencia de tipos ni NaN: la validación decide qué es un número o un vacío
+    yield from pd.read_csv(archivo, sep=separador, chunksize=tamano_bloque, dtype=str, keep_default_na=False,
+                           encoding='utf-8-sig')
+
+
+def _abrir_libro(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise RuntimeError("Importar Excel requiere openpyxl: pip install openpyxl") from e
+    return load_workbook(archivo, read_only=True, data_only=True)
+
+
+def leer_excel(archivo, tamano_bloque=TAMANO_BLOQUE, hoja=None):
+    """Como ``leer_csv`` para la hoja ``hoja`` (la primera si es None) de un libro .xlsx."""
+    libro = _abrir_libro(archivo)
+    try:
+        filas = (libro[hoja] if hoja else libro.worksheets[0]).iter_rows(values_only=True)
+        encabezados = [f"columna_{i + 1}" if valor is None else str(valor).strip()
+                       for i, valor in enumerate(next(filas, ()))]
+        # Las filas en blanco no cuentan, como en read_csv
+        filas = (fila[:len(encabezados)] for fila in filas if any(valor is not None for valor in fila))
+        while True:
+            bloque = list(itertools.islice(filas, tamano_bloque))
+            if not bloque:
+                return
+            yield pd.DataFrame(bloque, columns=encabezados, dtype=object).fillna('').astype(str)
+    finally:
+        libro.close()
+
+
+def leer_bloques(archivo, formato='csv', tamano_bloque=TAMANO_BLOQUE, separador=',', hoja=None):
+    if formato == 'excel':
+        return leer_excel(archivo, tamano_bloque, hoja)
+    return leer_csv(archivo, tamano_bloque, separador)
+
+
+def contar_filas(archivo, formato='csv'):
+    """Filas de datos aproximadas de un archivo binario con seek, para la barra de progreso."""
+    if formato == 'excel':
+        libro = _abrir_libro(archivo)
+        try:
+            return max((libro.worksheets[0].max_row or 1) - 1, 0)
+        finally:
+            libro.close()
+            archivo.seek(0)
+    total = sum(bloque.count(b'\n') for bloque in iter(lambda: archivo.read(BYTES_HUELLA), b''))
+    archivo.seek(0)
+    return max(total - 1, 0)
+
+
+def huella_archivo(archivo):
+    """Clave estable de un archivo (ruta o binario con seek) aunque se mueva o renombre."""
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            return huella_archivo(f)
+    posicion = archivo.tell()
+    tamano = archivo.seek(0, os.SEEK_END)
+    archivo.seek(0)
+    resumen = hashlib.sha1(archivo.read(BYTES_HUELLA)).hexdigest()
+    archivo.seek(posicion)
+    return f"{tamano}:{resumen}"
+
+
+# --- Mapeo y validación ---
+
+def normalizar_encabezado(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode().lower()
+    return re.sub(r'[^a-z0-9]+', '_', texto).strip('_')
+
+
+def mapear_columnas(tabla, encabezados, mapa=None):
+    """{columna de la tabla: encabezado del archivo} por nombre o alias normalizado.
+
+    ``mapa`` ({encabezado: columna}) fija asociaciones que los nombres no
+    deducen y tiene prioridad.
+    """
+    por_normalizado = {}
+    for encabezado in encabezados:
+        por_normalizado.setdefault(normalizar_encabezado(encabezado), encabezado)
+    mapeo = {}
+    for columna in ESQUEMAS[tabla].columnas:
+        for candidato in (columna.nombre,) + columna.alias:
+            if candidato in por_normalizado and por_normalizado[candidato] not in mapeo.values():
+                mapeo[columna.nombre] = por_normalizado[candidato]
+                break
+    for encabezado, columna in (mapa or {}).items():
+        mapeo = {c: e for c, e in mapeo.items() if e != encabezado}
+        mapeo[columna] = encabezado
+    return mapeo
+
+
+def faltantes(tabla, mapeo):
+    """Columnas obligatorias de ``tabla`` sin encabezado en ``mapeo``."""
+    return [c.nombre for c in ESQUEMAS[tabla].columnas if c.obligatoria and c.nombre not in mapeo]
+
+
+def _a_fechas(texto):
+    """Serie datetime (UTC sin zona) de textos ISO 8601 o de FORMATOS_FECHA; NaT si no se reconocen."""
+    fechas = pd.to_datetime(texto, errors='coerce', format='ISO8601', utc=True)
+    for formato in FORMATOS_FECHA:
+        pendientes = fechas.isna() & (texto != '')
+        if not pendientes.any():
+            break
+        fechas[pendientes] = pd.to_datetime(texto[pendientes], errors='coerce', format=formato, utc=True)
+    return fechas.dt.tz_localize(None)
+
+
+def _convertir(texto, columna, ahora):
+    """(valores, motivos) de una columna de texto; los valores vacíos quedan como None o ``por_defecto``."""
+    vacio = texto == ''
+    motivos = {}
+    if columna.obligatoria:
+        motivos[f'{columna.nombre}_vacio'] = vacio
+    if columna.tipo in ('real', 'entero'):
+        # Coma decimal de las hojas en español
+        valores = pd.to_numeric(texto.str.replace(',', '.', regex=False), errors='coerce')
+        invalido = valores.isna() & ~vacio
+        if columna.tipo == 'entero':
+            invalido |= valores.notna() & (valores % 1 != 0)
+        motivos[f'{columna.nombre}_invalido'] = invalido
+        if columna.rango:
+            minimo, maximo = columna.rango
+            fuera = pd.Series(False, index=texto.index)
+            if minimo is not None:
+                fuera |= valores < minimo
+            if maximo is not None:
+                fuera |= valores > maximo
+            motivos[f'{columna.nombre}_fuera_de_rango'] = fuera
+        valores = valores.astype(object).where(valores.notna(), None)
+        if columna.tipo == 'entero':
+            valores = valores.map(lambda v: None if v is None else int(v))
+    elif columna.tipo == 'booleano':
+        minusculas = texto.str.lower()
+        verdadero = minusculas.isin(VERDADEROS)
+        motivos[f'{columna.nombre}_invalido'] = ~vacio & ~verdadero & ~minusculas.isin(FALSOS)
+        valores = verdadero.astype(int).astype(object).where(~vacio, None)
+    elif columna.tipo in ('fecha', 'instante'):
+        fechas = _a_fechas(texto)
+        motivos[f'{columna.nombre}_invalido'] = fechas.isna() & ~vacio
+        formato = '%Y-%m-%d' if columna.tipo == 'fecha' else '%Y-%m-%d %H:%M:%S'
+        valores = fechas.dt.strftime(formato).astype(object).where(fechas.notna(), None)
+    else:
+        valores = texto.astype(object)
+        if columna.valores:
+            valores = texto.str.upper().astype(object)
+            motivos[f'{columna.nombre}_no_permitido'] = ~vacio & ~valores.isin(columna.valores)
+        valores = valores.where(~vacio, None)
+    por_defecto = ahora if columna.por_defecto == AHORA else columna.por_defecto
+    if por_defecto is not None:
+        valores = valores.where(~vacio, por_defecto)
+    return valores, motivos
+
+
+def validar_bloque(tabla, bloque, mapeo, referidos=None, ahora=None):
+    """Devuelve (valores, motivos) de un bloque leído como texto.
+
+    ``valores`` es un DataFrame con las columnas de ``ESQUEMAS[tabla]``
+    listas para insertar (None donde no hay dato) y ``motivos`` asocia
+    cada motivo de rechazo con su máscara booleana. ``referidos`` es el
+    índice de códigos existentes de la tabla referida (ver
+    ``cargar_referidos``); los códigos repetidos en la base los detecta
+    ``_cargar_bloque`` dentro de la transacción.
+    """
+    esquema = ESQUEMAS[tabla]
+    ahora = ahora or datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    vacia = pd.Series('', index=bloque.index, dtype=object)
+    valores = {}
+    motivos = {}
+    for columna in esquema.columnas:
+        texto = bloque[mapeo[columna.nombre]].astype(str).str.strip() if columna.nombre in mapeo else vacia
+        valores[columna.nombre], motivos_columna = _convertir(texto, columna, ahora)
+        motivos.update(motivos_columna)
+
+    codigo = valores[esquema.columnas[0].nombre]
+    motivos['codigo_repetido_en_archivo'] = codigo.notna() & codigo.duplicated(keep='first')
+    if esquema.referencia is not None and referidos is not None:
+        columna = esquema.referencia[0]
+        motivos[f'{columna}_inexistente'] = valores[columna].notna() & ~valores[columna].isin(referidos)
+    return pd.DataFrame(valores), {m: mascara.to_numpy(dtype=bool) for m, mascara in motivos.items()}
+
+
+def cargar_referidos(conn, tabla):
+    """Índice de los códigos que deben existir para las filas de ``tabla`` (vacío si no tiene referencia)."""
+    referencia = ESQUEMAS[tabla].referencia
+    if referencia is None:
+        return None
+    _, tabla_referida, columna_referida = referencia
+    return pd.Index([fila[0] for fila in conn.execute(f"SELECT {columna_referida} FROM {tabla_referida}")])
+
+
+# --- Carga ---
+
+def estado_importacion(conn, clave):
+    """Avance guardado de la importación ``clave`` o None."""
+    fila = conn.execute("""
+        SELECT filas_procesadas, filas_insertadas, filas_rechazadas, completada FROM importaciones WHERE clave = ?
+    """, (clave,)).fetchone()
+    return None if fila is None else Avance(fila[0], fila[1], fila[2], bool(fila[3]))
+
+
+def _cargar_bloque(conn, tabla, valores, clave, archivo, avance):
+    """Inserta las filas válidas de un bloque y guarda el avance; devuelve la máscara de códigos ya existentes.
+
+    ``avance`` es el Avance acumulado incluyendo este bloque, sin contar
+    aún los rechazos por código existente.
+    """
+    columna_codigo = COLUMNAS_CODIGO[tabla]
+    codigos = valores[columna_codigo]
+    existentes = set()
+    if codigos.notna().any():
+        existentes = {fila[0] for fila in conn.execute(
+            f"SELECT j.value FROM json_each(?) j JOIN {tabla} t ON t.{columna_codigo} = j.value",
+            (json.dumps(codigos.dropna().tolist()),))}
+    repetidos = codigos.isin(existentes).to_numpy(dtype=bool)
+    valores = valores[~repetidos]
+
+    if len(valores):
+        sin_codigo = valores[columna_codigo].isna()
+        if sin_codigo.any():
+            valores = valores.copy()
+            valores.loc[sin_codigo, columna_codigo] = reservar_codigos(conn, tabla, int(sin_codigo.sum()))
+        numeros = valores[columna_codigo].str.extract(patron_codigo(tabla), expand=False).dropna()
+        if not numeros.empty:
+            avanzar_secuencia(conn, tabla, numeros.astype('int64').max())
+        filas = list(valores.itertuples(index=False, name=None))
+        if tabla == 'lecturas_sensores':
+            # Los rollups se ponen al día una sola vez al terminar (ver importar)
+            insertar_filas(conn, filas, rollups=False)
+        else:
+            conn.executemany(f"INSERT INTO {tabla} ({', '.join(valores.columns)}) "
+                             f"VALUES ({', '.join('?' * len(valores.columns))})", filas)
+        if tabla in FUENTES_SPC:
+            actualizar_spc(conn, tabla, alertar=False)
+        if tabla in TABLAS_INDEXADAS:
+            while actualizar_linaje(conn):
+                pass
+
+    rechazados = int(repetidos.sum())
+    conn.execute(SQL_AVANCE, (clave, tabla, archivo, avance.filas_procesadas, avance.filas_insertadas - rechazados,
+                              avance.filas_rechazadas + rechazados, 0))
+    return repetidos
+
+
+def _finalizar(conn, tabla, clave, archivo, avance):
+    if tabla == 'lecturas_sensores':
+        actualizar_rollups(conn)
+    conn.execute(SQL_AVANCE, (clave, tabla, archivo) + tuple(avance[:3]) + (1,))
+
+
+def _escribir_rechazos(destino, bloque, numeros, motivos, rechazo, encabezado):
+    filas = bloque[rechazo].copy()
+    filas.insert(0, 'fila', numeros[rechazo])
+    texto = np.full(int(rechazo.sum()), '', dtype=object)
+    for motivo, mascara in motivos.items():
+        texto = texto + np.where(mascara[rechazo], f"{motivo};", '')
+    filas['motivos'] = [t.rstrip(';') for t in texto]
+    filas.to_csv(destino, header=encabezado, index=False)
+
+
+def importar(pool, tabla, bloques, clave, archivo=None, mapeo=None, reanudar=True, rechazos=None, escritor=None,
+             progreso=None):
+    """Valida e inserta los bloques (DataFrames de texto) de un archivo; devuelve un ResultadoImportacion.
+
+    ``clave`` identifica el archivo (``tabla:huella``, ver
+    ``clave_importacion``). Con ``reanudar`` se saltan las filas que una
+    carga anterior con la misma clave ya confirmó; sin él se empieza de
+    cero. ``mapeo`` es el de ``mapear_columnas`` (por defecto se deduce de
+    los encabezados). Las filas rechazadas se escriben como CSV en
+    ``rechazos`` (un archivo de texto abierto) con su número de fila y
+    motivos. Con ``escritor`` (ver ``tps_escritor``) cada bloque se carga a
+    través de la cola del escritor único; ``progreso`` recibe un
+    ResultadoImportacion parcial tras cada bloque.
+    """
+    inicio = time.perf_counter()
+    with pool.conexion() as conn:
+        referidos = cargar_referidos(conn, tabla)
+        previo = estado_importacion(conn, clave)
+    if previo is None or not reanudar:
+        previo = Avance(0, 0, 0, False)
+    omitir = previo.filas_procesadas
+    avance = previo
+    leidas = insertadas = rechazadas = 0
+    rechazos_por_motivo = {}
+    fila = 0
+
+    def resultado(completada=False):
+        return ResultadoImportacion(tabla, leidas, insertadas, rechazadas, time.perf_counter() - inicio,
+                                    rechazos_por_motivo, omitir, completada)
+
+    def cargar(*args):
+        if escritor is not None:
+            return escritor.ejecutar(*args, nombre=f"importar_{tabla}")
+        fn, *resto = args
+        with pool.transaccion() as conn:
+            return fn(conn, *resto)
+
+    if previo.completada:
+        return resultado(True)
+
+    for bloque in bloques:
+        if mapeo is None:
+            mapeo = mapear_columnas(tabla, bloque.columns)
+        sin_mapear = faltantes(tabla, mapeo)
+        if sin_mapear:
+            raise ValueError(f"Faltan columnas obligatorias de {tabla}: {', '.join(sin_mapear)}")
+        desde = fila
+        fila += len(bloque)
+        if fila <= omitir:
+            continue
+        if desde < omitir:
+            bloque = bloque.iloc[omitir - desde:]
+            desde = omitir
+        bloque = bloque.reset_index(drop=True)
+        numeros = np.arange(desde + 1, fila + 1)
+
+        valores, motivos = validar_bloque(tabla, bloque, mapeo, referidos)
+        rechazo = np.zeros(len(bloque), dtype=bool)
+        for mascara in motivos.values():
+            rechazo |= mascara
+        validas = int((~rechazo).sum())
+        avance = Avance(fila, avance.filas_insertadas + validas, avance.filas_rechazadas + len(bloque) - validas, False)
+        repetidos = cargar(_cargar_bloque, tabla, valores[~rechazo], clave, archivo, avance)
+
+        motivos['codigo_existente'] = np.zeros(len(bloque), dtype=bool)
+        motivos['codigo_existente'][np.flatnonzero(~rechazo)[repetidos]] = True
+        rechazo |= motivos['codigo_existente']
+        avance = avance._replace(filas_insertadas=avance.filas_insertadas - int(repetidos.sum()),
+                                 filas_rechazadas=avance.filas_rechazadas + int(repetidos.sum()))
+        for motivo, mascara in motivos.items():
+            total = int(mascara.sum())
+            if total:
+                rechazos_por_motivo[motivo] = rechazos_por_motivo.get(motivo, 0) + total
+        if rechazos is not None and rechazo.any():
+            _escribir_rechazos(rechazos, bloque, numeros, motivos, rechazo, encabezado=rechazos.tell() == 0)
+        leidas += len(bloque)
+        rechazadas += int(rechazo.sum())
+        insertadas += len(bloque) - int(rechazo.sum())
+        if progreso is not None:
+            progreso(resultado())
+
+    cargar(_finalizar, tabla, clave, archivo, avance)
+    return resultado(True)
+
+
+def clave_importacion(tabla, archivo):
+    return f"{tabla}:{huella_archivo(archivo)}"
+
+
+def _mapa(pares):
+    mapa = {}
+    for par in pares:
+        encabezado, separador, columna = par.partition('=')
+        if not separador:
+            raise argparse.ArgumentTypeError(f"--mapa espera ENCABEZADO=columna: {par}")
+        mapa[encabezado] = columna
+    return mapa
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importación de registros históricos de calidad TPS desde CSV o Excel")
+    parser.add_argument('tabla', choices=sorted(ESQUEMAS), help="Tabla de destino")
+    parser.add_argument('archivo', help="Archivo CSV o Excel (.xlsx)")
+    parser.add_argument('--hoja', default=None, help="Hoja del libro Excel (por defecto la primera)")
+    parser.add_argument('--separador', default=',', help="Separador de campos del CSV")
+    parser.add_argument('--mapa', action='append', default=[], metavar='ENCABEZADO=COLUMNA',
+                        help="Asociar un encabezado del archivo con una columna de la tabla (repetible)")
+    parser.add_argument('--rechazos', default=None,
+                        help="CSV donde escribir las filas rechazadas (por defecto ARCHIVO.rechazos.csv)")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE, help="Filas por bloque y transacción")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument('--reanudar', action='store_true',
+                      help="Seguir una importación interrumpida del mismo archivo desde su último bloque confirmado")
+    modo.add_argument('--desde-cero', action='store_true',
+                      help="Volver a importar el archivo aunque haya una importación anterior registrada")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    # Importación local: tps_migraciones importa módulos que usan tps_codigos
+    from tps_migraciones import aplicar_migraciones
+
+    formato = formato_de(args.archivo)
+    clave = clave_importacion(args.tabla, args.archivo)
+    ruta_rechazos = args.rechazos or f"{args.archivo}.rechazos.csv"
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        with pool.conexion() as conn:
+            previo = estado_importacion(conn, clave)
+        if previo is not None and not (args.reanudar or args.desde_cero):
+            estado = "completa" if previo.completada else f"interrumpida en la fila {previo.filas_procesadas:,}"
+            print(f"Este archivo ya tiene una importación {estado} en {args.tabla}: "
+                  f"use --reanudar para continuarla o --desde-cero para repetirla")
+            return 2
+
+        bloques = leer_bloques(args.archivo, formato, args.tamano_bloque, args.separador, args.hoja)
+        primero = next(bloques, None)
+        if primero is None:
+            print("El archivo no tiene filas")
+            return 0
+        mapeo = mapear_columnas(args.tabla, primero.columns, _mapa(args.mapa))
+        sin_mapear = faltantes(args.tabla, mapeo)
+        if sin_mapear:
+            print(f"Faltan columnas obligatorias de {args.tabla}: {', '.join(sin_mapear)} (use --mapa)")
+            return 2
+        ignoradas = [encabezado for encabezado in primero.columns if encabezado not in mapeo.values()]
+        if ignoradas:
+            print(f"Columnas ignoradas: {', '.join(ignoradas)}")
+
+        def informar(parcial):
+            print(f"\r{parcial.filas_omitidas + parcial.filas_leidas:,} filas | "
+                  f"{parcial.filas_por_segundo:,.0f} filas/s", end='', file=sys.stderr)
+
+        with open(ruta_rechazos, 'a' if args.reanudar else 'w', newline='', encoding='utf-8') as rechazos:
+            resultado = importar(pool, args.tabla, itertools.chain([primero], bloques), clave,
+                                 os.path.basename(args.archivo), mapeo, reanudar=args.reanudar, rechazos=rechazos,
+                                 progreso=informar)
+        print(file=sys.stderr)
+    finally:
+        pool.cerrar()
+
+    if resultado.filas_omitidas:
+        print(f"Reanudada: {resultado.filas_omitidas:,} filas ya importadas antes")
+    print(f"Leídas: {resultado.filas_leidas:,} | Insertadas: {resultado.filas_insertadas:,} | "
+          f"Rechazadas: {resultado.filas_rechazadas:,}")
+    print(f"Tiempo: {resultado.segundos:.2f}s | {resultado.filas_por_segundo:,.0f} filas/s")
+    for motivo, total in sorted(resultado.rechazos_por_motivo.items()):
+        print(f"  - {motivo}: {total:,}")
+    if resultado.filas_rechazadas:
+        print(f"Filas rechazadas en {ruta_rechazos}")
+    return 0 if resultado.filas_rechazadas == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
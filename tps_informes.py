@@ -0,0 +1,218 @@
+"""Motor de decisión para informes consolidados de calidad.
+
+Para los lotes EN_PROCESO sin informe, el último resultado de cada
+fuente (inspección visual, laboratorio, envases y sensores, con la
+proporción de lecturas con alerta) se lee de ``lote_resumen``, una fila
+por lote mantenida al escribir (ver ``tps_resumen``). La decisión y el
+porcentaje de calidad ponderado se calculan vectorizados sobre todos los
+lotes, y los informes junto con el cambio de estado de cada lote se
+escriben en una única transacción.
+
+Uso desde línea de comandos::
+
+    python tps_informes.py --responsable "Ing. Roberto Silva"
+    python tps_informes.py --responsable "Ing. Roberto Silva" --incluir-pendientes --destino "Exportación USA"
+    python tps_informes.py --responsable "Ing. Roberto Silva" --simular
+"""
+import argparse
+import datetime
+import sys
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from tps_codigos import reservar_codigos
+from tps_db import DB_PATH, PoolConexiones
+from tps_migraciones import aplicar_migraciones
+
+# Peso de cada fuente en porcentaje_calidad_total; las fuentes sin resultado
+# se excluyen y los pesos restantes se renormalizan.
+PESOS_CALIDAD = {
+    'visual': 0.35,
+    'sensores': 0.20,
+    'fisicoquimico': 0.30,
+    'envases': 0.15,
+}
+
+# Puntaje de los resultados categóricos (PENDIENTE/OBSERVADO no puntúan)
+PUNTAJE_RESULTADO = {'APROBADO': 100.0, 'RECHAZADO': 0.0}
+
+ESTADO_POR_DECISION = {'APROBADO': 'APROBADO', 'RECHAZADO': 'RECHAZADO', 'PENDIENTE': 'EN_REVISION'}
+
+DESTINOS_COMERCIALES = ["Exportación USA", "Exportación Europa", "Exportación Asia", "Mercado Nacional"]
+
+# Tablas de las que sale lote_resumen por triggers; la parte de sensores avanza con su marca en rollup_estado
+TABLAS_RESULTADOS = ('productos_agro', 'lotes_produccion', 'inspecciones_visuales', 'pruebas_fisicoquimicas',
+                     'compatibilidad_envases', 'alertas_automaticas', 'informes_calidad')
+
+# Una fila por lote pendiente, leída del resumen materializado (ver tps_resumen)
+CONSULTA_RESULTADOS = """
+    SELECT lr.codigo_lote, pa.nombre_producto, lr.cantidad_kg,
+           lr.resultado_visual AS resultado_inspeccion_visual, lr.porcentaje_conformidad,
+           lr.resultado_fisicoquimico, lr.resultado_envases,
+           lr.estado_sensores, lr.lecturas, lr.lecturas_con_alerta
+    FROM lote_resumen lr
+    JOIN productos_agro pa ON lr.codigo_producto = pa.codigo_producto
+    WHERE lr.estado_lote = 'EN_PROCESO' AND lr.codigo_informe IS NULL
+      {filtro_lotes}
+    ORDER BY lr.codigo_lote
+"""
+
+SQL_INSERTAR_INFORME = '''
+    INSERT INTO informes_calidad (codigo_informe, codigo_lote, resultado_inspeccion_visual, resultado_sensores, resultado_fisicoquimico, resultado_envases, decision_final, porcentaje_calidad_total, certificaciones_obtenidas, destino_comercial, responsable_aprobacion, fecha_aprobacion)
+    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM informes_calidad WHERE codigo_lote = ?)
+'''
+
+
+class ResultadoLote(NamedTuple):
+    evaluados: int
+    generados: int
+    por_decision: dict
+    codigos_informe: list
+    decisiones: pd.DataFrame
+
+
+def _consulta(codigos_lote=None):
+    filtro = ""
+    if codigos_lote is not None:
+        filtro = f"AND lr.codigo_lote IN ({', '.join('?' for _ in codigos_lote)})"
+    return CONSULTA_RESULTADOS.format(filtro_lotes=filtro)
+
+
+def leer_resultados(conn, codigos_lote=None):
+    """Últimos resultados por fuente de los lotes pendientes de informe (opcionalmente solo ``codigos_lote``)."""
+    params = list(codigos_lote) if codigos_lote is not None else []
+    df = pd.read_sql_query(_consulta(codigos_lote), conn, params=params)
+    for columna in ('resultado_inspeccion_visual', 'resultado_fisicoquimico', 'resultado_envases'):
+        df[columna] = df[columna].fillna('PENDIENTE')
+    df['resultado_sensores'] = np.where(df['estado_sensores'] == 'OPERATIVO', 'NORMAL', 'ALERTA')
+    return df
+
+
+def _puntaje(resultados):
+    return pd.Series(resultados).map(PUNTAJE_RESULTADO).to_numpy(dtype=float)
+
+
+def decidir(resultados):
+    """Agrega decision_final, porcentaje_calidad_total y nuevo_estado a una copia de ``resultados``."""
+    df = resultados.copy()
+    visual = df['resultado_inspeccion_visual'].to_numpy()
+    fisicoquimico = df['resultado_fisicoquimico'].to_numpy()
+    envases = df['resultado_envases'].to_numpy()
+
+    aprobado = (visual == 'APROBADO') & (fisicoquimico == 'APROBADO') & (envases == 'APROBADO') & \
+        (df['resultado_sensores'].to_numpy() == 'NORMAL')
+    rechazado = (visual == 'RECHAZADO') | (fisicoquimico == 'RECHAZADO') | (envases == 'RECHAZADO')
+    df['decision_final'] = np.select([aprobado, rechazado], ['APROBADO', 'RECHAZADO'], 'PENDIENTE')
+
+    # Puntaje por fuente (NaN = sin resultado) y media ponderada con pesos renormalizados
+    lecturas = df['lecturas'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        puntaje_sensores = np.clip(100.0 * (1.0 - df['lecturas_con_alerta'].to_numpy(dtype=float) / lecturas), 0.0, 100.0)
+    puntaje_sensores[~(lecturas > 0)] = np.nan
+    puntajes = np.column_stack([
+        df['porcentaje_conformidad'].to_numpy(dtype=float),
+        puntaje_sensores,
+        _puntaje(fisicoquimico),
+        _puntaje(envases),
+    ])
+    pesos = np.array([PESOS_CALIDAD['visual'], PESOS_CALIDAD['sensores'],
+                      PESOS_CALIDAD['fisicoquimico'], PESOS_CALIDAD['envases']])
+    disponibles = ~np.isnan(puntajes)
+    peso_total = (disponibles * pesos).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        porcentaje = np.where(disponibles, puntajes, 0.0) @ pesos / peso_total
+    df['porcentaje_calidad_total'] = np.round(porcentaje, 1)
+    df['nuevo_estado'] = df['decision_final'].map(ESTADO_POR_DECISION)
+    return df
+
+
+def registrar_informes(conn, decisiones, responsable, destino_comercial, certificaciones=''):
+    """Inserta los informes y actualiza el estado de los lotes; devuelve los códigos generados.
+
+    Los lotes que ya tienen informe (otro usuario se adelantó) se omiten.
+    """
+    if decisiones.empty:
+        return []
+    # UTC y en texto, como CURRENT_TIMESTAMP y el resto de las fechas que se guardan
+    ahora = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    codigos = reservar_codigos(conn, 'informes_calidad', len(decisiones))
+    lotes = decisiones['codigo_lote'].tolist()
+    porcentajes = [None if np.isnan(p) else p for p in decisiones['porcentaje_calidad_total'].tolist()]
+    filas = list(zip(
+        codigos,
+        lotes,
+        decisiones['resultado_inspeccion_visual'].tolist(),
+        decisiones['resultado_sensores'].tolist(),
+        decisiones['resultado_fisicoquimico'].tolist(),
+        decisiones['resultado_envases'].tolist(),
+        decisiones['decision_final'].tolist(),
+        porcentajes,
+        [certificaciones] * len(lotes),
+        [destino_comercial] * len(lotes),
+        [responsable] * len(lotes),
+        [ahora] * len(lotes),
+        lotes,
+    ))
+    conn.executemany(SQL_INSERTAR_INFORME, filas)
+    # Solo cambian de estado los lotes cuyo informe se insertó en esta llamada
+    conn.executemany('''
+        UPDATE lotes_produccion SET estado_lote = ?
+        WHERE codigo_lote = ? AND estado_lote = 'EN_PROCESO'
+          AND EXISTS (SELECT 1 FROM informes_calidad WHERE codigo_informe = ?)
+    ''', [(ESTADO_POR_DECISION[fila[6]], fila[1], fila[0]) for fila in filas])
+    return [fila[0] for fila in conn.execute(
+        "SELECT codigo_informe FROM informes_calidad WHERE codigo_informe BETWEEN ? AND ? ORDER BY codigo_informe",
+        (codigos[0], codigos[-1]))]
+
+
+def generar_informes_pendientes(pool, responsable, destino_comercial=DESTINOS_COMERCIALES[-1],
+                                incluir_pendientes=False, simular=False):
+    """Evalúa todos los lotes pendientes y genera sus informes en una transacción.
+
+    Sin ``incluir_pendientes`` solo se cierran los lotes con decisión
+    APROBADO o RECHAZADO; el resto sigue EN_PROCESO a la espera de resultados.
+    """
+    with pool.transaccion() as conn:
+        decisiones = decidir(leer_resultados(conn))
+        a_generar = decisiones if incluir_pendientes else decisiones[decisiones['decision_final'] != 'PENDIENTE']
+        codigos = [] if simular else registrar_informes(conn, a_generar, responsable, destino_comercial)
+    return ResultadoLote(
+        evaluados=len(decisiones),
+        generados=len(codigos),
+        por_decision=a_generar['decision_final'].value_counts().to_dict(),
+        codigos_informe=codigos,
+        decisiones=decisiones,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generación por lotes de informes consolidados de calidad")
+    parser.add_argument('--responsable', required=True, help="Responsable de aprobación registrado en los informes")
+    parser.add_argument('--destino', choices=DESTINOS_COMERCIALES, default=DESTINOS_COMERCIALES[-1],
+                        help="Destino comercial de los informes generados")
+    parser.add_argument('--incluir-pendientes', action='store_true',
+                        help="Generar también los informes PENDIENTE (el lote pasa a EN_REVISION)")
+    parser.add_argument('--simular', action='store_true', help="Evaluar y mostrar decisiones sin escribir")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        resultado = generar_informes_pendientes(pool, args.responsable, args.destino,
+                                                args.incluir_pendientes, args.simular)
+    finally:
+        pool.cerrar()
+
+    print(f"Lotes evaluados: {resultado.evaluados} | Informes generados: {resultado.generados}"
+          + (" (simulación)" if args.simular else ""))
+    for decision, total in sorted(resultado.por_decision.items()):
+        print(f"  - {decision}: {total}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
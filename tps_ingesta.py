@@ -0,0 +1,394 @@
+"""Ingesta masiva de lecturas de sensores en ``lecturas_sensores``.
+
+Acepta iterables de diccionarios, archivos CSV o NDJSON. Las lecturas se
+procesan en bloques: cada bloque se valida de forma vectorizada con NumPy,
+se evalúa contra los umbrales de alerta (``tps_alertas``) y se inserta con
+``executemany`` dentro de una transacción propia. Rollups, resumen por
+lote y cartas de control no se tocan en los bloques: se ponen al día
+después desde sus marcas (ver ``tps_series.poner_al_dia``).
+
+Uso desde línea de comandos::
+
+    python tps_ingesta.py lecturas.csv
+    python tps_ingesta.py lecturas.ndjson --formato ndjson --tamano-bloque 20000
+    cat lecturas.ndjson | python tps_ingesta.py - --formato ndjson
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import sys
+import time
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from tps_alertas import MotorAlertas
+from tps_codigos import reservar_codigos
+from tps_db import DB_PATH, PoolConexiones
+from tps_migraciones import aplicar_migraciones
+from tps_series import actualizar_rollups, poner_al_dia
+
+# Columna de lecturas_sensores -> alias aceptado en la entrada
+CAMPOS_SENSOR = {
+    'sensor_temperatura': 'temperatura',
+    'sensor_peso': 'peso',
+    'sensor_humedad': 'humedad',
+    'sensor_ph': 'ph',
+    'sensor_brix': 'brix',
+}
+
+# Rangos físicamente posibles; fuera de ellos la lectura es un fallo del sensor.
+# Los rangos óptimos (2-8°C, 85-95%...) generan alertas, no rechazos.
+RANGOS_VALIDOS = {
+    'sensor_temperatura': (-40.0, 60.0),
+    'sensor_peso': (0.0, 1000.0),
+    'sensor_humedad': (0.0, 100.0),
+    'sensor_ph': (0.0, 14.0),
+    'sensor_brix': (0.0, 40.0),
+}
+
+TAMANO_BLOQUE = 5000
+MAX_EJEMPLOS_RECHAZO = 20
+
+SQL_INSERTAR_LECTURA = '''
+    INSERT INTO lecturas_sensores (codigo_lectura, codigo_lote, timestamp_lectura, sensor_temperatura, sensor_peso, sensor_humedad, sensor_ph, sensor_brix, estado_sensores, alerta_generada)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class ResultadoIngesta(NamedTuple):
+    filas_leidas: int
+    filas_insertadas: int
+    filas_rechazadas: int
+    segundos: float
+    rechazos_por_motivo: dict
+    ejemplos_rechazo: list
+    alertas_generadas: int = 0
+    # (posición en la entrada, motivos) de cada fila rechazada; solo con detallar_rechazos
+    rechazos: list = None
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas_insertadas / self.segundos if self.segundos > 0 else 0.0
+
+
+class ContextoIngesta(NamedTuple):
+    # codigo_lote -> codigo_producto de los lotes existentes
+    producto_por_lote: dict
+    # None si no se evalúan alertas
+    motor: MotorAlertas
+
+
+def cargar_contexto(conn, evaluar_alertas=True):
+    """Lotes y umbrales que necesita ``ingestar_lecturas``; reutilizable entre llamadas."""
+    producto_por_lote = dict(conn.execute("SELECT codigo_lote, codigo_producto FROM lotes_produccion"))
+    motor = MotorAlertas.cargar(conn, producto_por_lote) if evaluar_alertas else None
+    return ContextoIngesta(producto_por_lote, motor)
+
+
+def _columna(bloque, nombre):
+    """Arreglo object con el campo ``nombre`` de cada registro (None donde no llega)."""
+    return np.fromiter((r.get(nombre) for r in bloque), dtype=object, count=len(bloque))
+
+
+def _con_dato(valores):
+    return ~np.equal(valores, None) & (valores != '')
+
+
+def _a_numeros(valores):
+    """float por columna; NaN en lo vacío o no numérico."""
+    try:
+        return np.asarray(valores, dtype=float)
+    except (TypeError, ValueError):
+        # Algún texto no numérico o vacío: conversión tolerante, también vectorizada
+        return pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce').to_numpy(dtype=float)
+
+
+def _a_instantes(textos):
+    # NumPy pasa a UTC las zonas ("Z", "+05:00") y avisa de que no las conserva
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        try:
+            return np.array(textos, dtype='datetime64[s]')
+        except (TypeError, ValueError):
+            pass
+        instantes = np.full(len(textos), np.datetime64('NaT'), dtype='datetime64[s]')
+        for i, texto in enumerate(textos):
+            try:
+                instantes[i] = np.datetime64(texto, 's')
+            except (TypeError, ValueError):
+                pass
+        return instantes
+
+
+def _a_texto(instantes):
+    """'AAAA-MM-DD HH:MM:SS' en UTC, el formato que ordenan las consultas por ventana, rollups y keyset."""
+    textos = np.char.replace(np.datetime_as_string(instantes, unit='s'), 'T', ' ').astype(object)
+    textos[np.isnat(instantes)] = None
+    return textos
+
+
+def _nulos(valores):
+    """Lista para executemany con None en lugar de NaN."""
+    return np.where(np.isnan(valores), None, valores).tolist()
+
+
+def leer_csv(archivo):
+    yield from csv.DictReader(archivo)
+
+
+def leer_ndjson(archivo):
+    for linea in archivo:
+        linea = linea.strip()
+        if linea:
+            yield json.loads(linea)
+
+
+def validar_bloque(bloque, lotes_validos=None, codigos_existentes=None):
+    """Devuelve (columnas, mascara_valida, motivos) para un bloque de registros.
+
+    ``columnas`` son arreglos NumPy por columna (NaN en los canales que no
+    llegan); ``motivos`` asocia cada motivo de rechazo con su máscara
+    booleana. ``lotes_validos`` es un conjunto (o vista de claves de dict)
+    con los códigos de lote existentes y ``codigos_existentes`` una función
+    que recibe los ``codigo_lectura`` del bloque y devuelve los que ya
+    están en la base. De un código repetido en el bloque se acepta la
+    primera fila que pase el resto de la validación.
+    """
+    n = len(bloque)
+    ahora = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    lotes = _columna(bloque, 'codigo_lote')
+    lotes = np.where(_con_dato(lotes), lotes, '').astype(str).astype(object)
+    timestamps = _columna(bloque, 'timestamp_lectura')
+    instantes = _a_instantes(np.where(_con_dato(timestamps), timestamps, ahora).tolist())
+    codigos = _columna(bloque, 'codigo_lectura')
+    con_codigo = _con_dato(codigos)
+    estados = _columna(bloque, 'estado_sensores')
+    # Se guarda el instante normalizado, no el texto recibido ("...T10:00:00Z" ordenaría mal)
+    columnas = {
+        'codigo_lote': lotes,
+        'timestamp_lectura': _a_texto(instantes),
+        'instante': instantes,
+        'codigo_lectura': np.where(con_codigo, codigos, None),
+        'con_codigo': con_codigo,
+        'estado_sensores': np.where(_con_dato(estados), estados, 'OPERATIVO'),
+    }
+    motivos = {'lote_vacio': lotes == '', 'timestamp_invalido': np.isnat(instantes)}
+    if lotes_validos is not None:
+        # Búsqueda en conjunto: np.isin sobre arreglos object compara todos contra todos
+        existe = np.fromiter((lote in lotes_validos for lote in lotes.tolist()), dtype=bool, count=n)
+        motivos['lote_inexistente'] = ~motivos['lote_vacio'] & ~existe
+
+    # Un canal ausente se guarda NULL (el esquema lo admite); solo se valida lo que llega
+    con_valor = np.zeros(n, dtype=bool)
+    for columna, (minimo, maximo) in RANGOS_VALIDOS.items():
+        crudos = _columna(bloque, columna)
+        faltan = np.equal(crudos, None)
+        if faltan.any():
+            crudos = np.where(faltan, _columna(bloque, CAMPOS_SENSOR[columna]), crudos)
+        presentes = _con_dato(crudos)
+        valores = _a_numeros(crudos)
+        columnas[columna] = valores
+        con_valor |= presentes
+        motivos[f'{columna}_invalido'] = presentes & ~np.isfinite(valores)
+        with np.errstate(invalid='ignore'):
+            motivos[f'{columna}_fuera_de_rango'] = (valores < minimo) | (valores > maximo)
+    motivos['sin_valores'] = ~con_valor
+
+    rechazo = np.zeros(n, dtype=bool)
+    for mascara in motivos.values():
+        rechazo |= mascara
+    # Un código ya guardado, o ya usado por una fila válida anterior del bloque, haría fallar el INSERT entero
+    candidatos = con_codigo & ~rechazo
+    duplicado = np.zeros(n, dtype=bool)
+    if candidatos.any():
+        propios = pd.Series(codigos[candidatos], dtype=object).astype(str)
+        repetidos = propios.duplicated(keep='first')
+        if codigos_existentes is not None:
+            repetidos |= propios.isin(set(codigos_existentes(propios.unique().tolist())))
+        duplicado[candidatos] = repetidos.to_numpy(dtype=bool)
+    motivos['codigo_duplicado'] = duplicado
+    return columnas, ~(rechazo | duplicado), motivos
+
+
+def codigos_guardados(conn, codigos, tamano=500):
+    """Los ``codigos`` de lectura que ya están en lecturas_sensores."""
+    encontrados = []
+    for inicio in range(0, len(codigos), tamano):
+        parte = codigos[inicio:inicio + tamano]
+        encontrados += [fila[0] for fila in conn.execute(
+            f"SELECT codigo_lectura FROM lecturas_sensores WHERE codigo_lectura IN ({', '.join('?' * len(parte))})",
+            parte)]
+    return encontrados
+
+
+def filas_para_insertar(columnas, validas, codigos_reservados, alerta_generada=None):
+    """Tuplas listas para ``executemany`` con las filas válidas del bloque.
+
+    ``alerta_generada`` está alineado con las filas válidas y
+    ``codigos_reservados`` (de ``tps_codigos.reservar_codigos``) con las
+    válidas sin ``codigo_lectura``; las que lo traen lo conservan.
+    """
+    indices = np.flatnonzero(validas)
+    codigos = columnas['codigo_lectura'][indices]
+    codigos[~columnas['con_codigo'][indices]] = codigos_reservados
+    return list(zip(
+        codigos.tolist(),
+        columnas['codigo_lote'][indices].tolist(),
+        columnas['timestamp_lectura'][indices].tolist(),
+        _nulos(columnas['sensor_temperatura'][indices]),
+        _nulos(columnas['sensor_peso'][indices]),
+        _nulos(columnas['sensor_humedad'][indices]),
+        _nulos(columnas['sensor_ph'][indices]),
+        _nulos(columnas['sensor_brix'][indices]),
+        columnas['estado_sensores'][indices].tolist(),
+        itertools.repeat(0) if alerta_generada is None else alerta_generada.astype(int).tolist(),
+    ))
+
+
+def insertar_filas(conn, filas, rollups=True):
+    """Inserta lecturas ya validadas; todo INSERT en lecturas_sensores pasa por aquí.
+
+    Con ``rollups=False`` los rollups quedan pendientes hasta la próxima
+    llamada a ``actualizar_rollups``, que retoma desde su última marca.
+    """
+    conn.executemany(SQL_INSERTAR_LECTURA, filas)
+    # Sin triggers por fila para estos contadores (migraciones 5 y 9)
+    conn.execute("UPDATE kpi_contadores SET valor = valor + ? WHERE clave = 'total_lecturas'", (len(filas),))
+    conn.execute("UPDATE generaciones_tablas SET generacion = generacion + 1 WHERE tabla = 'lecturas_sensores'")
+    if rollups:
+        actualizar_rollups(conn)
+
+
+def ingestar_lecturas(pool, registros, tamano_bloque=TAMANO_BLOQUE, validar_lotes=True,
+                      evaluar_alertas=True, contexto=None, detallar_rechazos=False):
+    """Valida e inserta lecturas por bloques; devuelve un ResultadoIngesta.
+
+    Los rollups, el resumen por lote y las cartas de control quedan
+    pendientes: quien ingesta los pone al día cuando le conviene con
+    ``tps_series.poner_al_dia`` (o ``mantener_derivados`` en el escritor
+    único), en tandas que no alargan la transacción de cada bloque. Con
+    ``evaluar_alertas`` cada bloque se evalúa contra los umbrales y las
+    excursiones se registran como episodios en alertas_automaticas.
+    Quien ingesta muchas veces seguidas (el gateway IoT) puede pasar un
+    ``contexto`` de ``cargar_contexto`` para no releer lotes y umbrales.
+    Con ``detallar_rechazos`` el resultado lista los motivos de cada fila
+    rechazada, para responder línea a línea a quien las envió.
+    """
+    inicio_reloj = time.perf_counter()
+    lotes_validos = None
+    if contexto is None:
+        with pool.conexion() as conn:
+            contexto = cargar_contexto(conn, evaluar_alertas)
+    motor = contexto.motor if evaluar_alertas else None
+    if validar_lotes:
+        lotes_validos = contexto.producto_por_lote.keys()
+
+    leidas = insertadas = alertas = 0
+    rechazos_por_motivo = {}
+    ejemplos_rechazo = []
+    rechazos = [] if detallar_rechazos else None
+
+    def existentes(codigos):
+        with pool.conexion() as conn:
+            return codigos_guardados(conn, codigos)
+
+    iterador = iter(registros)
+    while True:
+        bloque = list(itertools.islice(iterador, tamano_bloque))
+        if not bloque:
+            break
+        columnas, validas, motivos = validar_bloque(bloque, lotes_validos, existentes)
+        for motivo, mascara in motivos.items():
+            total = int(mascara.sum())
+            if total:
+                rechazos_por_motivo[motivo] = rechazos_por_motivo.get(motivo, 0) + total
+        if len(ejemplos_rechazo) < MAX_EJEMPLOS_RECHAZO:
+            for i in np.flatnonzero(~validas)[:MAX_EJEMPLOS_RECHAZO - len(ejemplos_rechazo)].tolist():
+                ejemplos_rechazo.append(bloque[i])
+        if detallar_rechazos:
+            for i in np.flatnonzero(~validas).tolist():
+                rechazos.append((leidas + i, [motivo for motivo, mascara in motivos.items() if mascara[i]]))
+
+        evaluacion = None
+        if motor is not None and validas.any():
+            evaluacion = motor.evaluar(
+                columnas['codigo_lote'][validas],
+                columnas['instante'][validas],
+                {canal: columnas[canal][validas] for canal in CAMPOS_SENSOR},
+            )
+        validas_bloque = int(validas.sum())
+        if validas_bloque:
+            with pool.transaccion() as conn:
+                # Un bloque de códigos por bloque de lecturas, no una reserva por fila, y solo
+                # para las que no traen el suyo
+                sin_codigo = int((validas & ~columnas['con_codigo']).sum())
+                codigos = reservar_codigos(conn, 'lecturas_sensores', sin_codigo)
+                filas = filas_para_insertar(columnas, validas, codigos,
+                                            evaluacion.alerta_generada if evaluacion else None)
+                insertar_filas(conn, filas, rollups=False)
+                if evaluacion is not None:
+                    alertas += motor.registrar(conn, evaluacion)
+        leidas += len(bloque)
+        insertadas += validas_bloque
+
+    return ResultadoIngesta(
+        filas_leidas=leidas,
+        filas_insertadas=insertadas,
+        filas_rechazadas=leidas - insertadas,
+        segundos=time.perf_counter() - inicio_reloj,
+        rechazos_por_motivo=rechazos_por_motivo,
+        ejemplos_rechazo=ejemplos_rechazo,
+        alertas_generadas=alertas,
+        rechazos=rechazos,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta masiva de lecturas de sensores TPS")
+    parser.add_argument('archivo', help="Archivo CSV/NDJSON, o '-' para leer de stdin")
+    parser.add_argument('--formato', choices=['csv', 'ndjson'], default=None,
+                        help="Formato de entrada (por defecto se deduce de la extensión)")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE)
+    parser.add_argument('--sin-validar-lotes', action='store_true',
+                        help="No verificar que codigo_lote exista en lotes_produccion")
+    parser.add_argument('--sin-alertas', action='store_true',
+                        help="No evaluar los umbrales de alerta durante la carga")
+    parser.add_argument('--sin-derivados', action='store_true',
+                        help="No poner al día rollups, resumen y cartas al terminar (lo hará el próximo mantenimiento)")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or ('ndjson' if args.archivo.endswith(('.ndjson', '.jsonl')) else 'csv')
+    lector = leer_ndjson if formato == 'ndjson' else leer_csv
+
+    pool = PoolConexiones(args.db)
+    aplicar_migraciones(pool)
+    archivo = sys.stdin if args.archivo == '-' else open(args.archivo, newline='', encoding='utf-8')
+    try:
+        resultado = ingestar_lecturas(pool, lector(archivo), args.tamano_bloque, not args.sin_validar_lotes,
+                                      evaluar_alertas=not args.sin_alertas)
+        inicio_derivados = time.perf_counter()
+        derivadas = 0 if args.sin_derivados else poner_al_dia(pool)
+        segundos_derivados = time.perf_counter() - inicio_derivados
+    finally:
+        if archivo is not sys.stdin:
+            archivo.close()
+        pool.cerrar()
+
+    print(f"Leídas: {resultado.filas_leidas} | Insertadas: {resultado.filas_insertadas} | "
+          f"Rechazadas: {resultado.filas_rechazadas} | Alertas nuevas: {resultado.alertas_generadas}")
+    print(f"Tiempo: {resultado.segundos:.2f}s | {resultado.filas_por_segundo:,.0f} filas/s")
+    if derivadas:
+        print(f"Rollups, resumen y cartas al día: {derivadas:,} lecturas en {segundos_derivados:.2f}s")
+    for motivo, total in sorted(resultado.rechazos_por_motivo.items()):
+        print(f"  - {motivo}: {total}")
+    return 0 if resultado.filas_rechazadas == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Snapshot de KPIs del TPS para el dashboard y la barra lateral.
+
+Los totales y los conteos por estado se leen de ``kpi_contadores``
+(mantenida por triggers, ver migración 4); solo los conteos "hoy" se
+calculan, con rangos sobre índices de fecha. Todo sale de una consulta.
+Los límites del día (UTC, como CURRENT_TIMESTAMP) van como parámetros y
+no con DATE('now'), para que la consulta no dependa del motor.
+"""
+import datetime
+import threading
+import time
+from typing import NamedTuple
+
+CONSULTA_SNAPSHOT = """
+    SELECT
+        COALESCE(MAX(CASE WHEN clave = 'lotes_en_proceso' THEN valor END), 0),
+        (SELECT COUNT(*) FROM inspecciones_visuales
+         WHERE fecha_inspeccion >= ? AND fecha_inspeccion < ?),
+        COALESCE(MAX(CASE WHEN clave = 'alertas_activas' THEN valor END), 0),
+        (SELECT COUNT(*) FROM informes_calidad
+         WHERE decision_final = 'APROBADO' AND fecha_informe >= ? AND fecha_informe < ?),
+        COALESCE(MAX(CASE WHEN clave = 'total_lotes' THEN valor END), 0),
+        COALESCE(MAX(CASE WHEN clave = 'total_inspecciones' THEN valor END), 0),
+        COALESCE(MAX(CASE WHEN clave = 'total_lecturas' THEN valor END), 0),
+        COALESCE(MAX(CASE WHEN clave = 'total_pruebas' THEN valor END), 0),
+        COALESCE(MAX(CASE WHEN clave = 'total_alertas' THEN valor END), 0),
+        COALESCE(MAX(CASE WHEN clave = 'total_informes' THEN valor END), 0)
+    FROM kpi_contadores
+"""
+
+
+class SnapshotKPI(NamedTuple):
+    lotes_en_proceso: int
+    inspecciones_hoy: int
+    alertas_activas: int
+    aprobados_hoy: int
+    total_lotes: int
+    total_inspecciones: int
+    total_lecturas: int
+    total_pruebas: int
+    total_alertas: int
+    total_informes: int
+
+
+def limites_del_dia():
+    """Inicio de hoy y de mañana (UTC) en el formato de texto de CURRENT_TIMESTAMP."""
+    hoy = datetime.datetime.now(datetime.timezone.utc).date()
+    return hoy.isoformat(), (hoy + datetime.timedelta(days=1)).isoformat()
+
+
+def leer_snapshot(conn):
+    desde, hasta = limites_del_dia()
+    return SnapshotKPI(*conn.execute(CONSULTA_SNAPSHOT, (desde, hasta, desde, hasta)).fetchone())
+
+
+class ServicioKPI:
+    """Cachea el último snapshot hasta que el pool registra una escritura.
+
+    ``ttl`` acota la antigüedad cuando escriben otros procesos, cuyos COMMIT
+    no pasan por este pool, y hace que los conteos "hoy" cambien de día.
+    """
+
+    def __init__(self, pool, ttl=30.0):
+        self.pool = pool
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._generacion = None
+        self._instante = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            vigente = (self._snapshot is not None
+                       and self._generacion == self.pool.generacion
+                       and time.monotonic() - self._instante < self.ttl)
+            if vigente:
+                return self._snapshot
+        generacion = self.pool.generacion
+        with self.pool.conexion() as conn:
+            snapshot = leer_snapshot(conn)
+        with self._lock:
+            self._snapshot = snapshot
+            self._generacion = generacion
+            self._instante = time.monotonic()
+        return snapshot
+
+    def invalidar(self):
+        with self._lock:
+            self._snapshot = None
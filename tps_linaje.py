@@ -0,0 +1,392 @@
+"""Índice de linaje de lotes: campo/cosecha -> lote -> informe -> envío -> contenedor.
+
+Tres tablas (migración 13):
+
+* ``linaje_nodos``: un nodo por (tipo, código). Los tipos están en
+  ``TIPOS``; las cosechas son ``campo|fecha_cosecha``.
+* ``linaje_aristas``: adyacencia padre -> hijo.
+* ``linaje_cierre``: cierre transitivo (ancestro, descendiente,
+  profundidad) del eje campo, cosecha, producto, lote, informe, envío y
+  contenedor, con los tipos de ambos extremos en la clave para que
+  "contenedores de este campo" sea un rango de índice.
+
+Las evidencias (inspecciones, pruebas, envases, alertas) solo tienen
+arista a su lote: meterlas en el cierre lo duplicaría sin responder
+ninguna pregunta que no se responda pasando por el lote.
+
+``actualizar_linaje`` indexa las filas nuevas de cada tabla desde su
+marca en ``linaje_estado``, por tandas. Se llama en la misma transacción
+que las escrituras: el generador en cada tramo, la importación en cada
+bloque. Los formularios de la app no lo indexan en su transacción: lo
+hace el mantenimiento del escritor único (``mantener_linaje``), en
+tandas cortas con la cola vacía, y recoge así también lo que escriban
+otros procesos. Las páginas solo leen: lo recién escrito puede tardar
+unos segundos en aparecer.
+Las ediciones de campo, cosecha o contenedor de filas ya indexadas (la
+app no las hace) requieren ``reconstruir_linaje``.
+
+Uso desde línea de comandos::
+
+    python tps_linaje.py actualizar
+    python tps_linaje.py consultar "Campo Norte" --abajo contenedor
+    python tps_linaje.py consultar DNPU0001234 --arriba cosecha
+"""
+import argparse
+import sys
+import time
+from typing import NamedTuple
+
+from tps_db import DB_PATH, PoolConexiones
+
+# Tipo de nodo -> código guardado en las tablas del índice
+TIPOS = {
+    'producto': 1,
+    'campo': 2,
+    'cosecha': 3,
+    'lote': 4,
+    'informe': 5,
+    'envio': 6,
+    'contenedor': 7,
+    'inspeccion': 8,
+    'prueba': 9,
+    'envase': 10,
+    'alerta': 11,
+}
+NOMBRES_TIPO = {codigo: nombre for nombre, codigo in TIPOS.items()}
+TIPOS_EVIDENCIA = ('inspeccion', 'prueba', 'envase', 'alerta')
+
+ETIQUETAS_TIPO = {
+    'producto': "🥑 Producto",
+    'campo': "🌱 Campo",
+    'cosecha': "🧺 Cosecha",
+    'lote': "📦 Lote",
+    'informe': "📊 Informe",
+    'envio': "🚢 Envío",
+    'contenedor': "🧊 Contenedor",
+    'inspeccion': "👁️ Inspección",
+    'prueba': "🧪 Prueba",
+    'envase': "📦 Envase",
+    'alerta': "🚨 Alerta",
+}
+
+FILAS_POR_TANDA = 20000
+# Tanda del mantenimiento del escritor único: un formulario que llega la espera entera
+FILAS_POR_MANTENIMIENTO = 2000
+
+# Tabla origen -> expresión de su código de evidencia (tipo, columna)
+EVIDENCIAS = {
+    'inspecciones_visuales': ('inspeccion', 'codigo_inspeccion'),
+    'pruebas_fisicoquimicas': ('prueba', 'codigo_prueba'),
+    'compatibilidad_envases': ('envase', 'codigo_compatibilidad'),
+    'alertas_automaticas': ('alerta', 'codigo_alerta'),
+}
+TABLAS_INDEXADAS = ('lotes_produccion', 'informes_calidad', 'trazabilidad_internacional') + tuple(EVIDENCIAS)
+
+COSECHA = "t.campo_origen || '|' || t.fecha_cosecha"
+
+# (nivel, tabla, tipo padre, código padre, tipo hijo, código hijo, condición).
+# El cierre se extiende nivel por nivel: las aristas de un nivel solo parten
+# de nodos cuyo cierre ya incluye los niveles anteriores. Nivel 0 = solo adyacencia.
+ARISTAS = (
+    (1, 'lotes_produccion', 'campo', "t.campo_origen", 'cosecha', COSECHA,
+     "t.campo_origen <> '' AND t.fecha_cosecha IS NOT NULL"),
+    (2, 'lotes_produccion', 'cosecha', COSECHA, 'lote', "t.codigo_lote",
+     "t.campo_origen <> '' AND t.fecha_cosecha IS NOT NULL"),
+    (2, 'lotes_produccion', 'campo', "t.campo_origen", 'lote', "t.codigo_lote",
+     "t.campo_origen <> '' AND t.fecha_cosecha IS NULL"),
+    (2, 'lotes_produccion', 'producto', "t.codigo_producto", 'lote', "t.codigo_lote", "t.codigo_producto IS NOT NULL"),
+    (3, 'informes_calidad', 'lote', "t.codigo_lote", 'informe', "t.codigo_informe", "t.codigo_lote IS NOT NULL"),
+    (4, 'trazabilidad_internacional', 'lote', "t.codigo_lote", 'envio', "t.codigo_trazabilidad",
+     "t.codigo_lote IS NOT NULL"),
+    (5, 'trazabilidad_internacional', 'envio', "t.codigo_trazabilidad", 'contenedor', "t.numero_contenedor",
+     "t.numero_contenedor <> ''"),
+) + tuple(
+    (0, tabla, 'lote', "t.codigo_lote", tipo, f"t.{columna}", "t.codigo_lote IS NOT NULL")
+    for tabla, (tipo, columna) in EVIDENCIAS.items()
+)
+NIVELES = sorted({nivel for nivel, *_ in ARISTAS if nivel})
+
+SQL_INFORME_ENVIO = """
+    -- Envíos nuevos con los informes de su lote ya indexados o de esta tanda
+    SELECT 4, 'informe', ic.codigo_informe, 'envio', t.codigo_trazabilidad
+    FROM trazabilidad_internacional t
+    JOIN informes_calidad ic ON ic.codigo_lote = t.codigo_lote AND ic.id <= :hasta_informes
+    WHERE t.id > :desde_envios AND t.id <= :hasta_envios
+    UNION
+    -- Informes nuevos con los envíos de su lote indexados antes
+    SELECT 4, 'informe', t.codigo_informe, 'envio', ti.codigo_trazabilidad
+    FROM informes_calidad t
+    JOIN trazabilidad_internacional ti ON ti.codigo_lote = t.codigo_lote AND ti.id <= :desde_envios
+    WHERE t.id > :desde_informes AND t.id <= :hasta_informes
+"""
+
+SQL_CIERRE_NIVEL = """
+    INSERT INTO linaje_cierre (ancestro, tipo_descendiente, descendiente, tipo_ancestro, profundidad)
+    SELECT a.ancestro, d.tipo_descendiente, d.descendiente, a.tipo_ancestro, MIN(a.profundidad + 1 + d.profundidad)
+    FROM temp.linaje_aristas_nuevas e
+    JOIN linaje_cierre a ON a.descendiente = e.padre
+    JOIN linaje_cierre d ON d.ancestro = e.hijo
+    WHERE e.nivel = ?
+    GROUP BY a.ancestro, d.descendiente
+    ON CONFLICT (ancestro, tipo_descendiente, descendiente) DO UPDATE SET
+        profundidad = MIN(profundidad, excluded.profundidad)
+"""
+
+
+class Nodo(NamedTuple):
+    id: int
+    tipo: str
+    codigo: str
+
+
+class Relacionados(NamedTuple):
+    total: int
+    filas: list       # [(Nodo, profundidad)] ordenadas por profundidad y código
+    milisegundos: float
+
+
+def _marcas(conn, tope):
+    """{tabla: (desde, hasta)} con las tandas pendientes de cada tabla, como mucho ``tope`` filas."""
+    marcas = {}
+    for tabla in TABLAS_INDEXADAS:
+        desde = conn.execute("SELECT ultimo_id FROM linaje_estado WHERE tabla = ?", (tabla,)).fetchone()[0]
+        maximo = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}").fetchone()[0]
+        marcas[tabla] = (desde, min(maximo, desde + tope) if tope else maximo)
+    return marcas
+
+
+def actualizar_linaje(conn, tope=FILAS_POR_TANDA):
+    """Indexa una tanda de filas nuevas; devuelve cuántas filas de origen procesó (0 = al día).
+
+    Debe llamarse dentro de una transacción; para ponerse al día del
+    todo, repetir hasta que devuelva 0.
+    """
+    marcas = _marcas(conn, tope)
+    pendientes = sum(hasta - desde for desde, hasta in marcas.values())
+    if not pendientes:
+        return 0
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS linaje_nuevas "
+                 "(nivel INTEGER, tipo_padre TEXT, padre TEXT, tipo_hijo TEXT, hijo TEXT)")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS linaje_aristas_nuevas "
+                 "(nivel INTEGER, padre INTEGER, hijo INTEGER, PRIMARY KEY (padre, hijo))")
+    conn.execute("DELETE FROM temp.linaje_nuevas")
+    conn.execute("DELETE FROM temp.linaje_aristas_nuevas")
+    for nivel, tabla, tipo_padre, padre, tipo_hijo, hijo, condicion in ARISTAS:
+        desde, hasta = marcas[tabla]
+        if hasta > desde:
+            conn.execute(f"""
+                INSERT INTO temp.linaje_nuevas
+                SELECT DISTINCT ?, ?, {padre}, ?, {hijo} FROM {tabla} t
+                WHERE t.id > ? AND t.id <= ? AND {condicion}
+            """, (nivel, tipo_padre, tipo_hijo, desde, hasta))
+    conn.execute(f"INSERT INTO temp.linaje_nuevas {SQL_INFORME_ENVIO}", {
+        'desde_envios': marcas['trazabilidad_internacional'][0], 'hasta_envios': marcas['trazabilidad_internacional'][1],
+        'desde_informes': marcas['informes_calidad'][0], 'hasta_informes': marcas['informes_calidad'][1],
+    })
+    # Los lotes sin campo ni producto también son nodos
+    desde, hasta = marcas['lotes_produccion']
+    conn.execute("""
+        INSERT INTO temp.linaje_nuevas
+        SELECT 0, NULL, NULL, 'lote', codigo_lote FROM lotes_produccion WHERE id > ? AND id <= ?
+    """, (desde, hasta))
+
+    ultimo_nodo = conn.execute("SELECT COALESCE(MAX(id), 0) FROM linaje_nodos").fetchone()[0]
+    for tipo, codigo in TIPOS.items():
+        conn.execute("""
+            INSERT OR IGNORE INTO linaje_nodos (tipo, codigo)
+            SELECT ?, padre FROM temp.linaje_nuevas WHERE tipo_padre = ?
+            UNION
+            SELECT ?, hijo FROM temp.linaje_nuevas WHERE tipo_hijo = ?
+        """, (codigo, tipo, codigo, tipo))
+    evidencia = ", ".join(str(TIPOS[tipo]) for tipo in TIPOS_EVIDENCIA)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO linaje_cierre (ancestro, tipo_descendiente, descendiente, tipo_ancestro, profundidad)
+        SELECT id, tipo, id, tipo, 0 FROM linaje_nodos WHERE id > ? AND tipo NOT IN ({evidencia})
+    """, (ultimo_nodo,))
+
+    # Solo las aristas que no existían: repetir una arista ya indexada recorrería de nuevo su subárbol
+    conn.execute("""
+        INSERT OR IGNORE INTO temp.linaje_aristas_nuevas (nivel, padre, hijo)
+        SELECT e.nivel, p.id, h.id
+        FROM temp.linaje_nuevas e
+        JOIN linaje_nodos p ON p.tipo = (CASE e.tipo_padre {}) AND p.codigo = e.padre
+        JOIN linaje_nodos h ON h.tipo = (CASE e.tipo_hijo {}) AND h.codigo = e.hijo
+        WHERE NOT EXISTS (SELECT 1 FROM linaje_aristas a WHERE a.padre = p.id AND a.hijo = h.id)
+    """.format(*[" ".join(f"WHEN '{tipo}' THEN {codigo}" for tipo, codigo in TIPOS.items()) + " END"] * 2))
+    conn.execute("INSERT OR IGNORE INTO linaje_aristas (padre, hijo) SELECT padre, hijo FROM temp.linaje_aristas_nuevas")
+    for nivel in NIVELES:
+        conn.execute(SQL_CIERRE_NIVEL, (nivel,))
+
+    conn.executemany("UPDATE linaje_estado SET ultimo_id = ? WHERE tabla = ?",
+                     [(hasta, tabla) for tabla, (_, hasta) in marcas.items()])
+    return pendientes
+
+
+def indexar_pendientes(conn, tope=FILAS_POR_TANDA):
+    """Indexa todo lo pendiente en la transacción en curso; devuelve las filas de origen procesadas."""
+    total = 0
+    while True:
+        procesadas = actualizar_linaje(conn, tope)
+        if not procesadas:
+            return total
+        total += procesadas
+
+
+def mantener_linaje(conn):
+    """Una tanda corta de ``actualizar_linaje`` para el ``mantenimiento`` del escritor único."""
+    return actualizar_linaje(conn, FILAS_POR_MANTENIMIENTO)
+
+
+def poner_al_dia(pool, tope=FILAS_POR_TANDA, escritor=None):
+    """Indexa todo lo pendiente, una transacción por tanda; devuelve las filas de origen procesadas.
+
+    Si no hay nada pendiente no abre ninguna transacción de escritura. Con
+    ``escritor`` (ver ``tps_escritor``) cada tanda es una intención del
+    escritor único en lugar de una transacción propia.
+    """
+    total = 0
+    while True:
+        with pool.conexion() as conn:
+            if not any(hasta > desde for desde, hasta in _marcas(conn, tope).values()):
+                return total
+        if escritor is not None:
+            total += escritor.ejecutar(actualizar_linaje, tope, nombre='poner_al_dia_linaje')
+            continue
+        with pool.transaccion() as conn:
+            total += actualizar_linaje(conn, tope)
+
+
+def reconstruir_linaje(conn, tope=FILAS_POR_TANDA):
+    """Vacía el índice y lo vuelve a construir; devuelve las filas de origen procesadas."""
+    for tabla in ('linaje_cierre', 'linaje_aristas', 'linaje_nodos'):
+        conn.execute(f"DELETE FROM {tabla}")
+    conn.execute("UPDATE linaje_estado SET ultimo_id = 0")
+    return indexar_pendientes(conn, tope)
+
+
+def buscar(conn, texto, limite=20):
+    """Nodos cuyo código empieza por ``texto`` (sin distinguir tipo)."""
+    texto = texto.strip()
+    if not texto:
+        return []
+    filas = conn.execute("""
+        SELECT id, tipo, codigo FROM linaje_nodos
+        WHERE codigo >= ? AND codigo < ? || char(1114111)
+        ORDER BY codigo, tipo
+        LIMIT ?
+    """, (texto, texto, limite)).fetchall()
+    return [Nodo(id_nodo, NOMBRES_TIPO[tipo], codigo) for id_nodo, tipo, codigo in filas]
+
+
+def nodo(conn, tipo, codigo):
+    fila = conn.execute("SELECT id FROM linaje_nodos WHERE tipo = ? AND codigo = ?", (TIPOS[tipo], codigo)).fetchone()
+    return Nodo(fila[0], tipo, codigo) if fila else None
+
+
+def _lote_de_evidencia(conn, nodo_evidencia):
+    fila = conn.execute("""
+        SELECT l.id FROM linaje_aristas a JOIN linaje_nodos l ON l.id = a.padre
+        WHERE a.hijo = ? AND l.tipo = ?
+    """, (nodo_evidencia.id, TIPOS['lote'])).fetchone()
+    return fila[0] if fila else None
+
+
+def relacionados(conn, origen, direccion, tipo, limite=500):
+    """Nodos de ``tipo`` aguas ``direccion`` ('arriba' o 'abajo') de ``origen``; devuelve Relacionados.
+
+    Desde una evidencia se parte de su lote. Las evidencias de destino son
+    las de los lotes relacionados (el propio lote incluido).
+    """
+    inicio = time.perf_counter()
+    base = _lote_de_evidencia(conn, origen) if origen.tipo in TIPOS_EVIDENCIA else origen.id
+    if base is None:
+        return Relacionados(0, [], 0.0)
+    propio, otro = ('ancestro', 'descendiente') if direccion == 'abajo' else ('descendiente', 'ancestro')
+    tipo_otro = f"tipo_{otro}"
+    if tipo in TIPOS_EVIDENCIA:
+        desde = f"""
+            FROM linaje_cierre c
+            JOIN linaje_aristas a ON a.padre = c.{otro}
+            JOIN linaje_nodos n ON n.id = a.hijo AND n.tipo = :tipo
+            WHERE c.{propio} = :base AND c.{tipo_otro} = :lote
+        """
+        profundidad = "c.profundidad + 1"
+    else:
+        desde = f"""
+            FROM linaje_cierre c
+            JOIN linaje_nodos n ON n.id = c.{otro}
+            WHERE c.{propio} = :base AND c.{tipo_otro} = :tipo AND c.profundidad > 0
+        """
+        profundidad = "c.profundidad"
+    params = {'base': base, 'tipo': TIPOS[tipo], 'lote': TIPOS['lote'], 'limite': limite}
+    total = conn.execute(f"SELECT COUNT(*) {desde}", params).fetchone()[0]
+    filas = conn.execute(f"SELECT n.id, n.codigo, {profundidad} {desde} ORDER BY 3, 2 LIMIT :limite", params).fetchall()
+    return Relacionados(total, [(Nodo(id_nodo, tipo, codigo), p) for id_nodo, codigo, p in filas],
+                        (time.perf_counter() - inicio) * 1000)
+
+
+def resumen(conn, origen):
+    """({tipo: nodos aguas arriba}, {tipo: nodos aguas abajo}) del eje, sin contar el propio nodo."""
+    base = _lote_de_evidencia(conn, origen) if origen.tipo in TIPOS_EVIDENCIA else origen.id
+    if base is None:
+        return {}, {}
+    conteos = []
+    for propio, tipo_otro in (('descendiente', 'tipo_ancestro'), ('ancestro', 'tipo_descendiente')):
+        conteos.append({NOMBRES_TIPO[tipo]: n for tipo, n in conn.execute(f"""
+            SELECT {tipo_otro}, COUNT(*) FROM linaje_cierre
+            WHERE {propio} = ? AND profundidad > 0
+            GROUP BY {tipo_otro}
+        """, (base,))})
+    return conteos[0], conteos[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice de linaje de lotes TPS")
+    parser.add_argument('accion', choices=['actualizar', 'reconstruir', 'consultar'])
+    parser.add_argument('codigo', nargs='?', help="Código a consultar (campo, cosecha, lote, contenedor...)")
+    parser.add_argument('--arriba', choices=list(TIPOS), help="Tipo de nodo buscado aguas arriba")
+    parser.add_argument('--abajo', choices=list(TIPOS), help="Tipo de nodo buscado aguas abajo")
+    parser.add_argument('--limite', type=int, default=50)
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    # Import local: tps_migraciones importa este módulo para construir el índice
+    from tps_migraciones import aplicar_migraciones
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        inicio = time.perf_counter()
+        if args.accion == 'reconstruir':
+            with pool.transaccion() as conn:
+                total = reconstruir_linaje(conn)
+            print(f"Índice reconstruido en {time.perf_counter() - inicio:.1f}s ({total:,} filas de origen)")
+            return 0
+        total = poner_al_dia(pool)
+        print(f"Índice al día en {time.perf_counter() - inicio:.1f}s ({total:,} filas nuevas)")
+        if args.accion != 'consultar':
+            return 0
+        if not args.codigo:
+            parser.error("consultar requiere un código")
+        with pool.conexion() as conn:
+            nodos = [n for n in buscar(conn, args.codigo) if n.codigo == args.codigo]
+            if not nodos:
+                print(f"❌ Sin nodos con código {args.codigo}", file=sys.stderr)
+                return 1
+            for origen in nodos:
+                arriba, abajo = resumen(conn, origen)
+                print(f"{ETIQUETAS_TIPO[origen.tipo]} {origen.codigo}: arriba {arriba}, abajo {abajo}")
+                for direccion, tipo in (('arriba', args.arriba), ('abajo', args.abajo)):
+                    if tipo:
+                        resultado = relacionados(conn, origen, direccion, tipo, args.limite)
+                        print(f"  {tipo} aguas {direccion}: {resultado.total:,} ({resultado.milisegundos:.1f} ms)")
+                        for relacionado, profundidad in resultado.filas:
+                            print(f"    - {relacionado.codigo} (profundidad {profundidad})")
+    finally:
+        pool.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
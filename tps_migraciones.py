@@ -0,0 +1,700 @@
+"""Migraciones versionadas del esquema TPS.
+
+Cada migración se aplica una sola vez y queda registrada en la tabla
+``schema_version``. Las migraciones se ejecutan en orden de versión y cada
+una en su propia transacción (salvo las que SQLite no permite dentro de
+una, como el cambio de ``journal_mode``).
+
+Los módulos de cada funcionalidad (rollups, linaje, cartas de control...)
+se importan dentro de la migración que los usa: con la base al día,
+``aplicar_migraciones`` no carga ninguno, y quien solo la llama al
+arrancar no paga NumPy ni esos módulos.
+"""
+from collections import namedtuple
+
+Migracion = namedtuple('Migracion', 'version nombre aplicar transaccional')
+
+
+# Migración 1: tablas originales del TPS
+def _esquema_base(conn):
+    cursor = conn.cursor()
+    
+    # Tabla de Productos Agroindustriales
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS productos_agro (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_producto TEXT UNIQUE,
+            nombre_producto TEXT,
+            variedad TEXT,
+            categoria TEXT,
+            origen_campo TEXT,
+            temporada TEXT,
+            estado TEXT,
+            fecha_registro DATE
+        )
+    ''')
+    
+    # Tabla de Lotes de Producción
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lotes_produccion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_lote TEXT UNIQUE,
+            codigo_producto TEXT,
+            fecha_cosecha DATE,
+            cantidad_kg REAL,
+            campo_origen TEXT,
+            responsable_campo TEXT,
+            estado_lote TEXT,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (codigo_producto) REFERENCES productos_agro (codigo_producto)
+        )
+    ''')
+    
+    # Tabla de Inspecciones Visuales (TPS Core)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inspecciones_visuales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_inspeccion TEXT UNIQUE,
+            codigo_lote TEXT,
+            fecha_inspeccion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            inspector TEXT,
+            color_evaluacion TEXT,
+            forma_evaluacion TEXT,
+            tamano_evaluacion TEXT,
+            defectos_visuales TEXT,
+            porcentaje_conformidad REAL,
+            resultado_visual TEXT,
+            observaciones TEXT,
+            tiempo_procesamiento REAL,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+    
+    # Tabla de Lecturas de Sensores (TPS Core)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lecturas_sensores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_lectura TEXT UNIQUE,
+            codigo_lote TEXT,
+            timestamp_lectura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sensor_temperatura REAL,
+            sensor_peso REAL,
+            sensor_humedad REAL,
+            sensor_ph REAL,
+            sensor_brix REAL,
+            estado_sensores TEXT,
+            alerta_generada BOOLEAN DEFAULT 0,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+    
+    # Tabla de Pruebas Fisicoquímicas (TPS Core)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pruebas_fisicoquimicas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_prueba TEXT UNIQUE,
+            codigo_lote TEXT,
+            fecha_prueba TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            laboratorista TEXT,
+            acidez_titulable REAL,
+            solidos_solubles REAL,
+            firmeza REAL,
+            contenido_humedad REAL,
+            residuos_pesticidas TEXT,
+            microbiologia_resultado TEXT,
+            resultado_fisicoquimico TEXT,
+            certificacion_organica BOOLEAN DEFAULT 0,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+    
+    # Tabla de Compatibilidad de Envases (TPS Core)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS compatibilidad_envases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_compatibilidad TEXT UNIQUE,
+            codigo_lote TEXT,
+            fecha_evaluacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            tipo_envase TEXT,
+            material_envase TEXT,
+            capacidad_envase TEXT,
+            prueba_hermeticidad BOOLEAN,
+            prueba_resistencia BOOLEAN,
+            compatibilidad_producto BOOLEAN,
+            resultado_envase TEXT,
+            observaciones_envase TEXT,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+    
+    # Tabla de Alertas Automáticas (TPS Core)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alertas_automaticas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_alerta TEXT UNIQUE,
+            codigo_lote TEXT,
+            tipo_alerta TEXT,
+            nivel_criticidad TEXT,
+            mensaje_alerta TEXT,
+            parametro_afectado TEXT,
+            valor_detectado REAL,
+            valor_limite REAL,
+            fecha_alerta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            estado_alerta TEXT,
+            accion_tomada TEXT,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+    
+    # Tabla de Informes de Calidad Consolidados (TPS Core)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS informes_calidad (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_informe TEXT UNIQUE,
+            codigo_lote TEXT,
+            fecha_informe TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            resultado_inspeccion_visual TEXT,
+            resultado_sensores TEXT,
+            resultado_fisicoquimico TEXT,
+            resultado_envases TEXT,
+            decision_final TEXT,
+            porcentaje_calidad_total REAL,
+            certificaciones_obtenidas TEXT,
+            destino_comercial TEXT,
+            responsable_aprobacion TEXT,
+            fecha_aprobacion TIMESTAMP,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+    
+    # Tabla de Trazabilidad Internacional
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trazabilidad_internacional (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo_trazabilidad TEXT UNIQUE,
+            codigo_lote TEXT,
+            pais_destino TEXT,
+            cliente_internacional TEXT,
+            certificacion_requerida TEXT,
+            numero_contenedor TEXT,
+            fecha_embarque DATE,
+            puerto_destino TEXT,
+            documentos_exportacion TEXT,
+            estado_envio TEXT,
+            FOREIGN KEY (codigo_lote) REFERENCES lotes_produccion (codigo_lote)
+        )
+    ''')
+
+
+# Migración 2: WAL permite que el dashboard lea mientras los inspectores escriben
+def _journal_wal(conn):
+    conn.execute("PRAGMA journal_mode = WAL")
+
+
+# Migración 3: índices para las consultas de cada módulo. Las columnas de fecha
+# se indexan tal cual para que los conteos "hoy" usen rangos en lugar de DATE().
+INDICES_CONSULTAS = (
+    # Selectores de lotes por estado (JOIN con productos_agro)
+    "CREATE INDEX IF NOT EXISTS idx_lotes_estado ON lotes_produccion (estado_lote, codigo_lote, codigo_producto)",
+    "CREATE INDEX IF NOT EXISTS idx_lotes_producto ON lotes_produccion (codigo_producto)",
+    # Inspecciones: último resultado por lote, historial por fecha, tiempo por inspector
+    "CREATE INDEX IF NOT EXISTS idx_inspecciones_lote_fecha ON inspecciones_visuales (codigo_lote, fecha_inspeccion)",
+    "CREATE INDEX IF NOT EXISTS idx_inspecciones_fecha ON inspecciones_visuales (fecha_inspeccion)",
+    "CREATE INDEX IF NOT EXISTS idx_inspecciones_inspector ON inspecciones_visuales (inspector, tiempo_procesamiento)",
+    # Sensores: última lectura por lote e histórico por rango de tiempo
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_lote_ts ON lecturas_sensores (codigo_lote, timestamp_lectura)",
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_ts ON lecturas_sensores (timestamp_lectura)",
+    # Laboratorio
+    "CREATE INDEX IF NOT EXISTS idx_pruebas_lote_fecha ON pruebas_fisicoquimicas (codigo_lote, fecha_prueba)",
+    "CREATE INDEX IF NOT EXISTS idx_pruebas_fecha ON pruebas_fisicoquimicas (fecha_prueba)",
+    # Envases
+    "CREATE INDEX IF NOT EXISTS idx_envases_lote ON compatibilidad_envases (codigo_lote)",
+    "CREATE INDEX IF NOT EXISTS idx_envases_fecha ON compatibilidad_envases (fecha_evaluacion)",
+    # Alertas: activas ordenadas por fecha
+    "CREATE INDEX IF NOT EXISTS idx_alertas_estado_fecha ON alertas_automaticas (estado_alerta, fecha_alerta)",
+    "CREATE INDEX IF NOT EXISTS idx_alertas_lote ON alertas_automaticas (codigo_lote)",
+    "CREATE INDEX IF NOT EXISTS idx_alertas_fecha ON alertas_automaticas (fecha_alerta)",
+    # Informes: aprobados hoy, lotes sin informe
+    "CREATE INDEX IF NOT EXISTS idx_informes_decision_fecha ON informes_calidad (decision_final, fecha_informe)",
+    "CREATE INDEX IF NOT EXISTS idx_informes_lote ON informes_calidad (codigo_lote)",
+    "CREATE INDEX IF NOT EXISTS idx_informes_fecha ON informes_calidad (fecha_informe)",
+    # Trazabilidad
+    "CREATE INDEX IF NOT EXISTS idx_trazabilidad_lote ON trazabilidad_internacional (codigo_lote)",
+    "CREATE INDEX IF NOT EXISTS idx_trazabilidad_estado_fecha ON trazabilidad_internacional (estado_envio, fecha_embarque)",
+    "CREATE INDEX IF NOT EXISTS idx_trazabilidad_fecha ON trazabilidad_internacional (fecha_embarque)",
+)
+
+
+def _indices_consultas(conn):
+    for sentencia in INDICES_CONSULTAS:
+        conn.execute(sentencia)
+    conn.execute("ANALYZE")
+
+
+# Migración 4: contadores de KPI mantenidos por triggers en la misma transacción
+# que cada INSERT/UPDATE/DELETE, para que el dashboard no cuente tablas completas.
+TABLAS_CONTADAS = {
+    'total_lotes': 'lotes_produccion',
+    'total_inspecciones': 'inspecciones_visuales',
+    'total_lecturas': 'lecturas_sensores',
+    'total_pruebas': 'pruebas_fisicoquimicas',
+    'total_alertas': 'alertas_automaticas',
+    'total_informes': 'informes_calidad',
+}
+
+# clave -> (tabla, columna, valor que se cuenta)
+CONTADORES_POR_ESTADO = {
+    'lotes_en_proceso': ('lotes_produccion', 'estado_lote', 'EN_PROCESO'),
+    'alertas_activas': ('alertas_automaticas', 'estado_alerta', 'ACTIVA'),
+}
+
+
+def _contadores_kpi(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_contadores (
+            clave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for clave, tabla in TABLAS_CONTADAS.items():
+        conn.execute(f"INSERT OR REPLACE INTO kpi_contadores (clave, valor) SELECT ?, COUNT(*) FROM {tabla}", (clave,))
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_kpi_{clave}_ins AFTER INSERT ON {tabla}
+            BEGIN
+                UPDATE kpi_contadores SET valor = valor + 1 WHERE clave = '{clave}';
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_kpi_{clave}_del AFTER DELETE ON {tabla}
+            BEGIN
+                UPDATE kpi_contadores SET valor = valor - 1 WHERE clave = '{clave}';
+            END
+        """)
+    for clave, (tabla, columna, valor) in CONTADORES_POR_ESTADO.items():
+        conn.execute(f"INSERT OR REPLACE INTO kpi_contadores (clave, valor) SELECT ?, COUNT(*) FROM {tabla} WHERE {columna} = ?",
+                     (clave, valor))
+        # "IS" devuelve 0/1 incluso con NULL, a diferencia de "="
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_kpi_{clave}_ins AFTER INSERT ON {tabla}
+            BEGIN
+                UPDATE kpi_contadores SET valor = valor + (NEW.{columna} IS '{valor}') WHERE clave = '{clave}';
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_kpi_{clave}_upd AFTER UPDATE OF {columna} ON {tabla}
+            BEGIN
+                UPDATE kpi_contadores
+                SET valor = valor + (NEW.{columna} IS '{valor}') - (OLD.{columna} IS '{valor}')
+                WHERE clave = '{clave}';
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_kpi_{clave}_del AFTER DELETE ON {tabla}
+            BEGIN
+                UPDATE kpi_contadores SET valor = valor - (OLD.{columna} IS '{valor}') WHERE clave = '{clave}';
+            END
+        """)
+
+
+# Migración 5: el trigger por fila de total_lecturas reducía a la mitad la ingesta
+# masiva; ese contador lo actualiza tps_ingesta.insertar_filas una vez por bloque.
+def _contador_lecturas_por_bloque(conn):
+    conn.execute("DROP TRIGGER IF EXISTS trg_kpi_total_lecturas_ins")
+    conn.execute("UPDATE kpi_contadores SET valor = (SELECT COUNT(*) FROM lecturas_sensores) WHERE clave = 'total_lecturas'")
+
+
+# Migración 6: rollups por minuto/hora/día de lecturas_sensores (ver tps_series)
+def _rollups_sensores(conn):
+    import tps_series
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lecturas_rollup (
+            resolucion TEXT NOT NULL,
+            codigo_lote TEXT NOT NULL,
+            canal TEXT NOT NULL,
+            periodo TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            minimo REAL,
+            maximo REAL,
+            suma REAL,
+            PRIMARY KEY (resolucion, codigo_lote, canal, periodo)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollup_canal_periodo ON lecturas_rollup (resolucion, canal, periodo)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_estado (
+            clave TEXT PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO rollup_estado (clave, ultimo_id) VALUES ('lecturas_sensores', 0)")
+    tps_series.actualizar_rollups(conn)
+
+
+# Migración 7: umbrales de alerta persistidos y episodios de alerta (ver tps_alertas)
+def _umbrales_y_episodios(conn):
+    import tps_alertas
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS umbrales_alerta (
+            ambito TEXT NOT NULL,
+            codigo TEXT NOT NULL DEFAULT '',
+            parametro TEXT NOT NULL,
+            valor REAL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ambito, codigo, parametro)
+        )
+    """)
+    conn.executemany("INSERT OR IGNORE INTO umbrales_alerta (ambito, codigo, parametro, valor) VALUES ('GLOBAL', '', ?, ?)",
+                     tps_alertas.PARAMETROS_UMBRAL.items())
+    for columna in ('fecha_fin TIMESTAMP', 'duracion_segundos REAL', 'lecturas_afectadas INTEGER',
+                    'episodio_abierto INTEGER DEFAULT 0'):
+        conn.execute(f"ALTER TABLE alertas_automaticas ADD COLUMN {columna}")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_alertas_episodio_abierto ON alertas_automaticas (codigo_lote, tipo_alerta)
+        WHERE episodio_abierto = 1
+    """)
+
+
+# Migración 8: índices (filtro, fecha) para la paginación por keyset de los historiales
+# (ver tps_paginacion). Los índices por (codigo_lote, fecha) sustituyen a los de solo codigo_lote.
+INDICES_PAGINACION = (
+    "CREATE INDEX IF NOT EXISTS idx_inspecciones_resultado_fecha ON inspecciones_visuales (resultado_visual, fecha_inspeccion)",
+    "CREATE INDEX IF NOT EXISTS idx_pruebas_resultado_fecha ON pruebas_fisicoquimicas (resultado_fisicoquimico, fecha_prueba)",
+    "CREATE INDEX IF NOT EXISTS idx_envases_resultado_fecha ON compatibilidad_envases (resultado_envase, fecha_evaluacion)",
+    "CREATE INDEX IF NOT EXISTS idx_envases_lote_fecha ON compatibilidad_envases (codigo_lote, fecha_evaluacion)",
+    "CREATE INDEX IF NOT EXISTS idx_alertas_criticidad_fecha ON alertas_automaticas (nivel_criticidad, fecha_alerta)",
+    "CREATE INDEX IF NOT EXISTS idx_alertas_lote_fecha ON alertas_automaticas (codigo_lote, fecha_alerta)",
+    "CREATE INDEX IF NOT EXISTS idx_informes_lote_fecha ON informes_calidad (codigo_lote, fecha_informe)",
+    "CREATE INDEX IF NOT EXISTS idx_trazabilidad_lote_fecha ON trazabilidad_internacional (codigo_lote, fecha_embarque)",
+)
+INDICES_REEMPLAZADOS = ('idx_envases_lote', 'idx_alertas_lote', 'idx_informes_lote', 'idx_trazabilidad_lote')
+
+
+def _indices_paginacion(conn):
+    for sentencia in INDICES_PAGINACION:
+        conn.execute(sentencia)
+    for indice in INDICES_REEMPLAZADOS:
+        conn.execute(f"DROP INDEX IF EXISTS {indice}")
+    conn.execute("ANALYZE")
+
+
+# Migración 9: contadores de generación por tabla para la caché de datasets (ver tps_cache)
+def _generaciones_tablas(conn):
+    import tps_cache
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generaciones_tablas (
+            tabla TEXT PRIMARY KEY,
+            generacion INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.executemany("INSERT OR IGNORE INTO generaciones_tablas (tabla) VALUES (?)",
+                     [(tabla,) for tabla in tps_cache.TABLAS_VERSIONADAS + ('lecturas_sensores',)])
+    for tabla in tps_cache.TABLAS_VERSIONADAS:
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_gen_{tabla}_{evento.lower()} AFTER {evento} ON {tabla}
+                BEGIN
+                    UPDATE generaciones_tablas SET generacion = generacion + 1 WHERE tabla = '{tabla}';
+                END
+            """)
+
+
+# Migración 10: lecturas con alerta por lote para el puntaje de sensores de los informes (ver tps_informes).
+# Índice parcial: solo ocupa espacio y tiempo de escritura para las lecturas fuera de rango.
+def _indice_lecturas_con_alerta(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lecturas_alerta_lote ON lecturas_sensores (codigo_lote) WHERE alerta_generada = 1")
+
+
+# Migración 11: registro de cambios por fila para el feed en vivo (ver tps_feed).
+# La poda corre cada 1000 cambios y deja los últimos CAMBIOS_CONSERVADOS.
+def _registro_cambios(conn):
+    import tps_feed
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS registro_cambios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            operacion TEXT NOT NULL
+        )
+    """)
+    for tabla in tps_feed.TABLAS_CON_REGISTRO:
+        for evento, fila in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_cambios_{tabla}_{evento.lower()} AFTER {evento} ON {tabla}
+                BEGIN
+                    INSERT INTO registro_cambios (tabla, fila_id, operacion) VALUES ('{tabla}', {fila}.id, '{evento}');
+                END
+            """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_poda_registro_cambios AFTER INSERT ON registro_cambios
+        WHEN NEW.id % 1000 = 0
+        BEGIN
+            DELETE FROM registro_cambios WHERE id <= NEW.id - {tps_feed.CAMBIOS_CONSERVADOS};
+        END
+    """)
+
+
+# Migración 12: catálogo de las tablas mensuales de lecturas archivadas (ver tps_retencion).
+# total_lecturas cuenta también lo archivado: sin trigger por fila al borrar de la tabla caliente.
+def _retencion_lecturas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lecturas_archivo (
+            mes TEXT PRIMARY KEY,
+            tabla TEXT NOT NULL,
+            desde TEXT NOT NULL,
+            hasta TEXT NOT NULL,
+            filas INTEGER NOT NULL DEFAULT 0,
+            fecha_actualizacion TIMESTAMP
+        )
+    """)
+    conn.execute("DROP TRIGGER IF EXISTS trg_kpi_total_lecturas_del")
+
+
+# Migración 13: índice de linaje campo -> lote -> informe -> envío -> contenedor (ver tps_linaje)
+def _indice_linaje(conn):
+    import tps_linaje
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS linaje_nodos (
+            id INTEGER PRIMARY KEY,
+            tipo INTEGER NOT NULL,
+            codigo TEXT NOT NULL,
+            UNIQUE (tipo, codigo)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_linaje_nodos_codigo ON linaje_nodos (codigo)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS linaje_aristas (
+            padre INTEGER NOT NULL,
+            hijo INTEGER NOT NULL,
+            PRIMARY KEY (padre, hijo)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_linaje_aristas_hijo ON linaje_aristas (hijo, padre)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS linaje_cierre (
+            ancestro INTEGER NOT NULL,
+            tipo_descendiente INTEGER NOT NULL,
+            descendiente INTEGER NOT NULL,
+            tipo_ancestro INTEGER NOT NULL,
+            profundidad INTEGER NOT NULL,
+            PRIMARY KEY (ancestro, tipo_descendiente, descendiente)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_linaje_cierre_descendiente "
+                 "ON linaje_cierre (descendiente, tipo_ancestro, ancestro, profundidad)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS linaje_estado (
+            tabla TEXT PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.executemany("INSERT OR IGNORE INTO linaje_estado (tabla) VALUES (?)",
+                     [(tabla,) for tabla in tps_linaje.TABLAS_INDEXADAS])
+    while tps_linaje.actualizar_linaje(conn):
+        pass
+
+
+# Migración 14: índice FTS5 del texto libre de inspecciones, envases, alertas y documentos de exportación,
+# al día por triggers (ver tps_busqueda.FUENTES)
+def _busqueda_texto(conn):
+    import tps_busqueda
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_texto USING fts5 (
+            texto,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    for tabla in tps_busqueda.FUENTES:
+        tps_busqueda.indexar_existentes(conn, tabla)
+        for sentencia in tps_busqueda.sentencias_indice(tabla):
+            conn.execute(sentencia)
+    conn.execute("INSERT INTO busqueda_texto (busqueda_texto) VALUES ('optimize')")
+
+
+# Migración 15: resumen materializado por lote para informes, dashboard y selectores (ver tps_resumen)
+def _resumen_lotes(conn):
+    import tps_resumen
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lote_resumen (
+            codigo_lote TEXT PRIMARY KEY,
+            codigo_producto TEXT,
+            campo_origen TEXT,
+            cantidad_kg REAL,
+            estado_lote TEXT,
+            resultado_visual TEXT,
+            porcentaje_conformidad REAL,
+            inspecciones INTEGER NOT NULL DEFAULT 0,
+            conformidad_suma REAL NOT NULL DEFAULT 0,
+            conformidad_n INTEGER NOT NULL DEFAULT 0,
+            resultado_fisicoquimico TEXT,
+            pruebas INTEGER NOT NULL DEFAULT 0,
+            resultado_envases TEXT,
+            envases INTEGER NOT NULL DEFAULT 0,
+            estado_sensores TEXT,
+            fecha_lectura TIMESTAMP,
+            id_lectura INTEGER,
+            lecturas INTEGER NOT NULL DEFAULT 0,
+            lecturas_con_alerta INTEGER NOT NULL DEFAULT 0,
+            alertas_activas INTEGER NOT NULL DEFAULT 0,
+            codigo_informe TEXT,
+            decision_final TEXT,
+            porcentaje_calidad_total REAL,
+            destino_comercial TEXT
+        ) WITHOUT ROWID
+    """)
+    # Lotes pendientes de informe por estado (motor de informes y selectores)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lote_resumen_estado ON lote_resumen (estado_lote, codigo_lote) "
+                 "WHERE codigo_informe IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lote_resumen_producto ON lote_resumen (codigo_producto, decision_final)")
+    tps_resumen.reconstruir_resumen(conn)
+    for sentencia in tps_resumen.sentencias_triggers():
+        conn.execute(sentencia)
+
+
+# Migración 16: estado incremental de las cartas de control por producto y canal (ver tps_spc)
+def _control_estadistico(conn):
+    import tps_spc
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS spc_canales (
+            codigo_producto TEXT NOT NULL,
+            canal TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            media REAL NOT NULL,
+            m2 REAL NOT NULL,
+            subgrupos INTEGER NOT NULL,
+            suma_medias REAL NOT NULL,
+            suma_rangos REAL NOT NULL,
+            ewma REAL,
+            cusum_pos REAL NOT NULL,
+            cusum_neg REAL NOT NULL,
+            parcial TEXT,
+            PRIMARY KEY (codigo_producto, canal)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS spc_subgrupos (
+            codigo_producto TEXT NOT NULL,
+            canal TEXT NOT NULL,
+            numero INTEGER NOT NULL,
+            fecha TIMESTAMP,
+            codigo_lote TEXT,
+            media REAL NOT NULL,
+            rango REAL NOT NULL,
+            ewma REAL,
+            cusum_pos REAL,
+            cusum_neg REAL,
+            reglas TEXT,
+            PRIMARY KEY (codigo_producto, canal, numero)
+        ) WITHOUT ROWID
+    """)
+    # El histórico fija los límites de partida sin generar alertas
+    tps_spc.reconstruir_spc(conn)
+
+
+# Migración 17: último número emitido por tabla para reservar códigos por bloques (ver tps_codigos)
+def _secuencias_codigos(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS secuencias_codigos (
+            tabla TEXT PRIMARY KEY,
+            ultimo INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+# Migración 18: avance de cada importación histórica por huella de archivo (ver tps_importacion)
+def _importaciones(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS importaciones (
+            clave TEXT PRIMARY KEY,
+            tabla TEXT NOT NULL,
+            archivo TEXT,
+            filas_procesadas INTEGER NOT NULL DEFAULT 0,
+            filas_insertadas INTEGER NOT NULL DEFAULT 0,
+            filas_rechazadas INTEGER NOT NULL DEFAULT 0,
+            completada INTEGER NOT NULL DEFAULT 0,
+            actualizada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+
+
+# Migración 19: los triggers de alertas de lote_resumen suman y restan en vez de recontar
+# el historial del lote en cada alta o cambio (ver tps_resumen)
+def _resumen_alertas_incremental(conn):
+    import tps_resumen
+    for evento in ('ins', 'upd', 'del'):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_resumen_alertas_automaticas_{evento}")
+    conn.execute("DROP TRIGGER IF EXISTS trg_resumen_lotes_ins")
+    for sentencia in tps_resumen.sentencias_triggers():
+        conn.execute(sentencia)
+
+
+# Migración 20: lecturas en rango desde el fin de un episodio abierto, para cerrarlo con histéresis (ver tps_alertas)
+def _histeresis_episodios(conn):
+    conn.execute("ALTER TABLE alertas_automaticas ADD COLUMN lecturas_en_rango INTEGER NOT NULL DEFAULT 0")
+
+
+MIGRACIONES = [
+    Migracion(1, 'esquema_base', _esquema_base, True),
+    Migracion(2, 'journal_wal', _journal_wal, False),
+    Migracion(3, 'indices_consultas', _indices_consultas, True),
+    Migracion(4, 'contadores_kpi', _contadores_kpi, True),
+    Migracion(5, 'contador_lecturas_por_bloque', _contador_lecturas_por_bloque, True),
+    Migracion(6, 'rollups_sensores', _rollups_sensores, True),
+    Migracion(7, 'umbrales_y_episodios', _umbrales_y_episodios, True),
+    Migracion(8, 'indices_paginacion', _indices_paginacion, True),
+    Migracion(9, 'generaciones_tablas', _generaciones_tablas, True),
+    Migracion(10, 'indice_lecturas_con_alerta', _indice_lecturas_con_alerta, True),
+    Migracion(11, 'registro_cambios', _registro_cambios, True),
+    Migracion(12, 'retencion_lecturas', _retencion_lecturas, True),
+    Migracion(13, 'indice_linaje', _indice_linaje, True),
+    Migracion(14, 'busqueda_texto', _busqueda_texto, True),
+    Migracion(15, 'resumen_lotes', _resumen_lotes, True),
+    Migracion(16, 'control_estadistico', _control_estadistico, True),
+    Migracion(17, 'secuencias_codigos', _secuencias_codigos, True),
+    Migracion(18, 'importaciones', _importaciones, True),
+    Migracion(19, 'resumen_alertas_incremental', _resumen_alertas_incremental, True),
+    Migracion(20, 'histeresis_episodios', _histeresis_episodios, True),
+]
+
+
+def version_actual(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            nombre TEXT,
+            fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def aplicar_migraciones(pool, migraciones=MIGRACIONES):
+    """Aplica en orden las migraciones pendientes y devuelve las versiones aplicadas."""
+    aplicadas = []
+    with pool.conexion() as conn:
+        version_actual(conn)
+        for migracion in sorted(migraciones, key=lambda m: m.version):
+            if migracion.transaccional:
+                # BEGIN IMMEDIATE serializa a varios procesos migrando a la vez
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (migracion.version,)).fetchone():
+                        conn.rollback()
+                        continue
+                    migracion.aplicar(conn)
+                    conn.execute("INSERT INTO schema_version (version, nombre) VALUES (?, ?)",
+                                 (migracion.version, migracion.nombre))
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+            else:
+                if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (migracion.version,)).fetchone():
+                    continue
+                migracion.aplicar(conn)
+                conn.execute("INSERT OR IGNORE INTO schema_version (version, nombre) VALUES (?, ?)",
+                             (migracion.version, migracion.nombre))
+                conn.commit()
+            aplicadas.append(migracion.version)
+    return aplicadas
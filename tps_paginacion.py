@@ -0,0 +1,188 @@
+"""Paginación por keyset para las pestañas de historial.
+
+Cada historial se describe con una ``VistaPaginada``. Las páginas se
+leen ordenadas por (fecha, id) descendente y se avanzan con la clave de
+la última fila vista (``(fecha, id) < (?, ?)``), de modo que el costo de
+una página no depende de su posición. Los filtros y rangos de fecha se
+aplican en el WHERE sobre la tabla principal, donde los índices
+(columna, fecha) de la migración 8 resuelven filtro y orden a la vez.
+
+Las filas con fecha NULL no se alcanzan con el keyset; todos los
+formularios del TPS fijan la fecha al registrar.
+"""
+from typing import NamedTuple
+
+TAMANO_PAGINA = 50
+TOPE_CONTEO = 10000
+
+
+class VistaPaginada(NamedTuple):
+    tabla: str
+    alias: str
+    columna_fecha: str
+    columnas: str
+    joins: str
+    # columna -> (etiqueta, opciones) de los filtros por igualdad
+    filtros: dict
+    # clave de kpi_contadores con el total sin filtros (None si no hay contador)
+    clave_total: str = None
+
+
+class Pagina(NamedTuple):
+    filas: list
+    columnas: list
+    hay_anterior: bool
+    hay_siguiente: bool
+    # claves (fecha, id) de la primera y la última fila, para navegar
+    primera: tuple
+    ultima: tuple
+
+
+_JOINS_LOTE = """
+    JOIN lotes_produccion lp ON {alias}.codigo_lote = lp.codigo_lote
+    JOIN productos_agro pa ON lp.codigo_producto = pa.codigo_producto
+"""
+
+VISTAS = {
+    'inspecciones': VistaPaginada(
+        'inspecciones_visuales', 'iv', 'fecha_inspeccion',
+        "iv.*, pa.nombre_producto, lp.cantidad_kg", _JOINS_LOTE.format(alias='iv'),
+        {'resultado_visual': ("Resultado", ["APROBADO", "OBSERVADO", "RECHAZADO"])},
+        'total_inspecciones',
+    ),
+    'pruebas': VistaPaginada(
+        'pruebas_fisicoquimicas', 'pf', 'fecha_prueba',
+        "pf.*, pa.nombre_producto, lp.cantidad_kg", _JOINS_LOTE.format(alias='pf'),
+        {'resultado_fisicoquimico': ("Resultado", ["APROBADO", "RECHAZADO", "PENDIENTE"])},
+        'total_pruebas',
+    ),
+    'envases': VistaPaginada(
+        'compatibilidad_envases', 'ce', 'fecha_evaluacion',
+        "ce.*, pa.nombre_producto, lp.cantidad_kg", _JOINS_LOTE.format(alias='ce'),
+        {'resultado_envase': ("Resultado", ["APROBADO", "RECHAZADO"])},
+    ),
+    'alertas': VistaPaginada(
+        'alertas_automaticas', 'aa', 'fecha_alerta',
+        "aa.*, pa.nombre_producto", _JOINS_LOTE.format(alias='aa'),
+        {'estado_alerta': ("Estado", ["ACTIVA", "RESUELTA"]),
+         'nivel_criticidad': ("Criticidad", ["BAJA", "MEDIA", "ALTA"])},
+        'total_alertas',
+    ),
+    'informes': VistaPaginada(
+        'informes_calidad', 'ic', 'fecha_informe',
+        "ic.*, pa.nombre_producto, lp.cantidad_kg, lp.campo_origen", _JOINS_LOTE.format(alias='ic'),
+        {'decision_final': ("Decisión", ["APROBADO", "RECHAZADO", "PENDIENTE"])},
+        'total_informes',
+    ),
+    'trazabilidad': VistaPaginada(
+        'trazabilidad_internacional', 'ti', 'fecha_embarque',
+        "ti.*, pa.nombre_producto, lp.cantidad_kg", _JOINS_LOTE.format(alias='ti'),
+        {'estado_envio': ("Estado", ["PREPARACION", "EMBARCADO", "EN_TRANSITO", "LLEGADA", "ENTREGADO"])},
+    ),
+}
+
+
+def condiciones(vista, filtros=None, codigo_lote=None, desde=None, hasta=None):
+    """(lista de condiciones SQL, parámetros) para los filtros sobre la tabla principal.
+
+    ``desde`` es inclusivo y ``hasta`` exclusivo; ambos se comparan como texto
+    contra la columna de fecha ('YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS').
+    """
+    a = vista.alias
+    sql, params = [], []
+    for columna, valor in (filtros or {}).items():
+        if columna not in vista.filtros:
+            raise ValueError(f"Filtro no permitido en {vista.tabla}: {columna}")
+        if valor is not None:
+            sql.append(f"{a}.{columna} = ?")
+            params.append(valor)
+    if codigo_lote:
+        sql.append(f"{a}.codigo_lote = ?")
+        params.append(codigo_lote)
+    if desde is not None:
+        sql.append(f"{a}.{vista.columna_fecha} >= ?")
+        params.append(str(desde))
+    if hasta is not None:
+        sql.append(f"{a}.{vista.columna_fecha} < ?")
+        params.append(str(hasta))
+    return sql, params
+
+
+def _where(sql):
+    return f"WHERE {' AND '.join(sql)}" if sql else ""
+
+
+def leer_pagina(conn, vista, despues_de=None, antes_de=None, tamano=TAMANO_PAGINA, **filtros):
+    """Una página del historial más reciente primero.
+
+    ``despues_de`` es la clave (fecha, id) de la última fila de la página
+    anterior (avanzar); ``antes_de`` la de la primera fila de la página
+    siguiente (retroceder). Sin ninguna de las dos se lee la primera página.
+    """
+    a, fecha = vista.alias, vista.columna_fecha
+    sql, params = condiciones(vista, **filtros)
+    if antes_de is not None:
+        sql.append(f"({a}.{fecha}, {a}.id) > (?, ?)")
+        params.extend(antes_de)
+        orden = "ASC"
+    else:
+        if despues_de is not None:
+            sql.append(f"({a}.{fecha}, {a}.id) < (?, ?)")
+            params.extend(despues_de)
+        orden = "DESC"
+    # Una fila extra indica si hay más páginas en la dirección de lectura
+    cursor = conn.execute(f"""
+        SELECT {vista.columnas}
+        FROM {vista.tabla} {a}
+        {vista.joins}
+        {_where(sql)}
+        ORDER BY {a}.{fecha} {orden}, {a}.id {orden}
+        LIMIT ?
+    """, params + [tamano + 1])
+    columnas = [d[0] for d in cursor.description]
+    filas = cursor.fetchall()
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if antes_de is not None:
+        filas.reverse()
+        hay_anterior, hay_siguiente = hay_mas, True
+    else:
+        hay_anterior, hay_siguiente = despues_de is not None, hay_mas
+
+    i_fecha, i_id = columnas.index(fecha), columnas.index('id')
+    primera = (filas[0][i_fecha], filas[0][i_id]) if filas else None
+    ultima = (filas[-1][i_fecha], filas[-1][i_id]) if filas else None
+    return Pagina(filas, columnas, hay_anterior and bool(filas), hay_siguiente and bool(filas), primera, ultima)
+
+
+def contar(conn, vista, tope=TOPE_CONTEO, **filtros):
+    """(total, exacto) para la cabecera de la página.
+
+    Sin filtros se usa el contador mantenido por triggers (migración 4);
+    con filtros se cuenta sobre el índice hasta ``tope`` filas, y más allá
+    solo se informa que hay al menos ``tope``.
+    """
+    sql, params = condiciones(vista, **filtros)
+    if not sql and vista.clave_total:
+        fila = conn.execute("SELECT valor FROM kpi_contadores WHERE clave = ?", (vista.clave_total,)).fetchone()
+        if fila is not None:
+            return fila[0], True
+    total = conn.execute(f"""
+        SELECT COUNT(*) FROM (SELECT 1 FROM {vista.tabla} {vista.alias} {_where(sql)} LIMIT ?)
+    """, params + [tope + 1]).fetchone()[0]
+    return min(total, tope), total <= tope
+
+
+def resumir(conn, vista, expresiones, **filtros):
+    """Agregados SQL sobre el conjunto filtrado; ``expresiones`` usa el alias de la vista.
+
+    Devuelve un dict nombre -> valor.
+    """
+    sql, params = condiciones(vista, **filtros)
+    nombres = list(expresiones)
+    fila = conn.execute(f"""
+        SELECT {', '.join(expresiones[n] for n in nombres)}
+        FROM {vista.tabla} {vista.alias}
+        {_where(sql)}
+    """, params).fetchone()
+    return dict(zip(nombres, fila))
@@ -0,0 +1,382 @@
+"""Perfilado de consultas: tiempo, filas y plan de cada sentencia por ejecución del script.
+
+Con el perfilador activo, las conexiones del pool (``ConexionPerfilada``)
+miden cada ``execute``/``executemany``, sus lecturas de filas y cada
+COMMIT, y capturan una vez por texto SQL el ``EXPLAIN QUERY PLAN``,
+marcando los recorridos completos de tabla. Las mediciones se agregan
+por página, sección (pestaña) y punto de llamada durante cada ejecución
+del script de Streamlit; al terminar, la ejecución queda en un historial
+en memoria y, si hay ruta de log, como una línea JSON.
+
+Inactivo, el coste es una comprobación por ``cursor()``: los cursores
+son los normales de sqlite3 y no se mide nada.
+
+Se activa con ``TPS_PERFILADO=1`` o desde la página de rendimiento; el
+log va a ``TPS_PERFILADO_LOG`` (por defecto ``tps_perfilado.jsonl``).
+
+Uso desde línea de comandos::
+
+    python tps_perfilado.py
+    python tps_perfilado.py tps_perfilado.jsonl --top 10 --pagina "📡 Lecturas de Sensores"
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+RUTA_LOG = 'tps_perfilado.jsonl'
+HISTORIAL = 50
+# Textos SQL distintos con plan guardado (las sentencias con valores incrustados no lo llenan)
+MAX_PLANES = 2000
+# Sentencias de las que se captura el plan
+SENTENCIAS_CON_PLAN = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# Marcos que no son el punto de llamada de una consulta: este módulo, el pool y todo lo que
+# esté fuera del proyecto (contextlib en los COMMIT de pool.transaccion(), librerías)
+_DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_ARCHIVOS_INTERNOS = (os.path.abspath(__file__), os.path.join(_DIRECTORIO_PROYECTO, 'tps_db.py'))
+
+
+class Plan(NamedTuple):
+    texto: str
+    escaneos: tuple         # tablas (o alias) recorridas enteras
+
+
+class ResumenEjecucion(NamedTuple):
+    inicio: str
+    pagina: str
+    segundos: float
+    consultas: list         # dicts ordenados por tiempo total, ver Perfilador._resumir
+
+
+class _Agregado:
+    """Acumulado de una sentencia en un punto de llamada durante una ejecución."""
+
+    def __init__(self):
+        self.ejecuciones = 0
+        self.segundos = 0.0
+        self.max_segundos = 0.0
+        self.filas = 0
+
+    def sumar(self, segundos, filas):
+        self.segundos += segundos
+        self.filas += filas
+
+
+def tabla_recorrida(detalle):
+    """Tabla (o alias) que un paso del plan recorre entera sin índice; None si no es un recorrido completo."""
+    if not detalle.startswith('SCAN '):
+        return None
+    resto = detalle[len('SCAN '):]
+    # Los SCAN con índice, de subconsultas, de tablas virtuales (FTS5) o de una fila constante no cuentan
+    if resto.startswith(('CONSTANT ROW', '(')) or 'USING' in resto or 'VIRTUAL TABLE' in resto:
+        return None
+    return resto.split()[0]
+
+
+def normalizar(sql):
+    return ' '.join(sql.split())
+
+
+def explicar(conn, sql, parametros=()):
+    """Plan de ``sql`` en ``conn``; None si la sentencia no admite EXPLAIN QUERY PLAN."""
+    try:
+        filas = sqlite3.Connection.cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    except sqlite3.Error:
+        return None
+    niveles = {0: -1}
+    lineas, escaneos = [], []
+    for id_nodo, padre, _, detalle in filas:
+        niveles[id_nodo] = niveles.get(padre, -1) + 1
+        lineas.append("  " * niveles[id_nodo] + detalle)
+        tabla = tabla_recorrida(detalle)
+        if tabla:
+            escaneos.append(tabla)
+    return Plan("\n".join(lineas), tuple(escaneos))
+
+
+class Perfilador:
+    def __init__(self, activo=False, ruta_log=None, historial=HISTORIAL):
+        self.activo = activo
+        self.ruta_log = ruta_log
+        self.historial = collections.deque(maxlen=historial)
+        self._planes = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # -- Ejecuciones del script y secciones -------------------------------------------------
+
+    def iniciar_ejecucion(self):
+        """Abre la ejecución del hilo actual (descarta una anterior que no llegó a terminar)."""
+        self._local.ejecucion = {} if self.activo else None
+        self._local.inicio = time.perf_counter()
+        self._local.fecha = datetime.datetime.now().isoformat(timespec='seconds')
+        self._local.pagina = ''
+        self._local.seccion = ''
+
+    def terminar_ejecucion(self):
+        """Cierra la ejecución del hilo actual; devuelve su ResumenEjecucion (None si no se perfilaba)."""
+        agregados = getattr(self._local, 'ejecucion', None)
+        self._local.ejecucion = None
+        if agregados is None:
+            return None
+        resumen = ResumenEjecucion(self._local.fecha, self._local.pagina,
+                                   time.perf_counter() - self._local.inicio, self._resumir(agregados))
+        with self._lock:
+            self.historial.append(resumen)
+            if self.ruta_log:
+                with open(self.ruta_log, 'a', encoding='utf-8') as log:
+                    log.write(json.dumps(resumen._asdict(), ensure_ascii=False) + "\n")
+        return resumen
+
+    @contextmanager
+    def seccion(self, seccion=None, pagina=None):
+        """Atribuye las consultas del bloque a ``pagina`` y/o ``seccion`` (una pestaña)."""
+        previas = getattr(self._local, 'pagina', ''), getattr(self._local, 'seccion', '')
+        if pagina is not None:
+            self._local.pagina, self._local.seccion = pagina, ''
+        if seccion is not None:
+            self._local.seccion = seccion
+        try:
+            yield
+        finally:
+            self._local.pagina, self._local.seccion = previas
+
+    # -- Mediciones en otro hilo (escritor único) --------------------------------------------
+
+    def contexto(self):
+        """(ejecución, página, sección) del hilo actual, para medir en su nombre desde otro hilo; None si no se mide."""
+        agregados = self.midiendo()
+        if agregados is None:
+            return None
+        return agregados, self._local.pagina, self._local.seccion
+
+    @contextmanager
+    def en_contexto(self, contexto, agregados):
+        """Mide el bloque en ``agregados`` con la página y sección de ``contexto`` (de ``contexto()``).
+
+        Sin ``contexto`` el bloque no se mide. ``fusionar`` pasa después
+        lo medido a la ejecución de origen.
+        """
+        previas = (getattr(self._local, 'ejecucion', None), getattr(self._local, 'pagina', ''),
+                   getattr(self._local, 'seccion', ''))
+        if contexto is None:
+            self._local.ejecucion = None
+        else:
+            self._local.ejecucion, self._local.pagina, self._local.seccion = agregados, contexto[1], contexto[2]
+        try:
+            yield
+        finally:
+            self._local.ejecucion, self._local.pagina, self._local.seccion = previas
+
+    @staticmethod
+    def fusionar(contexto, agregados, reatribuir=False):
+        """Suma ``agregados`` a la ejecución de ``contexto``.
+
+        Con ``reatribuir`` las sentencias pasan a la página y sección del
+        contexto (las compartidas por varias ejecuciones, como el COMMIT de
+        un grupo del escritor).
+        """
+        if contexto is None:
+            return
+        destino, pagina, seccion = contexto
+        for (pagina_origen, seccion_origen, origen, sql), agregado in agregados.items():
+            clave = (pagina, seccion, origen, sql) if reatribuir else (pagina_origen, seccion_origen, origen, sql)
+            total = destino.get(clave)
+            if total is None:
+                total = destino[clave] = _Agregado()
+            total.ejecuciones += agregado.ejecuciones
+            total.segundos += agregado.segundos
+            total.max_segundos = max(total.max_segundos, agregado.max_segundos)
+            total.filas += agregado.filas
+
+    # -- Registro de sentencias -------------------------------------------------------------
+
+    def midiendo(self):
+        """Agregados de la ejecución en curso del hilo; None si no hay nada que medir."""
+        return getattr(self._local, 'ejecucion', None) if self.activo else None
+
+    def registrar(self, agregados, conn, sql, parametros, segundos, filas):
+        """Suma una sentencia a la ejecución en curso; devuelve su _Agregado para las lecturas posteriores."""
+        plan = self._planes.get(sql, False)
+        if plan is False:
+            plan = None
+            if sql.lstrip().upper().startswith(SENTENCIAS_CON_PLAN):
+                plan = explicar(conn, sql, parametros)
+            if len(self._planes) < MAX_PLANES:
+                self._planes[sql] = plan
+        clave = (self._local.pagina, self._local.seccion, _origen(), sql)
+        agregado = agregados.get(clave)
+        if agregado is None:
+            agregado = agregados[clave] = _Agregado()
+        agregado.ejecuciones += 1
+        agregado.segundos += segundos
+        agregado.max_segundos = max(agregado.max_segundos, segundos)
+        agregado.filas += max(filas, 0)
+        return agregado
+
+    def _resumir(self, agregados):
+        consultas = []
+        for (pagina, seccion, origen, sql), agregado in agregados.items():
+            plan = self._planes.get(sql)
+            consultas.append({
+                'pagina': pagina,
+                'seccion': seccion,
+                'origen': origen,
+                'sql': normalizar(sql),
+                'ejecuciones': agregado.ejecuciones,
+                'segundos': agregado.segundos,
+                'max_segundos': agregado.max_segundos,
+                'filas': agregado.filas,
+                'escaneos': list(plan.escaneos) if plan else [],
+                'plan': plan.texto if plan else None,
+            })
+        consultas.sort(key=lambda consulta: consulta['segundos'], reverse=True)
+        return consultas
+
+
+def _origen():
+    """``archivo:línea función`` del primer marco del proyecto fuera de este módulo y tps_db."""
+    marco = sys._getframe(2)
+    while marco is not None:
+        archivo = marco.f_code.co_filename
+        if (archivo.startswith(_DIRECTORIO_PROYECTO) and archivo not in _ARCHIVOS_INTERNOS
+                and f"{os.sep}site-packages{os.sep}" not in archivo):
+            return f"{os.path.basename(archivo)}:{marco.f_lineno} {marco.f_code.co_name}"
+        marco = marco.f_back
+    return ''
+
+
+class CursorPerfilado(sqlite3.Cursor):
+    _agregado = None
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        super().execute(sql, parametros)
+        segundos = time.perf_counter() - inicio
+        agregados = self.connection.perfilador.midiendo()
+        if agregados is not None:
+            self._agregado = self.connection.perfilador.registrar(agregados, self.connection, sql, parametros,
+                                                                  segundos, self.rowcount)
+        return self
+
+    def executemany(self, sql, filas):
+        filas = filas if isinstance(filas, (list, tuple)) else list(filas)
+        inicio = time.perf_counter()
+        super().executemany(sql, filas)
+        segundos = time.perf_counter() - inicio
+        agregados = self.connection.perfilador.midiendo()
+        if agregados is not None:
+            self._agregado = self.connection.perfilador.registrar(agregados, self.connection, sql,
+                                                                  filas[0] if filas else (), segundos, self.rowcount)
+        return self
+
+    # Las lecturas de filas cuentan en la sentencia que las produjo
+    def _leer(self, lectura, *args):
+        inicio = time.perf_counter()
+        resultado = lectura(*args)
+        if self._agregado is not None:
+            filas = len(resultado) if isinstance(resultado, list) else int(resultado is not None)
+            self._agregado.sumar(time.perf_counter() - inicio, filas)
+        return resultado
+
+    def fetchone(self):
+        return self._leer(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._leer(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._leer(super().fetchall)
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        fila = super().__next__()
+        if self._agregado is not None:
+            self._agregado.sumar(time.perf_counter() - inicio, 1)
+        return fila
+
+
+class ConexionPerfilada(sqlite3.Connection):
+    """Conexión que entrega cursores perfilados mientras ``perfilador`` está activo."""
+    perfilador = None
+
+    def cursor(self, factory=None):
+        if factory is None and self.perfilador.activo:
+            factory = CursorPerfilado
+        return super().cursor(factory) if factory else super().cursor()
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, filas):
+        return self.cursor().executemany(sql, filas)
+
+    def commit(self):
+        agregados = self.perfilador.midiendo()
+        if agregados is None:
+            return super().commit()
+        inicio = time.perf_counter()
+        super().commit()
+        self.perfilador.registrar(agregados, self, "COMMIT", (), time.perf_counter() - inicio, 0)
+
+
+PERFILADOR = Perfilador(activo=os.environ.get('TPS_PERFILADO') == '1',
+                        ruta_log=os.environ.get('TPS_PERFILADO_LOG', RUTA_LOG))
+
+
+def leer_log(ruta):
+    """ResumenEjecucion de cada línea del log JSON."""
+    with open(ruta, encoding='utf-8') as log:
+        return [ResumenEjecucion(**json.loads(linea)) for linea in log if linea.strip()]
+
+
+def agregar_consultas(ejecuciones, clave=('pagina', 'seccion', 'origen', 'sql')):
+    """Suma las consultas de varias ejecuciones por ``clave``; lista de dicts por tiempo total."""
+    totales = {}
+    for ejecucion in ejecuciones:
+        for consulta in ejecucion.consultas:
+            llave = tuple(consulta[campo] for campo in clave)
+            total = totales.get(llave)
+            if total is None:
+                total = totales[llave] = dict({campo: consulta[campo] for campo in clave},
+                                              ejecuciones=0, segundos=0.0, max_segundos=0.0, filas=0,
+                                              escaneos=consulta['escaneos'], plan=consulta['plan'])
+            total['ejecuciones'] += consulta['ejecuciones']
+            total['segundos'] += consulta['segundos']
+            total['max_segundos'] = max(total['max_segundos'], consulta['max_segundos'])
+            total['filas'] += consulta['filas']
+    return sorted(totales.values(), key=lambda total: total['segundos'], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumen del log de perfilado de consultas del TPS")
+    parser.add_argument('log', nargs='?', default=RUTA_LOG, help="Log JSON escrito por el perfilador")
+    parser.add_argument('--top', type=int, default=20, help="Consultas a mostrar")
+    parser.add_argument('--pagina', help="Solo las ejecuciones de esta página")
+    args = parser.parse_args(argv)
+
+    ejecuciones = leer_log(args.log)
+    if args.pagina:
+        ejecuciones = [ejecucion for ejecucion in ejecuciones if ejecucion.pagina == args.pagina]
+    if not ejecuciones:
+        print("El log no tiene ejecuciones")
+        return 1
+    segundos = sum(ejecucion.segundos for ejecucion in ejecuciones)
+    print(f"{len(ejecuciones)} ejecuciones, {segundos / len(ejecuciones) * 1000:.1f} ms de media por ejecución")
+    for total in agregar_consultas(ejecuciones)[:args.top]:
+        escaneo = f"  ⚠ recorre {', '.join(total['escaneos'])}" if total['escaneos'] else ""
+        print(f"  {total['segundos'] * 1000:9.1f} ms  {total['ejecuciones']:6,}x  {total['filas']:9,} filas  "
+              f"{total['pagina'] or '-'} / {total['seccion'] or '-'}  {total['origen']}{escaneo}")
+        print(f"      {total['sql'][:140]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""Repositorio de escrituras del TPS con implementación SQLite y PostgreSQL.
+
+Reúne el SQL con que los formularios registran datos: el alta de cada
+uno (inspección, prueba, envase, alerta, envío) con su código de
+``tps_codigos`` y los cambios de estado, más la carga masiva de lecturas
+y la lectura por bloques de consultas grandes. Las páginas llaman a estos
+métodos (a través del escritor único, ver ``tps_escritor``) en lugar de
+escribir SQL propio.
+
+El alcance se limita a esas escrituras: ``RepositorioPostgres`` no es
+todavía un backend con el que corra la aplicación. Siguen atados a
+``PoolConexiones`` y a SQL de SQLite (FTS5, triggers, ``INSERT OR ...``):
+
+* las lecturas de las páginas (``tps_paginacion``, ``tps_catalogo``,
+  ``tps_kpis``, ``tps_linaje``, ``tps_busqueda``...);
+* la ingesta con su evaluación de alertas y el gateway IoT;
+* las importaciones, rollups, resumen por lote y cartas de control.
+
+Llevar esas piezas al repositorio es trabajo pendiente, no parte de este
+módulo.
+
+* ``RepositorioSQLite`` usa ``PoolConexiones`` y las migraciones; la
+  carga de lecturas pasa por ``tps_ingesta.insertar_filas`` y mantiene
+  contadores y rollups.
+* ``RepositorioPostgres`` usa un pool de ``psycopg_pool`` (dependencia
+  opcional: ``pip install "psycopg[binary,pool]"``), COPY para las
+  lecturas y cursores del lado del servidor para leer por bloques. Crea
+  las tablas transaccionales con ``crear_esquema``; los índices de
+  búsqueda, rollups y cartas de control siguen siendo de SQLite.
+
+Las sentencias se escriben una vez con marcadores ``?`` y cada motor
+las adapta. ``verificar_paridad`` corre los mismos escenarios sobre
+ambos y compara los resultados; la suite ``tests/test_repositorio.py``
+la usa con SQLite siempre y con PostgreSQL si ``TPS_POSTGRES_DSN`` apunta
+a una base desechable, en un esquema temporal que se borra al final::
+
+    python -m pytest tests/test_repositorio.py
+    TPS_POSTGRES_DSN=postgresql://localhost/tps_pruebas python -m pytest tests/test_repositorio.py
+"""
+import abc
+import datetime
+import math
+import uuid
+from contextlib import contextmanager
+
+from tps_codigos import SQL_AVANZAR, SQL_AVANZAR_POSTGRES, SQL_RESERVAR, codigos_del_bloque
+from tps_kpis import limites_del_dia
+
+# Tabla -> columna de su código de negocio
+COLUMNAS_CODIGO = {
+    'productos_agro': 'codigo_producto',
+    'lotes_produccion': 'codigo_lote',
+    'inspecciones_visuales': 'codigo_inspeccion',
+    'lecturas_sensores': 'codigo_lectura',
+    'pruebas_fisicoquimicas': 'codigo_prueba',
+    'compatibilidad_envases': 'codigo_compatibilidad',
+    'alertas_automaticas': 'codigo_alerta',
+    'informes_calidad': 'codigo_informe',
+    'trazabilidad_internacional': 'codigo_trazabilidad',
+}
+# Columnas de lecturas_sensores en el orden de tps_ingesta.filas_para_insertar
+COLUMNAS_LECTURA = ('codigo_lectura', 'codigo_lote', 'timestamp_lectura', 'sensor_temperatura', 'sensor_peso',
+                    'sensor_humedad', 'sensor_ph', 'sensor_brix', 'estado_sensores', 'alerta_generada')
+TAMANO_BLOQUE_LECTURA = 10000
+
+CONSULTA_CONTEOS_DIA = """
+    SELECT
+        (SELECT COUNT(*) FROM inspecciones_visuales WHERE fecha_inspeccion >= ? AND fecha_inspeccion < ?),
+        (SELECT COUNT(*) FROM informes_calidad
+         WHERE decision_final = 'APROBADO' AND fecha_informe >= ? AND fecha_informe < ?)
+"""
+
+# Tablas transaccionales de la migración 1 en PostgreSQL (fechas en UTC como CURRENT_TIMESTAMP de SQLite)
+_AHORA_UTC = "(now() AT TIME ZONE 'utc')"
+ESQUEMA_POSTGRES = (
+    """CREATE TABLE IF NOT EXISTS productos_agro (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_producto TEXT UNIQUE, nombre_producto TEXT, variedad TEXT, categoria TEXT, origen_campo TEXT,
+        temporada TEXT, estado TEXT, fecha_registro DATE)""",
+    f"""CREATE TABLE IF NOT EXISTS lotes_produccion (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_lote TEXT UNIQUE, codigo_producto TEXT REFERENCES productos_agro (codigo_producto),
+        fecha_cosecha DATE, cantidad_kg DOUBLE PRECISION, campo_origen TEXT, responsable_campo TEXT,
+        estado_lote TEXT, fecha_creacion TIMESTAMP DEFAULT {_AHORA_UTC})""",
+    f"""CREATE TABLE IF NOT EXISTS inspecciones_visuales (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_inspeccion TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        fecha_inspeccion TIMESTAMP DEFAULT {_AHORA_UTC}, inspector TEXT, color_evaluacion TEXT,
+        forma_evaluacion TEXT, tamano_evaluacion TEXT, defectos_visuales TEXT,
+        porcentaje_conformidad DOUBLE PRECISION, resultado_visual TEXT, observaciones TEXT,
+        tiempo_procesamiento DOUBLE PRECISION)""",
+    f"""CREATE TABLE IF NOT EXISTS lecturas_sensores (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_lectura TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        timestamp_lectura TIMESTAMP DEFAULT {_AHORA_UTC}, sensor_temperatura DOUBLE PRECISION,
+        sensor_peso DOUBLE PRECISION, sensor_humedad DOUBLE PRECISION, sensor_ph DOUBLE PRECISION,
+        sensor_brix DOUBLE PRECISION, estado_sensores TEXT, alerta_generada BOOLEAN DEFAULT FALSE)""",
+    f"""CREATE TABLE IF NOT EXISTS pruebas_fisicoquimicas (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_prueba TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        fecha_prueba TIMESTAMP DEFAULT {_AHORA_UTC}, laboratorista TEXT, acidez_titulable DOUBLE PRECISION,
+        solidos_solubles DOUBLE PRECISION, firmeza DOUBLE PRECISION, contenido_humedad DOUBLE PRECISION,
+        residuos_pesticidas TEXT, microbiologia_resultado TEXT, resultado_fisicoquimico TEXT,
+        certificacion_organica BOOLEAN DEFAULT FALSE)""",
+    f"""CREATE TABLE IF NOT EXISTS compatibilidad_envases (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_compatibilidad TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        fecha_evaluacion TIMESTAMP DEFAULT {_AHORA_UTC}, tipo_envase TEXT, material_envase TEXT,
+        capacidad_envase TEXT, prueba_hermeticidad BOOLEAN, prueba_resistencia BOOLEAN,
+        compatibilidad_producto BOOLEAN, resultado_envase TEXT, observaciones_envase TEXT)""",
+    f"""CREATE TABLE IF NOT EXISTS alertas_automaticas (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_alerta TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        tipo_alerta TEXT, nivel_criticidad TEXT, mensaje_alerta TEXT, parametro_afectado TEXT,
+        valor_detectado DOUBLE PRECISION, valor_limite DOUBLE PRECISION,
+        fecha_alerta TIMESTAMP DEFAULT {_AHORA_UTC}, estado_alerta TEXT, accion_tomada TEXT,
+        fecha_fin TIMESTAMP, duracion_segundos DOUBLE PRECISION, lecturas_afectadas INTEGER,
+        episodio_abierto INTEGER DEFAULT 0, lecturas_en_rango INTEGER NOT NULL DEFAULT 0)""",
+    f"""CREATE TABLE IF NOT EXISTS informes_calidad (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_informe TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        fecha_informe TIMESTAMP DEFAULT {_AHORA_UTC}, resultado_inspeccion_visual TEXT, resultado_sensores TEXT,
+        resultado_fisicoquimico TEXT, resultado_envases TEXT, decision_final TEXT,
+        porcentaje_calidad_total DOUBLE PRECISION, certificaciones_obtenidas TEXT, destino_comercial TEXT,
+        responsable_aprobacion TEXT, fecha_aprobacion TIMESTAMP)""",
+    """CREATE TABLE IF NOT EXISTS trazabilidad_internacional (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo_trazabilidad TEXT UNIQUE, codigo_lote TEXT REFERENCES lotes_produccion (codigo_lote),
+        pais_destino TEXT, cliente_internacional TEXT, certificacion_requerida TEXT, numero_contenedor TEXT,
+        fecha_embarque DATE, puerto_destino TEXT, documentos_exportacion TEXT, estado_envio TEXT)""",
+    "CREATE TABLE IF NOT EXISTS secuencias_codigos (tabla TEXT PRIMARY KEY, ultimo BIGINT NOT NULL)",
+    # Subconjunto de los índices de las migraciones 3 y 8: por lote y fecha, y los de los conteos del día
+    "CREATE INDEX IF NOT EXISTS idx_inspecciones_fecha ON inspecciones_visuales (fecha_inspeccion)",
+    "CREATE INDEX IF NOT EXISTS idx_inspecciones_lote_fecha ON inspecciones_visuales (codigo_lote, fecha_inspeccion)",
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_lote_ts ON lecturas_sensores (codigo_lote, timestamp_lectura)",
+    "CREATE INDEX IF NOT EXISTS idx_pruebas_lote_fecha ON pruebas_fisicoquimicas (codigo_lote, fecha_prueba)",
+    "CREATE INDEX IF NOT EXISTS idx_envases_lote_fecha ON compatibilidad_envases (codigo_lote, fecha_evaluacion)",
+    "CREATE INDEX IF NOT EXISTS idx_alertas_estado_fecha ON alertas_automaticas (estado_alerta, fecha_alerta)",
+    "CREATE INDEX IF NOT EXISTS idx_informes_fecha ON informes_calidad (fecha_informe)",
+)
+
+
+class Repositorio(abc.ABC):
+    """Operaciones comunes; las subclases ponen las conexiones y lo propio de cada motor."""
+
+    # Marcador de parámetros del driver; las sentencias se escriben con '?'
+    marcador = '?'
+    sql_avanzar = SQL_AVANZAR
+
+    def _sql(self, sql):
+        return sql if self.marcador == '?' else sql.replace('?', self.marcador)
+
+    def _ejecutar(self, conn, sql, params=()):
+        return conn.execute(self._sql(sql), params)
+
+    @abc.abstractmethod
+    def conexion(self):
+        """Context manager con una conexión de lectura."""
+
+    @abc.abstractmethod
+    def transaccion(self):
+        """Context manager con una conexión que confirma al salir y deshace ante una excepción."""
+
+    @abc.abstractmethod
+    def crear_esquema(self):
+        """Crea las tablas que usan estas operaciones."""
+
+    def reservar_codigos(self, conn, tabla, cantidad=1):
+        """Bloque de códigos de ``tabla`` (ver tps_codigos), dentro de la transacción de quien escribe."""
+        if cantidad <= 0:
+            return []
+        ultimo, = self._ejecutar(conn, SQL_RESERVAR, (tabla, cantidad)).fetchone()
+        return codigos_del_bloque(tabla, ultimo, cantidad)
+
+    def avanzar_secuencia(self, conn, tabla, numero):
+        """Lleva la secuencia de ``tabla`` al menos hasta ``numero`` (ver tps_codigos.avanzar_secuencia)."""
+        self._ejecutar(conn, self.sql_avanzar, (tabla, int(numero)))
+
+    def registrar(self, conn, tabla, datos):
+        """Inserta una fila de ``tabla`` con un código nuevo; devuelve el código."""
+        codigo = self.reservar_codigos(conn, tabla)[0]
+        columnas = [COLUMNAS_CODIGO[tabla], *datos]
+        self._ejecutar(conn, f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                       (codigo, *datos.values()))
+        return codigo
+
+    def actualizar(self, conn, tabla, valores, **donde):
+        """UPDATE de ``valores`` en las filas que cumplen ``donde`` (igualdades); devuelve las filas cambiadas."""
+        asignaciones = ', '.join(f"{columna} = ?" for columna in valores)
+        condiciones = ' AND '.join(f"{columna} = ?" for columna in donde)
+        return self._ejecutar(conn, f"UPDATE {tabla} SET {asignaciones} WHERE {condiciones}",
+                              (*valores.values(), *donde.values())).rowcount
+
+    @abc.abstractmethod
+    def insertar_lecturas(self, conn, filas):
+        """Carga masiva de lecturas ya validadas (tuplas en el orden de COLUMNAS_LECTURA)."""
+
+    @abc.abstractmethod
+    def leer_por_bloques(self, conn, sql, params=(), tamano=TAMANO_BLOQUE_LECTURA):
+        """Itera las filas de ``sql`` en listas de hasta ``tamano`` sin traer el resultado entero."""
+
+    def conteos_del_dia(self, conn):
+        """(inspecciones de hoy, informes aprobados hoy), con los límites de tps_kpis."""
+        desde, hasta = limites_del_dia()
+        return tuple(self._ejecutar(conn, CONSULTA_CONTEOS_DIA, (desde, hasta, desde, hasta)).fetchone())
+
+    def cerrar(self):
+        pass
+
+
+class RepositorioSQLite(Repositorio):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def conexion(self):
+        return self.pool.conexion()
+
+    def transaccion(self):
+        return self.pool.transaccion()
+
+    def crear_esquema(self):
+        # Importación local: tps_migraciones importa módulos que usan este
+        from tps_migraciones import aplicar_migraciones
+        aplicar_migraciones(self.pool)
+
+    def insertar_lecturas(self, conn, filas):
+        # Contadores, generaciones y rollups de SQLite van con el INSERT
+        from tps_ingesta import insertar_filas
+        insertar_filas(conn, filas)
+        return len(filas)
+
+    def leer_por_bloques(self, conn, sql, params=(), tamano=TAMANO_BLOQUE_LECTURA):
+        cursor = conn.execute(sql, params)
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                return
+            yield filas
+
+    def cerrar(self):
+        self.pool.cerrar()
+
+
+class RepositorioPostgres(Repositorio):
+    marcador = '%s'
+    sql_avanzar = SQL_AVANZAR_POSTGRES
+
+    def __init__(self, dsn, max_conexiones=8, esquema=None):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError('El backend PostgreSQL requiere psycopg 3: pip install "psycopg[binary,pool]"') from e
+        self.esquema = esquema
+        opciones = {'options': f"-c search_path={esquema}"} if esquema else {}
+        self.pool = ConnectionPool(dsn, min_size=1, max_size=max_conexiones, kwargs=opciones, open=True)
+
+    @contextmanager
+    def conexion(self):
+        # El pool de psycopg confirma al salir del bloque y deshace ante una excepción
+        with self.pool.connection() as conn:
+            yield conn
+
+    def transaccion(self):
+        return self.conexion()
+
+    def crear_esquema(self):
+        with self.pool.connection() as conn:
+            for sentencia in ESQUEMA_POSTGRES:
+                conn.execute(sentencia)
+
+    def insertar_lecturas(self, conn, filas):
+        with conn.cursor() as cursor:
+            with cursor.copy(f"COPY lecturas_sensores ({', '.join(COLUMNAS_LECTURA)}) FROM STDIN") as copia:
+                for fila in filas:
+                    copia.write_row(fila[:-1] + (bool(fila[-1]),))
+        return len(filas)
+
+    def leer_por_bloques(self, conn, sql, params=(), tamano=TAMANO_BLOQUE_LECTURA):
+        # Cursor con nombre: el resultado se queda en el servidor y llega por bloques
+        with conn.cursor(name=f"tps_{uuid.uuid4().hex[:12]}") as cursor:
+            cursor.itersize = tamano
+            cursor.execute(self._sql(sql), params)
+            while True:
+                filas = cursor.fetchmany(tamano)
+                if not filas:
+                    return
+                yield filas
+
+    def cerrar(self):
+        self.pool.close()
+
+
+def _normalizar(valor):
+    """Valor comparable entre motores: fechas como texto, booleanos como 0/1 y reales redondeados."""
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return str(valor)[:19]
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, float):
+        return round(valor, 6)
+    return valor
+
+
+def _lecturas_de_prueba(codigos, lote, cantidad, semilla=7):
+    # Importación local: solo los escenarios de paridad usan NumPy
+    import numpy as np
+    rng = np.random.default_rng(semilla)
+    inicio = datetime.datetime(2024, 12, 1)
+    return [
+        (codigo, lote, (inicio + datetime.timedelta(seconds=30 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+         round(float(t), 2), round(float(p), 1), round(float(h), 1), round(float(ph), 2), round(float(b), 1),
+         'OPERATIVO', int(t > 8.0))
+        for i, (codigo, t, p, h, ph, b) in enumerate(zip(
+            codigos, rng.normal(5, 2, cantidad), rng.normal(250, 10, cantidad), rng.normal(88, 3, cantidad),
+            rng.normal(3.8, 0.2, cantidad), rng.normal(12.5, 1, cantidad)))
+    ]
+
+
+def escenarios(repositorio, lecturas=5000):
+    """Corre los escenarios de paridad sobre ``repositorio``; devuelve un dict nombre -> resultado."""
+    resultados = {}
+    with repositorio.transaccion() as conn:
+        producto = repositorio.registrar(conn, 'productos_agro', {
+            'nombre_producto': "Espárrago Verde", 'variedad': "UC-157", 'categoria': "Hortaliza",
+            'origen_campo': "Campo Paridad", 'temporada': "2024-2025", 'estado': "ACTIVO", 'fecha_registro': '2024-12-01'})
+        lote = repositorio.registrar(conn, 'lotes_produccion', {
+            'codigo_producto': producto, 'fecha_cosecha': '2024-12-01', 'cantidad_kg': 1250.5,
+            'campo_origen': "Campo Paridad", 'responsable_campo': "Ing. Paridad", 'estado_lote': 'EN_PROCESO'})
+        resultados['codigos'] = [producto.split('-')[0], lote.split('-')[0], producto[-4:], lote[-4:]]
+
+    with repositorio.transaccion() as conn:
+        altas = [
+            repositorio.registrar(conn, 'inspecciones_visuales', {
+                'codigo_lote': lote, 'inspector': "Ana Torres", 'color_evaluacion': "Excelente",
+                'porcentaje_conformidad': 96.5, 'resultado_visual': 'APROBADO', 'tiempo_procesamiento': 12.5}),
+            repositorio.registrar(conn, 'pruebas_fisicoquimicas', {
+                'codigo_lote': lote, 'laboratorista': "Dra. Ruiz", 'acidez_titulable': 0.15, 'solidos_solubles': 12.0,
+                'resultado_fisicoquimico': 'APROBADO', 'certificacion_organica': True}),
+            repositorio.registrar(conn, 'compatibilidad_envases', {
+                'codigo_lote': lote, 'tipo_envase': "Caja", 'prueba_hermeticidad': True, 'prueba_resistencia': False,
+                'compatibilidad_producto': True, 'resultado_envase': 'RECHAZADO'}),
+            repositorio.registrar(conn, 'alertas_automaticas', {
+                'codigo_lote': lote, 'tipo_alerta': 'TEMPERATURA', 'nivel_criticidad': 'ALTA',
+                'mensaje_alerta': "Temperatura fuera de rango", 'valor_detectado': 9.5, 'valor_limite': 8.0,
+                'estado_alerta': 'ACTIVA'}),
+            repositorio.registrar(conn, 'trazabilidad_internacional', {
+                'codigo_lote': lote, 'pais_destino': "Estados Unidos", 'fecha_embarque': '2024-12-15',
+                'estado_envio': 'PREPARANDO'}),
+        ]
+        resultados['altas'] = [codigo.split('-')[0] for codigo in altas]
+        resultados['cambios'] = [
+            repositorio.actualizar(conn, 'alertas_automaticas', {'estado_alerta': 'RESUELTA'}, codigo_alerta=altas[3]),
+            repositorio.actualizar(conn, 'lotes_produccion', {'estado_lote': 'EXPORTADO'}, codigo_lote=lote),
+            repositorio.actualizar(conn, 'lotes_produccion', {'estado_lote': 'EXPORTADO'}, codigo_lote='NO-EXISTE'),
+        ]
+
+    with repositorio.transaccion() as conn:
+        # Una secuencia nunca retrocede: el segundo avance, menor, no cambia nada
+        repositorio.avanzar_secuencia(conn, 'lecturas_sensores', 1000)
+        repositorio.avanzar_secuencia(conn, 'lecturas_sensores', 10)
+        repositorio.avanzar_secuencia(conn, 'informes_calidad', 42)
+        resultados['secuencias'] = [codigo[-4:] for codigo in (
+            repositorio.reservar_codigos(conn, 'informes_calidad')[0],
+            repositorio.reservar_codigos(conn, 'lecturas_sensores')[0])]
+
+    with repositorio.transaccion() as conn:
+        codigos = repositorio.reservar_codigos(conn, 'lecturas_sensores', lecturas)
+        resultados['lecturas_insertadas'] = repositorio.insertar_lecturas(
+            conn, _lecturas_de_prueba(codigos, lote, lecturas))
+
+    with repositorio.conexion() as conn:
+        bloques = list(repositorio.leer_por_bloques(conn, """
+            SELECT codigo_lectura, timestamp_lectura, sensor_temperatura, alerta_generada
+            FROM lecturas_sensores WHERE codigo_lote = ? ORDER BY timestamp_lectura
+        """, (lote,), tamano=1000))
+        filas = [fila for bloque in bloques for fila in bloque]
+        resultados['lecturas_leidas'] = [len(bloques), len(filas)]
+        resultados['lecturas_extremos'] = [[_normalizar(v) for v in fila[1:]] for fila in (filas[0], filas[-1])]
+        resultados['temperatura_total'] = round(math.fsum(fila[2] for fila in filas), 4)
+        resultados['lecturas_con_alerta'] = sum(_normalizar(fila[3]) for fila in filas)
+        resultados['registros'] = [_normalizar(v) for v in repositorio._ejecutar(conn, """
+            SELECT i.resultado_visual, i.porcentaje_conformidad, p.certificacion_organica, e.prueba_resistencia,
+                   a.estado_alerta, l.estado_lote, t.fecha_embarque
+            FROM lotes_produccion l
+            JOIN inspecciones_visuales i ON i.codigo_lote = l.codigo_lote
+            JOIN pruebas_fisicoquimicas p ON p.codigo_lote = l.codigo_lote
+            JOIN compatibilidad_envases e ON e.codigo_lote = l.codigo_lote
+            JOIN alertas_automaticas a ON a.codigo_lote = l.codigo_lote
+            JOIN trazabilidad_internacional t ON t.codigo_lote = l.codigo_lote
+            WHERE l.codigo_lote = ? AND a.codigo_alerta = ?
+        """, (lote, altas[3])).fetchone()]
+        resultados['conteos_del_dia'] = list(repositorio.conteos_del_dia(conn))
+    return resultados
+
+
+def verificar_paridad(repositorios, lecturas=5000):
+    """Corre ``escenarios`` en cada repositorio (dict nombre -> repositorio); devuelve (resultados, diferencias)."""
+    resultados = {nombre: escenarios(repositorio, lecturas) for nombre, repositorio in repositorios.items()}
+    referencia, *otros = resultados
+    diferencias = [(escenario, {nombre: resultados[nombre][escenario] for nombre in resultados})
+                   for escenario in resultados[referencia]
+                   if any(resultados[otro][escenario] != resultados[referencia][escenario] for otro in otros)]
+    return resultados, diferencias
+
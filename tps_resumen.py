@@ -0,0 +1,252 @@
+"""Resumen materializado por lote (``lote_resumen``, migración 15).
+
+Una fila por lote con lo que informes, dashboard y selectores de lotes
+recalculaban sobre las tablas hijas: el último resultado visual, de
+laboratorio y de envases, la conformidad acumulada, el estado del último
+sensor con sus lecturas y lecturas con alerta, las alertas activas y el
+último informe.
+
+Las tablas de registro manual lo mantienen con triggers: cada alta,
+cambio o baja recalcula solo la fuente afectada del lote, con búsquedas
+por los índices (codigo_lote, fecha). Los contadores que crecen con el
+historial del lote (alertas activas) no se recuentan: el trigger suma o
+resta la fila que cambia, como los de ``kpi_contadores``, y solo
+``reconstruir_resumen`` los cuenta de nuevo. Las lecturas de sensores no llevan
+trigger por fila (ver migración 5): ``actualizar_lecturas`` acumula las
+nuevas desde su marca en ``rollup_estado`` y la llama
+``tps_series.actualizar_rollups``, así que el resumen de sensores avanza
+junto con los rollups, por tandas y fuera de los bloques de ingesta. Las lecturas archivadas siguen contando.
+
+Uso desde línea de comandos::
+
+    python tps_resumen.py --reconstruir
+"""
+import argparse
+import sys
+import time
+from typing import NamedTuple
+
+from tps_db import DB_PATH, PoolConexiones
+
+
+class Fuente(NamedTuple):
+    columna_fecha: str
+    ultimo: dict            # columna de lote_resumen -> columna del registro más reciente del lote
+    agregados: dict         # columna de lote_resumen -> agregado sobre todos los registros del lote
+    columnas: tuple         # columnas cuyo UPDATE obliga a recalcular la fuente
+    contadores: dict = {}   # columna de lote_resumen -> (columna, valor) que cuenta; los triggers suman y restan
+
+
+FUENTES = {
+    'inspecciones_visuales': Fuente(
+        'fecha_inspeccion',
+        {'resultado_visual': 'resultado_visual', 'porcentaje_conformidad': 'porcentaje_conformidad'},
+        {'inspecciones': 'COUNT(*)', 'conformidad_suma': 'TOTAL(porcentaje_conformidad)',
+         'conformidad_n': 'COUNT(porcentaje_conformidad)'},
+        ('codigo_lote', 'fecha_inspeccion', 'resultado_visual', 'porcentaje_conformidad')),
+    'pruebas_fisicoquimicas': Fuente(
+        'fecha_prueba', {'resultado_fisicoquimico': 'resultado_fisicoquimico'}, {'pruebas': 'COUNT(*)'},
+        ('codigo_lote', 'fecha_prueba', 'resultado_fisicoquimico')),
+    'compatibilidad_envases': Fuente(
+        'fecha_evaluacion', {'resultado_envases': 'resultado_envase'}, {'envases': 'COUNT(*)'},
+        ('codigo_lote', 'fecha_evaluacion', 'resultado_envase')),
+    'alertas_automaticas': Fuente(
+        'fecha_alerta', {}, {}, ('codigo_lote', 'estado_alerta'), {'alertas_activas': ('estado_alerta', 'ACTIVA')}),
+    'informes_calidad': Fuente(
+        'fecha_informe',
+        {'codigo_informe': 'codigo_informe', 'decision_final': 'decision_final',
+         'porcentaje_calidad_total': 'porcentaje_calidad_total', 'destino_comercial': 'destino_comercial'},
+        {}, ('codigo_lote', 'fecha_informe', 'codigo_informe', 'decision_final', 'porcentaje_calidad_total',
+             'destino_comercial')),
+}
+COLUMNAS_LOTE = ('codigo_producto', 'campo_origen', 'cantidad_kg', 'estado_lote')
+
+SQL_TABLA_LECTURAS_NUEVAS = """
+    CREATE TEMP TABLE IF NOT EXISTS resumen_lecturas_nuevas (
+        codigo_lote TEXT PRIMARY KEY,
+        n INTEGER,
+        con_alerta INTEGER,
+        estado_sensores TEXT,
+        timestamp_lectura TEXT,
+        id INTEGER,
+        nueva INTEGER
+    )
+"""
+
+# Por lote del rango: cuántas lecturas, cuántas con alerta, la más reciente y si supera a la del resumen
+SQL_AGREGAR_LECTURAS = """
+    INSERT INTO temp.resumen_lecturas_nuevas
+    SELECT u.codigo_lote, u.n, u.con_alerta, u.estado_sensores, u.timestamp_lectura, u.id,
+           (COALESCE(u.timestamp_lectura, ''), u.id) > (COALESCE(l.fecha_lectura, ''), COALESCE(l.id_lectura, 0))
+    FROM (
+        SELECT codigo_lote, estado_sensores, timestamp_lectura, id,
+               COUNT(*) OVER lote AS n, TOTAL(alerta_generada) OVER lote AS con_alerta,
+               ROW_NUMBER() OVER (lote ORDER BY timestamp_lectura DESC, id DESC) AS orden
+        FROM {tabla}
+        WHERE id > ? AND id <= ?
+        WINDOW lote AS (PARTITION BY codigo_lote)
+    ) u
+    JOIN lote_resumen l ON l.codigo_lote = u.codigo_lote
+    WHERE u.orden = 1
+"""
+
+# Por clave primaria, solo los lotes del rango (con UPDATE ... FROM el planificador recorre todo el resumen)
+SQL_SUMAR_LECTURAS = """
+    UPDATE lote_resumen
+    SET (lecturas, lecturas_con_alerta, estado_sensores, fecha_lectura, id_lectura) = (
+        SELECT lote_resumen.lecturas + r.n, lote_resumen.lecturas_con_alerta + r.con_alerta,
+               CASE WHEN r.nueva THEN r.estado_sensores ELSE lote_resumen.estado_sensores END,
+               CASE WHEN r.nueva THEN r.timestamp_lectura ELSE lote_resumen.fecha_lectura END,
+               CASE WHEN r.nueva THEN r.id ELSE lote_resumen.id_lectura END
+        FROM temp.resumen_lecturas_nuevas r WHERE r.codigo_lote = lote_resumen.codigo_lote)
+    WHERE codigo_lote IN (SELECT codigo_lote FROM temp.resumen_lecturas_nuevas)
+"""
+
+
+def sql_recalcular(tabla, lote, contadores=False):
+    """UPDATE que recalcula en lote_resumen la fuente ``tabla`` del lote ``lote`` (expresión SQL).
+
+    Con ``contadores`` también recuenta los contadores de la fuente. Sin
+    nada que recalcular devuelve None.
+    """
+    fuente = FUENTES[tabla]
+    agregados = dict(fuente.agregados)
+    if contadores:
+        agregados.update({columna: f"COUNT(CASE WHEN {contada} = '{valor}' THEN 1 END)"
+                          for columna, (contada, valor) in fuente.contadores.items()})
+    asignaciones = []
+    if fuente.ultimo:
+        asignaciones.append(f"""({', '.join(fuente.ultimo)}) = (
+            SELECT {', '.join(fuente.ultimo.values())} FROM {tabla}
+            WHERE codigo_lote = {lote} ORDER BY {fuente.columna_fecha} DESC, id DESC LIMIT 1)""")
+    if agregados:
+        asignaciones.append(f"""({', '.join(agregados)}) = (
+            SELECT {', '.join(agregados.values())} FROM {tabla} WHERE codigo_lote = {lote})""")
+    if not asignaciones:
+        return None
+    return f"UPDATE lote_resumen SET {', '.join(asignaciones)} WHERE codigo_lote = {lote}"
+
+
+def sql_contar(tabla, fila, signo):
+    """UPDATE que suma (signo '+') o resta ('-') la fila ``fila`` (NEW/OLD) a los contadores de su lote."""
+    fuente = FUENTES[tabla]
+    if not fuente.contadores:
+        return None
+    # "IS" devuelve 0/1 incluso con NULL, a diferencia de "="
+    asignaciones = ', '.join(f"{columna} = {columna} {signo} ({fila}.{contada} IS '{valor}')"
+                             for columna, (contada, valor) in fuente.contadores.items())
+    return f"UPDATE lote_resumen SET {asignaciones} WHERE codigo_lote = {fila}.codigo_lote"
+
+
+def _cuerpo(*sentencias):
+    return ';\n'.join(sentencia for sentencia in sentencias if sentencia)
+
+
+def sentencias_triggers():
+    """Triggers de lotes_produccion y de cada fuente que mantienen lote_resumen."""
+    columnas = ', '.join(COLUMNAS_LOTE)
+    nuevos = ', '.join(f"NEW.{columna}" for columna in COLUMNAS_LOTE)
+    sentencias = [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_resumen_lotes_ins AFTER INSERT ON lotes_produccion BEGIN
+            INSERT OR REPLACE INTO lote_resumen (codigo_lote, {columnas}) VALUES (NEW.codigo_lote, {nuevos});
+            {_cuerpo(*(sql_recalcular(tabla, 'NEW.codigo_lote', contadores=True) for tabla in FUENTES))};
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_resumen_lotes_upd AFTER UPDATE OF codigo_lote, {columnas} ON lotes_produccion BEGIN
+            UPDATE lote_resumen SET codigo_lote = NEW.codigo_lote,
+                {', '.join(f'{columna} = NEW.{columna}' for columna in COLUMNAS_LOTE)}
+            WHERE codigo_lote = OLD.codigo_lote;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_resumen_lotes_del AFTER DELETE ON lotes_produccion BEGIN
+            DELETE FROM lote_resumen WHERE codigo_lote = OLD.codigo_lote;
+        END""",
+    ]
+    for tabla, fuente in FUENTES.items():
+        sentencias += [
+            f"""CREATE TRIGGER IF NOT EXISTS trg_resumen_{tabla}_ins AFTER INSERT ON {tabla} BEGIN
+                {_cuerpo(sql_recalcular(tabla, 'NEW.codigo_lote'), sql_contar(tabla, 'NEW', '+'))};
+            END""",
+            # Con cambio de lote el -1 va al lote anterior y el +1 al nuevo
+            f"""CREATE TRIGGER IF NOT EXISTS trg_resumen_{tabla}_upd AFTER UPDATE OF {', '.join(fuente.columnas)} ON {tabla} BEGIN
+                {_cuerpo(sql_recalcular(tabla, 'OLD.codigo_lote'), sql_recalcular(tabla, 'NEW.codigo_lote'),
+                         sql_contar(tabla, 'OLD', '-'), sql_contar(tabla, 'NEW', '+'))};
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_resumen_{tabla}_del AFTER DELETE ON {tabla} BEGIN
+                {_cuerpo(sql_recalcular(tabla, 'OLD.codigo_lote'), sql_contar(tabla, 'OLD', '-'))};
+            END""",
+        ]
+    return sentencias
+
+
+def sumar_lecturas(conn, tabla, desde, hasta):
+    """Acumula en lote_resumen las lecturas de ``tabla`` con id en (desde, hasta]."""
+    conn.execute(SQL_TABLA_LECTURAS_NUEVAS)
+    conn.execute("DELETE FROM temp.resumen_lecturas_nuevas")
+    conn.execute(SQL_AGREGAR_LECTURAS.format(tabla=tabla), (desde, hasta))
+    conn.execute(SQL_SUMAR_LECTURAS)
+
+
+def actualizar_lecturas(conn, tope=None):
+    """Acumula las lecturas nuevas desde la última marca; devuelve cuántas. Dentro de una transacción.
+
+    Con ``tope`` acumula como mucho esas lecturas (por id). Antes de la
+    migración 15 no hay marca y no hace nada.
+    """
+    fila = conn.execute("SELECT ultimo_id FROM rollup_estado WHERE clave = 'lote_resumen'").fetchone()
+    if fila is None:
+        return 0
+    desde = fila[0]
+    hasta = conn.execute("SELECT COALESCE(MAX(id), 0) FROM lecturas_sensores").fetchone()[0]
+    if tope:
+        hasta = min(hasta, desde + tope)
+    if hasta <= desde:
+        return 0
+    sumar_lecturas(conn, 'lecturas_sensores', desde, hasta)
+    conn.execute("UPDATE rollup_estado SET ultimo_id = ? WHERE clave = 'lote_resumen'", (hasta,))
+    return hasta - desde
+
+
+def reconstruir_resumen(conn):
+    """Rehace lote_resumen desde cero (lecturas archivadas incluidas); devuelve el número de lotes."""
+    conn.execute("DELETE FROM lote_resumen")
+    columnas = ', '.join(COLUMNAS_LOTE)
+    n = conn.execute(f"INSERT INTO lote_resumen (codigo_lote, {columnas}) "
+                     f"SELECT codigo_lote, {columnas} FROM lotes_produccion").rowcount
+    for tabla in FUENTES:
+        conn.execute(sql_recalcular(tabla, 'lote_resumen.codigo_lote', contadores=True))
+    for tabla, in conn.execute("SELECT tabla FROM lecturas_archivo ORDER BY mes").fetchall():
+        sumar_lecturas(conn, tabla, 0, conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}").fetchone()[0])
+    conn.execute("INSERT OR REPLACE INTO rollup_estado (clave, ultimo_id) VALUES ('lote_resumen', 0)")
+    actualizar_lecturas(conn)
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumen materializado por lote del TPS")
+    parser.add_argument('--reconstruir', action='store_true', help="Rehacer lote_resumen desde las tablas de origen")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    # Importación local: tps_migraciones importa este módulo
+    from tps_migraciones import aplicar_migraciones
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        if args.reconstruir:
+            inicio = time.perf_counter()
+            with pool.transaccion() as conn:
+                n = reconstruir_resumen(conn)
+            print(f"Resumen reconstruido en {time.perf_counter() - inicio:.1f}s: {n:,} lotes")
+        with pool.conexion() as conn:
+            lotes, lecturas, marca = conn.execute("""
+                SELECT COUNT(*), TOTAL(lecturas), (SELECT ultimo_id FROM rollup_estado WHERE clave = 'lote_resumen')
+                FROM lote_resumen
+            """).fetchone()
+        print(f"lote_resumen: {lotes:,} lotes, {int(lecturas):,} lecturas acumuladas (marca {marca})")
+    finally:
+        pool.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
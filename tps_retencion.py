@@ -0,0 +1,212 @@
+"""Retención de lecturas de sensores: tabla caliente, archivo mensual y compactación.
+
+``archivar`` mueve las lecturas crudas anteriores a la ventana caliente
+(``DIAS_EN_CALIENTE``, redondeada al inicio de mes) a una tabla por mes
+``lecturas_sensores_AAAAMM`` registrada en ``lecturas_archivo``. El
+movimiento va en tandas de ``FILAS_POR_TANDA`` filas, cada una en su
+propia transacción corta, para no bloquear la ingesta. Solo se archivan
+lecturas ya agregadas en ``lecturas_rollup``, ``lote_resumen`` y las
+cartas de control: los rollups quedan en línea y los históricos por
+minuto/hora/día no cambian. Las consultas
+crudas (``tps_series.consultar_crudo``) leen los meses archivados solo
+si la ventana pedida llega hasta ellos.
+
+``compactar`` devuelve al sistema las páginas libres con
+``incremental_vacuum`` en pasos cortos y actualiza las estadísticas con
+ANALYZE acotado, tabla por tabla; nada de ello bloquea a los escritores
+más que un instante. La base debe estar en ``auto_vacuum = INCREMENTAL``:
+``--convertir`` hace la conversión, que requiere un VACUUM completo
+(bloqueante) una sola vez.
+
+Uso desde línea de comandos::
+
+    python tps_retencion.py archivar --dias 90
+    python tps_retencion.py compactar
+    python tps_retencion.py estado
+"""
+import argparse
+import datetime
+import sys
+import time
+from typing import NamedTuple
+
+from tps_db import DB_PATH, PoolConexiones
+from tps_migraciones import aplicar_migraciones
+
+DIAS_EN_CALIENTE = 90
+FILAS_POR_TANDA = 20000
+PAGINAS_POR_PASO = 2000
+# Filas muestreadas por índice en el ANALYZE de compactar
+LIMITE_ANALISIS = 1000
+AUTO_VACUUM = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+
+class ResultadoArchivo(NamedTuple):
+    corte: str
+    filas_por_mes: dict
+    segundos: float
+
+
+class ResultadoCompactacion(NamedTuple):
+    auto_vacuum: str
+    paginas_liberadas: int
+    tablas_analizadas: int
+    segundos: float
+
+
+def _ahora():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def corte_caliente(dias=DIAS_EN_CALIENTE, hoy=None):
+    """Inicio del mes que contiene ``hoy - dias``: lo anterior se archiva por meses completos."""
+    hoy = hoy or datetime.datetime.now(datetime.timezone.utc).date()
+    limite = hoy - datetime.timedelta(days=dias)
+    return limite.replace(day=1).strftime('%Y-%m-%d 00:00:00')
+
+
+def _limites_mes(mes):
+    """('AAAA-MM-01 00:00:00' del mes, el del mes siguiente) para ``mes`` = 'AAAAMM'."""
+    anio, numero = int(mes[:4]), int(mes[4:])
+    siguiente = (anio + 1, 1) if numero == 12 else (anio, numero + 1)
+    return f"{anio:04d}-{numero:02d}-01 00:00:00", f"{siguiente[0]:04d}-{siguiente[1]:02d}-01 00:00:00"
+
+
+def _crear_tabla_mes(conn, mes):
+    """Crea (si falta) la tabla de archivo del mes con las columnas de lecturas_sensores y la registra."""
+    tabla = f"lecturas_sensores_{mes}"
+    columnas = [(nombre, tipo) for _, nombre, tipo, *_ in conn.execute("PRAGMA table_info(lecturas_sensores)")]
+    definicion = ", ".join("id INTEGER PRIMARY KEY" if nombre == 'id' else f"{nombre} {tipo}" for nombre, tipo in columnas)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({definicion})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabla}_ts ON {tabla} (timestamp_lectura)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabla}_lote_ts ON {tabla} (codigo_lote, timestamp_lectura)")
+    desde, hasta = _limites_mes(mes)
+    conn.execute("INSERT OR IGNORE INTO lecturas_archivo (mes, tabla, desde, hasta) VALUES (?, ?, ?, ?)",
+                 (mes, tabla, desde, hasta))
+    return tabla, [nombre for nombre, _ in columnas]
+
+
+def archivar(pool, dias=DIAS_EN_CALIENTE, filas_por_tanda=FILAS_POR_TANDA, pausa=0.0, hoy=None):
+    """Mueve a las tablas mensuales las lecturas anteriores al corte; devuelve un ResultadoArchivo."""
+    inicio = time.perf_counter()
+    corte = corte_caliente(dias, hoy)
+    with pool.conexion() as conn:
+        meses = [mes for mes, in conn.execute("""
+            SELECT DISTINCT strftime('%Y%m', timestamp_lectura) FROM lecturas_sensores
+            WHERE timestamp_lectura < ?
+        """, (corte,)) if mes]
+    filas_por_mes = {}
+    for mes in sorted(meses):
+        with pool.transaccion() as conn:
+            tabla, columnas = _crear_tabla_mes(conn, mes)
+        lista = ", ".join(columnas)
+        desde, hasta = _limites_mes(mes)
+        filas_por_mes[mes] = 0
+        while True:
+            with pool.transaccion() as conn:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS ids_archivo (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM temp.ids_archivo")
+                # Solo lecturas ya incluidas en rollups, resumen y cartas (se ponen al día fuera de la ingesta)
+                n = conn.execute("""
+                    INSERT INTO temp.ids_archivo
+                    SELECT id FROM lecturas_sensores
+                    WHERE timestamp_lectura >= ? AND timestamp_lectura < ?
+                      AND id <= (SELECT MIN(ultimo_id) FROM rollup_estado
+                                 WHERE clave IN ('lecturas_sensores', 'lote_resumen', 'spc:lecturas_sensores'))
+                    LIMIT ?
+                """, (desde, min(hasta, corte), filas_por_tanda)).rowcount
+                if n == 0:
+                    break
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO {tabla} ({lista})
+                    SELECT {lista} FROM lecturas_sensores WHERE id IN (SELECT id FROM temp.ids_archivo)
+                """)
+                conn.execute("DELETE FROM lecturas_sensores WHERE id IN (SELECT id FROM temp.ids_archivo)")
+                conn.execute("UPDATE lecturas_archivo SET filas = filas + ?, fecha_actualizacion = ? WHERE mes = ?",
+                             (n, _ahora(), mes))
+                conn.execute("UPDATE generaciones_tablas SET generacion = generacion + 1 WHERE tabla = 'lecturas_sensores'")
+            filas_por_mes[mes] += n
+            if pausa:
+                time.sleep(pausa)
+    return ResultadoArchivo(corte, filas_por_mes, time.perf_counter() - inicio)
+
+
+def compactar(pool, paginas_por_paso=PAGINAS_POR_PASO, pausa=0.05, convertir=False):
+    """Libera páginas con incremental_vacuum por pasos y analiza tabla por tabla; devuelve un ResultadoCompactacion."""
+    inicio = time.perf_counter()
+    with pool.conexion() as conn:
+        modo = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if modo != 2 and convertir:
+            # El cambio de modo solo se aplica al reconstruir la base: un VACUUM completo, una vez
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            modo = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        liberadas = 0
+        if modo == 2:
+            while True:
+                libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not libres:
+                    break
+                # execute() daría un solo paso (una página); executescript lo ejecuta completo
+                conn.executescript(f"PRAGMA incremental_vacuum({paginas_por_paso})")
+                paso = libres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if paso <= 0:
+                    break
+                liberadas += paso
+                time.sleep(pausa)
+        conn.execute(f"PRAGMA analysis_limit = {LIMITE_ANALISIS}")
+        tablas = [tabla for tabla, in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        for tabla in tablas:
+            conn.execute(f"ANALYZE {tabla}")
+            time.sleep(pausa)
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    return ResultadoCompactacion(AUTO_VACUUM.get(modo, str(modo)), liberadas, len(tablas), time.perf_counter() - inicio)
+
+
+def estado(conn):
+    """(filas en la tabla caliente, lectura más antigua en caliente, [(mes, tabla, filas, actualización)])."""
+    calientes, mas_antigua = conn.execute(
+        "SELECT COUNT(*), MIN(timestamp_lectura) FROM lecturas_sensores").fetchone()
+    meses = conn.execute("SELECT mes, tabla, filas, fecha_actualizacion FROM lecturas_archivo ORDER BY mes").fetchall()
+    return calientes, mas_antigua, meses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retención y compactación de lecturas de sensores TPS")
+    parser.add_argument('accion', choices=['archivar', 'compactar', 'estado'])
+    parser.add_argument('--dias', type=int, default=DIAS_EN_CALIENTE, help="Días de lecturas crudas en la tabla caliente")
+    parser.add_argument('--filas-por-tanda', type=int, default=FILAS_POR_TANDA)
+    parser.add_argument('--pausa', type=float, default=0.05, help="Segundos de pausa entre tandas o pasos")
+    parser.add_argument('--convertir', action='store_true',
+                        help="Pasar la base a auto_vacuum INCREMENTAL (VACUUM completo, bloqueante)")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        if args.accion == 'archivar':
+            resultado = archivar(pool, args.dias, args.filas_por_tanda, args.pausa)
+            print(f"Archivado en {resultado.segundos:.1f}s (lecturas anteriores a {resultado.corte}):")
+            for mes, filas in resultado.filas_por_mes.items():
+                print(f"  - {mes}: {filas:,} filas")
+        elif args.accion == 'compactar':
+            resultado = compactar(pool, pausa=args.pausa, convertir=args.convertir)
+            print(f"Compactado en {resultado.segundos:.1f}s: auto_vacuum {resultado.auto_vacuum}, "
+                  f"{resultado.paginas_liberadas:,} páginas liberadas, {resultado.tablas_analizadas} tablas analizadas")
+            if resultado.auto_vacuum != 'INCREMENTAL':
+                print("  (sin auto_vacuum INCREMENTAL las páginas libres se reutilizan pero no se devuelven; ver --convertir)")
+        else:
+            with pool.conexion() as conn:
+                calientes, mas_antigua, meses = estado(conn)
+            print(f"Tabla caliente: {calientes:,} lecturas (la más antigua: {mas_antigua})")
+            for mes, tabla, filas, actualizacion in meses:
+                print(f"  - {tabla}: {filas:,} filas (actualizado {actualizacion})")
+    finally:
+        pool.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Series de tiempo de sensores: rollups incrementales y downsampling.
+
+``lecturas_rollup`` guarda min/max/suma/conteo por minuto, hora y día para
+cada lote y canal de sensor. Se mantiene de forma incremental a partir de
+la marca ``rollup_estado.ultimo_id``, junto con la parte de sensores de
+``lote_resumen`` (ver ``tps_resumen``) y las cartas de control (ver
+``tps_spc``). La ingesta masiva no los toca: quien ingesta los pone al
+día por tandas fuera de sus bloques (``poner_al_dia``), el gateway IoT
+cada ``INTERVALO_DERIVADOS`` segundos y el escritor único de la app en
+su mantenimiento, con la cola vacía (``mantener_derivados``).
+
+Las lecturas crudas antiguas se mueven a tablas mensuales de archivo
+(ver ``tps_retencion``); los rollups no se archivan. ``consultar_crudo``
+lee la tabla caliente y solo los meses archivados que toca la ventana.
+"""
+import numpy as np
+
+from tps_resumen import actualizar_lecturas
+from tps_spc import actualizar_spc
+
+CANALES = ('sensor_temperatura', 'sensor_peso', 'sensor_humedad', 'sensor_ph', 'sensor_brix')
+
+# resolución -> (formato strftime del inicio del periodo, segundos por periodo)
+RESOLUCIONES = {
+    'minuto': ('%Y-%m-%d %H:%M:00', 60),
+    'hora': ('%Y-%m-%d %H:00:00', 3600),
+    'dia': ('%Y-%m-%d 00:00:00', 86400),
+}
+
+MAX_PUNTOS = 2000
+
+# Lecturas por transacción al poner al día rollups, resumen y cartas
+LECTURAS_POR_TANDA = 50000
+# Tanda del mantenimiento del escritor único: un formulario que llega la espera entera
+LECTURAS_POR_MANTENIMIENTO = 1000
+
+
+def _sql_agregar_minutos():
+    # Una sola pasada sobre las lecturas nuevas: agregados por minuto de los cinco canales
+    columnas = ",\n           ".join(
+        f"COUNT({c}), MIN({c}), MAX({c}), SUM({c})" for c in CANALES)
+    return f"""
+    INSERT INTO temp.rollup_nuevas
+    SELECT codigo_lote, strftime('{RESOLUCIONES['minuto'][0]}', timestamp_lectura) AS periodo,
+           {columnas}
+    FROM lecturas_sensores
+    WHERE id > ? AND id <= ? AND codigo_lote IS NOT NULL
+    GROUP BY codigo_lote, periodo
+    HAVING periodo IS NOT NULL
+"""
+
+
+def _sql_upsert(canal):
+    # Los agregados por minuto se combinan en hora y día: min/max/suma/conteo son componibles
+    return f"""
+    INSERT INTO lecturas_rollup (resolucion, codigo_lote, canal, periodo, n, minimo, maximo, suma)
+    SELECT ?, codigo_lote, '{canal}', strftime(?, periodo) AS p,
+           SUM(n_{canal}), MIN(min_{canal}), MAX(max_{canal}), SUM(sum_{canal})
+    FROM temp.rollup_nuevas
+    WHERE n_{canal} > 0
+    GROUP BY codigo_lote, p
+    ON CONFLICT (resolucion, codigo_lote, canal, periodo) DO UPDATE SET
+        n = n + excluded.n,
+        minimo = MIN(minimo, excluded.minimo),
+        maximo = MAX(maximo, excluded.maximo),
+        suma = suma + excluded.suma
+"""
+
+
+SQL_TABLA_NUEVAS = "CREATE TEMP TABLE IF NOT EXISTS rollup_nuevas (codigo_lote TEXT, periodo TEXT, {})".format(
+    ", ".join(f"n_{c} INTEGER, min_{c} REAL, max_{c} REAL, sum_{c} REAL" for c in CANALES))
+SQL_AGREGAR_MINUTOS = _sql_agregar_minutos()
+SQL_UPSERT_ROLLUP = {canal: _sql_upsert(canal) for canal in CANALES}
+
+
+def actualizar_rollups(conn, tope=None):
+    """Agrega las lecturas nuevas desde la última marca; devuelve cuántas. Debe llamarse dentro de una transacción.
+
+    Con ``tope`` procesa como mucho esas lecturas (por id) en rollups,
+    resumen y cartas de control.
+    """
+    desde = conn.execute("SELECT ultimo_id FROM rollup_estado WHERE clave = 'lecturas_sensores'").fetchone()[0]
+    hasta = conn.execute("SELECT COALESCE(MAX(id), 0) FROM lecturas_sensores").fetchone()[0]
+    if tope:
+        hasta = min(hasta, desde + tope)
+    # El resumen por lote (lecturas, alertas, último estado) avanza con los rollups
+    actualizar_lecturas(conn, tope)
+    # Y las cartas de control de los canales de sensores
+    actualizar_spc(conn, 'lecturas_sensores', tope)
+    if hasta <= desde:
+        return 0
+    conn.execute(SQL_TABLA_NUEVAS)
+    conn.execute("DELETE FROM temp.rollup_nuevas")
+    conn.execute(SQL_AGREGAR_MINUTOS, (desde, hasta))
+    for resolucion, (formato, _) in RESOLUCIONES.items():
+        for canal in CANALES:
+            conn.execute(SQL_UPSERT_ROLLUP[canal], (resolucion, formato))
+    conn.execute("UPDATE rollup_estado SET ultimo_id = ? WHERE clave = 'lecturas_sensores'", (hasta,))
+    return hasta - desde
+
+
+def pendientes(conn):
+    """Lecturas aún sin pasar a rollups, resumen o cartas de control."""
+    return conn.execute("""
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM lecturas_sensores) - MIN(ultimo_id)
+        FROM rollup_estado WHERE clave IN ('lecturas_sensores', 'lote_resumen', 'spc:lecturas_sensores')
+    """).fetchone()[0] or 0
+
+
+def mantener_derivados(conn):
+    """Una tanda corta de ``actualizar_rollups`` para el ``mantenimiento`` del escritor único; devuelve cuánto avanzó."""
+    antes = pendientes(conn)
+    actualizar_rollups(conn, LECTURAS_POR_MANTENIMIENTO)
+    return antes - pendientes(conn)
+
+
+def poner_al_dia(pool, tope=LECTURAS_POR_TANDA, escritor=None):
+    """Pone al día rollups, resumen y cartas, una transacción por tanda; devuelve las lecturas procesadas.
+
+    Si no hay nada pendiente no abre ninguna transacción de escritura. Con
+    ``escritor`` (ver ``tps_escritor``) cada tanda es una intención del
+    escritor único en lugar de una transacción propia.
+    """
+    total = 0
+    while True:
+        with pool.conexion() as conn:
+            n = pendientes(conn)
+        if n <= 0:
+            return total
+        if escritor is not None:
+            escritor.ejecutar(actualizar_rollups, tope, nombre='poner_al_dia_rollups')
+        else:
+            with pool.transaccion() as conn:
+                actualizar_rollups(conn, tope)
+        total += min(n, tope) if tope else n
+
+
+def elegir_resolucion(segundos_ventana, max_puntos=MAX_PUNTOS):
+    """La resolución más fina cuyo número de periodos en la ventana cabe en ``max_puntos``."""
+    for resolucion, (_, segundos) in RESOLUCIONES.items():
+        if segundos_ventana / segundos <= max_puntos:
+            return resolucion
+    return 'dia'
+
+
+def consultar_rollup(conn, canal, resolucion, desde, hasta, codigo_lote=None):
+    """Filas (periodo, minimo, maximo, promedio, n) ordenadas por periodo.
+
+    Sin ``codigo_lote`` se combinan todos los lotes de cada periodo.
+    """
+    if canal not in CANALES or resolucion not in RESOLUCIONES:
+        raise ValueError(f"Canal o resolución no válidos: {canal}, {resolucion}")
+    filtro_lote = "AND codigo_lote = ?" if codigo_lote else ""
+    params = [resolucion, canal, desde, hasta] + ([codigo_lote] if codigo_lote else [])
+    return conn.execute(f"""
+        SELECT periodo, MIN(minimo), MAX(maximo), SUM(suma) / SUM(n), SUM(n)
+        FROM lecturas_rollup
+        WHERE resolucion = ? AND canal = ? AND periodo >= ? AND periodo < ? {filtro_lote}
+        GROUP BY periodo
+        ORDER BY periodo
+    """, params).fetchall()
+
+
+def tablas_lecturas(conn, desde=None, hasta=None):
+    """Tablas con lecturas crudas para la ventana [desde, hasta): los meses archivados que la tocan y la caliente.
+
+    Sin ventana se devuelven todas.
+    """
+    if desde is None or hasta is None:
+        archivadas = conn.execute("SELECT tabla FROM lecturas_archivo ORDER BY mes").fetchall()
+    else:
+        archivadas = conn.execute("SELECT tabla FROM lecturas_archivo WHERE desde < ? AND hasta > ? ORDER BY mes",
+                                  (hasta, desde)).fetchall()
+    return [tabla for tabla, in archivadas] + ['lecturas_sensores']
+
+
+def consultar_crudo(conn, canal, desde, hasta, codigo_lote=None):
+    """Filas (timestamp_lectura, valor) de lecturas crudas en la ventana, ordenadas por tiempo."""
+    if canal not in CANALES:
+        raise ValueError(f"Canal no válido: {canal}")
+    filtro_lote = "AND codigo_lote = ?" if codigo_lote else ""
+    tablas = tablas_lecturas(conn, desde, hasta)
+    params = ([desde, hasta] + ([codigo_lote] if codigo_lote else [])) * len(tablas)
+    union = "\n        UNION ALL\n".join(f"""
+        SELECT timestamp_lectura, {canal}
+        FROM {tabla}
+        WHERE timestamp_lectura >= ? AND timestamp_lectura < ? AND {canal} IS NOT NULL {filtro_lote}""" for tabla in tablas)
+    return conn.execute(f"{union}\n        ORDER BY timestamp_lectura", params).fetchall()
+
+
+def lttb(x, y, umbral):
+    """Largest-Triangle-Three-Buckets: índices de los ``umbral`` puntos que conservan la forma de la serie.
+
+    ``x`` debe ser numérico y creciente (por ejemplo, timestamps en segundos).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+
+    indices = np.empty(umbral, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    # Límites de los umbral-2 buckets intermedios
+    bordes = np.linspace(1, n - 1, umbral - 1).astype(np.int64)
+    a = 0
+    for i in range(umbral - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Promedio del bucket siguiente (el último punto para el bucket final)
+        sig_inicio, sig_fin = bordes[i + 1], (bordes[i + 2] if i + 2 < len(bordes) else n)
+        x_prom = x[sig_inicio:sig_fin].mean()
+        y_prom = y[sig_inicio:sig_fin].mean()
+        # Área del triángulo (a, candidato, promedio siguiente) para todo el bucket a la vez
+        areas = np.abs((x[a] - x_prom) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (y_prom - y[a]))
+        a = inicio + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def serie_historica(conn, canal, desde, hasta, codigo_lote=None, resolucion='auto', max_puntos=MAX_PUNTOS):
+    """Serie lista para graficar: (resolucion_usada, filas).
+
+    Cada fila es (instante, valor, minimo, maximo). ``resolucion='auto'``
+    elige la resolución de rollup según la ventana; ``'cruda'`` lee
+    lecturas_sensores y reduce la serie con LTTB a ``max_puntos``.
+    """
+    if resolucion == 'auto':
+        segundos = (np.datetime64(hasta, 's') - np.datetime64(desde, 's')).astype(int)
+        resolucion = elegir_resolucion(segundos, max_puntos)
+    if resolucion == 'cruda':
+        crudo = consultar_crudo(conn, canal, desde, hasta, codigo_lote)
+        if not crudo:
+            return resolucion, []
+        instantes = np.array([fila[0] for fila in crudo], dtype='datetime64[us]')
+        valores = np.array([fila[1] for fila in crudo], dtype=float)
+        indices = lttb(instantes.astype(np.int64), valores, max_puntos)
+        return resolucion, [(instantes[i].item(), valores[i], valores[i], valores[i]) for i in indices.tolist()]
+    filas = consultar_rollup(conn, canal, resolucion, desde, hasta, codigo_lote)
+    return resolucion, [(periodo, promedio, minimo, maximo) for periodo, minimo, maximo, promedio, _ in filas]
@@ -0,0 +1,446 @@
+"""Control estadístico de procesos (SPC) de sensores y laboratorio.
+
+Cartas X̄/R, EWMA y CUSUM por producto y canal: los cuatro canales de
+sensores de ``lecturas_sensores`` y tres valores de
+``pruebas_fisicoquimicas``. Los puntos de cada producto y canal se
+agrupan por orden de llegada en subgrupos de ``TAMANO_SUBGRUPO``.
+
+Dos tablas (migración 16):
+
+* ``spc_canales``: el estado acumulado de cada producto y canal. Media y
+  M2 de Welford de los valores individuales (la dispersión de EWMA y
+  CUSUM), sumas de medias y rangos de los subgrupos (los límites X̄/R),
+  el último EWMA y CUSUM y los valores del subgrupo aún incompleto. Un
+  punto nuevo actualiza una fila en O(1), sin releer el histórico.
+* ``spc_subgrupos``: los últimos ``SUBGRUPOS_CONSERVADOS`` subgrupos de
+  cada carta con media, rango, EWMA, CUSUM y las reglas de Western
+  Electric que incumplió.
+
+``actualizar_spc`` procesa las filas nuevas desde su marca en
+``rollup_estado`` (claves ``spc:<tabla>``). Las lecturas avanzan con los
+rollups (``tps_series.actualizar_rollups``), que se ponen al día por
+tandas fuera de los bloques de ingesta; las pruebas, en la transacción
+del formulario y del generador. Lo que escriban otros procesos (las
+importaciones) lo recoge el mantenimiento del escritor único
+(``mantener_cartas``); la pestaña de análisis solo lee. Los incumplimientos de reglas se
+registran en alertas_automaticas (tipo SPC), una alerta activa por
+producto, canal y regla que se extiende mientras siga activa.
+
+Uso desde línea de comandos::
+
+    python tps_spc.py
+    python tps_spc.py --reconstruir
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from tps_alertas import SQL_INSERTAR_ALERTA
+from tps_codigos import reservar_codigos
+from tps_db import DB_PATH, PoolConexiones
+
+
+class Fuente(NamedTuple):
+    columna_fecha: str
+    canales: tuple
+
+
+FUENTES = {
+    'lecturas_sensores': Fuente('timestamp_lectura',
+                                ('sensor_temperatura', 'sensor_humedad', 'sensor_ph', 'sensor_brix')),
+    'pruebas_fisicoquimicas': Fuente('fecha_prueba', ('acidez_titulable', 'solidos_solubles', 'firmeza')),
+}
+
+# canal -> (etiqueta, unidad)
+CANALES = {
+    'sensor_temperatura': ("Temperatura", "°C"),
+    'sensor_humedad': ("Humedad", "%"),
+    'sensor_ph': ("pH", ""),
+    'sensor_brix': ("Brix (sensor)", "°Brix"),
+    'acidez_titulable': ("Acidez titulable", "%"),
+    'solidos_solubles': ("Sólidos solubles", "°Brix"),
+    'firmeza': ("Firmeza", "g/mm"),
+}
+
+TAMANO_SUBGRUPO = 5
+# n -> (A2, D3, D4) de las cartas X̄/R
+CONSTANTES_XR = {
+    2: (1.880, 0.0, 3.267),
+    3: (1.023, 0.0, 2.574),
+    4: (0.729, 0.0, 2.282),
+    5: (0.577, 0.0, 2.114),
+    6: (0.483, 0.0, 2.004),
+    7: (0.419, 0.076, 1.924),
+    8: (0.373, 0.136, 1.864),
+    9: (0.337, 0.184, 1.816),
+    10: (0.308, 0.223, 1.777),
+}
+LAMBDA_EWMA, L_EWMA = 0.2, 3.0
+K_CUSUM, H_CUSUM = 0.5, 5.0
+# Subgrupos necesarios antes de evaluar reglas (límites de fase I)
+MIN_SUBGRUPOS = 20
+SUBGRUPOS_CONSERVADOS = 1000
+PUNTOS_POR_TANDA = 200000
+# Tanda del mantenimiento del escritor único: un formulario que llega la espera entera
+PUNTOS_POR_MANTENIMIENTO = 2000
+
+# regla -> (nivel de criticidad, descripción)
+REGLAS_WE = {
+    1: ('ALTA', "un subgrupo fuera de los límites de control (3σ)"),
+    2: ('MEDIA', "2 de 3 subgrupos más allá de 2σ del mismo lado"),
+    3: ('MEDIA', "4 de 5 subgrupos más allá de 1σ del mismo lado"),
+    4: ('MEDIA', "8 subgrupos seguidos del mismo lado de la línea central"),
+}
+
+
+class Limites(NamedTuple):
+    centro: float           # X̄̄
+    lic: float
+    lsc: float
+    rango_medio: float      # R̄
+    rango_lic: float
+    rango_lsc: float
+    media: float            # media de Welford de los valores individuales
+    sigma_media: float      # desviación de Welford / sqrt(TAMANO_SUBGRUPO)
+    ewma_lic: float
+    ewma_lsc: float
+
+
+class ResultadoSPC(NamedTuple):
+    puntos: int
+    subgrupos: int
+    alertas: int
+
+
+SQL_GUARDAR_ESTADO = '''
+    INSERT OR REPLACE INTO spc_canales (codigo_producto, canal, n, media, m2, subgrupos, suma_medias, suma_rangos,
+                                        ewma, cusum_pos, cusum_neg, parcial)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_INSERTAR_SUBGRUPO = '''
+    INSERT OR REPLACE INTO spc_subgrupos (codigo_producto, canal, numero, fecha, codigo_lote, media, rango,
+                                          ewma, cusum_pos, cusum_neg, reglas)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def calcular_limites(subgrupos, suma_medias, suma_rangos, n, media, m2):
+    """Límites de las cartas a partir del estado acumulado; None sin subgrupos."""
+    if not subgrupos:
+        return None
+    a2, d3, d4 = CONSTANTES_XR[TAMANO_SUBGRUPO]
+    centro, rango_medio = suma_medias / subgrupos, suma_rangos / subgrupos
+    sigma_media = (m2 / (n - 1)) ** 0.5 / TAMANO_SUBGRUPO ** 0.5 if n > 1 else 0.0
+    ancho_ewma = L_EWMA * sigma_media * (LAMBDA_EWMA / (2 - LAMBDA_EWMA)) ** 0.5
+    return Limites(centro, centro - a2 * rango_medio, centro + a2 * rango_medio,
+                   rango_medio, d3 * rango_medio, d4 * rango_medio,
+                   media, sigma_media, media - ancho_ewma, media + ancho_ewma)
+
+
+def reglas_incumplidas(ventanas, centro, sigma):
+    """Máscara (subgrupos, 4) de las reglas de Western Electric que incumple cada subgrupo.
+
+    Cada fila de ``ventanas`` tiene las 8 últimas medias hasta ese
+    subgrupo (NaN si no hay tantas) y se mide contra sus propios límites
+    ``centro`` ± k·``sigma``.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (ventanas - centro[:, None]) / sigma[:, None]
+    actual = z[:, -1]
+    lado = np.where(actual > 0, 1.0, -1.0)[:, None]
+    with np.errstate(invalid='ignore'):
+        lado_z = z * lado
+        return np.column_stack([
+            np.abs(actual) > 3,
+            (np.abs(actual) > 2) & ((lado_z[:, -3:] > 2).sum(axis=1) >= 2),
+            (np.abs(actual) > 1) & ((lado_z[:, -5:] > 1).sum(axis=1) >= 4),
+            (lado_z > 0).all(axis=1),
+        ]) & (sigma > 0)[:, None]
+
+
+def _cargar_estado(conn, producto, canal):
+    fila = conn.execute('''
+        SELECT n, media, m2, subgrupos, suma_medias, suma_rangos, ewma, cusum_pos, cusum_neg, parcial
+        FROM spc_canales WHERE codigo_producto = ? AND canal = ?
+    ''', (producto, canal)).fetchone()
+    if fila is None:
+        return [0, 0.0, 0.0, 0, 0.0, 0.0, None, 0.0, 0.0, []]
+    return list(fila[:9]) + [json.loads(fila[9] or '[]')]
+
+
+def _medias_recientes(conn, producto, canal):
+    filas = conn.execute('''
+        SELECT media FROM spc_subgrupos WHERE codigo_producto = ? AND canal = ?
+        ORDER BY numero DESC LIMIT 7
+    ''', (producto, canal)).fetchall()
+    return np.array([np.nan] * (7 - len(filas)) + [media for media, in reversed(filas)])
+
+
+def _procesar_canal(conn, producto, canal, valores, fechas, lotes, alertar, incumplimientos):
+    """Acumula los valores de un producto y canal; devuelve cuántos subgrupos cerró."""
+    n, media, m2, subgrupos, suma_medias, suma_rangos, ewma, cusum_pos, cusum_neg, parcial = \
+        _cargar_estado(conn, producto, canal)
+
+    # Welford por bloques (Chan et al.): combina media y M2 del bloque con las acumuladas
+    n_bloque = len(valores)
+    media_bloque = float(valores.mean())
+    delta = media_bloque - media
+    total = n + n_bloque
+    media += delta * n_bloque / total
+    m2 += float(((valores - media_bloque) ** 2).sum()) + delta * delta * n * n_bloque / total
+    n = total
+
+    secuencia = np.concatenate([np.asarray(parcial, dtype=float), valores])
+    completos = len(secuencia) // TAMANO_SUBGRUPO
+    cerrados = secuencia[:completos * TAMANO_SUBGRUPO].reshape(completos, TAMANO_SUBGRUPO)
+    medias_sub = cerrados.mean(axis=1)
+    rangos_sub = np.ptp(cerrados, axis=1)
+    # El último punto de cada subgrupo siempre es del bloque: lo parcial tiene menos de TAMANO_SUBGRUPO
+    ultimos = np.arange(1, completos + 1) * TAMANO_SUBGRUPO - 1 - len(parcial)
+    parcial = secuencia[completos * TAMANO_SUBGRUPO:].tolist()
+
+    filas = []
+    if completos:
+        # Límites tras cada subgrupo, a partir de las sumas acumuladas
+        numeros = subgrupos + np.arange(1, completos + 1)
+        sumas_medias = suma_medias + np.cumsum(medias_sub)
+        sumas_rangos = suma_rangos + np.cumsum(rangos_sub)
+        centros = sumas_medias / numeros
+        anchos = CONSTANTES_XR[TAMANO_SUBGRUPO][0] * sumas_rangos / numeros
+        subgrupos, suma_medias, suma_rangos = int(numeros[-1]), float(sumas_medias[-1]), float(sumas_rangos[-1])
+        limites = calcular_limites(subgrupos, suma_medias, suma_rangos, n, media, m2)
+
+        # EWMA: z_k = λ·x̄_k + (1 - λ)·z_(k-1), partiendo del último guardado
+        previos = medias_sub if ewma is None else np.r_[ewma, medias_sub]
+        ewmas = pd.Series(previos).ewm(alpha=LAMBDA_EWMA, adjust=False).mean().to_numpy()[-completos:]
+        ewma = float(ewmas[-1])
+        # CUSUM tabular con la recursión de Lindley: C_k = S_k - min(-C_0, min_(j<=k) S_j)
+        if limites.sigma_media > 0:
+            desvios = (medias_sub - limites.media) / limites.sigma_media
+            acumulado = np.cumsum(desvios - K_CUSUM)
+            cusums_pos = acumulado - np.minimum(-cusum_pos, np.minimum.accumulate(acumulado))
+            acumulado = np.cumsum(-desvios - K_CUSUM)
+            cusums_neg = acumulado - np.minimum(-cusum_neg, np.minimum.accumulate(acumulado))
+            cusum_pos, cusum_neg = float(cusums_pos[-1]), float(cusums_neg[-1])
+        else:
+            cusums_pos, cusums_neg = np.full(completos, cusum_pos), np.full(completos, cusum_neg)
+
+        ventanas = np.lib.stride_tricks.sliding_window_view(
+            np.r_[_medias_recientes(conn, producto, canal), medias_sub], 8)
+        incumplidas = reglas_incumplidas(ventanas, centros, anchos / 3) & (numeros >= MIN_SUBGRUPOS)[:, None]
+        reglas = [None] * completos
+        for k in np.flatnonzero(incumplidas.any(axis=1)).tolist():
+            reglas[k] = ','.join(str(r + 1) for r in np.flatnonzero(incumplidas[k]).tolist())
+            if not alertar:
+                continue
+            fecha, lote, media_sub = fechas[ultimos[k]], lotes[ultimos[k]], float(medias_sub[k])
+            limite = float(centros[k] + anchos[k] if media_sub > centros[k] else centros[k] - anchos[k])
+            for regla in np.flatnonzero(incumplidas[k]).tolist():
+                clave = (producto, canal, regla + 1)
+                previo = incumplimientos.get(clave)
+                # Las fechas de registro no tienen por qué seguir el orden de llegada
+                incumplimientos[clave] = (
+                    min(previo[0], fecha) if previo else fecha, max(previo[1], fecha) if previo else fecha,
+                    lote, media_sub, limite, (previo[5] if previo else 0) + 1)
+        filas = list(zip(itertools.repeat(producto), itertools.repeat(canal), numeros.tolist(),
+                         fechas[ultimos].tolist(), lotes[ultimos].tolist(), medias_sub.tolist(), rangos_sub.tolist(),
+                         ewmas.tolist(), cusums_pos.tolist(), cusums_neg.tolist(), reglas))
+
+    if filas:
+        conn.executemany(SQL_INSERTAR_SUBGRUPO, filas)
+        conn.execute("DELETE FROM spc_subgrupos WHERE codigo_producto = ? AND canal = ? AND numero <= ?",
+                     (producto, canal, subgrupos - SUBGRUPOS_CONSERVADOS))
+    conn.execute(SQL_GUARDAR_ESTADO, (producto, canal, n, media, m2, subgrupos, suma_medias, suma_rangos,
+                                      ewma, cusum_pos, cusum_neg, json.dumps(parcial)))
+    return completos
+
+
+def _segundos(desde, hasta):
+    return float((pd.Timestamp(hasta) - pd.Timestamp(desde)).total_seconds())
+
+
+def _registrar_alertas(conn, incumplimientos):
+    """Una alerta activa por producto, canal y regla: se extiende si ya existe; devuelve las nuevas."""
+    nuevas = []
+    for (producto, canal, regla), (inicio, fin, lote, valor, limite, veces) in incumplimientos.items():
+        nivel, descripcion = REGLAS_WE[regla]
+        mensaje = f"SPC {producto} · {CANALES[canal][0]}: regla {regla} de Western Electric, {descripcion}"
+        activa = conn.execute('''
+            SELECT id, fecha_alerta, fecha_fin, lecturas_afectadas FROM alertas_automaticas
+            WHERE estado_alerta = 'ACTIVA' AND tipo_alerta = 'SPC' AND mensaje_alerta = ?
+        ''', (mensaje,)).fetchone()
+        if activa is not None:
+            id_alerta, fecha_alerta, fecha_fin, lecturas = activa
+            fin = max(fin, fecha_fin or fin)
+            conn.execute('''
+                UPDATE alertas_automaticas
+                SET codigo_lote = ?, valor_detectado = ?, valor_limite = ?, fecha_fin = ?, duracion_segundos = ?,
+                    lecturas_afectadas = ?
+                WHERE id = ?
+            ''', (lote, round(valor, 3), round(limite, 3), fin, _segundos(fecha_alerta, fin),
+                  (lecturas or 0) + veces * TAMANO_SUBGRUPO, id_alerta))
+            continue
+        nuevas.append((lote, 'SPC', nivel, mensaje, CANALES[canal][0], round(valor, 3),
+                       round(limite, 3), inicio, fin, _segundos(inicio, fin), veces * TAMANO_SUBGRUPO, 0, 0))
+    if nuevas:
+        codigos = reservar_codigos(conn, 'alertas_automaticas', len(nuevas))
+        conn.executemany(SQL_INSERTAR_ALERTA, [(codigo,) + fila for codigo, fila in zip(codigos, nuevas)])
+    return len(nuevas)
+
+
+def procesar(conn, tabla, fuente, desde, hasta, alertar=True):
+    """Acumula las filas de ``tabla`` con id en (desde, hasta]; devuelve un ResultadoSPC.
+
+    ``fuente`` es la clave de FUENTES (una tabla de archivo de lecturas
+    usa la de ``lecturas_sensores``).
+    """
+    config = FUENTES[fuente]
+    puntos = pd.read_sql_query(f"""
+        SELECT lp.codigo_producto, t.codigo_lote, t.{config.columna_fecha} AS fecha, {', '.join(config.canales)}
+        FROM {tabla} t
+        JOIN lotes_produccion lp ON lp.codigo_lote = t.codigo_lote
+        WHERE t.id > ? AND t.id <= ? AND lp.codigo_producto IS NOT NULL
+        ORDER BY t.id
+    """, conn, params=(desde, hasta))
+    subgrupos = 0
+    incumplimientos = {}
+    for producto, grupo in puntos.groupby('codigo_producto', sort=False):
+        for canal in config.canales:
+            valores = pd.to_numeric(grupo[canal], errors='coerce').to_numpy(dtype=float)
+            validos = np.isfinite(valores)
+            if not validos.any():
+                continue
+            subgrupos += _procesar_canal(conn, producto, canal, valores[validos],
+                                         grupo['fecha'].to_numpy()[validos], grupo['codigo_lote'].to_numpy()[validos],
+                                         alertar, incumplimientos)
+    alertas = _registrar_alertas(conn, incumplimientos) if incumplimientos else 0
+    return ResultadoSPC(len(puntos), subgrupos, alertas)
+
+
+def _marcas(conn, tope):
+    """{fuente: (desde, hasta)} pendientes, como mucho ``tope`` filas; vacío antes de la migración 16."""
+    marcas = {}
+    for fuente in FUENTES:
+        fila = conn.execute("SELECT ultimo_id FROM rollup_estado WHERE clave = ?", (f"spc:{fuente}",)).fetchone()
+        if fila is None:
+            continue
+        maximo = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {fuente}").fetchone()[0]
+        marcas[fuente] = (fila[0], min(maximo, fila[0] + tope) if tope else maximo)
+    return marcas
+
+
+def actualizar_spc(conn, fuente, tope=None, alertar=True):
+    """Procesa las filas nuevas de ``fuente`` desde su marca; devuelve un ResultadoSPC.
+
+    Debe llamarse dentro de una transacción. Con ``tope`` procesa como
+    mucho esas filas; antes de la migración 16 no hace nada.
+    """
+    desde, hasta = _marcas(conn, tope).get(fuente, (0, 0))
+    if hasta <= desde:
+        return ResultadoSPC(0, 0, 0)
+    resultado = procesar(conn, fuente, fuente, desde, hasta, alertar)
+    conn.execute("UPDATE rollup_estado SET ultimo_id = ? WHERE clave = ?", (hasta, f"spc:{fuente}"))
+    return resultado
+
+
+def mantener_cartas(conn):
+    """Una tanda corta de cada fuente para el ``mantenimiento`` del escritor único; devuelve las filas procesadas."""
+    marcas = _marcas(conn, PUNTOS_POR_MANTENIMIENTO)
+    for fuente, (desde, hasta) in marcas.items():
+        if hasta > desde:
+            actualizar_spc(conn, fuente, PUNTOS_POR_MANTENIMIENTO)
+    return sum(hasta - desde for desde, hasta in marcas.values())
+
+
+def poner_al_dia(pool, tope=PUNTOS_POR_TANDA):
+    """Procesa lo pendiente de todas las fuentes, una transacción por tanda; devuelve las filas procesadas.
+
+    Si no hay nada pendiente no abre ninguna transacción de escritura.
+    """
+    total = 0
+    while True:
+        with pool.conexion() as conn:
+            pendientes = {fuente: hasta - desde for fuente, (desde, hasta) in _marcas(conn, tope).items() if hasta > desde}
+        if not pendientes:
+            return total
+        with pool.transaccion() as conn:
+            for fuente in pendientes:
+                actualizar_spc(conn, fuente, tope)
+        total += sum(pendientes.values())
+
+
+def reconstruir_spc(conn, tope=PUNTOS_POR_TANDA):
+    """Rehace las cartas desde cero sin generar alertas (lecturas archivadas incluidas); devuelve los subgrupos."""
+    conn.execute("DELETE FROM spc_canales")
+    conn.execute("DELETE FROM spc_subgrupos")
+    subgrupos = 0
+    for tabla, in conn.execute("SELECT tabla FROM lecturas_archivo ORDER BY mes").fetchall():
+        maximo = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}").fetchone()[0]
+        for desde in range(0, maximo, tope):
+            subgrupos += procesar(conn, tabla, 'lecturas_sensores', desde, min(desde + tope, maximo), False).subgrupos
+    for fuente in FUENTES:
+        conn.execute("INSERT OR REPLACE INTO rollup_estado (clave, ultimo_id) VALUES (?, 0)", (f"spc:{fuente}",))
+        while _marcas(conn, tope)[fuente][1] > _marcas(conn, tope)[fuente][0]:
+            subgrupos += actualizar_spc(conn, fuente, tope, alertar=False).subgrupos
+    return subgrupos
+
+
+def carta(conn, producto, canal, limite=200):
+    """(Limites, DataFrame) con los últimos ``limite`` subgrupos de un producto y canal; (None, vacío) sin datos."""
+    fila = conn.execute('''
+        SELECT subgrupos, suma_medias, suma_rangos, n, media, m2 FROM spc_canales
+        WHERE codigo_producto = ? AND canal = ?
+    ''', (producto, canal)).fetchone()
+    subgrupos = pd.read_sql_query('''
+        SELECT numero, fecha, codigo_lote, media, rango, ewma, cusum_pos, cusum_neg, reglas
+        FROM spc_subgrupos WHERE codigo_producto = ? AND canal = ?
+        ORDER BY numero DESC LIMIT ?
+    ''', conn, params=(producto, canal, limite)).iloc[::-1].reset_index(drop=True)
+    return (calcular_limites(*fila) if fila else None), subgrupos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Control estadístico de procesos del TPS")
+    parser.add_argument('--reconstruir', action='store_true', help="Rehacer las cartas desde las tablas de origen")
+    parser.add_argument('--db', default=DB_PATH, help="Ruta de la base de datos SQLite")
+    args = parser.parse_args(argv)
+
+    # Importación local: tps_migraciones importa este módulo
+    from tps_migraciones import aplicar_migraciones
+
+    pool = PoolConexiones(args.db)
+    try:
+        aplicar_migraciones(pool)
+        inicio = time.perf_counter()
+        if args.reconstruir:
+            with pool.transaccion() as conn:
+                subgrupos = reconstruir_spc(conn)
+            print(f"Cartas reconstruidas en {time.perf_counter() - inicio:.1f}s: {subgrupos:,} subgrupos")
+        else:
+            filas = poner_al_dia(pool)
+            print(f"{filas:,} filas nuevas procesadas en {time.perf_counter() - inicio:.1f}s")
+        with pool.conexion() as conn:
+            for producto, canal, senales, *estado in conn.execute('''
+                SELECT c.codigo_producto, c.canal,
+                       (SELECT COUNT(*) FROM spc_subgrupos s
+                        WHERE s.codigo_producto = c.codigo_producto AND s.canal = c.canal AND s.reglas IS NOT NULL),
+                       c.subgrupos, c.suma_medias, c.suma_rangos, c.n, c.media, c.m2
+                FROM spc_canales c WHERE c.subgrupos > 0 ORDER BY c.codigo_producto, c.canal
+            ''').fetchall():
+                limites = calcular_limites(*estado)
+                print(f"  - {producto} {CANALES[canal][0]}: {estado[3]:,} puntos, {estado[0]:,} subgrupos, "
+                      f"X̄ {limites.centro:.3f} [{limites.lic:.3f}, {limites.lsc:.3f}], "
+                      f"{senales} subgrupos recientes con reglas incumplidas")
+    finally:
+        pool.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())